@@ -16,9 +16,14 @@ import os
 import base64
 import random
 import json
+import struct
 from alert import AsynchronousAlertExecuter
 BUFSIZE = 16384
 
+# maximum size of a message in the framed protocol
+# (a larger length prefix is treated as a protocol error)
+MAXMESSAGESIZE = 67108864
+
 
 # simple class of an ssl tcp client 
 class Client:
@@ -33,33 +38,84 @@ class Client:
 		self.socket = None
 		self.sslSocket = None
 
+		# the ssl context is created with the first connection and
+		# used for all reconnections (the ca file and the client
+		# certificate are only loaded once)
+		self.sslContext = None
+
+		# flag that states if the framed protocol is used
+		# (each message is prefixed by its length, negotiated during the
+		# authentication) and the received data that does not form
+		# a complete message yet
+		self.framedProtocol = False
+		self.recvBuffer = bytearray()
+
 
 	def connect(self):
 		self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 
-		# check if a client certificate is required
-		if (self.clientCertFile is None
-			or self.clientKeyFile is None):
-			self.sslSocket = ssl.wrap_socket(self.socket, 
-				ca_certs=self.serverCAFile, cert_reqs=ssl.CERT_REQUIRED, 
-				ssl_version=ssl.PROTOCOL_TLSv1)
-		else:
-			self.sslSocket = ssl.wrap_socket(self.socket, 
-				ca_certs=self.serverCAFile, cert_reqs=ssl.CERT_REQUIRED, 
-				ssl_version=ssl.PROTOCOL_TLSv1,
-				certfile=self.clientCertFile, keyfile=self.clientKeyFile)
+		if self.sslContext is None:
+			sslContext = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
+			sslContext.options |= ssl.OP_NO_SSLv2
+			sslContext.options |= ssl.OP_NO_SSLv3
+			sslContext.verify_mode = ssl.CERT_REQUIRED
+			sslContext.load_verify_locations(self.serverCAFile)
+
+			# check if a client certificate is required
+			if (self.clientCertFile is not None
+				and self.clientKeyFile is not None):
+				sslContext.load_cert_chain(self.clientCertFile,
+					self.clientKeyFile)
 
+			self.sslContext = sslContext
+
+		self.sslSocket = self.sslContext.wrap_socket(self.socket)
 		self.sslSocket.connect((self.host, self.port))
 
+		# a new connection starts with the old protocol
+		self.framedProtocol = False
+		self.recvBuffer = bytearray()
+
+
+	# internal function that receives the next message
+	# of the framed protocol
+	def _recvFramedMessage(self, buffsize):
+
+		while True:
+
+			if len(self.recvBuffer) >= 4:
+
+				messageSize = struct.unpack("!I",
+					str(self.recvBuffer[:4]))[0]
+				if messageSize > MAXMESSAGESIZE:
+					raise ValueError("Message size %d exceeds maximum."
+						% messageSize)
+
+				if len(self.recvBuffer) >= (4 + messageSize):
+					data = str(self.recvBuffer[4:(4 + messageSize)])
+					del self.recvBuffer[:(4 + messageSize)]
+					return data
+
+			data = self.sslSocket.recv(buffsize)
+			if not data:
+				return ""
+			self.recvBuffer.extend(data)
+
 
 	def send(self, data):
-		count = self.sslSocket.send(data)
+		if self.framedProtocol:
+			self.sslSocket.sendall(struct.pack("!I", len(data)) + data)
+		else:
+			count = self.sslSocket.send(data)
 
 
 	def recv(self, buffsize, timeout=3.0):
 		data = None
 		self.sslSocket.settimeout(timeout)
-		data = self.sslSocket.recv(buffsize)
+		if self.framedProtocol:
+			data = self._recvFramedMessage(buffsize)
+		else:
+			data = self.sslSocket.recv(buffsize)
 		self.sslSocket.settimeout(None)
 		return data
 
@@ -289,7 +345,8 @@ class ServerCommunication:
 				"version": self.version,
 				"rev": self.rev,
 				"username": self.username,
-				"password": self.password}
+				"password": self.password,
+				"framing": "lengthprefix"}
 			message = {"clientTime": int(time.time()),
 				"message": "authentication", "payload": payload}
 			self.client.send(json.dumps(message))
@@ -348,6 +405,13 @@ class ServerCommunication:
 					% (self.fileName, message["payload"]["result"]))
 				return False
 
+			# use the framed protocol if the server acknowledged it
+			# (older servers do not know it and use the old protocol)
+			if ("framing" in message["payload"].keys()
+				and str(message["payload"]["framing"]).upper()
+				== "LENGTHPREFIX"):
+				self.client.framedProtocol = True
+
 		except Exception as e:
 			logging.exception("[%s]: Receiving authentication response failed."
 				% self.fileName)
@@ -0,0 +1,167 @@
+#!/usr/bin/python2
+
+# written by sqall
+# twitter: https://twitter.com/sqall01
+# blog: http://blog.h4des.org
+# github: https://github.com/sqall01
+#
+# Licensed under the GNU Public License, version 2.
+
+# benchmark of the pre filter of the sensor alert executer of the server
+# that looks up the alert levels triggered by a received sensor alert:
+# 5000 sensors with 3 random alert levels each and 5000 sensor alerts,
+# every second alert level has rules activated
+#
+# usage: python2 benchmarkAlertLevelLookup.py
+#
+# the pre filter of the server in this tree is compared with the
+# previous pre filter that compared every configured alert level with
+# every alert level of the sensor and scanned the pending rule work
+# (copied below from the run loop of the sensor alert executer before
+# the alert levels were indexed by their level), the results of both
+# are checked to be equal
+
+import os
+import sys
+import time
+import random
+import timeit
+import logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+	"..", "server", "lib"))
+import alert
+from globalData import GlobalData
+
+
+# numbers of configured alert levels that are measured
+ALERTLEVELCOUNTS = [10, 100, 500]
+
+# number of sensors and of received sensor alerts
+SENSORCOUNT = 5000
+SENSORALERTCOUNT = 5000
+
+
+# storage that returns the alert levels of the sensors
+class Storage:
+
+	def __init__(self, sensorAlertLevels):
+		self.sensorAlertLevels = sensorAlertLevels
+
+	def getSensorAlertLevels(self, sensorId):
+		return self.sensorAlertLevels[sensorId]
+
+
+# the previous pre filter of the sensor alert executer
+# (sensorAlertsToHandleWithRules is a list of [sensorAlerts, alertLevel])
+def previousPreFilter(executer, sensorAlert, isAlertSystemActive,
+	sensorAlertsToHandle, sensorAlertsToHandleWithRules):
+
+	sensorId = sensorAlert[1]
+	state = sensorAlert[5]
+	sensorAlertLevels = executer.storage.getSensorAlertLevels(sensorId)
+
+	triggeredAlertLevels = list()
+	for configuredAlertLevel in executer.alertLevels:
+		for sensorAlertLevel in sensorAlertLevels:
+			if configuredAlertLevel.level != sensorAlertLevel[0]:
+				continue
+
+			if (not isAlertSystemActive
+				and not configuredAlertLevel.triggerAlways):
+				continue
+			if (not configuredAlertLevel.triggerAlertTriggered
+				and state == 1):
+				continue
+			if (not configuredAlertLevel.triggerAlertNormal
+				and state == 0):
+				continue
+
+			if configuredAlertLevel.rulesActivated:
+				found = False
+				for alertWithRule in sensorAlertsToHandleWithRules:
+					if configuredAlertLevel == alertWithRule[1]:
+						alertWithRule[0].append(sensorAlert)
+						found = True
+						break
+				if not found:
+					sensorAlertsToHandleWithRules.append(
+						[[sensorAlert], configuredAlertLevel])
+			else:
+				triggeredAlertLevels.append(configuredAlertLevel)
+
+	if triggeredAlertLevels:
+		sensorAlertsToHandle.append([sensorAlert, triggeredAlertLevels])
+
+
+# creates the sensor alert executer with the given number of alert levels
+def createExecuter(alertLevelCount):
+
+	random.seed(1)
+
+	globalData = GlobalData()
+	globalData.serverSessions = list()
+	for level in range(alertLevelCount):
+		alertLevel = alert.AlertLevel()
+		alertLevel.level = level
+		alertLevel.triggerAlways = True
+		alertLevel.triggerAlertTriggered = True
+		alertLevel.triggerAlertNormal = True
+		alertLevel.rulesActivated = (level % 2 == 1)
+		globalData.alertLevels.append(alertLevel)
+		globalData.alertLevelsByLevel[level] = alertLevel
+
+	globalData.storage = Storage(dict([(sensorId,
+		[(random.randrange(alertLevelCount), ) for i in range(3)])
+		for sensorId in range(SENSORCOUNT)]))
+
+	return alert.SensorAlertExecuter(globalData)
+
+
+if __name__ == '__main__':
+
+	logging.disable(logging.CRITICAL)
+
+	print "levels   previous/alert   current/alert"
+
+	for alertLevelCount in ALERTLEVELCOUNTS:
+
+		executer = createExecuter(alertLevelCount)
+		sensorAlerts = [(i, random.randrange(SENSORCOUNT), 1, 0, 0, 1, "",
+			"") for i in range(SENSORALERTCOUNT)]
+
+		def runPrevious():
+			sensorAlertsToHandle = list()
+			sensorAlertsToHandleWithRules = list()
+			for sensorAlert in sensorAlerts:
+				previousPreFilter(executer, sensorAlert, True,
+					sensorAlertsToHandle, sensorAlertsToHandleWithRules)
+			return (sensorAlertsToHandle, sensorAlertsToHandleWithRules)
+
+		def runCurrent():
+			sensorAlertsToHandle = list()
+			sensorAlertsToHandleWithRules = dict()
+			timeQueued = time.time()
+			for sensorAlert in sensorAlerts:
+				executer._preFilterSensorAlert(sensorAlert, timeQueued,
+					True, sensorAlertsToHandle, sensorAlertsToHandleWithRules)
+			return (sensorAlertsToHandle,
+				sensorAlertsToHandleWithRules.values())
+
+		# both pre filters have to return the same result
+		previousResult = runPrevious()
+		currentResult = runCurrent()
+		for result in (previousResult, currentResult):
+			result[0][:] = [(element[0], sorted([alertLevel.level
+				for alertLevel in element[1]])) for element in result[0]]
+			result[1][:] = sorted([(element[1].level, element[0])
+				for element in result[1]])
+		if previousResult != currentResult:
+			print "  results differ"
+
+		previousTime = min(timeit.repeat(runPrevious, number=1, repeat=3))
+		currentTime = min(timeit.repeat(runCurrent, number=1, repeat=3))
+
+		print "%6d %14.1fus %14.1fus" % (alertLevelCount,
+			previousTime / SENSORALERTCOUNT * 1000000,
+			currentTime / SENSORALERTCOUNT * 1000000)
@@ -0,0 +1,177 @@
+#!/usr/bin/python2
+
+# written by sqall
+# twitter: https://twitter.com/sqall01
+# blog: http://blog.h4des.org
+# github: https://github.com/sqall01
+#
+# Licensed under the GNU Public License, version 2.
+
+# benchmark of the rule evaluation of the sensor alert executer of the
+# server: three rules per alert level with random and/or/not trees of
+# sensor and hour rule elements are updated with random sensor alerts
+#
+# usage: python2 benchmarkRuleEvaluation.py [baselineRevision]
+#
+# the time per update is measured for the server in this tree and
+# (if given) for the lib/alert.py of the server in the given git revision
+# (for example the revision before the rules were compiled), the
+# triggered values of the rules of both are compared after every update
+
+import os
+import sys
+import imp
+import time
+import random
+import timeit
+import logging
+import subprocess
+
+repoDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+libDir = os.path.join(repoDir, "server", "lib")
+sys.path.insert(0, libDir)
+import alert
+from globalData import GlobalData
+
+
+# (depth, fan-out) of the rule trees that are measured
+TREESIZES = [(3, 3), (5, 3), (7, 2)]
+
+# number of sensor alerts per measurement
+ITERATIONS = 2000
+
+
+# storage that maps the remote sensor id of the username "sensor"
+# directly to the sensor id
+class Storage:
+
+	def getNodeId(self, username):
+		return 1
+
+	def getSensorId(self, nodeId, remoteSensorId):
+		return remoteSensorId
+
+
+# loads the lib/alert.py of the server in the given git revision
+def loadBaseline(revision):
+
+	source = subprocess.check_output(["git", "-C", repoDir, "show",
+		"%s:server/lib/alert.py" % revision])
+
+	module = imp.new_module("baselineAlert")
+	module.__file__ = os.path.join(libDir, "alert.py")
+	exec compile(source, module.__file__, "exec") in module.__dict__
+	return module
+
+
+# creates a random rule tree and returns the number of sensor elements
+def createRuleElement(module, ruleElement, depth, fan, sensorCount):
+
+	if depth == 0:
+		if random.random() < 0.7:
+			sensorElement = module.RuleSensor()
+			sensorElement.username = "sensor"
+			sensorElement.remoteSensorId = sensorCount
+			ruleElement.type = "sensor"
+			ruleElement.element = sensorElement
+			ruleElement.timeTriggeredFor = 1000000000.0
+			return sensorCount + 1
+
+		hourElement = module.RuleHour()
+		hourElement.time = "utc"
+		hourElement.start = 0
+		hourElement.end = random.choice([0, 23])
+		ruleElement.type = "hour"
+		ruleElement.element = hourElement
+		return sensorCount
+
+	booleanElement = module.RuleBoolean()
+	booleanElement.type = random.choice(["and", "or", "not"])
+	for i in range(1 if booleanElement.type == "not" else fan):
+		element = module.RuleElement()
+		sensorCount = createRuleElement(module, element, depth - 1, fan,
+			sensorCount)
+		booleanElement.elements.append(element)
+
+	ruleElement.type = "boolean"
+	ruleElement.element = booleanElement
+	return sensorCount
+
+
+# creates the sensor alert executer with an alert level of three rules
+#
+# return tuple of (executer, alertLevel, sensorCount)
+def createExecuter(module, seed, depth, fan):
+
+	random.seed(seed)
+
+	alertLevel = module.AlertLevel()
+	alertLevel.level = 1
+	sensorCount = 0
+	for order in range(3):
+		ruleStart = module.RuleStart()
+		ruleStart.order = order
+		ruleStart.minTimeAfterPrev = 0.0
+		ruleStart.maxTimeAfterPrev = 1000000000.0
+		ruleStart.counterActivated = False
+		sensorCount = createRuleElement(module, ruleStart, depth, fan,
+			sensorCount)
+		alertLevel.rules.append(ruleStart)
+		if hasattr(module, "CompiledRule"):
+			alertLevel.compiledRules.append(module.CompiledRule(ruleStart))
+
+	globalData = GlobalData()
+	globalData.storage = Storage()
+	globalData.alertLevels = [alertLevel]
+	globalData.serverSessions = list()
+	executer = module.SensorAlertExecuter(globalData)
+
+	return (executer, alertLevel, max(sensorCount, 1))
+
+
+# creates the random sensor alerts (tuples of (sensorAlertId, sensorId,
+# nodeId, timeReceived, alertDelay, state, description, dataJson))
+def createSensorAlerts(seed, sensorCount):
+
+	random.seed(seed)
+	timeReceived = int(time.time())
+	return [(i, random.randrange(sensorCount), 1, timeReceived, 0,
+		random.choice([0, 1]), "", "") for i in range(ITERATIONS)]
+
+
+if __name__ == '__main__':
+
+	logging.disable(logging.CRITICAL)
+
+	modules = [("current", alert)]
+	if len(sys.argv) > 1:
+		modules.append((sys.argv[1], loadBaseline(sys.argv[1])))
+
+	print "depth fan-out  " + "".join(["%16s" % name
+		for name, module in modules])
+
+	for depth, fan in TREESIZES:
+
+		results = list()
+		triggeredValues = list()
+		for name, module in modules:
+			executer, alertLevel, sensorCount = createExecuter(module, 1,
+				depth, fan)
+			sensorAlerts = createSensorAlerts(2, sensorCount)
+
+			triggered = list()
+			startTime = timeit.default_timer()
+			for sensorAlert in sensorAlerts:
+				executer._updateRule([sensorAlert], alertLevel)
+				triggered.append(tuple([ruleStart.triggered
+					for ruleStart in alertLevel.rules]))
+			results.append((timeit.default_timer() - startTime)
+				/ ITERATIONS)
+			triggeredValues.append(triggered)
+
+		print "%5d %7d  " % (depth, fan) + "".join(["%14.1fus"
+			% (result * 1000000) for result in results])
+
+		for triggered in triggeredValues[1:]:
+			if triggered != triggeredValues[0]:
+				print "  triggered values differ from the current server"
@@ -0,0 +1,139 @@
+#!/usr/bin/python3
+
+# written by sqall
+# twitter: https://twitter.com/sqall01
+# blog: http://blog.h4des.org
+# github: https://github.com/sqall01
+#
+# Licensed under the GNU Public License, version 2.
+
+# benchmark of the tls handshakes of the server during a reconnect storm:
+# the given number of clients connect to a running server at the same
+# time and do the tls handshake, the cpu time the server process used
+# for it is measured (read from /proc, so only on linux)
+#
+# usage: python3 benchmarkTlsReconnect.py [options] host port caFile
+#	serverPid count
+#
+# options:
+#	--resume			every client connects once before the storm and
+#						resumes its tls session in the storm
+#	--tls12				limit the clients to TLSv1.2
+#	--clientCert file	client certificate (if the server requires one)
+#	--clientKey file	key of the client certificate
+#
+# this script needs python 3, because the ssl module of python 2 can not
+# hand a session to a new connection. the server is started separately
+# (for example once with the server of this tree and once with the server
+# of an older revision, and with both engines) and its process id is
+# given. TLSv1 and all ciphers are allowed by the clients, so servers of
+# older revisions that only speak TLSv1 can be measured (depending on the
+# openssl configuration of the system, OPENSSL_CONF has to point to a
+# configuration with "MinProtocol = TLSv1" and
+# "CipherString = DEFAULT@SECLEVEL=0" for this)
+
+import os
+import ssl
+import sys
+import time
+import socket
+import argparse
+import threading
+
+
+# gets the cpu time (user and system) the given process used so far
+def getCpuTime(pid):
+
+	with open("/proc/%d/stat" % pid) as fp:
+		fields = fp.read().split(")")[1].split()
+	return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+# creates the ssl context that is shared by all clients
+def createContext(options):
+
+	context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+	context.check_hostname = False
+	context.load_verify_locations(options.caFile)
+	context.minimum_version = ssl.TLSVersion.TLSv1
+	if options.tls12:
+		context.maximum_version = ssl.TLSVersion.TLSv1_2
+	context.set_ciphers("DEFAULT@SECLEVEL=0")
+	if options.clientCert is not None:
+		context.load_cert_chain(options.clientCert, options.clientKey)
+	return context
+
+
+# connects to the server, does the tls handshake and closes the connection
+#
+# return tuple of (session, sessionReused, version)
+def handshake(context, options, session=None):
+
+	sslSocket = context.wrap_socket(socket.create_connection(
+		(options.host, options.port)), session=session)
+
+	# the session ticket of TLSv1.3 is sent after the handshake
+	if sslSocket.version() == "TLSv1.3":
+		sslSocket.settimeout(0.2)
+		try:
+			sslSocket.recv(1)
+		except Exception:
+			pass
+
+	result = (sslSocket.session, sslSocket.session_reused,
+		sslSocket.version())
+	sslSocket.close()
+	return result
+
+
+if __name__ == '__main__':
+
+	parser = argparse.ArgumentParser()
+	parser.add_argument("host")
+	parser.add_argument("port", type=int)
+	parser.add_argument("caFile")
+	parser.add_argument("serverPid", type=int)
+	parser.add_argument("count", type=int)
+	parser.add_argument("--resume", action="store_true")
+	parser.add_argument("--tls12", action="store_true")
+	parser.add_argument("--clientCert")
+	parser.add_argument("--clientKey")
+	options = parser.parse_args()
+
+	context = createContext(options)
+
+	# get the sessions of the clients before the storm
+	sessions = [None] * options.count
+	if options.resume:
+		for i in range(options.count):
+			sessions[i] = handshake(context, options)[0]
+		time.sleep(0.5)
+
+	results = list()
+	resultsLock = threading.Lock()
+
+	def connect(i):
+		result = handshake(context, options, sessions[i])
+		with resultsLock:
+			results.append(result)
+
+	threads = [threading.Thread(target=connect, args=(i, ))
+		for i in range(options.count)]
+
+	cpuTime = getCpuTime(options.serverPid)
+	startTime = time.time()
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+	duration = time.time() - startTime
+
+	# give the server the time to finish the connections
+	time.sleep(0.3)
+	cpuTime = getCpuTime(options.serverPid) - cpuTime
+
+	print("%d handshakes in %.2fs (%s), reused %d" % (options.count,
+		duration, ", ".join(sorted(set([result[2] for result in results]))),
+		sum([result[1] for result in results])))
+	print("server cpu %.2fs, %.2f ms per handshake" % (cpuTime,
+		cpuTime / options.count * 1000))
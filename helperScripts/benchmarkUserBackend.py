@@ -0,0 +1,243 @@
+#!/usr/bin/python2
+
+# written by sqall
+# twitter: https://twitter.com/sqall01
+# blog: http://blog.h4des.org
+# github: https://github.com/sqall01
+#
+# Licensed under the GNU Public License, version 2.
+
+# benchmark of the csv user backend of the server that checks the
+# credentials, node type and instance of the clients during the
+# authentication: 5000 checks of random usernames (a third with the
+# correct password, a third with a wrong password and a third with an
+# unknown username) for different numbers of stored users
+#
+# usage: python2 benchmarkUserBackend.py
+#
+# the user backend of the server in this tree is compared with the
+# previous user backend that scanned the list of all stored users for
+# each check (copied below from the csv user backend before the users
+# were indexed by their username), the results of both are checked to be
+# equal. afterwards the cost of the salted password hashes (pbkdf2_sha256)
+# is measured for different numbers of iterations, for known and for
+# unknown usernames (which are checked against a dummy hash with the same
+# iterations, so both take the same time)
+
+import os
+import sys
+import csv
+import random
+import shutil
+import timeit
+import hashlib
+import logging
+import binascii
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+	"..", "server", "lib"))
+from userBackend import CSVBackend
+
+
+# numbers of stored users that are measured
+USERCOUNTS = [10, 100, 1000, 5000]
+
+# number of checked credentials
+CHECKCOUNT = 5000
+
+# iterations of the password hashes that are measured
+# (and the number of checked credentials for them)
+HASHITERATIONS = [1000, 10000, 100000]
+HASHCHECKCOUNT = 10
+
+
+# the previous csv user backend
+class PreviousCSVBackend:
+
+	def __init__(self, csvLocation):
+
+		# stores all user credentials as a tuple of values (username, password)
+		self.userCredentials = list()
+
+		# parse csv file and store all user credentials
+		with open(csvLocation, 'rb') as csvFile:
+			csvReader = csv.reader(csvFile, quoting=csv.QUOTE_ALL)
+			for row in csvReader:
+				if len(row) != 4:
+					continue
+				if row[0].find('#') != -1:
+					continue
+
+				username = row[0].replace(' ', '')
+				password = row[1].replace(' ', '')
+				nodeType = row[2].replace(' ', '')
+				instance = row[3].replace(' ', '')
+
+				# check if username has a duplicate
+				if any(map(lambda x : x[0] == username,
+					self.userCredentials)):
+					continue
+
+				self.userCredentials.append( (username,
+					password,
+					nodeType,
+					instance) )
+
+
+	def areUserCredentialsValid(self, username, password):
+
+		for storedTuple in self.userCredentials:
+
+			if storedTuple[0] != username:
+				continue
+
+			else:
+				if storedTuple[1] == password:
+					return True
+				else:
+					return False
+
+		return False
+
+
+	def checkNodeTypeAndInstance(self, username, nodeType, instance):
+
+		for storedTuple in self.userCredentials:
+
+			if storedTuple[0] != username:
+				continue
+
+			else:
+				if (storedTuple[2].upper() == nodeType.upper()
+					and storedTuple[3].upper() == instance.upper()):
+					return True
+				else:
+					return False
+
+		return False
+
+
+# writes a csv file with the given number of users and returns the
+# list of tuples (username, password, nodeType, instance)
+# (the password is stored as hash if iterations are given)
+def writeCsvFile(csvLocation, userCount, iterations=None):
+
+	random.seed(1)
+
+	users = list()
+	with open(csvLocation, 'wb') as csvFile:
+		for i in range(userCount):
+			username = "user%d" % i
+			password = binascii.hexlify(os.urandom(8))
+			nodeType = random.choice(["sensor", "alert", "manager"])
+			instance = "instance%d" % random.randrange(10)
+			users.append((username, password, nodeType, instance))
+
+			storedPassword = password
+			if iterations is not None:
+				salt = os.urandom(16)
+				storedPassword = "pbkdf2_sha256$%d$%s$%s" % (iterations,
+					binascii.hexlify(salt), binascii.hexlify(
+					hashlib.pbkdf2_hmac("sha256", password, salt,
+					iterations)))
+
+			csvFile.write("%s, %s, %s, %s\n" % (username, storedPassword,
+				nodeType, instance))
+
+	return users
+
+
+# creates the checked credentials as list of tuples
+# (username, password, nodeType, instance)
+def createChecks(users, checkCount):
+
+	checks = list()
+	for i in range(checkCount):
+		username, password, nodeType, instance = random.choice(users)
+		if i % 3 == 1:
+			password = "wrong" + password
+		elif i % 3 == 2:
+			username = "unknown%d" % i
+		checks.append((username, password, nodeType, instance))
+
+	return checks
+
+
+# checks all credentials with the given user backend
+def runChecks(userBackend, checks):
+	return [(userBackend.areUserCredentialsValid(username, password),
+		userBackend.checkNodeTypeAndInstance(username, nodeType, instance))
+		for username, password, nodeType, instance in checks]
+
+
+if __name__ == '__main__':
+
+	logging.disable(logging.CRITICAL)
+
+	tempDir = tempfile.mkdtemp()
+	csvLocation = os.path.join(tempDir, "users.csv")
+
+	try:
+		print "users    previous/check   current/check"
+
+		for userCount in USERCOUNTS:
+
+			users = writeCsvFile(csvLocation, userCount)
+			checks = createChecks(users, CHECKCOUNT)
+
+			previousBackend = PreviousCSVBackend(csvLocation)
+			currentBackend = CSVBackend(csvLocation, 0, None)
+
+			# both user backends have to return the same result
+			if (runChecks(previousBackend, checks)
+				!= runChecks(currentBackend, checks)):
+				print "  results differ"
+
+			previousTime = min(timeit.repeat(
+				lambda: runChecks(previousBackend, checks), number=1,
+				repeat=3))
+			currentTime = min(timeit.repeat(
+				lambda: runChecks(currentBackend, checks), number=1,
+				repeat=3))
+
+			print "%5d %14.1fus %14.1fus" % (userCount,
+				previousTime / CHECKCOUNT * 1000000,
+				currentTime / CHECKCOUNT * 1000000)
+
+		print
+		print "iterations     known/check   unknown/check"
+
+		for iterations in HASHITERATIONS:
+
+			users = writeCsvFile(csvLocation, HASHCHECKCOUNT,
+				iterations)
+			currentBackend = CSVBackend(csvLocation, 0, None)
+
+			knownChecks = [(user[0], user[1]) for user in
+				random.sample(users, HASHCHECKCOUNT)]
+			unknownChecks = [("unknown%d" % i, "password")
+				for i in range(HASHCHECKCOUNT)]
+
+			# only the correct passwords of known usernames are valid
+			if (not all([currentBackend.areUserCredentialsValid(*check)
+				for check in knownChecks])
+				or any([currentBackend.areUserCredentialsValid(
+				check[0], "wrong" + check[1]) for check in knownChecks])
+				or any([currentBackend.areUserCredentialsValid(*check)
+				for check in unknownChecks])):
+				print "  results wrong"
+
+			knownTime = min(timeit.repeat(
+				lambda: [currentBackend.areUserCredentialsValid(*check)
+				for check in knownChecks], number=1, repeat=3))
+			unknownTime = min(timeit.repeat(
+				lambda: [currentBackend.areUserCredentialsValid(*check)
+				for check in unknownChecks], number=1, repeat=3))
+
+			print "%10d %14.1fms %14.1fms" % (iterations,
+				knownTime / HASHCHECKCOUNT * 1000,
+				unknownTime / HASHCHECKCOUNT * 1000)
+
+	finally:
+		shutil.rmtree(tempDir)
@@ -18,8 +18,13 @@ import os
 import base64
 import random
 import json
+import struct
 BUFSIZE = 16384
 
+# maximum size of a message in the framed protocol
+# (a larger length prefix is treated as a protocol error)
+MAXMESSAGESIZE = 67108864
+
 
 # simple class of an ssl tcp client 
 class Client:
@@ -34,33 +39,84 @@ class Client:
 		self.socket = None
 		self.sslSocket = None
 
+		# the ssl context is created with the first connection and
+		# used for all reconnections (the ca file and the client
+		# certificate are only loaded once)
+		self.sslContext = None
+
+		# flag that states if the framed protocol is used
+		# (each message is prefixed by its length, negotiated during the
+		# authentication) and the received data that does not form
+		# a complete message yet
+		self.framedProtocol = False
+		self.recvBuffer = bytearray()
+
 
 	def connect(self):
 		self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 
-		# check if a client certificate is required
-		if (self.clientCertFile is None
-			or self.clientKeyFile is None):
-			self.sslSocket = ssl.wrap_socket(self.socket, 
-				ca_certs=self.serverCAFile, cert_reqs=ssl.CERT_REQUIRED, 
-				ssl_version=ssl.PROTOCOL_TLSv1)
-		else:
-			self.sslSocket = ssl.wrap_socket(self.socket, 
-				ca_certs=self.serverCAFile, cert_reqs=ssl.CERT_REQUIRED, 
-				ssl_version=ssl.PROTOCOL_TLSv1,
-				certfile=self.clientCertFile, keyfile=self.clientKeyFile)
+		if self.sslContext is None:
+			sslContext = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
+			sslContext.options |= ssl.OP_NO_SSLv2
+			sslContext.options |= ssl.OP_NO_SSLv3
+			sslContext.verify_mode = ssl.CERT_REQUIRED
+			sslContext.load_verify_locations(self.serverCAFile)
+
+			# check if a client certificate is required
+			if (self.clientCertFile is not None
+				and self.clientKeyFile is not None):
+				sslContext.load_cert_chain(self.clientCertFile,
+					self.clientKeyFile)
 
+			self.sslContext = sslContext
+
+		self.sslSocket = self.sslContext.wrap_socket(self.socket)
 		self.sslSocket.connect((self.host, self.port))
 
+		# a new connection starts with the old protocol
+		self.framedProtocol = False
+		self.recvBuffer = bytearray()
+
+
+	# internal function that receives the next message
+	# of the framed protocol
+	def _recvFramedMessage(self, buffsize):
+
+		while True:
+
+			if len(self.recvBuffer) >= 4:
+
+				messageSize = struct.unpack("!I",
+					str(self.recvBuffer[:4]))[0]
+				if messageSize > MAXMESSAGESIZE:
+					raise ValueError("Message size %d exceeds maximum."
+						% messageSize)
+
+				if len(self.recvBuffer) >= (4 + messageSize):
+					data = str(self.recvBuffer[4:(4 + messageSize)])
+					del self.recvBuffer[:(4 + messageSize)]
+					return data
+
+			data = self.sslSocket.recv(buffsize)
+			if not data:
+				return ""
+			self.recvBuffer.extend(data)
+
 
 	def send(self, data):
-		count = self.sslSocket.send(data)
+		if self.framedProtocol:
+			self.sslSocket.sendall(struct.pack("!I", len(data)) + data)
+		else:
+			count = self.sslSocket.send(data)
 
 
 	def recv(self, buffsize, timeout=3.0):
 		data = None
 		self.sslSocket.settimeout(timeout)
-		data = self.sslSocket.recv(buffsize)
+		if self.framedProtocol:
+			data = self._recvFramedMessage(buffsize)
+		else:
+			data = self.sslSocket.recv(buffsize)
 		self.sslSocket.settimeout(None)
 		return data
 
@@ -113,6 +169,23 @@ class ServerCommunication:
 		# transaction with the server
 		self.transactionInitiation = False
 
+		# version of the last received status update (None if the server
+		# does not send versioned status updates)
+		self.statusVersion = None
+
+		# last received status as dict of entity type => dict of
+		# entity key => received entity (used to apply status updates
+		# that only contain the changes since the last version)
+		self.statusSnapshot = None
+
+		# the key that identifies an entity of the given type
+		self.statusEntityKeys = {"options": "type",
+			"nodes": "nodeId",
+			"sensors": "sensorId",
+			"managers": "managerId",
+			"alerts": "alertId",
+			"alertLevels": "alertLevel"}
+
 
 	# internal function that acquires the lock
 	def _acquireLock(self):
@@ -294,7 +367,8 @@ class ServerCommunication:
 				"version": self.version,
 				"rev": self.rev,
 				"username": self.username,
-				"password": self.password}
+				"password": self.password,
+				"framing": "lengthprefix"}
 			message = {"clientTime": int(time.time()),
 				"message": "authentication", "payload": payload}
 			self.client.send(json.dumps(message))
@@ -353,6 +427,13 @@ class ServerCommunication:
 					% (self.fileName, message["payload"]["result"]))
 				return False
 
+			# use the framed protocol if the server acknowledged it
+			# (older servers do not know it and use the old protocol)
+			if ("framing" in message["payload"].keys()
+				and str(message["payload"]["framing"]).upper()
+				== "LENGTHPREFIX"):
+				self.client.framedProtocol = True
+
 		except Exception as e:
 			logging.exception("[%s]: Receiving authentication response failed."
 				% self.fileName)
@@ -485,6 +566,40 @@ class ServerCommunication:
 		return True
 
 
+	# internal function that merges the received changes of a status
+	# update into the last received status and returns the resulting
+	# status as dict of entity type => dict of entity key => entity
+	# (sensorsLastStateUpdatedRaw is a list of [sensorId, lastStateUpdated]
+	# of the sensors that were not changed)
+	def _mergeStatusDelta(self, changedRaw, removedRaw,
+		sensorsLastStateUpdatedRaw):
+
+		newSnapshot = dict()
+		for entityType in self.statusEntityKeys.keys():
+			entityKey = self.statusEntityKeys[entityType]
+			entities = dict(self.statusSnapshot[entityType])
+
+			for key in removedRaw[entityType]:
+				if key in entities:
+					del entities[key]
+
+			for entity in changedRaw[entityType]:
+				entities[entity[entityKey]] = entity
+
+			# refresh the time of the last status message of the sensors
+			# (it does not count as a change of a sensor)
+			if entityType == "sensors":
+				for sensorId, lastStateUpdated in sensorsLastStateUpdatedRaw:
+					if sensorId in entities:
+						entity = dict(entities[sensorId])
+						entity["lastStateUpdated"] = int(lastStateUpdated)
+						entities[sensorId] = entity
+
+			newSnapshot[entityType] = entities
+
+		return newSnapshot
+
+
 	# internal function that handles received status updates
 	def _statusUpdateHandler(self, incomingMessage):
 
@@ -584,6 +699,56 @@ class ServerCommunication:
 
 				return False
 
+			# version of the status (is not sent by older servers)
+			statusVersion = None
+			if "version" in incomingMessage["payload"].keys():
+				statusVersion = int(incomingMessage["payload"]["version"])
+
+			# check if only the changes since the last version were sent
+			isDelta = False
+			if "statusType" in incomingMessage["payload"].keys():
+				isDelta = (str(incomingMessage["payload"][
+					"statusType"]).upper() == "DELTA")
+
+			if isDelta:
+				baseVersion = int(incomingMessage["payload"]["baseVersion"])
+
+				removedRaw = incomingMessage["payload"]["removed"]
+				# check if removed is of type dict with lists
+				if (not isinstance(removedRaw, dict)
+					or not all(isinstance(removedRaw[entityType], list)
+					for entityType in self.statusEntityKeys.keys())):
+					# send error message back
+					try:
+						message = {"clientTime": int(time.time()),
+							"message": incomingMessage["message"],
+							"error": "removed not of type dict"}
+						self.client.send(json.dumps(message))
+					except Exception as e:
+						pass
+
+					return False
+
+				# time of the last status message of the sensors that
+				# were not changed (is not sent by older servers)
+				sensorsLastStateUpdatedRaw = list()
+				if ("sensorsLastStateUpdated"
+					in incomingMessage["payload"].keys()):
+					sensorsLastStateUpdatedRaw = incomingMessage["payload"][
+						"sensorsLastStateUpdated"]
+				# check if sensorsLastStateUpdated is of type list
+				if not isinstance(sensorsLastStateUpdatedRaw, list):
+					# send error message back
+					try:
+						message = {"clientTime": int(time.time()),
+							"message": incomingMessage["message"],
+							"error": "sensorsLastStateUpdated not of type list"}
+						self.client.send(json.dumps(message))
+					except Exception as e:
+						pass
+
+					return False
+
 		except Exception as e:
 			logging.exception("[%s]: Received status " % self.fileName
 				+ "invalid.")
@@ -599,6 +764,63 @@ class ServerCommunication:
 
 			return False
 
+		# apply the received changes to the last received status
+		if isDelta:
+
+			# check if the changes are based on the version
+			# of the last received status
+			# => if not, request a full status update
+			if (self.statusSnapshot is None
+				or baseVersion != self.statusVersion):
+				logging.warning("[%s]: Received status changes " % self.fileName
+					+ "for version %d but have version %s. "
+					% (baseVersion, str(self.statusVersion))
+					+ "Requesting full status update.")
+
+				try:
+					payload = {"type": "response", "result": "versiongap"}
+					message = {"clientTime": int(time.time()),
+						"message": "status", "payload": payload}
+					self.client.send(json.dumps(message))
+
+				except Exception as e:
+					logging.exception("[%s]: Sending status " % self.fileName
+						+ "response failed.")
+
+					return False
+
+				return True
+
+			try:
+				newSnapshot = self._mergeStatusDelta({"options": optionsRaw,
+					"nodes": nodesRaw,
+					"sensors": sensorsRaw,
+					"managers": managersRaw,
+					"alerts": alertsRaw,
+					"alertLevels": alertLevelsRaw}, removedRaw,
+					sensorsLastStateUpdatedRaw)
+			except Exception as e:
+				logging.exception("[%s]: Received status " % self.fileName
+					+ "changes invalid.")
+
+				# send error message back
+				try:
+					message = {"clientTime": int(time.time()),
+						"message": incomingMessage["message"],
+						"error": "received status changes invalid"}
+					self.client.send(json.dumps(message))
+				except Exception as e:
+					pass
+
+				return False
+
+			optionsRaw = newSnapshot["options"].values()
+			nodesRaw = newSnapshot["nodes"].values()
+			sensorsRaw = newSnapshot["sensors"].values()
+			managersRaw = newSnapshot["managers"].values()
+			alertsRaw = newSnapshot["alerts"].values()
+			alertLevelsRaw = newSnapshot["alertLevels"].values()
+
 		logging.debug("[%s]: Received option count: %d." 
 				% (self.fileName, len(optionsRaw)))
 
@@ -905,12 +1127,33 @@ class ServerCommunication:
 
 			return False
 
+		# remember the received status to be able to apply
+		# the changes of the next status update
+		if statusVersion is not None:
+			self.statusVersion = statusVersion
+			self.statusSnapshot = dict()
+			for entityType, entitiesRaw in [("options", optionsRaw),
+				("nodes", nodesRaw),
+				("sensors", sensorsRaw),
+				("managers", managersRaw),
+				("alerts", alertsRaw),
+				("alertLevels", alertLevelsRaw)]:
+
+				entityKey = self.statusEntityKeys[entityType]
+				entities = dict()
+				for entity in entitiesRaw:
+					entities[entity[entityKey]] = entity
+				self.statusSnapshot[entityType] = entities
+
 		# sending sensor alert response
 		logging.debug("[%s]: Sending status " % self.fileName
 			+ "response message.")
 		try:
 
 			payload = {"type": "response", "result": "ok"}
+			# acknowledge the received version
+			if statusVersion is not None:
+				payload["version"] = statusVersion
 			message = {"clientTime": int(time.time()),
 				"message": "status", "payload": payload}
 			self.client.send(json.dumps(message))
@@ -1040,10 +1283,19 @@ class ServerCommunication:
 		logging.debug("[%s]: Received state change." % self.fileName)
 		
 		# extract state change values
+		# (the server sends multiple state changes as a list,
+		# a single state change directly in the payload)
+		stateChanges = list()
 		try:
 			serverTime = int(incomingMessage["serverTime"])
-			sensorId = int(incomingMessage["payload"]["sensorId"])
-			state = int(incomingMessage["payload"]["state"])
+			if "stateChanges" in incomingMessage["payload"].keys():
+				for stateChange in incomingMessage["payload"]["stateChanges"]:
+					stateChanges.append((int(stateChange["sensorId"]),
+						int(stateChange["state"])))
+			else:
+				sensorId = int(incomingMessage["payload"]["sensorId"])
+				state = int(incomingMessage["payload"]["state"])
+				stateChanges.append((sensorId, state))
 		except Exception as e:
 			logging.exception("[%s]: Received state change " % self.fileName
 				+ "invalid.")
@@ -1075,13 +1327,15 @@ class ServerCommunication:
 
 			return False
 
-		# handle received state change
-		if self.serverEventHandler.receivedStateChange(serverTime, sensorId,
-			state) is True:
+		# handle received state changes
+		returnValue = True
+		for stateChangeTuple in stateChanges:
+			if self.serverEventHandler.receivedStateChange(serverTime,
+				stateChangeTuple[0], stateChangeTuple[1]) is not True:
 
-			return True
+				returnValue = False
 
-		return False
+		return returnValue
 
 
 	# function that initializes the communication to the server
@@ -1090,6 +1344,10 @@ class ServerCommunication:
 		
 		self._acquireLock()
 
+		# the server sends a full status update for a new connection
+		self.statusVersion = None
+		self.statusSnapshot = None
+
 		# create client instance and connect to the server
 		self.client = Client(self.host, self.port, self.serverCAFile,
 			self.clientCertFile, self.clientKeyFile)
@@ -10,20 +10,26 @@
 import sys
 import os
 from lib import ServerSession, ConnectionWatchdog, ThreadedTCPServer
-from lib import Sqlite, Mysql
+from lib import EventDrivenTCPServer
+from lib import Sqlite, Mysql, CachedStorage, MeteredStorage
 from lib import SensorAlertExecuter, AlertLevel, RuleStart, RuleElement, \
 	RuleBoolean, RuleSensor, RuleWeekday, RuleMonthday, RuleHour, RuleMinute, \
-	RuleSecond
+	RuleSecond, CompiledRule
 from lib import CSVBackend
 from lib import SMTPAlert
-from lib import ManagerUpdateExecuter
+from lib import ManagerUpdateExecuter, ManagerStatus
 from lib import UpdateChecker
 from lib import GlobalData
+from lib import SlidingWindowCounter
 from lib import SurveyExecuter
+from lib import MetricsRegistry, MetricsServer
+from lib import Tracer, TraceDumper
 import logging
 import time
 import threading
 import random
+import ssl
+import signal
 import xml.etree.ElementTree
 
 
@@ -770,6 +776,47 @@ if __name__ == '__main__':
 				+ "compatible with client version '%.3f'."
 				% globalData.version)
 
+		# parse metrics options and create the registry of the metrics
+		# before the components are created that register their metrics
+		# (configurations without the element do not export metrics)
+		metricsActivated = False
+		if configRoot.find("general").find("metrics") is not None:
+			metricsActivated = (str(
+				configRoot.find("general").find("metrics").attrib[
+				"activated"]).upper() == "TRUE")
+		if metricsActivated is True:
+			metricsHost = str(
+				configRoot.find("general").find("metrics").attrib["host"])
+			metricsPort = int(
+				configRoot.find("general").find("metrics").attrib["port"])
+			globalData.metrics = MetricsRegistry()
+
+		# parse tracing options and create the tracer before the
+		# components are created that record their spans
+		# (configurations without the element do not record spans)
+		tracingActivated = False
+		if configRoot.find("general").find("tracing") is not None:
+			tracingActivated = (str(
+				configRoot.find("general").find("tracing").attrib[
+				"activated"]).upper() == "TRUE")
+		if tracingActivated is True:
+			tracingBufferSize = int(
+				configRoot.find("general").find("tracing").attrib[
+				"bufferSize"])
+			tracingFile = str(
+				configRoot.find("general").find("tracing").attrib["file"])
+			tracingFormat = str(
+				configRoot.find("general").find("tracing").attrib[
+				"format"]).upper()
+
+			if tracingBufferSize < 1:
+				raise ValueError("Value of bufferSize not valid.")
+			if tracingFormat != "JSON" and tracingFormat != "FOLDED":
+				raise ValueError("No valid tracing format in config file.")
+
+			globalData.tracer = Tracer(tracingBufferSize, tracingFile,
+				tracingFormat)
+
 		# parse smtp options if activated
 		smtpActivated = (str(
 			configRoot.find("smtp").find("general").attrib[
@@ -784,7 +831,7 @@ if __name__ == '__main__':
 			smtpToAddr = str(
 				configRoot.find("smtp").find("general").attrib["toAddr"])
 			globalData.smtpAlert = SMTPAlert(smtpServer, smtpPort,
-			smtpFromAddr, smtpToAddr)
+			smtpFromAddr, smtpToAddr, globalData)
 
 		# parse update options
 		updateActivated = (str(
@@ -818,7 +865,8 @@ if __name__ == '__main__':
 			configRoot.find("storage").find("userBackend").attrib[
 			"method"]).upper()
 		if userBackendMethod == "CSV":
-			globalData.userBackend = CSVBackend(globalData.userBackendCsvFile)
+			globalData.userBackend = CSVBackend(globalData.userBackendCsvFile,
+				globalData.userBackendCsvReloadInterval, globalData.metrics)
 
 		else:
 			raise ValueError("No valid user backend method in config file.")
@@ -827,9 +875,15 @@ if __name__ == '__main__':
 		userBackendMethod = str(
 			configRoot.find("storage").find("storageBackend").attrib[
 			"method"]).upper()
+
+		# get if reads are processed concurrently
+		# (configurations without the attribute serialize all reads)
+		backendConcurrentReads = (str(
+			configRoot.find("storage").find("storageBackend").attrib.get(
+			"concurrentReads", "False")).upper() == "TRUE")
 		if userBackendMethod == "SQLITE":
 			globalData.storage = Sqlite(globalData.storageBackendSqliteFile,
-				globalData.version)
+				globalData.version, backendConcurrentReads, globalData.tracer)
 
 		elif userBackendMethod == "MYSQL":
 
@@ -843,14 +897,41 @@ if __name__ == '__main__':
 				"storageBackend").attrib["port"])
 			backendDatabase = str(configRoot.find("storage").find(
 				"storageBackend").attrib["database"])
+			# (configurations without the attribute use one connection)
+			backendPoolSize = int(configRoot.find("storage").find(
+				"storageBackend").attrib.get("poolSize", "1"))
+
+			if backendPoolSize < 1:
+				raise ValueError("Value of poolSize not valid.")
 
 			globalData.storage = Mysql(backendServer, backendPort,
 				backendDatabase, backendUsername, backendPassword,
-				globalData.version)
+				globalData.version, backendPoolSize, backendConcurrentReads,
+				globalData.tracer)
 
 		else:
 			raise ValueError("No valid storage backend method in config file.")
 
+		# measure the calls to the storage backend if metrics are activated
+		if globalData.metrics is not None:
+			globalData.storage = MeteredStorage(globalData.storage,
+				globalData.metrics)
+
+		# cache the metadata of the alert system in memory if it is activated
+		# (configurations without the attribute do not use the cache)
+		backendCacheMetadata = (str(
+			configRoot.find("storage").find("storageBackend").attrib.get(
+			"cacheMetadata", "False")).upper() == "TRUE")
+		if backendCacheMetadata:
+			globalData.storage = CachedStorage(globalData.storage,
+				globalData.metrics)
+
+		# get if received sensor alerts are written to the journal
+		# (configurations without the attribute do not use the journal)
+		globalData.journalSensorAlerts = (str(
+			configRoot.find("storage").find("storageBackend").attrib.get(
+			"journalSensorAlerts", "False")).upper() == "TRUE")
+
 		# get survey configurations
 		surveyActivated = (str(
 			configRoot.find("general").find("survey").attrib[
@@ -863,6 +944,39 @@ if __name__ == '__main__':
 				"server").attrib["keyFile"])
 		port = int(configRoot.find("general").find("server").attrib["port"])
 
+		# get the engine of the server (configurations without the
+		# attribute use the threaded engine)
+		serverEngine = str(configRoot.find("general").find(
+				"server").attrib.get("engine", "threaded")).upper()
+		if "workers" in configRoot.find("general").find(
+			"server").attrib.keys():
+			globalData.eventDrivenWorkers = int(configRoot.find(
+				"general").find("server").attrib["workers"])
+
+		# get the cipher preferences of the server (configurations
+		# without the attribute use the default ciphers of openssl)
+		if "ciphers" in configRoot.find("general").find(
+			"server").attrib.keys():
+			globalData.serverCiphers = str(configRoot.find("general").find(
+				"server").attrib["ciphers"])
+
+		if (serverEngine != "THREADED"
+			and serverEngine != "EVENTDRIVEN"):
+			raise ValueError("No valid server engine in config file.")
+		if globalData.eventDrivenWorkers < 1:
+			raise ValueError("Value of workers not valid.")
+
+		# get manager update configurations
+		# (configurations without the element send the state changes
+		# as fast as possible)
+		globalData.stateChangeWindow = 0.0
+		if configRoot.find("general").find("managerUpdate") is not None:
+			globalData.stateChangeWindow = float(configRoot.find(
+				"general").find("managerUpdate").attrib["stateChangeWindow"])
+
+		if globalData.stateChangeWindow < 0:
+			raise ValueError("Value of stateChangeWindow not valid.")
+
 		if (os.path.exists(globalData.serverCertFile) is False
 			or os.path.exists(globalData.serverKeyFile) is False):
 			raise ValueError("Server certificate or key does not exist.")
@@ -880,6 +994,27 @@ if __name__ == '__main__':
 			if os.path.exists(globalData.clientCAFile) is False:
 				raise ValueError("Client CA file does not exist.")
 
+		# create the ssl context that is used for all connections
+		# (the certificate and key are only loaded once and the session
+		# cache of the context lets clients resume their tls sessions
+		# via session ids or session tickets)
+		sslContext = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
+		sslContext.options |= ssl.OP_NO_SSLv2
+		sslContext.options |= ssl.OP_NO_SSLv3
+		sslContext.options |= ssl.OP_CIPHER_SERVER_PREFERENCE
+		if globalData.serverCiphers is not None:
+			sslContext.set_ciphers(globalData.serverCiphers)
+		sslContext.load_cert_chain(globalData.serverCertFile,
+			globalData.serverKeyFile)
+
+		# check if the clients should also be forced to authenticate
+		# themselves via a certificate
+		if globalData.useClientCertificates is True:
+			sslContext.verify_mode = ssl.CERT_REQUIRED
+			sslContext.load_verify_locations(globalData.clientCAFile)
+
+		globalData.serverSSLContext = sslContext
+
 		# parse all alert levels
 		for item in configRoot.find("alertLevels").iterfind("alertLevel"):
 
@@ -1005,6 +1140,20 @@ if __name__ == '__main__':
 							raise ValueError("'counterWaitTime' attribute "
 							+ "not allowed to be smaller than 0.")
 
+						# the counter could not reach a limit that is
+						# greater than the maximum size of a counter
+						if (ruleElement.counterLimit
+							> globalData.ruleCounterMaxSize):
+							raise ValueError("'counterLimit' attribute "
+							+ "not allowed to be greater than %d."
+							% globalData.ruleCounterMaxSize)
+
+						# the counter never stores more elements than
+						# its limit
+						ruleElement.counter = SlidingWindowCounter(
+							ruleElement.counterWaitTime,
+							ruleElement.counterLimit)
+
 					# start parsing the rule
 					if not orRule is None:
 
@@ -1240,6 +1389,11 @@ if __name__ == '__main__':
 				# sort rules by order
 				alertLevel.rules.sort(key=lambda x: x.order)
 
+				# compile the rules into flat lists that are
+				# evaluated without traversing the rules recursively
+				for ruleElement in alertLevel.rules:
+					alertLevel.compiledRules.append(CompiledRule(ruleElement))
+
 				# check if parsed rules should be logged
 				if (loglevel == logging.INFO
 					or loglevel == logging.DEBUG):
@@ -1251,11 +1405,11 @@ if __name__ == '__main__':
 						logRule(ruleElement, 0, fileName)
 
 			# check if the alert level only exists once
-			for tempAlertLevel in globalData.alertLevels:
-				if tempAlertLevel.level == alertLevel.level:
-					raise ValueError("Alert level must be unique.")
+			if alertLevel.level in globalData.alertLevelsByLevel:
+				raise ValueError("Alert level must be unique.")
 
 			globalData.alertLevels.append(alertLevel)
+			globalData.alertLevelsByLevel[alertLevel.level] = alertLevel
 
 		# check if all alert levels for alert clients that exist in the
 		# database are configured in the configuration file
@@ -1264,14 +1418,7 @@ if __name__ == '__main__':
 			raise ValueError("Could not get alert client "
 				+ "alert levels from database.")
 		for alertLevelInDb in alertLevelsInDb:
-			found = False
-			for alertLevel in globalData.alertLevels:
-				if alertLevelInDb[0] == alertLevel.level:
-					found = True
-					break
-			if found:
-				continue
-			else:
+			if not alertLevelInDb[0] in globalData.alertLevelsByLevel:
 				raise ValueError("An alert level for an alert client exists "
 					+ "in the database that is not configured.")
 
@@ -1282,14 +1429,7 @@ if __name__ == '__main__':
 			raise ValueError("Could not get sensor alert " 
 				+ "levels from database.")
 		for alertLevelInDb in alertLevelsInDb:
-			found = False
-			for alertLevel in globalData.alertLevels:
-				if alertLevelInDb[0] == alertLevel.level:
-					found = True
-					break
-			if found:
-				continue
-			else:
+			if not alertLevelInDb[0] in globalData.alertLevelsByLevel:
 				raise ValueError("An alert level for a sensor exists "
 					+ "in the database that is not configured.")
 
@@ -1299,6 +1439,14 @@ if __name__ == '__main__':
 
 	random.seed()
 
+	# start the thread that sends the queued eMails
+	if globalData.smtpAlert is not None:
+		logging.info("[%s] Starting smtp sender thread." % fileName)
+		# set thread to daemon
+		# => threads terminates when main thread terminates
+		globalData.smtpAlert.smtpSender.daemon = True
+		globalData.smtpAlert.smtpSender.start()
+
 	# start the thread that handles all sensor alerts
 	logging.info("[%s] Starting sensor alert manage thread." % fileName)
 	globalData.sensorAlertExecuter = SensorAlertExecuter(globalData)
@@ -1307,6 +1455,10 @@ if __name__ == '__main__':
 	globalData.sensorAlertExecuter.daemon = True
 	globalData.sensorAlertExecuter.start()
 
+	# create the snapshot of the alert system information
+	# that is sent to the manager clients
+	globalData.managerStatus = ManagerStatus(globalData)
+
 	logging.info("[%s] Starting manager client manage thread." % fileName)
 	# start the thread that handles the manager updates
 	globalData.managerUpdateExecuter = ManagerUpdateExecuter(globalData)
@@ -1315,31 +1467,39 @@ if __name__ == '__main__':
 	globalData.managerUpdateExecuter.daemon = True
 	globalData.managerUpdateExecuter.start()
 
+	# start a watchdog thread that controls all server sessions
+	# (before the server is started because each new server session
+	# is registered at the watchdog)
+	logging.info("[%s] Starting watchdog thread." % fileName)
+	globalData.connectionWatchdog = ConnectionWatchdog(globalData,
+		globalData.connectionTimeout)
+	# set thread to daemon
+	# => threads terminates when main thread terminates	
+	globalData.connectionWatchdog.daemon = True
+	globalData.connectionWatchdog.start()
+
 	# start server process
 	while 1:
 		try:
-			server = ThreadedTCPServer(globalData, ('0.0.0.0', port),
-				ServerSession)
+			if serverEngine == "EVENTDRIVEN":
+				server = EventDrivenTCPServer(globalData, ('0.0.0.0', port))
+			else:
+				server = ThreadedTCPServer(globalData, ('0.0.0.0', port),
+					ServerSession)
 			break
 		except Exception as e:
 			logging.exception("[%s]: Starting server failed. " % fileName
 			+ "Try again in 5 seconds.")
 			time.sleep(5)
 
-	logging.info("[%s] Starting server thread." % fileName)
-	serverThread = threading.Thread(target=server.serve_forever)
-	# set thread to daemon
-	# => threads terminates when main thread terminates	
-	serverThread.daemon =True
-	serverThread.start()
-
-	# start a watchdog thread that controls all server sessions
-	logging.info("[%s] Starting watchdog thread." % fileName)
-	watchdog = ConnectionWatchdog(globalData, globalData.connectionTimeout)
-	# set thread to daemon
-	# => threads terminates when main thread terminates	
-	watchdog.daemon = True
-	watchdog.start()
+	# the event driven server handles all connections in the main thread
+	if serverEngine == "THREADED":
+		logging.info("[%s] Starting server thread." % fileName)
+		serverThread = threading.Thread(target=server.serve_forever)
+		# set thread to daemon
+		# => threads terminates when main thread terminates	
+		serverThread.daemon =True
+		serverThread.start()
 
 	# only start update checker if it is activated
 	if updateActivated is True:
@@ -1361,8 +1521,56 @@ if __name__ == '__main__':
 		surveyExecuter.daemon = True
 		surveyExecuter.start()
 
+	# only export the metrics if they are activated
+	# (the server also runs without the export)
+	if globalData.metrics is not None:
+		logging.info("[%s] Starting metrics server thread." % fileName)
+		try:
+			metricsServer = MetricsServer(globalData, metricsHost,
+				metricsPort)
+			# set thread to daemon
+			# => threads terminates when main thread terminates
+			metricsServer.daemon = True
+			metricsServer.start()
+		except Exception as e:
+			logging.exception("[%s]: Starting metrics server failed."
+				% fileName)
+
+	# only write the trace file if tracing is activated
+	if globalData.tracer is not None:
+		logging.info("[%s] Starting trace dumper thread." % fileName)
+		traceDumper = TraceDumper(globalData)
+		# set thread to daemon
+		# => threads terminates when main thread terminates
+		traceDumper.daemon = True
+		traceDumper.start()
+
+		# write the trace file when SIGUSR1 is received
+		# (interrupted system calls of the other threads are restarted)
+		def handleTraceSignal(signum, frame):
+			traceDumper.requestDump()
+		signal.signal(signal.SIGUSR1, handleTraceSignal)
+		signal.siginterrupt(signal.SIGUSR1, False)
+
 	logging.info("[%s] Server started." % fileName)
 
+	# shut the server down when SIGTERM is received
+	def handleTerminationSignal(signum, frame):
+		sys.exit(0)
+	signal.signal(signal.SIGTERM, handleTerminationSignal)
+
 	# handle requests in an infinity loop
-	while True:
-		server.handle_request()
\ No newline at end of file
+	try:
+		if serverEngine == "EVENTDRIVEN":
+			server.serve_forever()
+		else:
+			while True:
+				server.handle_request()
+	except (KeyboardInterrupt, SystemExit):
+		logging.info("[%s] Shutting down server." % fileName)
+
+	# send the still queued eMails before exiting
+	if globalData.smtpAlert is not None:
+		globalData.smtpAlert.smtpSender.exit()
+		globalData.smtpAlert.smtpSender.join(globalData.smtpExitTimeout
+			+ globalData.smtpTimeout)
\ No newline at end of file
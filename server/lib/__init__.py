@@ -8,14 +8,19 @@
 # Licensed under the GNU Public License, version 2.
 
 from server import ServerSession, ConnectionWatchdog, ThreadedTCPServer, \
-	AsynchronousSender
-from storage import Sqlite, Mysql
+	AsynchronousSender, EventDrivenTCPServer
+from storage import Sqlite, Mysql, CachedStorage, MeteredStorage
 from alert import SensorAlertExecuter, AlertLevel, RuleStart, RuleElement, \
 	RuleBoolean, RuleSensor, RuleWeekday, RuleMonthday, RuleHour, RuleMinute, \
-	RuleSecond
+	RuleSecond, CompiledRule
 from userBackend import CSVBackend
 from smtp import SMTPAlert
-from manager import ManagerUpdateExecuter
+from manager import ManagerUpdateExecuter, ManagerStatus
 from update import UpdateChecker, Updater
 from globalData import GlobalData
-from survey import SurveyExecuter
\ No newline at end of file
+from timerHeap import TimerHeap
+from slidingWindowCounter import SlidingWindowCounter
+from sessionRegistry import SessionRegistry
+from survey import SurveyExecuter
+from metrics import MetricsRegistry, MetricsServer
+from tracer import Tracer, TraceDumper
\ No newline at end of file
@@ -12,7 +12,12 @@ import os
 import time
 import logging
 import json
-from server import AsynchronousSender
+import heapq
+import select
+import errno
+import fcntl
+from timerHeap import TimerHeap
+from slidingWindowCounter import SlidingWindowCounter
 
 
 # this class represents a rule that triggeres when the current second
@@ -187,9 +192,10 @@ class RuleStart(RuleElement):
 		# this flag is set when the counter of the rule is activated
 		self.counterActivated = None
 
-		# the list of timeWhenTriggered values for the counter
+		# the timeWhenTriggered values for the counter in a sliding
+		# window of counterWaitTime
 		# (only processed if counterActivated is set)
-		self.counterList = list()
+		self.counter = SlidingWindowCounter(0, 0)
 
 		# the max value/limit of the counter (when it is reached
 		# the trigger is reset)
@@ -202,960 +208,809 @@ class RuleStart(RuleElement):
 		self.counterWaitTime = 0
 
 
-# this class represents a single alert level that is configured
-class AlertLevel:
-
-	def __init__(self):
-
-		# this flag tells if the alert level has an email notification
-		# enabled
-		self.smtpActivated = None
-
-		# the email address the email notification should be sent to
-		# (if it is enabled)
-		self.toAddr = None
-
-		# this value indicates the alert level
-		self.level = None
-
-		# gives the name of this alert level
-		self.name = None
-
-		# this flag indicates if a sensor alert with this alert level
-		# should trigger regardless of if the alert system is active or not
-		self.triggerAlways = None
-
-		# this flag tells if the alert level should trigger a sensor alert
-		# if the sensor goes to state "triggered"
-		self.triggerAlertTriggered = None
+# this class represents a rule (a rule start with all its rule elements)
+# that is compiled into flat lists, so the rule elements do not have to be
+# traversed recursively each time the rule is updated and evaluated
+class CompiledRule:
 
-		# this flag tells if the alert level should also trigger a sensor alert
-		# if the sensor goes to state "normal"
-		self.triggerAlertNormal = None
-
-		# this flag tells if the alert level has rules activated
-		# that has to match before an alert is triggered (flag: True) or
-		# if it just triggers when a sensor alert is received (flag: False)
-		self.rulesActivated = None
-
-		# a list of rules (rule chain) that have to evaluate before the
-		# alert level triggers a sensor alert
-		# (the order in which the elements are stored in this list is the
-		# order in which the rules have to evaluate)
-		self.rules = list()
-
-
-# this class is woken up if a sensor alert is received
-# and executes all necessary steps
-class SensorAlertExecuter(threading.Thread):
-
-	def __init__(self, globalData):
-		threading.Thread.__init__(self)
-
-		# get global configured data
-		self.globalData = globalData
-		self.serverSessions = self.globalData.serverSessions
-		self.managerUpdateExecuter = self.globalData.managerUpdateExecuter
-		self.smtpAlert = self.globalData.smtpAlert
-		self.storage = self.globalData.storage
-		self.alertLevels = self.globalData.alertLevels
+	def __init__(self, ruleStart):
 
 		# file nme of this file (used for logging)
 		self.fileName = os.path.basename(__file__)
 
-		# create an event that is used to wake this thread up
-		# and reacte on sensor alert
-		self.sensorAlertEvent = threading.Event()
-		self.sensorAlertEvent.clear()
-
-		# set exit flag as false
-		self.exitFlag = False
-
-
-	# this internal function recursively updates all values of 
-	# the rule elements it processes received sensor alerts,
-	# updates the timeWhenTriggered values and sets the rule elements
-	# to triggered or not triggered respectively
-	def _updateRuleValuesRecursively(self, sensorAlertList,
-		currentRuleElement):
-
-		# check if rule element is of type "sensor"
-		# => update values of rule
-		if currentRuleElement.type == "sensor":
-
-			# get node id of sensor client
-			ruleNodeId = self.storage.getNodeId(
-				currentRuleElement.element.username)
-			if ruleNodeId is None:
-				logging.error("[%s]: Not able to get " % self.fileName
-					+ "node id for sensor to update rule.")
-				return False
-
-			# get sensor id of sensor
-			ruleSensorId = self.storage.getSensorId(ruleNodeId,
-				currentRuleElement.element.remoteSensorId)
-			if ruleSensorId is None:
-				logging.error("[%s]: Not able to get " % self.fileName
-					+ "sensor id for sensor to update rule.")
-				return False
-
-			# update sensor rule element (set as not triggered)
-			# if sensor does not count as triggered
-			# => unset triggered flag
-			if (((currentRuleElement.timeWhenTriggered
-				+ currentRuleElement.timeTriggeredFor) < time.time())
-				and currentRuleElement.triggered):
-
-				logging.debug("[%s]: Sensor " % self.fileName
-					+ "with id '%d' does not count as triggered anymore."
-					% ruleSensorId)
-
-				currentRuleElement.triggered = False
-
-			# update sensor rule values with current sensor alerts
-			for sensorAlert in sensorAlertList:
-				sensorAlertNodeId = sensorAlert[2]
-				sensorAlertSensorId = sensorAlert[1]
-				sensorAlertTimeReceived = sensorAlert[3]
-				sensorAlertAlertDelay = sensorAlert[4]
+		# the rule start of the compiled rule
+		self.ruleStart = ruleStart
+
+		# index of the rule elements of type "sensor" by the sensor they
+		# reference (key: tuple (username, remoteSensorId);
+		# value: list of rule elements)
+		self.sensorIndex = dict()
+
+		# all rule elements of type "weekday", "monthday", "hour", "minute"
+		# and "second" as a list of tuples (ruleElement, useUtc,
+		# timeAttribute, start, end, description)
+		# (the rule element triggers when the attribute of the local or
+		# utc time lies between start and end)
+		self.timeElements = list()
+
+		# all rule elements of type "boolean" as a list of tuples
+		# (ruleElement, booleanType, elements)
+		# (ordered in a way that a rule element is after all rule elements
+		# it contains, so they are evaluated before it)
+		self.booleanElements = list()
+
+		# all rule elements that are not of type "boolean"
+		self.leafElements = list()
+
+		self._compileRecursively(ruleStart)
+
+		# position of the rule element of type "boolean" that contains
+		# the rule element (key: rule element; value: position in the
+		# list of the rule elements of type "boolean" or None)
+		self.parentPositions = dict()
+		self.parentPositions[ruleStart] = None
+		for position in range(len(self.booleanElements)):
+			for element in self.booleanElements[position][2]:
+				self.parentPositions[element] = position
+
+		# flag that indicates if all rule elements of type "boolean" were
+		# evaluated once (afterwards only the affected ones are evaluated)
+		self.evaluatedOnce = False
+
+		# timers for the triggered rule elements of type "sensor" that are
+		# reached when they do not count as triggered anymore
+		# (key: rule element)
+		self.sensorTimers = TimerHeap()
+
+		# timers for the rule elements that depend on the time that are
+		# reached when they can change the next time
+		# (key: position in the list of rule elements that depend on the
+		# time; all are reached directly for the first update)
+		self.timeTimers = TimerHeap()
+		for position in range(len(self.timeElements)):
+			self.timeTimers.schedule(position, 0.0)
+
+		# position of the rule start in the list of rule elements that
+		# depend on the time (None if it does not depend on the time)
+		self.ruleStartTimePosition = None
+		for position in range(len(self.timeElements)):
+			if self.timeElements[position][0] is ruleStart:
+				self.ruleStartTimePosition = position
+
+
+	# internal function that adds the given rule element and all rule
+	# elements it contains to the flat lists
+	# (raises a ValueError if the rule element is not valid)
+	def _compileRecursively(self, ruleElement):
+
+		if ruleElement.type == "sensor":
+			self.leafElements.append(ruleElement)
+
+			sensorKey = (ruleElement.element.username,
+				ruleElement.element.remoteSensorId)
+			if not sensorKey in self.sensorIndex:
+				self.sensorIndex[sensorKey] = list()
+			self.sensorIndex[sensorKey].append(ruleElement)
+
+		elif ruleElement.type == "weekday":
+			weekdayElement = ruleElement.element
+			self._addTimeElement(ruleElement, weekdayElement.time, "tm_wday",
+				weekdayElement.weekday, weekdayElement.weekday,
+				"Week day with value '%d' for '%s'"
+				% (weekdayElement.weekday, weekdayElement.time))
+
+		elif ruleElement.type == "monthday":
+			monthdayElement = ruleElement.element
+			self._addTimeElement(ruleElement, monthdayElement.time, "tm_mday",
+				monthdayElement.monthday, monthdayElement.monthday,
+				"Month day with value '%d' for '%s'"
+				% (monthdayElement.monthday, monthdayElement.time))
+
+		elif ruleElement.type == "hour":
+			hourElement = ruleElement.element
+			self._addTimeElement(ruleElement, hourElement.time, "tm_hour",
+				hourElement.start, hourElement.end,
+				"Hour from '%d' to '%d' for '%s'"
+				% (hourElement.start, hourElement.end, hourElement.time))
+
+		elif ruleElement.type == "minute":
+			minuteElement = ruleElement.element
+			self._addTimeElement(ruleElement, "local", "tm_min",
+				minuteElement.start, minuteElement.end,
+				"Minute from '%d' to '%d'"
+				% (minuteElement.start, minuteElement.end))
+
+		elif ruleElement.type == "second":
+			secondElement = ruleElement.element
+			self._addTimeElement(ruleElement, "local", "tm_sec",
+				secondElement.start, secondElement.end,
+				"Second from '%d' to '%d'"
+				% (secondElement.start, secondElement.end))
+
+		elif ruleElement.type == "boolean":
+			booleanElement = ruleElement.element
+			if (booleanElement.type != "and"
+				and booleanElement.type != "or"
+				and booleanElement.type != "not"):
+				raise ValueError("Boolean rule element has an invalid type.")
+
+			# add all contained rule elements before the rule element itself
+			for element in booleanElement.elements:
+				self._compileRecursively(element)
+
+			self.booleanElements.append((ruleElement, booleanElement.type,
+				list(booleanElement.elements)))
 
-				# check if received sensor alert is triggered by
-				# the sensor of the rule
-				if (sensorAlertNodeId == ruleNodeId
-					and sensorAlertSensorId == ruleSensorId):
-
-					logging.debug("[%s]: Found match " % self.fileName
-						+ "for sensor with id '%d' and sensor in rule."
-						% ruleSensorId)
-
-					# checked if the received sensor alert
-					# is newer than the stored time when triggered
-					# => update time when triggered
-					if ((sensorAlertTimeReceived + sensorAlertAlertDelay)
-						> currentRuleElement.timeWhenTriggered):
-
-						# check if an alert delay has to be considered
-						if not ((time.time() - sensorAlertTimeReceived)
-							> sensorAlertAlertDelay):
-
-							logging.debug("[%s]: Sensor alert " % self.fileName
-								+ "for sensor with id '%d' still delayed for "
-								% ruleSensorId
-								+ "'%.2f' seconds."
-								% (sensorAlertAlertDelay
-								- (time.time() - sensorAlertTimeReceived)))
-
-							continue
-
-						logging.debug("[%s]: New sensor " % self.fileName
-							+ "alert for sensor with id '%d' received."
-							% ruleSensorId)
-
-						currentRuleElement.timeWhenTriggered = \
-							sensorAlertTimeReceived + sensorAlertAlertDelay
-
-						# check if sensor still counts as triggered
-						# => set triggered flag
-						if ((currentRuleElement.timeWhenTriggered
-							+ currentRuleElement.timeTriggeredFor)
-							> time.time()):
-
-							logging.debug("[%s]: Sensor " % self.fileName
-								+ "with id '%d' counts as triggered."
-								% ruleSensorId)
-
-							currentRuleElement.triggered = True
-
-						# if sensor does not count as triggered
-						# => unset triggered flag
-						else:
-
-							logging.debug("[%s]: Sensor " % self.fileName
-							+ "with id '%d' does not count as triggered."
-							% ruleSensorId)
-
-							currentRuleElement.triggered = False
-
-		# check if rule element is of type "weekday"
-		# => update values of rule according to the date
-		elif currentRuleElement.type == "weekday":
-
-			weekdayElement = currentRuleElement.element
-
-			if weekdayElement.time == "local":
-
-				# check if week day matches
-				# => set rule element as triggered if it is not yet triggered
-				if weekdayElement.weekday == time.localtime().tm_wday:
-					
-					# check if rule element is not triggered
-					# => set as triggered
-					if not currentRuleElement.triggered:
-
-						logging.debug("[%s]: Week day " % self.fileName
-							+ "with value '%d' for '%s' counts as triggered."
-							% (weekdayElement.weekday, weekdayElement.time))
-
-						currentRuleElement.timeWhenTriggered = time.time()
-						currentRuleElement.triggered = True
-
-				# check if rule element is triggered
-				# => set rule element as not triggered
-				elif currentRuleElement.triggered:
-
-					logging.debug("[%s]: Week day " % self.fileName
-						+ "with value '%d' for '%s' no longer "
-						% (weekdayElement.weekday, weekdayElement.time)
-						+ "counts as triggered.")
-
-					currentRuleElement.triggered = False
-
-			elif weekdayElement.time == "utc":
+		else:
+			raise ValueError("Rule element has an invalid type.")
 
-				# check if week day matches
-				# => set rule element as triggered if it is not yet triggered
-				if weekdayElement.weekday == time.gmtime().tm_wday:
 
-					# check if rule element is not triggered
-					# => set as triggered
-					if not currentRuleElement.triggered:
+	# internal function that adds a rule element that depends on the time
+	# (raises a ValueError if the used time is not valid)
+	def _addTimeElement(self, ruleElement, usedTime, timeAttribute, start,
+		end, description):
 
-						logging.debug("[%s]: Week day " % self.fileName
-							+ "with value '%d' for '%s' counts as triggered."
-							% (weekdayElement.weekday, weekdayElement.time))
+		if usedTime == "local":
+			useUtc = False
+		elif usedTime == "utc":
+			useUtc = True
+		else:
+			raise ValueError("No valid value for 'time' attribute "
+				+ "in %s tag." % ruleElement.type)
 
-						currentRuleElement.timeWhenTriggered = time.time()
-						currentRuleElement.triggered = True
+		self.timeElements.append((ruleElement, useUtc, timeAttribute, start,
+			end, description))
+		self.leafElements.append(ruleElement)
 
-				# check if rule element is triggered
-				# => set rule element as not triggered
-				elif currentRuleElement.triggered:
 
-					logging.debug("[%s]: Week day " % self.fileName
-						+ "with value '%d' for '%s' no longer "
-						% (weekdayElement.weekday, weekdayElement.time)
-						+ "counts as triggered.")
+	# gets the rule elements of type "sensor" that reference the sensor
+	# given by the key (username, remoteSensorId)
+	#
+	# return list of rule elements
+	def getSensorElements(self, sensorKey):
 
-					currentRuleElement.triggered = False
+		if sensorKey in self.sensorIndex:
+			return self.sensorIndex[sensorKey]
 
-			else:
-				logging.error("[%s]: No valid value for " % self.fileName
-					+ "'time' attribute in weekday tag.")
-				return False
+		return list()
 
-		# check if rule element is of type "monthday"
-		# => update values of rule according to the date
-		elif currentRuleElement.type == "monthday":
 
-			monthdayElement = currentRuleElement.element
+	# sets the timer of a rule element of type "sensor" after it was
+	# updated with a received sensor alert
+	def updateSensorTimer(self, ruleElement):
 
-			if monthdayElement.time == "local":
+		if ruleElement.triggered:
+			self.sensorTimers.schedule(ruleElement,
+				ruleElement.timeWhenTriggered + ruleElement.timeTriggeredFor)
+		else:
+			self.sensorTimers.cancel(ruleElement)
 
-				# check if month day matches
-				# => set rule element as triggered if it is not yet triggered
-				if monthdayElement.monthday == time.localtime().tm_mday:
-					
-					# check if rule element is not triggered
-					# => set as triggered
-					if not currentRuleElement.triggered:
 
-						logging.debug("[%s]: Month day " % self.fileName
-							+ "with value '%d' for '%s' counts as triggered."
-							% (monthdayElement.monthday, monthdayElement.time))
+	# sets all rule elements of type "sensor" as not triggered that
+	# do not count as triggered anymore
+	#
+	# return list of the changed rule elements
+	def expireSensorElements(self):
 
-						currentRuleElement.timeWhenTriggered = time.time()
-						currentRuleElement.triggered = True
+		changedElements = list()
 
-				# check if rule element is triggered
-				# => set rule element as not triggered
-				elif currentRuleElement.triggered:
+		for ruleElement in self.sensorTimers.popExpired(time.time()):
+			if ruleElement.triggered:
 
-					logging.debug("[%s]: Month day " % self.fileName
-						+ "with value '%d' for '%s' no longer "
-						% (monthdayElement.monthday, monthdayElement.time)
-						+ "counts as triggered.")
+				logging.debug("[%s]: Sensor " % self.fileName
+					+ "with remote id '%d' and username '%s' "
+					% (ruleElement.element.remoteSensorId,
+					ruleElement.element.username)
+					+ "does not count as triggered anymore.")
 
-					currentRuleElement.triggered = False
+				ruleElement.triggered = False
+				changedElements.append(ruleElement)
 
-			elif monthdayElement.time == "utc":
+		return changedElements
 
-				# check if month day matches
-				# => set rule element as triggered if it is not yet triggered
-				if monthdayElement.monthday == time.gmtime().tm_mday:
 
-					# check if rule element is not triggered
-					# => set as triggered
-					if not currentRuleElement.triggered:
+	# updates all rule elements that depend on the time
+	# (sets them as triggered or not triggered)
+	#
+	# return list of the changed rule elements
+	def updateTimeElements(self):
 
-						logging.debug("[%s]: Month day " % self.fileName
-							+ "with value '%d' for '%s' counts as triggered."
-							% (monthdayElement.monthday, monthdayElement.time))
+		changedElements = list()
 
-						currentRuleElement.timeWhenTriggered = time.time()
-						currentRuleElement.triggered = True
+		currentTime = time.time()
 
-				# check if rule element is triggered
-				# => set rule element as not triggered
-				elif currentRuleElement.triggered:
+		# the rule start is reset when the rule chain triggered, did not
+		# trigger in time or its counter reached the limit
+		# => a rule start that depends on the time is checked again
+		# directly and not only when it can change the next time
+		if (self.ruleStartTimePosition is not None
+			and not self.ruleStart.triggered):
+			self.timeTimers.schedule(self.ruleStartTimePosition, 0.0)
 
-					logging.debug("[%s]: Month day " % self.fileName
-						+ "with value '%d' for '%s' no longer "
-						% (monthdayElement.monthday, monthdayElement.time)
-						+ "counts as triggered.")
+		positions = self.timeTimers.popExpired(currentTime)
+		if not positions:
+			return changedElements
 
-					currentRuleElement.triggered = False
+		localTime = time.localtime(currentTime)
+		utcTime = time.gmtime(currentTime)
 
-			else:
-				logging.error("[%s]: No valid value for " % self.fileName
-					+ "'time' attribute in monthday tag.")
-				return False
-
-		# check if rule element is of type "hour"
-		# => update values of rule according to the date
-		elif currentRuleElement.type == "hour":
-
-			hourElement = currentRuleElement.element
-
-			if hourElement.time == "local":
-
-				# check if the current hour lies between the start/end
-				# of the hour rule element
-				# => set rule element as triggered if it is not yet triggered
-				if (hourElement.start <= time.localtime().tm_hour
-					and time.localtime().tm_hour <= hourElement.end):
-					
-					# check if rule element is not triggered
-					# => set as triggered
-					if not currentRuleElement.triggered:
-
-						logging.debug("[%s]: Hour " % self.fileName
-							+ "from '%d' to '%d' for '%s' counts as triggered."
-							% (hourElement.start, hourElement.end,
-							hourElement.time))
-
-						currentRuleElement.timeWhenTriggered = time.time()
-						currentRuleElement.triggered = True
-
-				# check if rule element is triggered
-				# => set rule element as not triggered
-				elif currentRuleElement.triggered:
-
-					logging.debug("[%s]: Hour " % self.fileName
-						+ "from '%d' to '%d' for '%s' no longer "
-						% (hourElement.start, hourElement.end,
-						hourElement.time)
-						+ "counts as triggered.")
-
-					currentRuleElement.triggered = False
-
-			elif hourElement.time == "utc":
-
-				# check if the current hour lies between the start/end
-				# of the hour rule element
-				# => set rule element as triggered if it is not yet triggered
-				if (hourElement.start <= time.gmtime().tm_hour
-					and time.gmtime().tm_hour <= hourElement.end):
-					
-					# check if rule element is not triggered
-					# => set as triggered
-					if not currentRuleElement.triggered:
-
-						logging.debug("[%s]: Hour " % self.fileName
-							+ "from '%d' to '%d' for '%s' counts as triggered."
-							% (hourElement.start, hourElement.end,
-							hourElement.time))
-
-						currentRuleElement.timeWhenTriggered = time.time()
-						currentRuleElement.triggered = True
-
-				# check if rule element is triggered
-				# => set rule element as not triggered
-				elif currentRuleElement.triggered:
-
-					logging.debug("[%s]: Hour " % self.fileName
-						+ "from '%d' to '%d' for '%s' no longer "
-						% (hourElement.start, hourElement.end,
-						hourElement.time)
-						+ "counts as triggered.")
-
-					currentRuleElement.triggered = False
+		for position in positions:
+			timeElement = self.timeElements[position]
+			ruleElement = timeElement[0]
 
+			if timeElement[1]:
+				timeStruct = utcTime
 			else:
-				logging.error("[%s]: No valid value for " % self.fileName
-					+ "'time' attribute in hour tag.")
-				return False
+				timeStruct = localTime
+			value = getattr(timeStruct, timeElement[2])
 
-		# check if rule element is of type "minute"
-		# => update values of rule according to the date
-		elif currentRuleElement.type == "minute":
+			# set the timer for the next time the rule element can change
+			nextChange = self._getNextTimeChange(timeElement, currentTime,
+				timeStruct)
+			if nextChange is not None:
+				self.timeTimers.schedule(position, nextChange)
 
-			minuteElement = currentRuleElement.element
-
-			# check if the current minute lies between the start/end
-			# of the minute rule element
+			# check if the current time matches
 			# => set rule element as triggered if it is not yet triggered
-			if (minuteElement.start <= time.localtime().tm_min
-				and time.localtime().tm_min <= minuteElement.end):
-					
-				# check if rule element is not triggered
-				# => set as triggered
-				if not currentRuleElement.triggered:
+			if timeElement[3] <= value and value <= timeElement[4]:
+
+				if not ruleElement.triggered:
 
-					logging.debug("[%s]: Minute " % self.fileName
-						+ "from '%d' to '%d' counts as triggered."
-						% (minuteElement.start, minuteElement.end))
+					logging.debug("[%s]: %s counts as triggered."
+						% (self.fileName, timeElement[5]))
 
-					currentRuleElement.timeWhenTriggered = time.time()
-					currentRuleElement.triggered = True
+					ruleElement.timeWhenTriggered = time.time()
+					ruleElement.triggered = True
+					changedElements.append(ruleElement)
 
 			# check if rule element is triggered
 			# => set rule element as not triggered
-			elif currentRuleElement.triggered:
-
-				logging.debug("[%s]: Minute " % self.fileName
-					+ "from '%d' to '%d' no longer "
-					% (minuteElement.start, minuteElement.end)
-					+ "counts as triggered.")
+			elif ruleElement.triggered:
+
+				logging.debug("[%s]: %s no longer counts as triggered."
+					% (self.fileName, timeElement[5]))
+
+				ruleElement.triggered = False
+				changedElements.append(ruleElement)
+
+		return changedElements
+
+
+	# internal function that gets the point in time at which the given
+	# rule element that depends on the time can change the next time
+	#
+	# return point in time or None (if it can never change)
+	def _getNextTimeChange(self, timeElement, currentTime, timeStruct):
+
+		useUtc = timeElement[1]
+		timeAttribute = timeElement[2]
+		start = timeElement[3]
+		end = timeElement[4]
+		value = getattr(timeStruct, timeAttribute)
+		triggered = (start <= value and value <= end)
+
+		# get the length of the time unit of the attribute, the number of
+		# values it has before it starts again and the seconds that have
+		# passed since the start of the current unit and hour
+		passedSeconds = currentTime - int(currentTime)
+		unitLength = 1
+		period = 60
+		if timeAttribute != "tm_sec":
+			passedSeconds += timeStruct.tm_sec
+			unitLength = 60
+		if timeAttribute != "tm_sec" and timeAttribute != "tm_min":
+			passedSeconds += timeStruct.tm_min * 60
+			unitLength = 3600
+			period = 24
+		passedSecondsOfHour = passedSeconds
+		if timeAttribute == "tm_wday" or timeAttribute == "tm_mday":
+			passedSeconds += timeStruct.tm_hour * 3600
+			unitLength = 86400
+			if timeAttribute == "tm_wday":
+				period = 7
+
+			# the number of days of a month differs
+			# => check the rule element again with the next day
+			else:
+				period = None
+
+		# count the units until the value leaves (or enters) the range
+		units = 1
+		if period is not None:
+			while units < period:
+				nextValue = (value + units) % period
+				if (start <= nextValue and nextValue <= end) != triggered:
+					break
+				units += 1
+			else:
+				return None
+
+		nextChange = currentTime - passedSeconds + (units * unitLength)
+
+		# the local time can be shifted by the daylight saving time
+		# => check the rule element again with the next hour at the latest
+		if not useUtc and unitLength >= 3600:
+			nextChange = min(nextChange,
+				currentTime - passedSecondsOfHour + 3600)
+
+		return nextChange
+
+
+	# gets the point in time at which the next timer of the rule
+	# is reached (a sensor does not count as triggered anymore or a
+	# rule element that depends on the time can change)
+	#
+	# return point in time or None
+	def getNextDeadline(self):
+
+		sensorDeadline = self.sensorTimers.getNextDeadline()
+		timeDeadline = self.timeTimers.getNextDeadline()
+
+		if sensorDeadline is None:
+			return timeDeadline
+		if timeDeadline is None:
+			return sensorDeadline
+		return min(sensorDeadline, timeDeadline)
+
+
+	# internal function that evaluates the rule elements of type "boolean"
+	# at the given positions and all rule elements that contain them
+	# if their triggered value changes
+	# (positions are processed in ascending order, so a rule element
+	# is always evaluated after the rule elements it contains)
+	def _evaluateBooleanPositions(self, positions):
+
+		positionHeap = list(set(positions))
+		heapq.heapify(positionHeap)
+		queuedPositions = set(positionHeap)
+
+		while positionHeap:
+			position = heapq.heappop(positionHeap)
+			booleanElement = self.booleanElements[position]
+			ruleElement = booleanElement[0]
+			booleanType = booleanElement[1]
+
+			# "and" rule element is triggered if all elements are triggered
+			if booleanType == "and":
+				triggered = True
+				for element in booleanElement[2]:
+					if not element.triggered:
+						triggered = False
+						break
+
+			# "or" rule element is triggered if one element is triggered
+			elif booleanType == "or":
+				triggered = False
+				for element in booleanElement[2]:
+					if element.triggered:
+						triggered = True
+						break
+
+			# "not" rule element toggles the triggered value of its element
+			else:
+				triggered = not booleanElement[2][0].triggered
 
-				currentRuleElement.triggered = False
+			if triggered == ruleElement.triggered:
+				continue
 
-		# check if rule element is of type "second"
-		# => update values of rule according to the date
-		elif currentRuleElement.type == "second":
+			# the rule element that contains this one has to be
+			# evaluated again
+			parentPosition = self.parentPositions[ruleElement]
+			if (parentPosition is not None
+				and not parentPosition in queuedPositions):
+				heapq.heappush(positionHeap, parentPosition)
+				queuedPositions.add(parentPosition)
+
+			if triggered:
+				logging.debug("[%s]: Rule elements evaluate " % self.fileName
+					+ "to triggered. Set '%s' rule also to triggered."
+					% booleanType)
+			else:
+				logging.debug("[%s]: Rule elements evaluate " % self.fileName
+					+ "to not triggered. Set '%s' rule also to not triggered."
+					% booleanType)
 
-			secondElement = currentRuleElement.element
+			ruleElement.triggered = triggered
 
-			# check if the current second lies between the start/end
-			# of the second rule element
-			# => set rule element as triggered if it is not yet triggered
-			if (secondElement.start <= time.localtime().tm_sec
-				and time.localtime().tm_sec <= secondElement.end):
-					
-				# check if rule element is not triggered
-				# => set as triggered
-				if not currentRuleElement.triggered:
+			# a "not" rule element does not set the time when it triggered
+			if triggered and booleanType != "not":
+				ruleElement.timeWhenTriggered = time.time()
 
-					logging.debug("[%s]: Second " % self.fileName
-						+ "from '%d' to '%d' counts as triggered."
-						% (secondElement.start, secondElement.end))
 
-					currentRuleElement.timeWhenTriggered = time.time()
-					currentRuleElement.triggered = True
+	# evaluates the rule elements of type "boolean" that are affected by
+	# the given changed rule elements
+	# (means AND, OR and NOT are evaluated as triggered/not triggered)
+	def evaluateBooleanElements(self, changedElements):
 
-			# check if rule element is triggered
-			# => set rule element as not triggered
-			elif currentRuleElement.triggered:
+		if not self.evaluatedOnce:
+			self._evaluateBooleanPositions(range(len(self.booleanElements)))
+			self.evaluatedOnce = True
+			return
 
-				logging.debug("[%s]: Second " % self.fileName
-					+ "from '%d' to '%d' no longer "
-					% (secondElement.start, secondElement.end)
-					+ "counts as triggered.")
+		positions = set()
+		for ruleElement in changedElements:
+			parentPosition = self.parentPositions[ruleElement]
+			if parentPosition is not None:
+				positions.add(parentPosition)
 
-				currentRuleElement.triggered = False
+		# the rule start is always evaluated because its triggered value
+		# is reset when the rule chain triggered or did not trigger in time
+		if self.ruleStart.type == "boolean":
+			positions.add(len(self.booleanElements) - 1)
 
-		# check if rule element is of type "boolean"
-		# => traverse rule recursively
-		elif currentRuleElement.type == "boolean":
+		self._evaluateBooleanPositions(positions)
 
-			# update values of all rule elements in current rule element
-			for ruleElement in currentRuleElement.element.elements:
-				self._updateRuleValuesRecursively(sensorAlertList,
-					ruleElement)
 
-		else:
-			logging.error("[%s]: Rule element " % self.fileName
-				+ "has an invalid type.")
-			return False
+	# checks if a rule element that is not of type "boolean" is triggered
+	# and therefore the rule is likely to trigger during the next evaluation
+	def canTrigger(self):
 
-		return True
+		for ruleElement in self.leafElements:
+			if ruleElement.triggered:
+				return True
 
+		return False
 
-	# this internal function evaluates rule elements from type
-	# "boolean" recursively
-	# (means AND, OR and NOT are evaluated as triggered/not triggered)
-	def _evaluateRuleElementsRecursively(self, currentRuleElement):
 
-		# only evaluate rule elements of type "boolean"
-		if currentRuleElement.type == "boolean":
+# this class represents a single alert level that is configured
+class AlertLevel:
 
-			# evaluate "and" rule element
-			if currentRuleElement.element.type == "and":
-
-				andElement = currentRuleElement.element
+	def __init__(self):
 
-				# check if all elements of the "and" rule element are triggered
-				for element in andElement.elements:
+		# this flag tells if the alert level has an email notification
+		# enabled
+		self.smtpActivated = None
 
-					# check if sensor element is not triggered
-					# => if it is, set current rule element also as
-					# not triggered (if it was triggered) and return
-					if element.type == "sensor":
-						if not element.triggered:
+		# the email address the email notification should be sent to
+		# (if it is enabled)
+		self.toAddr = None
 
-							if currentRuleElement.triggered:
-								logging.debug("[%s]: Sensor rule element with "
-									% self.fileName
-									+ "remote id '%d' and username '%s' not "
-									% (element.element.remoteSensorId,
-									element.element.username)
-									+ "triggered. Set 'and' rule "
-									+ "also to not triggered.")
-
-								currentRuleElement.triggered = False
+		# this value indicates the alert level
+		self.level = None
 
-							return True
+		# gives the name of this alert level
+		self.name = None
 
-					# check if weekday element is not triggered
-					# => if it is, set current rule element also as
-					# not triggered (if it was triggered) and return
-					elif element.type == "weekday":
+		# this flag indicates if a sensor alert with this alert level
+		# should trigger regardless of if the alert system is active or not
+		self.triggerAlways = None
 
-						if not element.triggered:
+		# this flag tells if the alert level should trigger a sensor alert
+		# if the sensor goes to state "triggered"
+		self.triggerAlertTriggered = None
 
-							if currentRuleElement.triggered:
-								logging.debug("[%s]: Week day rule element "
-									% self.fileName
-									+ "with value '%d' for '%s' not "
-									% (element.element.weekday,
-									element.element.time)
-									+ "triggered. Set 'and' rule "
-									+ "also to not triggered.")
-
-								currentRuleElement.triggered = False
+		# this flag tells if the alert level should also trigger a sensor alert
+		# if the sensor goes to state "normal"
+		self.triggerAlertNormal = None
 
-							return True
+		# this flag tells if the alert level has rules activated
+		# that has to match before an alert is triggered (flag: True) or
+		# if it just triggers when a sensor alert is received (flag: False)
+		self.rulesActivated = None
 
-					# check if monthday element is not triggered
-					# => if it is, set current rule element also as
-					# not triggered (if it was triggered) and return
-					elif element.type == "monthday":
+		# a list of rules (rule chain) that have to evaluate before the
+		# alert level triggers a sensor alert
+		# (the order in which the elements are stored in this list is the
+		# order in which the rules have to evaluate)
+		self.rules = list()
 
-						if not element.triggered:
+		# the rules compiled into flat lists (in the same order as the rules)
+		self.compiledRules = list()
 
-							if currentRuleElement.triggered:
-								logging.debug("[%s]: Month day rule element "
-									% self.fileName
-									+ "with value '%d' for '%s' not "
-									% (element.element.monthday,
-									element.element.time)
-									+ "triggered. Set 'and' rule "
-									+ "also to not triggered.")
 
-								currentRuleElement.triggered = False
+# this class tracks the delivery of a triggered sensor alert to the
+# alert and manager clients (the sender of each client reports the
+# result of its delivery)
+class SensorAlertDelivery:
 
-							return True
+	def __init__(self, description, deadline, finishedCallback):
 
-					# check if hour element is not triggered
-					# => if it is, set current rule element also as
-					# not triggered (if it was triggered) and return
-					elif element.type == "hour":
+		# file nme of this file (used for logging)
+		self.fileName = os.path.basename(__file__)
 
-						if not element.triggered:
+		# description of the sensor alert
+		self.description = description
 
-							if currentRuleElement.triggered:
-								logging.debug("[%s]: Hour rule element "
-									% self.fileName
-									+ "from '%d' to '%d' for '%s' not "
-									% (element.element.start,
-									element.element.end,
-									element.element.time)
-									+ "triggered. Set 'and' rule "
-									+ "also to not triggered.")
+		# time in seconds in which the sensor alert should be delivered
+		# to each client
+		self.deadline = deadline
 
-								currentRuleElement.triggered = False
+		# function that is called with this object when
+		# the delivery has finished
+		self.finishedCallback = finishedCallback
 
-							return True
+		# point in time the sensor alert was dispatched
+		self.timeDispatched = time.time()
 
-					# check if minute element is not triggered
-					# => if it is, set current rule element also as
-					# not triggered (if it was triggered) and return
-					elif element.type == "minute":
+		# lock that makes the delivery thread safe
+		self.lock = threading.Lock()
 
-						if not element.triggered:
+		# number of clients that did not report a result yet
+		self.pendingCount = 0
 
-							if currentRuleElement.triggered:
-								logging.debug("[%s]: Minute rule element "
-									% self.fileName
-									+ "from '%d' to '%d' not "
-									% (element.element.start,
-									element.element.end)
-									+ "triggered. Set 'and' rule "
-									+ "also to not triggered.")
+		# flag that is set when all clients were added
+		self.closed = False
 
-								currentRuleElement.triggered = False
+		# results of the clients as a list of tuples
+		# (clientAddress, clientPort, success, latency)
+		self.results = list()
 
-							return True
+		# number of clients the sensor alert could not be delivered to
+		# or was not delivered to in time
+		self.countFailed = 0
+		self.countLate = 0
 
-					# check if second element is not triggered
-					# => if it is, set current rule element also as
-					# not triggered (if it was triggered) and return
-					elif element.type == "second":
+		# time in seconds the delivery to all clients took
+		self.deliveryTime = None
 
-						if not element.triggered:
 
-							if currentRuleElement.triggered:
-								logging.debug("[%s]: Second rule element "
-									% self.fileName
-									+ "from '%d' to '%d' not "
-									% (element.element.start,
-									element.element.end)
-									+ "triggered. Set 'and' rule "
-									+ "also to not triggered.")
+	# internal function that is called when all clients
+	# have reported their result
+	def _finish(self):
 
-								currentRuleElement.triggered = False
+		self.deliveryTime = time.time() - self.timeDispatched
 
-							return True
+		if self.countFailed != 0 or self.countLate != 0:
 
-					elif element.type == "boolean":
-						if not self._evaluateRuleElementsRecursively(element):
-							return False
+			resultString = ", ".join(
+				"%s:%d %s %.3fs" % (result[0], result[1],
+				("ok" if result[2] else "failed"), result[3])
+				for result in self.results)
 
-						# check if rule element was set to not triggered
-						# => if it was, set current rule element
-						# also as not triggered (when it was triggered)
-						# and return
-						if not element.triggered:
+			logging.warning("[%s]: Sensor alert '%s' "
+				% (self.fileName, self.description)
+				+ "was not delivered to all clients in time. "
+				+ "Failed: %d; Late: %d; Delivery time: %.3fs (%s)."
+				% (self.countFailed, self.countLate, self.deliveryTime,
+				resultString))
 
-							if currentRuleElement.triggered:
-								logging.debug("[%s]: Rule element evaluates "
-									% self.fileName
-									+ "to not triggered. Set 'and' rule "
-									+ "also to not triggered.")
+		else:
+			logging.debug("[%s]: Sensor alert '%s' "
+				% (self.fileName, self.description)
+				+ "delivered to %d clients in %.3fs."
+				% (len(self.results), self.deliveryTime))
 
-								currentRuleElement.triggered = False
+		self.finishedCallback(self)
 
-							return True
 
-					else:
-						logging.error("[%s]: Type of " % self.fileName
-							+ "rule element not valid.")
-						return False
+	# adds a client the sensor alert is delivered to
+	def addRecipient(self):
 
-				# when this point is reached, every element of the "and"
-				# rule is triggered
-				# => set current element as triggered (when not triggered)
-				# and return
-				if not currentRuleElement.triggered:
+		self.lock.acquire()
+		self.pendingCount += 1
+		self.lock.release()
 
-					logging.debug("[%s]: Each rule element evaluates "
-						% self.fileName
-						+ "to triggered. Set 'and' rule "
-						+ "also to triggered.")
 
-					currentRuleElement.triggered = True
-					currentRuleElement.timeWhenTriggered = time.time()
+	# reports the result of the delivery to a client
+	def reportResult(self, clientComm, success):
 
-				return True
+		latency = time.time() - self.timeDispatched
 
-			# evaluate "or" rule element
-			elif currentRuleElement.element.type == "or":
+		self.lock.acquire()
+		self.results.append((clientComm.clientAddress,
+			clientComm.clientPort, success, latency))
+		self.pendingCount -= 1
+		if not success:
+			self.countFailed += 1
+		elif latency > self.deadline:
+			self.countLate += 1
+		finished = (self.closed and self.pendingCount == 0)
+		self.lock.release()
 
-				orElement = currentRuleElement.element
+		if finished:
+			self._finish()
 
-				# first check all elements if there exist a "not rule" element
-				# that is triggered
-				# => if it does, set current rule element
-				# also as triggered (if it was not triggered) and return
-				# (done for optimization)
-				for element in orElement.elements:
 
-					if (element.type == "sensor"
-						and element.triggered == True):
+	# marks that all clients were added
+	def close(self):
 
-						if not currentRuleElement.triggered:
-							logging.debug("[%s]: Sensor rule element with "
-								% self.fileName
-								+ "remote id '%d' and username '%s' "
-								% (element.element.remoteSensorId,
-								element.element.username)
-								+ "triggered. Set 'or' rule "
-								+ "also to triggered.")
+		self.lock.acquire()
+		self.closed = True
+		finished = (self.pendingCount == 0)
+		self.lock.release()
 
-							currentRuleElement.triggered = True
-							currentRuleElement.timeWhenTriggered = time.time()
+		if finished:
+			self._finish()
 
-						return True
 
-					elif (element.type == "weekday"
-						and element.triggered == True):
+# this class is woken up if a sensor alert is received
+# and executes all necessary steps
+class SensorAlertExecuter(threading.Thread):
 
-						if not currentRuleElement.triggered:
-							logging.debug("[%s]: Week day rule element with "
-								% self.fileName
-								+ "value '%d' for '%s' "
-								% (element.element.weekday,
-								element.element.time)
-								+ "triggered. Set 'or' rule "
-								+ "also to triggered.")
+	def __init__(self, globalData):
+		threading.Thread.__init__(self)
 
-							currentRuleElement.triggered = True
-							currentRuleElement.timeWhenTriggered = time.time()
+		# get global configured data
+		self.globalData = globalData
+		self.sessionRegistry = self.globalData.sessionRegistry
+		self.managerUpdateExecuter = self.globalData.managerUpdateExecuter
+		self.smtpAlert = self.globalData.smtpAlert
+		self.storage = self.globalData.storage
+		self.alertLevels = self.globalData.alertLevels
+		self.alertLevelsByLevel = self.globalData.alertLevelsByLevel
 
-						return True
+		# file nme of this file (used for logging)
+		self.fileName = os.path.basename(__file__)
 
-					elif (element.type == "monthday"
-						and element.triggered == True):
+		# pipe that is used to wake this thread up and reacte on
+		# sensor alert (a timed wait on a threading.Event polls in
+		# python 2, waiting on a pipe with select does not)
+		self.wakeupPipeRead, self.wakeupPipeWrite = os.pipe()
+		fcntl.fcntl(self.wakeupPipeRead, fcntl.F_SETFL,
+			fcntl.fcntl(self.wakeupPipeRead, fcntl.F_GETFL) | os.O_NONBLOCK)
+		fcntl.fcntl(self.wakeupPipeWrite, fcntl.F_SETFL,
+			fcntl.fcntl(self.wakeupPipeWrite, fcntl.F_GETFL) | os.O_NONBLOCK)
+
+		# queue of the received sensor alerts that are not processed yet
+		# as tuples (sensorAlert, timeQueued) (filled by the server
+		# sessions) and the flag if the thread was already woken up for them
+		self.sensorAlertQueueLock = threading.Lock()
+		self.sensorAlertQueue = list()
+		self.wakeupPending = False
+
+		# sets if the received sensor alerts are written to the journal
+		# in the database until they are handled
+		self.journalSensorAlerts = self.globalData.journalSensorAlerts
+
+		# ids of the sensor alerts in the journal that are not deleted yet
+		self.journaledSensorAlertIds = set()
+
+		# the sensors that are referenced by rule elements of type "sensor"
+		# (key: tuple (nodeId, sensorId); value: list of
+		# tuples (username, remoteSensorId))
+		self.ruleSensorKeys = dict()
+
+		# time in seconds in which a sensor alert should be delivered
+		# to each alert and manager client
+		self.sensorAlertDeliveryDeadline = \
+			self.globalData.sensorAlertDeliveryDeadline
+
+		# statistics of the deliveries of the triggered sensor alerts
+		self.deliveryStatisticsLock = threading.Lock()
+		self.countDeliveries = 0
+		self.countDeliveriesFailed = 0
+		self.countDeliveriesLate = 0
+		self.maxDeliveryTime = 0.0
+		self.sumDeliveryTime = 0.0
+
+		# the metrics of the server (None if they are not activated)
+		self.metrics = self.globalData.metrics
+		if self.metrics is not None:
+			self.metrics.registerCounter("alertr_sensor_alerts_received_total",
+				"Sensor alerts received from the sensor clients.")
+			self.metrics.registerCounter(
+				"alertr_sensor_alerts_dispatched_total",
+				"Sensor alerts dispatched to the alert and manager clients.")
+			self.metrics.registerHistogram(
+				"alertr_sensor_alert_dispatch_latency_seconds",
+				"Time from the point a sensor alert is due (received plus "
+				+ "alert delay) until it is dispatched.")
+			self.metrics.registerHistogram(
+				"alertr_sensor_alert_delivery_seconds",
+				"Time from dispatching a sensor alert until all clients "
+				+ "reported its delivery.")
+			self.metrics.registerCounter(
+				"alertr_sensor_alert_deliveries_total",
+				"Finished deliveries of sensor alerts by result (failed if "
+				+ "a client failed, late if a client missed the deadline).")
+			self.metrics.registerCallback("alertr_sensor_alert_queue_length",
+				"gauge", "Received sensor alerts that are not processed yet.",
+				self._getQueueMetrics)
 
-						if not currentRuleElement.triggered:
-							logging.debug("[%s]: Month day rule element with "
-								% self.fileName
-								+ "value '%d' for '%s' "
-								% (element.element.monthday,
-								element.element.time)
-								+ "triggered. Set 'or' rule "
-								+ "also to triggered.")
+		# set exit flag as false
+		self.exitFlag = False
 
-							currentRuleElement.triggered = True
-							currentRuleElement.timeWhenTriggered = time.time()
 
-						return True
+	# this internal function gets the keys (username, remoteSensorId)
+	# of the rule elements of type "sensor" that reference the given sensor
+	def _getRuleSensorKeys(self, nodeId, sensorId):
 
-					elif (element.type == "hour"
-						and element.triggered == True):
+		if (nodeId, sensorId) in self.ruleSensorKeys:
+			return self.ruleSensorKeys[(nodeId, sensorId)]
 
-						if not currentRuleElement.triggered:
-							logging.debug("[%s]: Hour rule element from "
-								% self.fileName
-								+ "'%d' to '%d' for '%s' "
-								% (element.element.start,
-								element.element.end,
-								element.element.time)
-								+ "triggered. Set 'or' rule "
-								+ "also to triggered.")
+		# sensor is not known yet (for example because its node
+		# registered after the last lookup)
+		# => look up the sensors of all rules again
+		ruleSensorKeys = dict()
+		for alertLevel in self.alertLevels:
+			for compiledRule in alertLevel.compiledRules:
+				for sensorKey in compiledRule.sensorIndex.keys():
 
-							currentRuleElement.triggered = True
-							currentRuleElement.timeWhenTriggered = time.time()
+					# get node id of sensor client
+					ruleNodeId = self.storage.getNodeId(sensorKey[0])
+					if ruleNodeId is None:
+						logging.error("[%s]: Not able to get " % self.fileName
+							+ "node id for sensor to update rule.")
+						continue
 
-						return True
+					# get sensor id of sensor
+					ruleSensorId = self.storage.getSensorId(ruleNodeId,
+						sensorKey[1])
+					if ruleSensorId is None:
+						logging.error("[%s]: Not able to get " % self.fileName
+							+ "sensor id for sensor to update rule.")
+						continue
 
-					elif (element.type == "minute"
-						and element.triggered == True):
+					if not (ruleNodeId, ruleSensorId) in ruleSensorKeys:
+						ruleSensorKeys[(ruleNodeId, ruleSensorId)] = list()
+					if (not sensorKey
+						in ruleSensorKeys[(ruleNodeId, ruleSensorId)]):
+						ruleSensorKeys[(ruleNodeId, ruleSensorId)].append(
+							sensorKey)
+
+		# keep the sensors that are not referenced by any rule
+		# (sensor ids are not reused, so this can not change)
+		for key in self.ruleSensorKeys.keys():
+			if not key in ruleSensorKeys:
+				ruleSensorKeys[key] = self.ruleSensorKeys[key]
+		if not (nodeId, sensorId) in ruleSensorKeys:
+			ruleSensorKeys[(nodeId, sensorId)] = list()
+
+		self.ruleSensorKeys = ruleSensorKeys
+		return self.ruleSensorKeys[(nodeId, sensorId)]
+
+
+	# this internal function updates the values of a rule element of type
+	# "sensor" with a received sensor alert of the sensor it references
+	# (updates the timeWhenTriggered value and sets the rule element
+	# to triggered or not triggered respectively)
+	def _updateSensorRuleElement(self, sensorAlert, ruleElement):
+
+		sensorAlertSensorId = sensorAlert[1]
+		sensorAlertTimeReceived = sensorAlert[3]
+		sensorAlertAlertDelay = sensorAlert[4]
+
+		logging.debug("[%s]: Found match " % self.fileName
+			+ "for sensor with id '%d' and sensor in rule."
+			% sensorAlertSensorId)
+
+		# checked if the received sensor alert
+		# is newer than the stored time when triggered
+		# => update time when triggered
+		if ((sensorAlertTimeReceived + sensorAlertAlertDelay)
+			> ruleElement.timeWhenTriggered):
+
+			# check if an alert delay has to be considered
+			if not ((time.time() - sensorAlertTimeReceived)
+				> sensorAlertAlertDelay):
+
+				logging.debug("[%s]: Sensor alert " % self.fileName
+					+ "for sensor with id '%d' still delayed for "
+					% sensorAlertSensorId
+					+ "'%.2f' seconds."
+					% (sensorAlertAlertDelay
+					- (time.time() - sensorAlertTimeReceived)))
 
-						if not currentRuleElement.triggered:
-							logging.debug("[%s]: Minute rule element from "
-								% self.fileName
-								+ "'%d' to '%d' "
-								% (element.element.start,
-								element.element.end)
-								+ "triggered. Set 'or' rule "
-								+ "also to triggered.")
+				return
 
-							currentRuleElement.triggered = True
-							currentRuleElement.timeWhenTriggered = time.time()
+			logging.debug("[%s]: New sensor " % self.fileName
+				+ "alert for sensor with id '%d' received."
+				% sensorAlertSensorId)
 
-						return True
+			ruleElement.timeWhenTriggered = \
+				sensorAlertTimeReceived + sensorAlertAlertDelay
 
-					elif (element.type == "second"
-						and element.triggered == True):
+			# check if sensor still counts as triggered
+			# => set triggered flag
+			if ((ruleElement.timeWhenTriggered
+				+ ruleElement.timeTriggeredFor)
+				> time.time()):
 
-						if not currentRuleElement.triggered:
-							logging.debug("[%s]: Second rule element from "
-								% self.fileName
-								+ "'%d' to '%d' "
-								% (element.element.start,
-								element.element.end)
-								+ "triggered. Set 'or' rule "
-								+ "also to triggered.")
-
-							currentRuleElement.triggered = True
-							currentRuleElement.timeWhenTriggered = time.time()
-
-						return True
-
-				# if there exists no element that is already triggered
-				# => update rule elements and evaluate them
-				for element in orElement.elements:
-
-					# only update rule elements
-					if element.type == "boolean":
-						if not self._evaluateRuleElementsRecursively(element):
-							return False
-
-						# check if rule element was set to triggered
-						# => if it was, set current rule element
-						# also as triggered (if it was not triggered)
-						# and return
-						if element.triggered:
-
-							if not currentRuleElement.triggered:
-								logging.debug("[%s]: Rule element evaluates "
-									% self.fileName
-									+ "to triggered. Set 'or' rule "
-									+ "also to triggered.")
-
-								currentRuleElement.triggered = True
-								currentRuleElement.timeWhenTriggered = \
-									time.time()
-
-							return True
-
-				# when this point is reached, every element of the "or"
-				# rule is not triggered
-				# => set current element as not triggered (if it was triggered)
-				# and return
-				if currentRuleElement.triggered:
-					logging.debug("[%s]: Each rule element evaluates "
-						% self.fileName
-						+ "to not triggered. Set 'or' rule "
-						+ "also to not triggered.")
-
-					currentRuleElement.triggered = False
+				logging.debug("[%s]: Sensor " % self.fileName
+					+ "with id '%d' counts as triggered."
+					% sensorAlertSensorId)
 
-				return True
+				ruleElement.triggered = True
 
-			# evaluate "not" rule element
-			elif currentRuleElement.element.type == "not":
-
-				notElement = currentRuleElement.element
-
-				element = notElement.elements[0]
-
-				# check if sensor rule element and current not rule element
-				# have the same triggered value
-				# => toggle current not element triggered value
-				if element.type == "sensor":
-					if element.triggered == currentRuleElement.triggered:
-
-						logging.debug("[%s]: Sensor rule element with "
-							% self.fileName
-							+ "remote id '%d' and username '%s' has same "
-							% (element.element.remoteSensorId,
-							element.element.username)
-							+ "triggered value as 'not' rule. "
-							+ "Toggle triggered value of 'not' rule.")
-
-						# toggle current rule element triggered value
-						currentRuleElement.triggered = not element.triggered
-
-					return True
-
-				# check if week day rule element and current not rule element
-				# have the same triggered value
-				# => toggle current not element triggered value
-				elif element.type == "weekday":
-					if element.triggered == currentRuleElement.triggered:
-
-						logging.debug("[%s]: Week day rule element with "
-							% self.fileName
-							+ "value '%d' for '%s' has same "
-							% (element.element.weekday,
-							element.element.time)
-							+ "triggered value as 'not' rule. "
-							+ "Toggle triggered value of 'not' rule.")
-
-						# toggle current rule element triggered value
-						currentRuleElement.triggered = not element.triggered
-
-					return True
-
-				# check if month day rule element and current not rule element
-				# have the same triggered value
-				# => toggle current not element triggered value
-				elif element.type == "monthday":
-					if element.triggered == currentRuleElement.triggered:
-
-						logging.debug("[%s]: Month day rule element with "
-							% self.fileName
-							+ "value '%d' for '%s' has same "
-							% (element.element.monthday,
-							element.element.time)
-							+ "triggered value as 'not' rule. "
-							+ "Toggle triggered value of 'not' rule.")
-
-						# toggle current rule element triggered value
-						currentRuleElement.triggered = not element.triggered
-
-					return True
-
-				# check if hour rule element and current not rule element
-				# have the same triggered value
-				# => toggle current not element triggered value
-				elif element.type == "hour":
-					if element.triggered == currentRuleElement.triggered:
-
-						logging.debug("[%s]: Hour rule element from "
-							% self.fileName
-							+ "'%d' to '%d' for '%s' has same "
-							% (element.element.start,
-							element.element.end,
-							element.element.time)
-							+ "triggered value as 'not' rule. "
-							+ "Toggle triggered value of 'not' rule.")
-
-						# toggle current rule element triggered value
-						currentRuleElement.triggered = not element.triggered
-
-					return True
-
-				# check if minute rule element and current not rule element
-				# have the same triggered value
-				# => toggle current not element triggered value
-				elif element.type == "minute":
-					if element.triggered == currentRuleElement.triggered:
-
-						logging.debug("[%s]: Minute rule element from "
-							% self.fileName
-							+ "'%d' to '%d' has same "
-							% (element.element.start,
-							element.element.end)
-							+ "triggered value as 'not' rule. "
-							+ "Toggle triggered value of 'not' rule.")
-
-						# toggle current rule element triggered value
-						currentRuleElement.triggered = not element.triggered
-
-					return True
-
-				# check if second rule element and current not rule element
-				# have the same triggered value
-				# => toggle current not element triggered value
-				elif element.type == "second":
-					if element.triggered == currentRuleElement.triggered:
-
-						logging.debug("[%s]: Second rule element from "
-							% self.fileName
-							+ "'%d' to '%d' has same "
-							% (element.element.start,
-							element.element.end)
-							+ "triggered value as 'not' rule. "
-							+ "Toggle triggered value of 'not' rule.")
-
-						# toggle current rule element triggered value
-						currentRuleElement.triggered = not element.triggered
-
-					return True
-
-				# check if rule element evaluates to the same triggered value
-				# as the current not rule element
-				# => toggle current not element triggered value
-				elif element.type == "boolean":
-					if not self._evaluateRuleElementsRecursively(element):
-						return False
-
-					# check if rule element was evaluated to the same
-					# triggered value as the not rule element
-					# => toggle current not element triggered value
-					if element.triggered == currentRuleElement.triggered:
-
-						logging.debug("[%s]: Rule element evaluates "
-							% self.fileName
-							+ "to the same triggered value as 'not' rule. "
-							+ "Toggle triggered value of 'not' rule.")
-
-						# toggle current rule element triggered value
-						currentRuleElement.triggered = not element.triggered
-
-					return True
+			# if sensor does not count as triggered
+			# => unset triggered flag
+			else:
 
-				else:
-					logging.error("[%s]: Type of " % self.fileName
-						+ "rule element not valid.")
-					return False
+				logging.debug("[%s]: Sensor " % self.fileName
+				+ "with id '%d' does not count as triggered."
+				% sensorAlertSensorId)
 
-		# if current rule element is not of type "boolean"
-		# => just return
-		else:
-			return True
+				ruleElement.triggered = False
 
 
 	# this internal function updates all rules and their rule elements
@@ -1166,25 +1021,30 @@ class SensorAlertExecuter(threading.Thread):
 			+ "for alert level '%d'." % alertLevel.level)
 
 		# update and evaluate all rules of the alert level
-		for ruleStart in alertLevel.rules:
+		for compiledRule in alertLevel.compiledRules:
 
-			# update all rule values (sets also the sensors as triggered
-			# or not triggered)
-			if not self._updateRuleValuesRecursively(sensorAlertList,
-				ruleStart):
-				logging.error("[%s]: Not able to update " % self.fileName
-					+ "values for rule with order '%d' "
-					% ruleStart.order
-					+ "for alert level '%d'."
-					% alertLevel.level)
-				return False
+			# rule elements that changed since the last evaluation
+			# (sensors that do not count as triggered anymore)
+			changedElements = compiledRule.expireSensorElements()
+
+			# update only the rule elements that reference the sensors
+			# of the received sensor alerts
+			for sensorAlert in sensorAlertList:
+				for sensorKey in self._getRuleSensorKeys(sensorAlert[2],
+					sensorAlert[1]):
+					for ruleElement in compiledRule.getSensorElements(
+						sensorKey):
+						self._updateSensorRuleElement(sensorAlert,
+							ruleElement)
+						compiledRule.updateSensorTimer(ruleElement)
+						changedElements.append(ruleElement)
+
+			# update the rule elements that depend on the time
+			changedElements.extend(compiledRule.updateTimeElements())
 
-			# evaluate all and/or/not rule elements
-			if not self._evaluateRuleElementsRecursively(ruleStart):
-				logging.error("[%s]: Not able to evaluate " % self.fileName
-					+ "rule with order '%d' for alert level '%d'."
-					% (ruleStart.order, alertLevel.level))
-				return False
+			# evaluate only the and/or/not rule elements that
+			# are affected by the changes
+			compiledRule.evaluateBooleanElements(changedElements)
 
 
 		# if more than one rule exists
@@ -1249,6 +1109,15 @@ class SensorAlertExecuter(threading.Thread):
 				sensorAlertList.remove(sensorAlert)
 
 
+		# update the counters of the rules
+		self._updateRuleCounters(alertLevel)
+
+
+	# this internal function updates the counters of the rules of the
+	# given alert level (a triggered rule is added to its counter or
+	# reset if the limit of its counter is reached)
+	def _updateRuleCounters(self, alertLevel):
+
 		# check if the counter is activated and when it is activated
 		# if the counter limit is reached
 		for ruleStart in alertLevel.rules:
@@ -1259,16 +1128,12 @@ class SensorAlertExecuter(threading.Thread):
 
 			# remove all triggered elements from the counter
 			# if the time that they have to wait has passed
-			for counterTimeWhenTriggered in list(ruleStart.counterList):
-				if ((counterTimeWhenTriggered + ruleStart.counterWaitTime)
-					< time.time()):
-
-					logging.debug("[%s]: Counter for rule with order '%d' "
-						% (self.fileName, ruleStart.order)
-						+ "for alert level '%d' has expired. Removing it."
-						% alertLevel.level)
-
-					ruleStart.counterList.remove(counterTimeWhenTriggered)
+			countExpired = ruleStart.counter.expire(time.time())
+			if countExpired != 0:
+				logging.debug("[%s]: %d counter(s) for rule with order '%d' "
+					% (self.fileName, countExpired, ruleStart.order)
+					+ "for alert level '%d' have expired. Removing them."
+					% alertLevel.level)
 
 			# only process counter if the rule is triggered
 			if ruleStart.triggered:
@@ -1276,7 +1141,7 @@ class SensorAlertExecuter(threading.Thread):
 				# check if timeWhenTriggered is already processed in the
 				# counter list
 				# => do nothing
-				if ruleStart.timeWhenTriggered in ruleStart.counterList:
+				if ruleStart.timeWhenTriggered in ruleStart.counter:
 					pass
 
 				# when it is not processed yet
@@ -1285,10 +1150,16 @@ class SensorAlertExecuter(threading.Thread):
 
 					# check if the limit of the counter is not yet reached
 					# => add timeWhenTriggered to the counter list
-					if len(ruleStart.counterList) < ruleStart.counterLimit:
+					if len(ruleStart.counter) < ruleStart.counterLimit:
 
-						ruleStart.counterList.append(
-							ruleStart.timeWhenTriggered)
+						if not ruleStart.counter.add(
+							ruleStart.timeWhenTriggered):
+
+							logging.warning("[%s]: Counter for rule with "
+								% self.fileName
+								+ "order '%d' for alert level '%d' "
+								% (ruleStart.order, alertLevel.level)
+								+ "is full. Removed its oldest element.")
 
 					# when the limit is already reached
 					# => reset the trigger
@@ -1330,67 +1201,6 @@ class SensorAlertExecuter(threading.Thread):
 			return False
 
 
-	# this internal function checks recusrively if a rule element is triggered
-	# and therefore the rule is likely to trigger during the next evaluation
-	def _checkRulesCanTriggerRecursively(self, currentRuleElement):
-
-		# check if rule element is of type "sensor"
-		# => return if it is triggered
-		if currentRuleElement.type == "sensor":
-
-			return currentRuleElement.triggered
-
-		# check if rule element is of type "weekday"
-		# => return if it is triggered
-		elif currentRuleElement.type == "weekday":
-
-			return currentRuleElement.triggered
-
-		# check if rule element is of type "monthday"
-		# => return if it is triggered
-		elif currentRuleElement.type == "monthday":
-
-			return currentRuleElement.triggered
-
-		# check if rule element is of type "hour"
-		# => return if it is triggered
-		elif currentRuleElement.type == "hour":
-
-			return currentRuleElement.triggered
-
-		# check if rule element is of type "minute"
-		# => return if it is triggered
-		elif currentRuleElement.type == "minute":
-
-			return currentRuleElement.triggered
-
-		# check if rule element is of type "second"
-		# => return if it is triggered
-		elif currentRuleElement.type == "second":
-
-			return currentRuleElement.triggered
-
-		# check if rule element is of type "boolean"
-		# => traverse rule recursively
-		elif currentRuleElement.type == "boolean":
-
-			# check all rule elements of the current rule element
-			# if one rule element is triggered => rule can still trigger
-			for ruleElement in currentRuleElement.element.elements:
-
-				if self._checkRulesCanTriggerRecursively(ruleElement):
-					return True
-
-			# when this point is reached, no rule element of the current one
-			# is triggered
-			return False
-
-		else:
-			logging.error("[%s]: Rule element " % self.fileName
-				+ "has an invalid type while checking.")
-			return False
-
-
 	# this internal function checks if a rule is likely to trigger
 	# during the next check (means an element of it counts still as triggered)
 	def _checkRulesCanTrigger(self, sensorAlertList, alertLevel):
@@ -1405,8 +1215,8 @@ class SensorAlertExecuter(threading.Thread):
 
 		# check all rules if they can still trigger
 		# if one of the rules chain can => complete rules chain can trigger
-		for ruleElement in alertLevel.rules:
-			if self._checkRulesCanTriggerRecursively(ruleElement):
+		for compiledRule in alertLevel.compiledRules:
+			if compiledRule.canTrigger():
 				return True
 
 		# when this point is reached, no rule of the rules chain can trigger
@@ -1414,6 +1224,355 @@ class SensorAlertExecuter(threading.Thread):
 		return False
 
 
+	# this internal function gets the next point in time at which a sensor
+	# alert to handle can change without a new received sensor alert
+	# (alert delays, sensors that do not count as triggered anymore,
+	# changed time, rule chain time frames and counters)
+	#
+	# return point in time or None
+	def _getNextDeadline(self, sensorAlertsToHandle,
+		sensorAlertsToHandleWithRules, lastUpdateTime):
+
+		deadlines = list()
+
+		# alert delays of the sensor alerts without rules
+		for sensorAlertToHandle in sensorAlertsToHandle:
+			deadlines.append(sensorAlertToHandle[0][3]
+				+ sensorAlertToHandle[0][4])
+
+		for sensorAlertToHandle in sensorAlertsToHandleWithRules.values():
+			alertLevel = sensorAlertToHandle[1]
+
+			# alert delays of the sensor alerts and the time they are
+			# removed from the list (5 seconds after the alert delay)
+			for sensorAlert in sensorAlertToHandle[0]:
+				deadlines.append(sensorAlert[3] + sensorAlert[4])
+				deadlines.append(sensorAlert[3] + sensorAlert[4] + 5)
+
+			# timers of the rule elements
+			for compiledRule in alertLevel.compiledRules:
+				deadline = compiledRule.getNextDeadline()
+				if not deadline is None:
+					deadlines.append(deadline)
+
+			# a rule that triggered too early after the previous rule
+			# counts again after the minimal time has passed
+			for idx in range(1, len(alertLevel.rules)):
+				deadlines.append(alertLevel.rules[idx - 1].timeWhenTriggered
+					+ alertLevel.rules[idx].minTimeAfterPrev)
+
+			# triggers that are removed from the counters
+			for ruleStart in alertLevel.rules:
+				if not ruleStart.counterActivated:
+					continue
+				nextExpiration = ruleStart.counter.getNextExpiration(
+					lastUpdateTime)
+				if nextExpiration is not None:
+					deadlines.append(nextExpiration)
+
+		# deadlines that were reached before the last update are
+		# already processed
+		nextDeadline = None
+		for deadline in deadlines:
+			if deadline <= lastUpdateTime:
+				continue
+			if nextDeadline is None or deadline < nextDeadline:
+				nextDeadline = deadline
+
+		return nextDeadline
+
+
+	# internal function that gets all sensor alerts from the queue
+	# (and adds them to the journal in the database if it is activated)
+	#
+	# return a list of tuples (sensorAlert, timeQueued) with the sensor
+	# alert a tuple (sensorAlertId, sensorId, nodeId, timeReceived,
+	# alertDelay, state, description, dataJson)
+	def _getQueuedSensorAlerts(self):
+
+		self.sensorAlertQueueLock.acquire()
+		sensorAlertList = self.sensorAlertQueue
+		self.sensorAlertQueue = list()
+		self.sensorAlertQueueLock.release()
+
+		if not self.journalSensorAlerts or not sensorAlertList:
+			return sensorAlertList
+
+		# add all sensor alerts to the journal in one transaction
+		# (if it fails the sensor alerts are only handled in memory)
+		sensorAlertIds = self.storage.addSensorAlertsToJournal(
+			[queuedSensorAlert[0] for queuedSensorAlert in sensorAlertList])
+		if sensorAlertIds is None:
+			logging.error("[%s]: Not able to add sensor " % self.fileName
+				+ "alerts to the journal.")
+			return sensorAlertList
+
+		journaledSensorAlertList = list()
+		for i in range(len(sensorAlertList)):
+			journaledSensorAlertList.append(((sensorAlertIds[i], )
+				+ sensorAlertList[i][0][1:], sensorAlertList[i][1]))
+		self.journaledSensorAlertIds.update(sensorAlertIds)
+
+		return journaledSensorAlertList
+
+
+	# internal function that deletes all sensor alerts from the journal
+	# in the database that are handled (in one transaction)
+	def _deleteHandledSensorAlerts(self, sensorAlertList,
+		sensorAlertsToHandle, sensorAlertsToHandleWithRules):
+
+		if not self.journaledSensorAlertIds:
+			return
+
+		# get the ids of all sensor alerts that are not handled yet
+		notHandledSensorAlertIds = set()
+		for sensorAlert, _ in sensorAlertList:
+			notHandledSensorAlertIds.add(sensorAlert[0])
+		for sensorAlertToHandle in sensorAlertsToHandle:
+			notHandledSensorAlertIds.add(sensorAlertToHandle[0][0])
+		for sensorAlertToHandle in sensorAlertsToHandleWithRules.values():
+			for sensorAlert in sensorAlertToHandle[0]:
+				notHandledSensorAlertIds.add(sensorAlert[0])
+
+		handledSensorAlertIds = (self.journaledSensorAlertIds
+			- notHandledSensorAlertIds)
+		if not handledSensorAlertIds:
+			return
+
+		# sensor alerts that could not be deleted are tried again
+		# the next time
+		if self.storage.deleteSensorAlerts(list(handledSensorAlertIds)):
+			self.journaledSensorAlertIds -= handledSensorAlertIds
+
+
+	# this internal function checks which alert levels are triggered by
+	# a received sensor alert (used as a pre filter) and adds it to the
+	# sensor alerts to handle (or to the sensor alerts to handle of the
+	# alert levels with rules)
+	def _preFilterSensorAlert(self, sensorAlert, timeQueued,
+		isAlertSystemActive, sensorAlertsToHandle,
+		sensorAlertsToHandleWithRules):
+
+		sensorId = sensorAlert[1]
+		state = sensorAlert[5]
+
+		# get all alert levels for this sensor
+		sensorAlertLevels = self.storage.getSensorAlertLevels(sensorId)
+		if not sensorAlertLevels:
+			logging.error("[%s]: No alert levels " % self.fileName
+				+ "for sensor in database. Can not trigger alert.")
+			return
+
+		# get all alert levels that are triggered
+		# because of this sensor alert
+		triggeredAlertLevels = list()
+		for sensorAlertLevel in sensorAlertLevels:
+
+			# ignore alert levels that are not configured
+			if not sensorAlertLevel[0] in self.alertLevelsByLevel:
+				continue
+			configuredAlertLevel = self.alertLevelsByLevel[sensorAlertLevel[0]]
+
+			# check if alert system is active
+			# or alert level triggers always
+			if (not isAlertSystemActive
+				and not configuredAlertLevel.triggerAlways):
+				continue
+
+			# check if the configured alert level
+			# should trigger a sensor alert message
+			# when the sensor goes to state "triggered"
+			# => if not skip configured alert level
+			if (not configuredAlertLevel.triggerAlertTriggered
+				and state == 1):
+				continue
+
+			# check if the configured alert level
+			# should trigger a sensor alert message
+			# when the sensor goes to state "normal"
+			# => if not skip configured alert level
+			if (not configuredAlertLevel.triggerAlertNormal
+				and state == 0):
+				continue
+
+			# split sensor alerts into alerts with rules
+			# (each alert level with a rule is handled
+			# as a single sensor alert and stored
+			# separately by its level)
+			if configuredAlertLevel.rulesActivated:
+
+				# check if an alert level with a rule
+				# is already triggered
+				# => add current sensor alert to it
+				if configuredAlertLevel.level in sensorAlertsToHandleWithRules:
+					sensorAlertsToHandleWithRules[
+						configuredAlertLevel.level][0].append(sensorAlert)
+
+				# if no alert level with a rule was found
+				# => create a new sensor alert with rule
+				# to handle for it
+				else:
+					sensorAlertsToHandleWithRules[configuredAlertLevel.level] = \
+						[ [sensorAlert], configuredAlertLevel ]
+
+			# create a list of sensor alerts to handle
+			# without rules activated
+			else:
+				triggeredAlertLevels.append(configuredAlertLevel)
+
+		# check if an alert level to trigger was found
+		# if not => just ignore it
+		if not triggeredAlertLevels:
+			logging.info("[%s]: No alert level " % self.fileName
+				+ "to trigger was found.")
+
+			# add sensorId of the sensor alert
+			# to the queue for state changes of the
+			# manager update executer
+			if self.managerUpdateExecuter != None:
+				managerStateTuple = (sensorId, state)
+				self.managerUpdateExecuter.queueStateChange.append(
+					managerStateTuple)
+
+		# update alert levels to trigger
+		else:
+
+			# add sensor alert with alert levels
+			# to the list of sensor alerts to handle
+			sensorAlertsToHandle.append( [sensorAlert,
+				triggeredAlertLevels, timeQueued] )
+
+
+	# this internal function updates the statistics with a finished
+	# delivery of a sensor alert
+	# (called by the sender of the client that reported the last result)
+	def _deliveryFinished(self, delivery):
+
+		self.deliveryStatisticsLock.acquire()
+		self.countDeliveries += 1
+		if delivery.countFailed != 0:
+			self.countDeliveriesFailed += 1
+		if delivery.countLate != 0:
+			self.countDeliveriesLate += 1
+		self.sumDeliveryTime += delivery.deliveryTime
+		if delivery.deliveryTime > self.maxDeliveryTime:
+			self.maxDeliveryTime = delivery.deliveryTime
+		self.deliveryStatisticsLock.release()
+
+		if self.metrics is not None:
+			if delivery.countFailed != 0:
+				result = "failed"
+			elif delivery.countLate != 0:
+				result = "late"
+			else:
+				result = "ok"
+			self.metrics.incrementCounter(
+				"alertr_sensor_alert_deliveries_total", (("result", result),))
+			self.metrics.observe("alertr_sensor_alert_delivery_seconds",
+				delivery.deliveryTime)
+
+
+	# this internal function gets the length of the queue of the received
+	# sensor alerts for the metrics
+	#
+	# return list of tuples (labels, value)
+	def _getQueueMetrics(self):
+
+		self.sensorAlertQueueLock.acquire()
+		queueLength = len(self.sensorAlertQueue)
+		self.sensorAlertQueueLock.release()
+
+		return [((), queueLength)]
+
+
+	# this internal function queues a triggered sensor alert for all
+	# alert and manager clients (the senders of the clients deliver it
+	# in parallel and report the result of the delivery; there is one
+	# sender thread per connection and no separate dispatcher pool,
+	# because a connection can not be written by several threads at once)
+	def _dispatchSensorAlert(self, sensorId, state, alertLevels,
+		description, rulesActivated, dataTransfer, data):
+
+		delivery = SensorAlertDelivery(description,
+			self.sensorAlertDeliveryDeadline, self._deliveryFinished)
+
+		if self.metrics is not None:
+			self.metrics.incrementCounter(
+				"alertr_sensor_alerts_dispatched_total",
+				(("rulesactivated", str(rulesActivated).lower()),))
+
+		# all manager clients and the alert clients that handle
+		# one of the alert levels
+		for clientComm in self.sessionRegistry.getSensorAlertClients(
+			alertLevels):
+
+			logging.debug("[%s]: Sending sensor " % self.fileName
+				+ "alert to manager/alert (%s:%d)."
+				% (clientComm.clientAddress, clientComm.clientPort))
+
+			# queue sensor alert for the manager/alert node
+			# to not block the sensor alert executer
+			delivery.addRecipient()
+			if not clientComm.asyncSender.queueSensorAlert(sensorId, state,
+				alertLevels, description, rulesActivated, dataTransfer,
+				data, delivery):
+				delivery.reportResult(clientComm, False)
+
+		delivery.close()
+
+
+	# this internal function wakes up the thread
+	# (sensor alert queue lock has to be acquired by the caller)
+	def _wakeUp(self):
+
+		if self.wakeupPending:
+			return
+
+		self.wakeupPending = True
+		try:
+			os.write(self.wakeupPipeWrite, "x")
+		except OSError as e:
+			if e.errno != errno.EAGAIN:
+				raise
+
+
+	# this internal function waits until the thread is woken up
+	# or the timeout is reached (None waits without a timeout)
+	def _waitForWakeUp(self, timeout):
+
+		try:
+			select.select([self.wakeupPipeRead], [], [], timeout)
+		except select.error as e:
+			# a signal interrupted the wait => the loop waits again
+			if e[0] != errno.EINTR:
+				raise
+
+		self.sensorAlertQueueLock.acquire()
+		try:
+			os.read(self.wakeupPipeRead, 4096)
+		except OSError as e:
+			if e.errno != errno.EAGAIN:
+				raise
+		self.wakeupPending = False
+		self.sensorAlertQueueLock.release()
+
+
+	# adds a received sensor alert to the queue of the sensor alert
+	# executer and wakes it up
+	# (sensor alert is a tuple (sensorAlertId, sensorId, nodeId,
+	# timeReceived, alertDelay, state, description, dataJson))
+	def addSensorAlert(self, sensorAlert):
+
+		self.sensorAlertQueueLock.acquire()
+		self.sensorAlertQueue.append((sensorAlert, time.time()))
+		self._wakeUp()
+		self.sensorAlertQueueLock.release()
+
+		if self.metrics is not None:
+			self.metrics.incrementCounter(
+				"alertr_sensor_alerts_received_total")
+
+
 	# this function starts the endless loop of the alert executer thread
 	def run(self):
 
@@ -1421,9 +1580,28 @@ class SensorAlertExecuter(threading.Thread):
 		# that have to be handled
 		sensorAlertsToHandle = list()
 
-		# create an empty list for sensor alerts
+		# create an empty dictionary for sensor alerts
 		# that have to be handled and which alert levels have rules
-		sensorAlertsToHandleWithRules = list()
+		# (key: level of the alert level;
+		# value: list [sensorAlertList, alertLevel])
+		sensorAlertsToHandleWithRules = dict()
+
+		# get all sensor alerts from the journal in the database that
+		# were not handled before the server was stopped
+		# list is a list of tuples (sensorAlert, timeQueued) with the
+		# sensor alert a tuple (sensorAlertId, sensorId, nodeId,
+		# timeReceived, alertDelay, state, description, dataJson)
+		receivedSensorAlerts = list()
+		if self.journalSensorAlerts:
+			journaledSensorAlertList = self.storage.getSensorAlerts()
+			if journaledSensorAlertList is None:
+				logging.error("[%s]: Not able to get sensor " % self.fileName
+					+ "alerts from the journal.")
+			else:
+				for sensorAlert in journaledSensorAlertList:
+					receivedSensorAlerts.append((tuple(sensorAlert),
+						time.time()))
+					self.journaledSensorAlertIds.add(sensorAlert[0])
 
 		while 1:
 
@@ -1437,142 +1615,50 @@ class SensorAlertExecuter(threading.Thread):
 				self.managerUpdateExecuter = \
 					self.globalData.managerUpdateExecuter
 
-			# get a list of all sensor alerts from database
-			# list is a list of tuples (sensorAlertId, sensorId, nodeId,
-			# timeReceived, alertDelay, state, description, dataJson)
-			sensorAlertList = self.storage.getSensorAlerts()
+			# get all received sensor alerts from the queue
+			receivedSensorAlerts.extend(self._getQueuedSensorAlerts())
 
-			# check if no sensor alerts are to handle and exist in database
+			# delete all sensor alerts from the journal
+			# that were handled since the last run
+			self._deleteHandledSensorAlerts(receivedSensorAlerts,
+				sensorAlertsToHandle, sensorAlertsToHandleWithRules)
+
+			# check if no sensor alerts are to handle and were received
 			if (not sensorAlertsToHandle
 				and not sensorAlertsToHandleWithRules
-				and not sensorAlertList):
-					
-				self.sensorAlertEvent.wait()
-				self.sensorAlertEvent.clear()
+				and not receivedSensorAlerts):
+
+				self._waitForWakeUp(None)
 				continue
 
 			# get the flag if the system is active or not
+			# (once for the received sensor alerts and
+			# the sensor alerts to handle)
 			isAlertSystemActive = self.storage.isAlertSystemActive()
 
-			# check if sensor alerts from the database
-			# have to be handled
-			for sensorAlert in sensorAlertList:
-				sensorAlertId = sensorAlert[0]
-				sensorId = sensorAlert[1]
-				state = sensorAlert[5]
-
-				# delete sensor alert from the database
-				self.storage.deleteSensorAlert(sensorAlertId)
-
-				# get all alert levels for this sensor
-				sensorAlertLevels = self.storage.getSensorAlertLevels(sensorId)
-				if sensorAlertLevels is None:
-					logging.error("[%s]: No alert levels " % self.fileName
-						+ "for sensor in database. Can not trigger alert.")
-					continue
+			# check if received sensor alerts have to be handled
+			if receivedSensorAlerts:
+				for sensorAlert, timeQueued in receivedSensorAlerts:
+					self._preFilterSensorAlert(sensorAlert, timeQueued,
+						isAlertSystemActive, sensorAlertsToHandle,
+						sensorAlertsToHandleWithRules)
 
-				# get all alert levels that are triggered
-				# because of this sensor alert (used as a pre filter)
-				triggeredAlertLevels = list()
-				for configuredAlertLevel in self.alertLevels:
-					for sensorAlertLevel in sensorAlertLevels:
-						if (configuredAlertLevel.level == 
-							sensorAlertLevel[0]):
-							# check if alert system is active
-							# or alert level triggers always
-							if (isAlertSystemActive 
-								or configuredAlertLevel.triggerAlways):
-
-								# check if the configured alert level
-								# should trigger a sensor alert message
-								# when the sensor goes to state "triggered"
-								# => if not skip configured alert level
-								if (not
-									configuredAlertLevel.triggerAlertTriggered
-									and state == 1):
-									continue
-
-								# check if the configured alert level
-								# should trigger a sensor alert message
-								# when the sensor goes to state "normal"
-								# => if not skip configured alert level
-								if (not configuredAlertLevel.triggerAlertNormal
-									and state == 0):
-									continue
-
-								# split sensor alerts into alerts with rules
-								# (each alert level with a rule is handled
-								# as a single sensor alert and appended
-								# into a separate list)
-								if configuredAlertLevel.rulesActivated:
-
-									# check if an alert level with a rule
-									# is already triggered
-									# => add current sensor alert to it
-									found = False
-									for alertWithRule in \
-										sensorAlertsToHandleWithRules:
-
-										if (configuredAlertLevel ==
-											alertWithRule[1]):
-
-											alertWithRule[0].append(
-												sensorAlert)
-
-											found = True
-											break
-
-									# if no alert level with a rule was found
-									# => create a new sensor alert with rule
-									# to handle for it
-									if not found:
-										sensorAlertsToHandleWithRules.append(
-											[ [sensorAlert],
-											configuredAlertLevel] )
-
-								# create a list of sensor alerts to handle
-								# without rules activated
-								else:
-									triggeredAlertLevels.append(
-										configuredAlertLevel)
-
-				# check if an alert level to trigger was found
-				# if not => just ignore it
-				if not triggeredAlertLevels:
-					logging.info("[%s]: No alert level " % self.fileName
-						+ "to trigger was found.")	
-
-					# add sensorId of the sensor alert
-					# to the queue for state changes of the
-					# manager update executer
-					if self.managerUpdateExecuter != None:
-						managerStateTuple = (sensorId, state)
-						self.managerUpdateExecuter.queueStateChange.append(
-							managerStateTuple)
-
-					continue
-
-				# update alert levels to trigger
-				else:
+				# all received sensor alerts are processed
+				receivedSensorAlerts = list()
 
-					# add sensor alert with alert levels
-					# to the list of sensor alerts to handle
-					sensorAlertsToHandle.append( [sensorAlert,
-						triggeredAlertLevels] )
-
-			# wake up manager update executer 
-			# => state change will be transmitted
-			# (because it is in the queue)
-			if self.managerUpdateExecuter != None:
-				self.managerUpdateExecuter.managerUpdateEvent.set()
+				# wake up manager update executer
+				# => state change will be transmitted
+				# (because it is in the queue)
+				if self.managerUpdateExecuter != None:
+					self.managerUpdateExecuter.managerUpdateEvent.set()
 
 			# when no sensor alerts exist to handle => restart loop
 			if (not sensorAlertsToHandle
 				and not sensorAlertsToHandleWithRules):
 				continue
 
-			# get the flag if the system is active or not
-			isAlertSystemActive = self.storage.isAlertSystemActive()
+			# the point in time the sensor alerts to handle are updated
+			lastUpdateTime = time.time()
 
 			# check all sensor alerts to handle if they have to be triggered
 			for sensorAlertToHandle in list(sensorAlertsToHandle):
@@ -1581,7 +1667,6 @@ class SensorAlertExecuter(threading.Thread):
 				nodeId = sensorAlertToHandle[0][2]
 				timeReceived = sensorAlertToHandle[0][3]
 				alertDelay = sensorAlertToHandle[0][4]
-				state = self.storage.getSensorState(sensorId)
 				description = sensorAlertToHandle[0][6]
 
 				# get json data string and convert it
@@ -1602,16 +1687,12 @@ class SensorAlertExecuter(threading.Thread):
 				# get all alert levels that are triggered
 				# because of this sensor alert
 				triggeredAlertLevels = list()
-				for configuredAlertLevel in self.alertLevels:
-					for sensorAlertLevel in sensorAlertToHandle[1]:
-						if (configuredAlertLevel.level == 
-							sensorAlertLevel.level):
-							# check if alert system is active
-							# or alert level triggers always
-							if (isAlertSystemActive 
-								or configuredAlertLevel.triggerAlways):
-								triggeredAlertLevels.append(
-									configuredAlertLevel)
+				for sensorAlertLevel in sensorAlertToHandle[1]:
+					# check if alert system is active
+					# or alert level triggers always
+					if (isAlertSystemActive
+						or sensorAlertLevel.triggerAlways):
+						triggeredAlertLevels.append(sensorAlertLevel)
 
 				# check if an alert level to trigger remains
 				# if not => just remove sensor alert to handle from the list
@@ -1630,6 +1711,10 @@ class SensorAlertExecuter(threading.Thread):
 				# check if sensor alert has triggered
 				if (time.time() - timeReceived) > alertDelay:
 
+					# get the current state of the sensor
+					# (only needed when the sensor alert is sent)
+					state = self.storage.getSensorState(sensorId)
+
 					# check if one of the triggered alert levels
 					# has email notification (smtpAlert) activated
 					# => send email alert (to all of the alert levels)
@@ -1655,42 +1740,16 @@ class SensorAlertExecuter(threading.Thread):
 					for triggeredAlertLevel in triggeredAlertLevels:
 						intListAlertLevel.append(triggeredAlertLevel.level)
 
+					if self.metrics is not None:
+						self.metrics.observe(
+							"alertr_sensor_alert_dispatch_latency_seconds",
+							max(time.time() - sensorAlertToHandle[2]
+							- alertDelay, 0.0))
+
 					# send sensor alert to all manager and alert clients
-					for serverSession in self.serverSessions:
-						# ignore sessions which do not exist yet
-						# and that are not managers
-						if serverSession.clientComm == None:
-							continue
-						if (serverSession.clientComm.nodeType != "manager"
-							and serverSession.clientComm.nodeType != "alert"):
-							continue
-						if not serverSession.clientComm.clientInitialized:
-							continue
-
-						# sending sensor alert to manager/alert node
-						# via a thread to not block the sensor alert executer
-						sensorAlertProcess = AsynchronousSender(
-							self.globalData, serverSession.clientComm)
-						# set thread to daemon
-						# => threads terminates when main thread terminates	
-						sensorAlertProcess.daemon = True
-						sensorAlertProcess.sendSensorAlert = True
-						sensorAlertProcess.sensorAlertRulesActivated = False
-						sensorAlertProcess.sensorAlertSensorId = sensorId
-						sensorAlertProcess.sensorAlertState = state
-						sensorAlertProcess.sensorAlertAlertLevels = \
-							intListAlertLevel
-						sensorAlertProcess.sensorAlertSensorDescription = \
-							description
-						sensorAlertProcess.sensorAlertDataTransfer = \
-							dataTransfer
-						sensorAlertProcess.sensorAlertData = data
-
-						logging.debug("[%s]: Sending sensor " % self.fileName
-							+ "alert to manager/alert (%s:%d)."
-							% (serverSession.clientComm.clientAddress,
-							serverSession.clientComm.clientPort))
-						sensorAlertProcess.start()
+					self._dispatchSensorAlert(sensorId, state,
+						intListAlertLevel, description, False,
+						dataTransfer, data)
 
 					# after sensor alert was triggered
 					# => remove sensor alert to handle
@@ -1699,7 +1758,7 @@ class SensorAlertExecuter(threading.Thread):
 
 			# check all sensor alerts to handle with alert levels that have
 			# rules if they have to be triggered
-			for sensorAlertToHandle in list(sensorAlertsToHandleWithRules):
+			for sensorAlertToHandle in sensorAlertsToHandleWithRules.values():
 
 				sensorAlertList = sensorAlertToHandle[0]
 				alertLevel = sensorAlertToHandle[1]
@@ -1725,44 +1784,14 @@ class SensorAlertExecuter(threading.Thread):
 							alertLevel.name, time.time(), alertLevel.toAddr)
 
 					# send sensor alert to all manager and alert clients
-					for serverSession in self.serverSessions:
-						# ignore sessions which do not exist yet
-						# and that are not managers
-						if serverSession.clientComm == None:
-							continue
-						if (serverSession.clientComm.nodeType != "manager"
-							and serverSession.clientComm.nodeType != "alert"):
-							continue
-						if not serverSession.clientComm.clientInitialized:
-							continue
-
-						# sending sensor alert to manager/alert node
-						# via a thread to not block the sensor alert executer
-						sensorAlertProcess = AsynchronousSender(
-							self.globalData, serverSession.clientComm)
-						# set thread to daemon
-						# => threads terminates when main thread terminates	
-						sensorAlertProcess.daemon = True
-						sensorAlertProcess.sendSensorAlert = True
-						sensorAlertProcess.sensorAlertRulesActivated = True
-						sensorAlertProcess.sensorAlertAlertLevels = \
-							[alertLevel.level]
-
-						sensorAlertProcess.sensorAlertSensorDescription = \
-							"Rule of Alert Level: '%s'" % alertLevel.name
-
-						sensorAlertProcess.sensorAlertDataTransfer = False
-						sensorAlertProcess.sensorAlertData = None
-
-						logging.debug("[%s]: Sending sensor " % self.fileName
-							+ "alert to manager/alert (%s:%d)."
-							% (serverSession.clientComm.clientAddress,
-							serverSession.clientComm.clientPort))
-						sensorAlertProcess.start()
+					self._dispatchSensorAlert(None, None,
+						[alertLevel.level],
+						"Rule of Alert Level: '%s'" % alertLevel.name,
+						True, False, None)
 
 					# remove sensor alert to handle from list
 					# after it has triggered
-					sensorAlertsToHandleWithRules.remove(sensorAlertToHandle)
+					del sensorAlertsToHandleWithRules[alertLevel.level]
 
 				# if rule chain did not evaluate to triggered
 				# => check if it is likely that it can trigger during the
@@ -1777,13 +1806,22 @@ class SensorAlertExecuter(threading.Thread):
 
 						# remove sensor alert to handle from list
 						# when it can not trigger at the current state
-						sensorAlertsToHandleWithRules.remove(
-							sensorAlertToHandle)
-
-			time.sleep(0.5)
+						del sensorAlertsToHandleWithRules[alertLevel.level]
+
+			# wait until a new sensor alert is received or the next
+			# point in time at which a sensor alert to handle can change
+			nextDeadline = self._getNextDeadline(sensorAlertsToHandle,
+				sensorAlertsToHandleWithRules, lastUpdateTime)
+			if nextDeadline is None:
+				self._waitForWakeUp(None)
+			else:
+				self._waitForWakeUp(max(nextDeadline - time.time(), 0))
 
 
 	# sets the exit flag to shut down the thread
 	def exit(self):
 		self.exitFlag = True
+		self.sensorAlertQueueLock.acquire()
+		self._wakeUp()
+		self.sensorAlertQueueLock.release()
 		return
\ No newline at end of file
@@ -9,6 +9,7 @@
 
 import os
 import threading
+from sessionRegistry import SessionRegistry
 
 
 # this class is a global configuration class that holds 
@@ -29,8 +30,8 @@ class GlobalData:
 		# the instance of this server
 		self.instance = "server"
 
-		# list of all sessions that are handled by the server
-		self.serverSessions = list()
+		# registry of all sessions that are handled by the server
+		self.sessionRegistry = SessionRegistry()
 
 		# instance of the storage backend
 		self.storage = None
@@ -44,6 +45,13 @@ class GlobalData:
 		# instance of the thread that handles manager updates
 		self.managerUpdateExecuter = None
 
+		# instance of the thread that checks the connections for timeouts
+		self.connectionWatchdog = None
+
+		# instance of the versioned snapshot of the alert system
+		# information that is sent to the manager clients
+		self.managerStatus = None
+
 		# this is the time in seconds when the client times out
 		self.connectionTimeout = 60
 
@@ -51,6 +59,14 @@ class GlobalData:
 		# are sent updates of the clients (at least)
 		self.managerUpdateInterval = 60.0
 
+		# this is the time in seconds in which state changes are collected
+		# before they are sent together to the manager clients
+		self.stateChangeWindow = 0.5
+
+		# sets if received sensor alerts are written to the journal
+		# in the database until they are handled
+		self.journalSensorAlerts = True
+
 		# path to the configuration file of the client
 		self.configFile = os.path.dirname(os.path.abspath(__file__)) \
 			+ "/../config/config.xml"
@@ -59,6 +75,10 @@ class GlobalData:
 		self.userBackendCsvFile = os.path.dirname(os.path.abspath(__file__)) \
 			+ "/../config/users.csv"
 
+		# interval in seconds in which the csv user credentials file is
+		# checked for changes and reloaded (0 disables the reloading)
+		self.userBackendCsvReloadInterval = 5.0
+
 		# path to the sqlite database file (if sqlite is used as backend)
 		self.storageBackendSqliteFile = os.path.dirname(os.path.abspath(
 			__file__)) + "/../config/database.db"
@@ -75,15 +95,93 @@ class GlobalData:
 		# path to CA that is used to authenticate clients
 		self.clientCAFile = None
 
+		# the cipher preferences of the server (in the openssl
+		# cipher list format; None uses the default ciphers of openssl)
+		self.serverCiphers = None
+
+		# the ssl context that is used for all connections of the server
+		self.serverSSLContext = None
+
 		# instance of the email alerting object
 		self.smtpAlert = None
 
+		# the registry of the metrics of the server
+		# (None if the metrics are not activated)
+		self.metrics = None
+
+		# the tracer that records the timing spans of the server
+		# (None if tracing is not activated)
+		self.tracer = None
+
+		# maximum number of eMails that can be queued before
+		# new eMails are dropped
+		self.smtpQueueSize = 1000
+
+		# time in seconds after a sensor alert eMail was sent in which
+		# further sensor alert eMails for the same address are collected
+		# and sent as one digest eMail (0 disables the digests)
+		self.smtpDigestInterval = 30.0
+
+		# time in seconds to wait before an eMail that could not be sent
+		# is retried (doubled after each failure up to the maximum)
+		# and the number of attempts before an eMail is dropped
+		self.smtpRetryInterval = 5.0
+		self.smtpMaxRetryInterval = 300.0
+		self.smtpMaxAttempts = 10
+
+		# time in seconds after which an unused connection to the
+		# smtp server is closed
+		self.smtpIdleTimeout = 60.0
+
+		# time out in seconds of the operations on the smtp server
+		self.smtpTimeout = 30.0
+
+		# number of attempts and time in seconds the still queued eMails
+		# are tried to be sent when the server shuts down
+		self.smtpExitAttempts = 2
+		self.smtpExitTimeout = 30.0
+
 		# a list of all alert leves that are configured on this server
 		self.alertLevels = list()
 
+		# all alert levels that are configured on this server
+		# indexed by their level (key: level; value: alert level)
+		self.alertLevelsByLevel = dict()
+
 		# time the server is waiting on receives until a time out occurs
 		self.serverReceiveTimeout = 20.0
 
+		# number of worker threads of the event driven server that handle
+		# the communication with the clients after the ssl handshake
+		# (each one blocks while a client sends a message, so this many
+		# slow clients can be handled at the same time without stalling
+		# the other sessions; can be set with the attribute "workers"
+		# of the server element in the configuration)
+		self.eventDrivenWorkers = 8
+
+		# time in seconds a worker thread of the event driven server
+		# waits on each message of a client before the session is closed
+		# (limits the time a slow or hostile client blocks a worker thread,
+		# has to be lower than the 3 seconds the clients wait on the
+		# responses of the server, because a client can wait this long
+		# for a free worker thread)
+		self.eventDrivenReceiveTimeout = 2.0
+
+		# maximum number of messages that can be queued for a client
+		# before messages are dropped (or state changes are replaced
+		# by a full status update)
+		self.senderQueueSize = 1000
+
+		# maximum number of elements that are stored in the counter
+		# of a rule (a greater counter limit of a rule is rejected
+		# when the configuration is parsed)
+		self.ruleCounterMaxSize = 10000
+
+		# time in seconds in which a triggered sensor alert should be
+		# delivered to each alert and manager client (deliveries that
+		# take longer are logged as late)
+		self.sensorAlertDeliveryDeadline = 5.0
+
 		# list and lock of/for the asynchronous option executer
 		self.asyncOptionExecutersLock = threading.BoundedSemaphore(1)
 		self.asyncOptionExecuters = list()
\ No newline at end of file
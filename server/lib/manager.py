@@ -12,7 +12,380 @@ import os
 import time
 import logging
 import collections
-from server import AsynchronousSender
+
+
+# this class holds a versioned snapshot of the alert system information
+# that is sent to the manager clients (every entity stores the version in
+# which it was changed for the last time, so the changes since a version
+# that a manager client already has can be sent instead of all data)
+class ManagerStatus:
+
+	def __init__(self, globalData):
+
+		# file nme of this file (used for logging)
+		self.fileName = os.path.basename(__file__)
+
+		# get global configured data
+		self.globalData = globalData
+		self.storage = self.globalData.storage
+		self.alertLevels = self.globalData.alertLevels
+
+		# lock that is used to access the snapshot
+		self.statusLock = threading.Lock()
+
+		# lock that serializes the updates of the snapshot (held while
+		# the information is read from the database, so an older
+		# information is never applied after a newer one)
+		self.updateLock = threading.Lock()
+
+		# current version of the snapshot (0 means no snapshot exists yet)
+		self.version = 0
+
+		# oldest version from which on a delta can be generated
+		# (older versions need a full status update because the
+		# information about removed entities was discarded)
+		self.oldestDeltaVersion = 0
+
+		# maximum number of removed entities that are remembered
+		# before a full status update is needed for older versions
+		self.maxRemovedCount = 1000
+
+		# the key that identifies an entity of the given type
+		self.entityKeys = {"options": "type",
+			"nodes": "nodeId",
+			"sensors": "sensorId",
+			"managers": "managerId",
+			"alerts": "alertId",
+			"alertLevels": "alertLevel"}
+
+		# dict of entity type => dict of key => [version, entity]
+		self.entities = dict()
+
+		# dict of entity type => dict of key => version in which
+		# the entity was removed
+		self.removed = dict()
+
+		for entityType in self.entityKeys.keys():
+			self.entities[entityType] = dict()
+			self.removed[entityType] = dict()
+
+		# fields of the entities that change with every status message
+		# of a client and therefore do not count as a change (they are
+		# kept up to date and the time of the last status message of the
+		# sensors is sent in a compact list with every delta)
+		# (dict of entity type => set of fields)
+		self.volatileFields = {"sensors": set(["lastStateUpdated"])}
+
+
+	# internal function that gets the current information of the
+	# alert system as a dict of entity type => list of entities
+	def _getAlertSystemInformation(self):
+
+		# get a list from database of 
+		# list[0] = optionCount
+		# list[1] = list(tuples of (type, value))
+		# list[2] = nodeCount
+		# list[3] = list(tuples of (nodeId, hostname, nodeType, instance,
+		# connected, version, rev))
+		# list[4] = sensorCount
+		# list[5] = list(tuples of (nodeId, sensorId, alertDelay,
+		# description, lastStateUpdated, state))
+		# list[6] = managerCount
+		# list[7] = list(tuples of (nodeId, managerId, description))
+		# list[8] = alertCount
+		# list[9] = list(tuples of (nodeId, alertId, description))
+		# list[10] = list(tuples of (sensorId, alertLevel))
+		# list[11] = list(tuples of (alertId, alertLevel))
+		alertSystemInformation = self.storage.getAlertSystemInformation()
+		if alertSystemInformation == None:
+			logging.error("[%s]: Getting alert system " % self.fileName
+				+ "information from database failed.")
+
+			return None
+		optionCount = alertSystemInformation[0]
+		optionsInformation = alertSystemInformation[1]
+		nodeCount = alertSystemInformation[2]
+		nodesInformation = alertSystemInformation[3]
+		sensorCount = alertSystemInformation[4]
+		sensorsInformation = alertSystemInformation[5]
+		managerCount = alertSystemInformation[6]
+		managersInformation = alertSystemInformation[7]
+		alertCount = alertSystemInformation[8]
+		alertsInformation = alertSystemInformation[9]
+		sensorsAlertLevels = alertSystemInformation[10]
+		alertsAlertLevels = alertSystemInformation[11]
+
+		# create dicts of sensorId/alertId => list of alert levels
+		sensorsAlertLevelsDict = dict()
+		for sensorAlertLevelTuple in sensorsAlertLevels:
+			sensorId = sensorAlertLevelTuple[0]
+			if not sensorId in sensorsAlertLevelsDict:
+				sensorsAlertLevelsDict[sensorId] = list()
+			sensorsAlertLevelsDict[sensorId].append(sensorAlertLevelTuple[1])
+
+		alertsAlertLevelsDict = dict()
+		for alertAlertLevelTuple in alertsAlertLevels:
+			alertId = alertAlertLevelTuple[0]
+			if not alertId in alertsAlertLevelsDict:
+				alertsAlertLevelsDict[alertId] = list()
+			alertsAlertLevelsDict[alertId].append(alertAlertLevelTuple[1])
+
+		# generating options list
+		options = list()
+		for i in range(optionCount):
+			tempDict = {"type": optionsInformation[i][0],
+				"value": optionsInformation[i][1]}
+			options.append(tempDict)
+
+		# generating nodes list
+		nodes = list()
+		for i in range(nodeCount):
+			tempDict = {"nodeId": nodesInformation[i][0],
+				"hostname": nodesInformation[i][1],
+				"nodeType": nodesInformation[i][2],
+				"instance": nodesInformation[i][3],
+				"connected": nodesInformation[i][4],
+				"version": nodesInformation[i][5],
+				"rev": nodesInformation[i][6]}
+			nodes.append(tempDict)
+
+		# generating sensors list
+		sensors = list()
+		for i in range(sensorCount):
+
+			sensorId = sensorsInformation[i][1]
+
+			# get list of alert levels of this sensor
+			alertLevels = list()
+			if sensorId in sensorsAlertLevelsDict:
+				alertLevels = sensorsAlertLevelsDict[sensorId]
+
+			tempDict = {"nodeId": sensorsInformation[i][0],
+				"sensorId": sensorId,
+				"alertDelay": sensorsInformation[i][2],
+				"alertLevels": alertLevels,
+				"description": sensorsInformation[i][3],
+				"lastStateUpdated": sensorsInformation[i][4],
+				"state": sensorsInformation[i][5]}
+			sensors.append(tempDict)
+
+		# generating managers list
+		managers = list()
+		for i in range(managerCount):
+			tempDict = {"nodeId": managersInformation[i][0],
+				"managerId": managersInformation[i][1],
+				"description": managersInformation[i][2]}
+			managers.append(tempDict)
+
+		# generating alerts list
+		alerts = list()
+		for i in range(alertCount):
+
+			alertId = alertsInformation[i][1]
+
+			# get list of alert levels of this alert
+			alertLevels = list()
+			if alertId in alertsAlertLevelsDict:
+				alertLevels = alertsAlertLevelsDict[alertId]
+
+			tempDict = {"nodeId": alertsInformation[i][0],
+				"alertId": alertId,
+				"alertLevels": alertLevels,
+				"description": alertsInformation[i][2]}
+			alerts.append(tempDict)
+
+		# generating alertLevels list
+		alertLevels = list()
+		for i in range(len(self.alertLevels)):
+
+			tempDict = {"alertLevel": self.alertLevels[i].level,
+				"name": self.alertLevels[i].name,
+				"triggerAlways": (1 if self.alertLevels[i].triggerAlways
+				else 0),
+				"smtpActivated": (1 if self.alertLevels[i].smtpActivated
+				else 0),
+				"toAddr": self.alertLevels[i].toAddr,
+				"rulesActivated": self.alertLevels[i].rulesActivated}
+			alertLevels.append(tempDict)
+
+		return {"options": options,
+			"nodes": nodes,
+			"sensors": sensors,
+			"managers": managers,
+			"alerts": alerts,
+			"alertLevels": alertLevels}
+
+
+	# internal function that checks if the given entities only differ
+	# in the fields that do not count as a change
+	#
+	# return True or False
+	def _differOnlyInVolatileFields(self, entityType, oldEntity, newEntity):
+
+		if not entityType in self.volatileFields:
+			return False
+		volatileFields = self.volatileFields[entityType]
+
+		if len(oldEntity) != len(newEntity):
+			return False
+
+		for field in newEntity.keys():
+			if field in volatileFields:
+				continue
+			if not field in oldEntity or oldEntity[field] != newEntity[field]:
+				return False
+
+		return True
+
+
+	# function that updates the snapshot with the current information
+	# of the alert system and returns the version of the snapshot
+	# (or None if it failed)
+	def update(self):
+
+		# the information is read and applied while the update lock
+		# is held (also released if reading the information fails)
+		self.updateLock.acquire()
+		try:
+			return self._updateSnapshot()
+		finally:
+			self.updateLock.release()
+
+
+	# internal function that updates the snapshot with the current
+	# information of the alert system
+	# (update lock has to be acquired by the caller)
+	def _updateSnapshot(self):
+
+		alertSystemInformation = self._getAlertSystemInformation()
+		if alertSystemInformation is None:
+			return None
+
+		self.statusLock.acquire()
+
+		newVersion = self.version + 1
+		changed = False
+
+		for entityType in self.entityKeys.keys():
+			entityKey = self.entityKeys[entityType]
+			entities = self.entities[entityType]
+			removed = self.removed[entityType]
+
+			# add new and changed entities
+			currentKeys = set()
+			for entity in alertSystemInformation[entityType]:
+				key = entity[entityKey]
+				currentKeys.add(key)
+
+				if key in entities:
+					if entities[key][1] == entity:
+						continue
+
+					# keep the entity up to date without a new version
+					if self._differOnlyInVolatileFields(entityType,
+						entities[key][1], entity):
+						entities[key][1] = entity
+						continue
+
+				entities[key] = [newVersion, entity]
+				if key in removed:
+					del removed[key]
+				changed = True
+
+			# remember removed entities
+			for key in entities.keys():
+				if key in currentKeys:
+					continue
+
+				del entities[key]
+				removed[key] = newVersion
+				changed = True
+
+		if changed:
+			self.version = newVersion
+
+		# discard the information about removed entities if too many
+		# are remembered (managers with an older version than the current
+		# one will get a full status update)
+		removedCount = 0
+		for entityType in self.removed.keys():
+			removedCount += len(self.removed[entityType])
+		if removedCount > self.maxRemovedCount:
+			for entityType in self.removed.keys():
+				self.removed[entityType] = dict()
+			self.oldestDeltaVersion = self.version
+
+		version = self.version
+
+		self.statusLock.release()
+
+		return version
+
+
+	# function that returns a tuple of (version, status) with all entities
+	# (status is a dict of entity type => list of entities)
+	def getFullStatus(self):
+
+		self.statusLock.acquire()
+
+		status = dict()
+		for entityType in self.entities.keys():
+			status[entityType] = list()
+			for versionEntity in self.entities[entityType].values():
+				status[entityType].append(versionEntity[1])
+
+		version = self.version
+
+		self.statusLock.release()
+
+		return (version, status)
+
+
+	# function that returns a tuple of
+	# (version, status, removed, sensorsLastStateUpdated) with
+	# all entities that were changed after the given version
+	# (status is a dict of entity type => list of changed entities,
+	# removed is a dict of entity type => list of keys of removed entities,
+	# sensorsLastStateUpdated is a list of [sensorId, lastStateUpdated]
+	# of all sensors that were not changed)
+	# or None if the changes can not be generated for the given version
+	def getDeltaStatus(self, baseVersion):
+
+		self.statusLock.acquire()
+
+		if (baseVersion < self.oldestDeltaVersion
+			or baseVersion > self.version):
+			self.statusLock.release()
+			return None
+
+		status = dict()
+		removed = dict()
+		for entityType in self.entities.keys():
+			status[entityType] = list()
+			for versionEntity in self.entities[entityType].values():
+				if versionEntity[0] > baseVersion:
+					status[entityType].append(versionEntity[1])
+
+			removed[entityType] = list()
+			for key, version in self.removed[entityType].items():
+				if version > baseVersion:
+					removed[entityType].append(key)
+
+		# the time of the last status message of a sensor does not
+		# create a new version, so it is sent for all sensors that
+		# are not in the changed entities
+		sensorsLastStateUpdated = list()
+		for versionEntity in self.entities["sensors"].values():
+			if versionEntity[0] <= baseVersion:
+				sensorsLastStateUpdated.append([
+					versionEntity[1]["sensorId"],
+					versionEntity[1]["lastStateUpdated"]])
+
+		version = self.version
+
+		self.statusLock.release()
+
+		return (version, status, removed, sensorsLastStateUpdated)
 
 
 # this class is woken up if a sensor alert or state change is received
@@ -24,9 +397,11 @@ class ManagerUpdateExecuter(threading.Thread):
 
 		# get global configured data
 		self.globalData = globalData
-		self.serverSessions = self.globalData.serverSessions
+		self.sessionRegistry = self.globalData.sessionRegistry
 		self.managerUpdateInterval = self.globalData.managerUpdateInterval
+		self.stateChangeWindow = self.globalData.stateChangeWindow
 		self.storage = self.globalData.storage
+		self.managerStatus = self.globalData.managerStatus
 
 		# file nme of this file (used for logging)
 		self.fileName = os.path.basename(__file__)
@@ -51,6 +426,32 @@ class ManagerUpdateExecuter(threading.Thread):
 		# that should be sent to the manager clients
 		self.queueStateChange = collections.deque()
 
+		# the metrics of the server (None if they are not activated)
+		self.metrics = self.globalData.metrics
+		if self.metrics is not None:
+			self.metrics.registerCounter("alertr_manager_updates_total",
+				"Updates queued for all manager clients by type.")
+			self.metrics.registerCounter(
+				"alertr_manager_state_changes_total",
+				"Sensor state changes sent to the manager clients "
+				+ "(after only keeping the newest state of a sensor).")
+			self.metrics.registerHistogram(
+				"alertr_manager_snapshot_update_seconds",
+				"Time of updating the snapshot of the alert system "
+				+ "information for the manager clients.")
+			self.metrics.registerCallback(
+				"alertr_manager_state_change_queue_length", "gauge",
+				"Sensor state changes that are not sent yet.",
+				self._getQueueMetrics)
+
+
+	# this internal function gets the length of the state change queue
+	# for the metrics
+	#
+	# return list of tuples (labels, value)
+	def _getQueueMetrics(self):
+		return [((), len(self.queueStateChange))]
+
 
 	def run(self):
 
@@ -84,64 +485,68 @@ class ManagerUpdateExecuter(threading.Thread):
 
 				# empty current state queue
 				# (because the state changes are also transmitted
-				# during the full state update)
+				# during the full state update; has to be done before
+				# the snapshot is updated, otherwise state changes that
+				# occur in between are neither in the snapshot nor sent)
 				self.queueStateChange.clear()
 
-				for serverSession in self.serverSessions:
-					# ignore sessions which do not exist yet
-					# and that are not managers
-					if serverSession.clientComm == None:
-						continue
-					if serverSession.clientComm.nodeType != "manager":
-						continue
-					if not serverSession.clientComm.clientInitialized:
-						continue
+				# update the snapshot of the alert system information
+				# that is sent to the manager clients
+				updateStartTime = time.time()
+				if self.managerStatus.update() is None:
+					logging.error("[%s]: Updating alert system " % self.fileName
+						+ "snapshot failed.")
+
+				if self.metrics is not None:
+					self.metrics.observe(
+						"alertr_manager_snapshot_update_seconds",
+						time.time() - updateStartTime)
+					self.metrics.incrementCounter(
+						"alertr_manager_updates_total", (("type", "status"),))
+
+				for clientComm in self.sessionRegistry.getClientsByNodeType(
+					"manager"):
 
-					# sending status update to manager via a thread
+					# queue status update for the manager
 					# to not block the manager update executer
-					statusUpdateProcess = AsynchronousSender(self.globalData,
-						serverSession.clientComm)
-					# set thread to daemon
-					# => threads terminates when main thread terminates	
-					statusUpdateProcess.daemon = True
-					statusUpdateProcess.sendManagerUpdate = True
-					statusUpdateProcess.start()
+					clientComm.asyncSender.queueManagerUpdate()
 
 				# if status update was sent to manager clients
 				# => ignore state changes (because they are also covered
 				# by a status update)
 				continue
 
-			# if status change queue is not empty
-			# => send status changes to manager clients
+			# if status change queue is empty
+			# => nothing to send
+			if len(self.queueStateChange) == 0:
+				continue
+
+			# wait for further state changes during the configured
+			# window to send them together to the manager clients
+			if self.stateChangeWindow > 0:
+				time.sleep(self.stateChangeWindow)
+
+			# collect the state changes (only the newest state of each
+			# sensor is sent)
+			stateChanges = dict()
 			while len(self.queueStateChange) != 0:
 				managerStateTuple = self.queueStateChange.popleft()
-				sensorId = managerStateTuple[0]
-				state = managerStateTuple[1]
+				stateChanges[managerStateTuple[0]] = managerStateTuple[1]
+			stateChanges = stateChanges.items()
 
-				for serverSession in self.serverSessions:
-					# ignore sessions which do not exist yet
-					# and that are not managers
-					if serverSession.clientComm == None:
-						continue
-					if serverSession.clientComm.nodeType != "manager":
-						continue
-					if not serverSession.clientComm.clientInitialized:
-						continue
+			if self.metrics is not None:
+				self.metrics.incrementCounter("alertr_manager_updates_total",
+					(("type", "statechange"),))
+				self.metrics.incrementCounter(
+					"alertr_manager_state_changes_total",
+					value=len(stateChanges))
 
-					# sending status update to manager via a thread
-					# to not block the manager update executer
-					stateChangeProcess = AsynchronousSender(self.globalData,
-						serverSession.clientComm)
-					# set thread to daemon
-					# => threads terminates when main thread terminates	
-					stateChangeProcess.daemon = True
-					stateChangeProcess.sendManagerStateChange = True
-					stateChangeProcess.sendManagerStateChangeSensorId \
-						= sensorId
-					stateChangeProcess.sendManagerStateChangeState \
-						= state
-					stateChangeProcess.start()
+			for clientComm in self.sessionRegistry.getClientsByNodeType(
+				"manager"):
+
+				# queue state changes for the manager
+				# to not block the manager update executer
+				clientComm.asyncSender.queueManagerStateChanges(stateChanges)
 
 
 	# sets the exit flag to shut down the thread
@@ -0,0 +1,276 @@
+#!/usr/bin/python2
+
+# written by sqall
+# twitter: https://twitter.com/sqall01
+# blog: http://blog.h4des.org
+# github: https://github.com/sqall01
+#
+# Licensed under the GNU Public License, version 2.
+
+import threading
+import logging
+import os
+import bisect
+import BaseHTTPServer
+
+
+# upper bounds in seconds of the buckets of the histograms
+DEFAULTBUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+	0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+# this class stores the metrics of the server (counters, gauges and
+# histograms) and renders them in the prometheus text format
+# (labels are given as tuples of (labelName, labelValue) tuples)
+class MetricsRegistry:
+
+	def __init__(self):
+
+		# file nme of this file (used for logging)
+		self.fileName = os.path.basename(__file__)
+
+		# lock that makes the registry thread safe
+		self.lock = threading.Lock()
+
+		# type and help text of all metrics
+		# (key: name; value: tuple (type, helpText))
+		self.descriptions = dict()
+
+		# values of the counters (key: tuple (name, labels); value: value)
+		self.counters = dict()
+
+		# values of the histograms (key: tuple (name, labels); value:
+		# list [bucketCounts, sum, count] with the not cumulative
+		# counts of the buckets and the count above the last bucket)
+		self.histograms = dict()
+
+		# functions that are called when the metrics are rendered
+		# (list of tuples (name, function) with the function returning
+		# a list of tuples (labels, value))
+		self.callbacks = list()
+
+
+	# internal function that formats the labels of a metric
+	def _formatLabels(self, labels):
+
+		if not labels:
+			return ""
+
+		return "{%s}" % ",".join(["%s=\"%s\"" % (labelName,
+			str(labelValue).replace("\\", "\\\\").replace("\"", "\\\"")
+			.replace("\n", "\\n")) for labelName, labelValue in labels])
+
+
+	# internal function that formats a value of a metric
+	def _formatValue(self, value):
+
+		if isinstance(value, float):
+			return repr(value)
+		return str(value)
+
+
+	# internal function that adds the type and help text of a metric
+	# if it is not described yet
+	# (lock has to be acquired by the caller)
+	def _describe(self, name, metricType, helpText):
+
+		if name not in self.descriptions or helpText is not None:
+			self.descriptions[name] = (metricType, helpText)
+
+
+	# describes a counter
+	def registerCounter(self, name, helpText):
+
+		self.lock.acquire()
+		self._describe(name, "counter", helpText)
+		self.lock.release()
+
+
+	# describes a histogram
+	def registerHistogram(self, name, helpText):
+
+		self.lock.acquire()
+		self._describe(name, "histogram", helpText)
+		self.lock.release()
+
+
+	# registers a function that gets the values of a metric when it is
+	# rendered (used for gauges and for counters that are kept by the
+	# components themselves)
+	def registerCallback(self, name, metricType, helpText, function):
+
+		self.lock.acquire()
+		self._describe(name, metricType, helpText)
+		self.callbacks.append((name, function))
+		self.lock.release()
+
+
+	# increments a counter
+	def incrementCounter(self, name, labels=(), value=1):
+
+		self.lock.acquire()
+		if name not in self.descriptions:
+			self._describe(name, "counter", None)
+		key = (name, labels)
+		if key in self.counters:
+			self.counters[key] += value
+		else:
+			self.counters[key] = value
+		self.lock.release()
+
+
+	# adds an observed value (in seconds) to a histogram
+	def observe(self, name, value, labels=()):
+
+		bucketIndex = bisect.bisect_left(DEFAULTBUCKETS, value)
+
+		self.lock.acquire()
+		if name not in self.descriptions:
+			self._describe(name, "histogram", None)
+		key = (name, labels)
+		if key in self.histograms:
+			histogram = self.histograms[key]
+		else:
+			histogram = [[0] * (len(DEFAULTBUCKETS) + 1), 0.0, 0]
+			self.histograms[key] = histogram
+		histogram[0][bucketIndex] += 1
+		histogram[1] += value
+		histogram[2] += 1
+		self.lock.release()
+
+
+	# renders all metrics in the prometheus text format
+	#
+	# return string
+	def getText(self):
+
+		# get the values of the metrics that are kept by the components
+		# (outside of the lock because the functions can acquire
+		# locks of the components)
+		self.lock.acquire()
+		callbacks = list(self.callbacks)
+		self.lock.release()
+
+		callbackValues = dict()
+		for name, function in callbacks:
+			try:
+				values = function()
+			except Exception as e:
+				logging.exception("[%s]: Not able to get the values "
+					% self.fileName
+					+ "of metric '%s'." % name)
+				continue
+			callbackValues.setdefault(name, list()).extend(values)
+
+		self.lock.acquire()
+
+		# collect the lines of each metric
+		# (key: name; value: list of lines)
+		lines = dict()
+		for name, values in callbackValues.items():
+			for labels, value in values:
+				lines.setdefault(name, list()).append("%s%s %s"
+					% (name, self._formatLabels(labels),
+					self._formatValue(value)))
+
+		for key, value in self.counters.items():
+			lines.setdefault(key[0], list()).append("%s%s %s"
+				% (key[0], self._formatLabels(key[1]),
+				self._formatValue(value)))
+
+		for key, histogram in self.histograms.items():
+			name = key[0]
+			labels = key[1]
+			cumulativeCount = 0
+			for idx in range(len(DEFAULTBUCKETS)):
+				cumulativeCount += histogram[0][idx]
+				lines.setdefault(name, list()).append("%s_bucket%s %d"
+					% (name, self._formatLabels(labels
+					+ (("le", repr(DEFAULTBUCKETS[idx])),)),
+					cumulativeCount))
+			lines[name].append("%s_bucket%s %d"
+				% (name, self._formatLabels(labels + (("le", "+Inf"),)),
+				histogram[2]))
+			lines[name].append("%s_sum%s %s"
+				% (name, self._formatLabels(labels), repr(histogram[1])))
+			lines[name].append("%s_count%s %d"
+				% (name, self._formatLabels(labels), histogram[2]))
+
+		descriptions = dict(self.descriptions)
+
+		self.lock.release()
+
+		output = list()
+		for name in sorted(lines.keys()):
+			metricType, helpText = descriptions[name]
+			if helpText is not None:
+				output.append("# HELP %s %s" % (name, helpText))
+			output.append("# TYPE %s %s" % (name, metricType))
+			output.extend(lines[name])
+
+		return "\n".join(output) + "\n"
+
+
+# this class handles the requests to the metrics endpoint
+class MetricsRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+	def do_GET(self):
+
+		if self.path.split("?")[0] not in ["/", "/metrics"]:
+			self.send_error(404)
+			return
+
+		try:
+			body = self.server.metrics.getText()
+		except Exception as e:
+			logging.exception("[%s]: Not able to render metrics."
+				% os.path.basename(__file__))
+			self.send_error(500)
+			return
+
+		self.send_response(200)
+		self.send_header("Content-Type", "text/plain; version=0.0.4")
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+
+	# log the requests only in debug mode
+	def log_message(self, format, *args):
+
+		logging.debug("[%s]: Metrics request from %s: %s"
+			% (os.path.basename(__file__), self.client_address[0],
+			format % args))
+
+
+# this class is a http server that exports the metrics in the
+# prometheus text format
+class MetricsServer(threading.Thread):
+
+	def __init__(self, globalData, host, port):
+		threading.Thread.__init__(self)
+
+		# file nme of this file (used for logging)
+		self.fileName = os.path.basename(__file__)
+
+		# get global configured data
+		self.globalData = globalData
+
+		self.httpServer = BaseHTTPServer.HTTPServer((host, port),
+			MetricsRequestHandler)
+		self.httpServer.metrics = self.globalData.metrics
+
+
+	def run(self):
+
+		logging.info("[%s]: Exporting metrics on %s:%d."
+			% (self.fileName, self.httpServer.server_address[0],
+			self.httpServer.server_address[1]))
+
+		self.httpServer.serve_forever()
+
+
+	# shuts down the http server
+	def exit(self):
+		self.httpServer.shutdown()
+		return
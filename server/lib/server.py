@@ -11,14 +11,25 @@ import ssl
 import socket
 import threading
 import SocketServer
+import select
+import errno
 import time
 import logging
 import os
 import base64
 import random
 import json
+import collections
+import struct
+import fcntl
+import Queue
+from timerHeap import TimerHeap
 BUFSIZE = 16384
 
+# maximum size of a message in the framed protocol
+# (a larger length prefix is treated as a protocol error)
+MAXMESSAGESIZE = 67108864
+
 
 # this class handles the communication with the incoming client connection
 class ClientCommunication:
@@ -33,14 +44,18 @@ class ClientCommunication:
 		self.serverVersion = self.globalData.version
 		self.serverRev = self.globalData.rev
 		self.storage = self.globalData.storage
+		self.metrics = self.globalData.metrics
+		self.tracer = self.globalData.tracer
 		self.userBackend = self.globalData.userBackend
 		self.sensorAlertExecuter = self.globalData.sensorAlertExecuter
 		self.managerUpdateExecuter = self.globalData.managerUpdateExecuter
 		self.alertLevels = self.globalData.alertLevels
+		self.alertLevelsByLevel = self.globalData.alertLevelsByLevel
 		self.asyncOptionExecuters = self.globalData.asyncOptionExecuters
 		self.asyncOptionExecutersLock \
 			= self.globalData.asyncOptionExecutersLock
-		self.serverSessions = self.globalData.serverSessions
+		self.sessionRegistry = self.globalData.sessionRegistry
+		self.managerStatus = self.globalData.managerStatus
 
 		# time the last message was received by the server
 		self.lastRecv = 0.0
@@ -71,6 +86,10 @@ class ClientCommunication:
 		# (only set if the client is of the type "sensor")
 		self.sensorCount = 0
 
+		# alert levels of all alerts that are managed by the client
+		# (only set if the client is of the type "alert")
+		self.clientAlertLevels = set()
+
 		# this lock is used to only allow one thread to use the communication
 		self.connectionLock = threading.BoundedSemaphore(1)
 
@@ -81,16 +100,53 @@ class ClientCommunication:
 		# time the server is waiting on receives until a time out occurs
 		self.serverReceiveTimeout = self.globalData.serverReceiveTimeout
 
+		# time in seconds in which a message has to be received completely
+		# (None if only the timeout of each receive applies; set by the
+		# worker threads of the event driven server while they hold the
+		# lock, so a client that sends its message slowly in small parts
+		# can not block them longer)
+		self.messageReceiveTimeout = None
+
 		# flag that states if the server is already trying to initiate a
 		# transaction with the client
 		self.transactionInitiation = False
 
+		# the thread that sends all queued messages to the client
+		# (only used for manager and alert clients)
+		self.asyncSender = None
+
+		# version of the alert system information the manager client
+		# acknowledged last (None if a full status update has to be sent)
+		self.managerStatusVersion = None
+
+		# flag that states if the manager client was not able to
+		# apply a status update because of a version gap
+		self.managerStatusVersionGap = False
+
+		# flag that states if the framed protocol is used with the client
+		# (each message is prefixed by its length, negotiated during the
+		# authentication, old clients send each message with one send)
+		self.framedProtocol = False
+
+		# data received from the client that does not form
+		# a complete message yet (only used by the framed protocol)
+		self.recvBuffer = bytearray()
+
 
 	# internal function that acquires the lock
 	def _acquireLock(self):
 		logging.debug("[%s]: Acquire lock (%s:%d)." % (self.fileName,
 			self.clientAddress, self.clientPort))
-		self.connectionLock.acquire()
+
+		if self.tracer is None:
+			self.connectionLock.acquire()
+
+		# only trace the waiting time if the lock is not free
+		elif not self.connectionLock.acquire(False):
+			startTime = time.time()
+			self.connectionLock.acquire()
+			self.tracer.addSpan("connectionLock wait", startTime,
+				time.time() - startTime, self.nodeType)
 
 
 	# internal function that releases the lock
@@ -100,6 +156,20 @@ class ClientCommunication:
 		self.connectionLock.release()
 
 
+	# internal function that calls the handler of a received message
+	# (inside a span if tracing is activated)
+	def _callHandler(self, handler, message):
+
+		if self.tracer is None:
+			return handler(message)
+
+		self.tracer.startSpan(handler.__name__, self.nodeType)
+		try:
+			return handler(message)
+		finally:
+			self.tracer.endSpan()
+
+
 	# this internal function cleans up the session before releasing the
 	# lock and exiting/closing the session
 	def _cleanUpSessionForClosing(self):
@@ -107,6 +177,13 @@ class ClientCommunication:
 		# the client is finished as false
 		self.clientInitialized = False
 
+		# remove the client from the indexes of the session registry
+		self.sessionRegistry.unregisterClient(self)
+
+		# stop the thread that sends the queued messages
+		if self.asyncSender is not None:
+			self.asyncSender.exit()
+
 		# mark node as not connected
 		self.storage.markNodeAsNotConnected(self.nodeId)
 
@@ -115,6 +192,74 @@ class ClientCommunication:
 		self.managerUpdateExecuter.managerUpdateEvent.set()
 
 
+	# internal function that sends a message to the client
+	def _sendMessage(self, message):
+
+		data = json.dumps(message)
+
+		if self.framedProtocol:
+			self.sslSocket.sendall(struct.pack("!I", len(data)) + data)
+		else:
+			self.sslSocket.send(data)
+
+
+	# internal function that removes the next complete message from
+	# the receive buffer (only used by the framed protocol)
+	#
+	# return data of the message or None
+	def _getBufferedMessage(self):
+
+		if len(self.recvBuffer) < 4:
+			return None
+
+		messageSize = struct.unpack("!I", str(self.recvBuffer[:4]))[0]
+		if messageSize > MAXMESSAGESIZE:
+			raise ValueError("Message size %d exceeds maximum."
+				% messageSize)
+
+		if len(self.recvBuffer) < (4 + messageSize):
+			return None
+
+		data = str(self.recvBuffer[4:(4 + messageSize)])
+		del self.recvBuffer[:(4 + messageSize)]
+
+		return data
+
+
+	# internal function that receives the next message from the client
+	# (blocks until the timeout of the socket)
+	#
+	# return data of the message or an empty string if the
+	# connection was closed
+	def _recvMessageData(self):
+
+		if not self.framedProtocol:
+			return self.sslSocket.recv(BUFSIZE).strip()
+
+		if self.messageReceiveTimeout is not None:
+			deadline = time.time() + self.messageReceiveTimeout
+
+		while True:
+
+			data = self._getBufferedMessage()
+			if data is not None:
+				return data
+
+			# only wait until the message has to be received completely
+			if self.messageReceiveTimeout is not None:
+				timeout = deadline - time.time()
+				if timeout <= 0.0:
+					raise socket.timeout("Message was not received "
+						+ "completely in time.")
+				self.sslSocket.settimeout(min(timeout,
+					self.serverReceiveTimeout))
+
+			data = self.sslSocket.recv(BUFSIZE)
+			if not data:
+				return ""
+			self.recvBuffer.extend(data)
+
+
 	# this internal function that tries to initiate a transaction with
 	# the client (and acquires a lock if it is told to do so)
 	def _initiateTransaction(self, messageType, acquireLock=False):
@@ -176,7 +321,7 @@ class ClientCommunication:
 				payload = {"type": "rts", "id": transactionId}
 				message = {"serverTime": int(time.time()),
 					"message": messageType, "payload": payload}
-				self.sslSocket.send(json.dumps(message))
+				self._sendMessage(message)
 
 			except Exception as e:
 				logging.exception("[%s]: Sending RTS " % self.fileName
@@ -199,7 +344,7 @@ class ClientCommunication:
 
 			try:
 
-				data = self.sslSocket.recv(BUFSIZE).strip()
+				data = self._recvMessageData()
 				message = json.loads(data)
 
 				# check if an error was received
@@ -276,7 +421,7 @@ class ClientCommunication:
 		# get version and credentials from client
 		try:
 
-			data = self.sslSocket.recv(BUFSIZE).strip()
+			data = self._recvMessageData()
 			message = json.loads(data)
 			# check if an error was received
 			if "error" in message.keys():
@@ -303,7 +448,7 @@ class ClientCommunication:
 					message = {"serverTime": int(time.time()), 
 						"message": message["message"],
 						"error": "authentication message expected"}
-					self.sslSocket.send(json.dumps(message))
+					self._sendMessage(message)
 				except Exception as e:
 					pass
 
@@ -319,7 +464,7 @@ class ClientCommunication:
 					message = {"serverTime": int(time.time()),
 						"message": message["message"],
 						"error": "request expected"}
-					self.sslSocket.send(json.dumps(message))
+					self._sendMessage(message)
 				except Exception as e:
 					pass
 
@@ -335,7 +480,7 @@ class ClientCommunication:
 				message = {"serverTime": int(time.time()),
 					"message": message["message"],
 					"error": "message not valid"}
-				self.sslSocket.send(json.dumps(message))
+				self._sendMessage(message)
 			except Exception as e:
 				pass
 
@@ -361,7 +506,7 @@ class ClientCommunication:
 					message = {"serverTime": int(time.time()),
 						"message": message["message"],
 						"error": "version not compatible"}
-					self.sslSocket.send(json.dumps(message))
+					self._sendMessage(message)
 				except Exception as e:
 					pass
 
@@ -377,7 +522,7 @@ class ClientCommunication:
 				message = {"serverTime": int(time.time()),
 					"message": message["message"],
 					"error": "version not valid"}
-				self.sslSocket.send(json.dumps(message))
+				self._sendMessage(message)
 			except Exception as e:
 				pass
 
@@ -387,6 +532,14 @@ class ClientCommunication:
 			% (self.fileName, self.clientVersion, self.clientRev,
 			self.clientAddress, self.clientPort))
 
+		# check if the client wants to use the framed protocol
+		# (older clients do not request it)
+		useFramedProtocol = False
+		if ("framing" in message["payload"].keys()
+			and str(message["payload"]["framing"]).upper()
+			== "LENGTHPREFIX"):
+			useFramedProtocol = True
+
 		# get user credentials
 		try:
 
@@ -403,7 +556,7 @@ class ClientCommunication:
 				message = {"serverTime": int(time.time()),
 					"message": message["message"],
 					"error": "no user credentials"}
-				self.sslSocket.send(json.dumps(message))
+				self._sendMessage(message)
 			except Exception as e:
 				pass
 
@@ -415,32 +568,33 @@ class ClientCommunication:
 
 		# check if username is already in use
 		# => terminate connection
-		for serverSession in self.serverSessions:
+		if not self.sessionRegistry.claimUsername(self, self.username):
 
-			# ignore THIS server session and not existing once
-			if (serverSession.clientComm is None
-				or serverSession.clientComm == self):
-				continue
+			logging.error("[%s]: Username already in use (%s:%d)." 
+			% (self.fileName, self.clientAddress, self.clientPort))
 
-			if serverSession.clientComm.username == self.username:
+			# send error message back
+			try:
+				message = {"serverTime": int(time.time()),
+					"message": message["message"],
+					"error": "username already in use"}
+				self._sendMessage(message)
+			except Exception as e:
+				pass
 
-				logging.error("[%s]: Username already in use (%s:%d)." 
-				% (self.fileName, self.clientAddress, self.clientPort))
+			return False
 
-				# send error message back
-				try:
-					message = {"serverTime": int(time.time()),
-						"message": message["message"],
-						"error": "username already in use"}
-					self.sslSocket.send(json.dumps(message))
-				except Exception as e:
-					pass
+		# check if the given user credentials are valid
+		authenticationStartTime = time.time()
+		credentialsValid = self.userBackend.areUserCredentialsValid(
+			self.username, password)
 
-				return False
+		if self.metrics is not None:
+			self.metrics.observe("alertr_authentication_seconds",
+				time.time() - authenticationStartTime,
+				(("result", str(credentialsValid).lower()),))
 
-		# check if the given user credentials are valid
-		if not self.userBackend.areUserCredentialsValid(self.username,
-			password):
+		if not credentialsValid:
 
 			logging.error("[%s]: Invalid user credentials " % self.fileName
 				+ "(%s:%d)." % (self.clientAddress, self.clientPort))
@@ -450,7 +604,7 @@ class ClientCommunication:
 				message = {"serverTime": int(time.time()),
 					"message": message["message"],
 					"error": "invalid user credentials"}
-				self.sslSocket.send(json.dumps(message))
+				self._sendMessage(message)
 			except Exception as e:
 				pass
 
@@ -463,9 +617,15 @@ class ClientCommunication:
 				"result": "ok",
 				"version": self.serverVersion,
 				"rev" : self.serverRev}
+
+			# acknowledge the framed protocol
+			# (used for all messages after this response)
+			if useFramedProtocol:
+				payload["framing"] = "lengthprefix"
+
 			message = {"serverTime": int(time.time()),
 				"message": "authentication", "payload": payload}
-			self.sslSocket.send(json.dumps(message))
+			self._sendMessage(message)
 
 		except Exception as e:
 			logging.exception("[%s]: Sending authentication response "
@@ -473,6 +633,11 @@ class ClientCommunication:
 				+ "failed (%s:%d)." % (self.clientAddress, self.clientPort))
 			return False
 
+		self.framedProtocol = useFramedProtocol
+		if self.framedProtocol:
+			logging.debug("[%s]: Using framed protocol (%s:%d)."
+				% (self.fileName, self.clientAddress, self.clientPort))
+
 		return True
 
 
@@ -483,7 +648,7 @@ class ClientCommunication:
 		# get registration from client
 		try:
 
-			data = self.sslSocket.recv(BUFSIZE).strip()
+			data = self._recvMessageData()
 			message = json.loads(data)
 			# check if an error was received
 			if "error" in message.keys():
@@ -510,7 +675,7 @@ class ClientCommunication:
 					message = {"serverTime": int(time.time()),
 						"message": message["message"],
 						"error": "registration message expected"}
-					self.sslSocket.send(json.dumps(message))
+					self._sendMessage(message)
 				except Exception as e:
 					pass
 
@@ -526,7 +691,7 @@ class ClientCommunication:
 					message = {"serverTime": int(time.time()),
 						"message": message["message"],
 						"error": "request expected"}
-					self.sslSocket.send(json.dumps(message))
+					self._sendMessage(message)
 				except Exception as e:
 					pass
 
@@ -542,7 +707,7 @@ class ClientCommunication:
 				message = {"serverTime": int(time.time()),
 					"message": message["message"],
 					"error": "message not valid"}
-				self.sslSocket.send(json.dumps(message))
+				self._sendMessage(message)
 			except Exception as e:
 				pass
 
@@ -564,7 +729,7 @@ class ClientCommunication:
 				message = {"serverTime": int(time.time()),
 					"message": message["message"],
 					"error": "registration message not valid"}
-				self.sslSocket.send(json.dumps(message))
+				self._sendMessage(message)
 			except Exception as e:
 				pass
 
@@ -583,7 +748,7 @@ class ClientCommunication:
 				message = {"serverTime": int(time.time()),
 					"message": message["message"],
 					"error": "invalid node type or instance"}
-				self.sslSocket.send(json.dumps(message))
+				self._sendMessage(message)
 			except Exception as e:
 				pass
 
@@ -604,7 +769,7 @@ class ClientCommunication:
 				message = {"serverTime": int(time.time()),
 					"message": message["message"],
 					"error": "unable to add node to database"}
-				self.sslSocket.send(json.dumps(message))
+				self._sendMessage(message)
 			except Exception as e:
 				pass
 
@@ -625,7 +790,7 @@ class ClientCommunication:
 						message = {"serverTime": int(time.time()),
 							"message": message["message"],
 							"error": "sensors not of type list"}
-						self.sslSocket.send(json.dumps(message))
+						self._sendMessage(message)
 					except Exception as e:
 						pass
 
@@ -640,7 +805,7 @@ class ClientCommunication:
 					message = {"serverTime": int(time.time()),
 						"message": message["message"],
 						"error": "no sensors in message"}
-					self.sslSocket.send(json.dumps(message))
+					self._sendMessage(message)
 				except Exception as e:
 					pass
 
@@ -667,7 +832,7 @@ class ClientCommunication:
 							message = {"serverTime": int(time.time()),
 								"message": message["message"],
 								"error": "alertLevels not of type list"}
-							self.sslSocket.send(json.dumps(message))
+							self._sendMessage(message)
 						except Exception as e:
 							pass
 
@@ -680,7 +845,7 @@ class ClientCommunication:
 							message = {"serverTime": int(time.time()),
 								"message": message["message"],
 								"error": "alertLevels items not of type int"}
-							self.sslSocket.send(json.dumps(message))
+							self._sendMessage(message)
 						except Exception as e:
 							pass
 
@@ -697,7 +862,7 @@ class ClientCommunication:
 						message = {"serverTime": int(time.time()),
 							"message": message["message"],
 							"error": "sensor data invalid"}
-						self.sslSocket.send(json.dumps(message))
+						self._sendMessage(message)
 					except Exception as e:
 						pass
 
@@ -714,11 +879,7 @@ class ClientCommunication:
 						self.clientAddress, self.clientPort))
 
 					# check if alert level is configured on server
-					found = False
-					for configuredAlertLevel in self.alertLevels:
-						if tempAlertLevel == configuredAlertLevel.level:
-							found = True
-					if not found:
+					if not tempAlertLevel in self.alertLevelsByLevel:
 						logging.error("[%s]: Alert level does " % self.fileName
 							+ "not exist in configuration (%s:%d)."
 							% (self.clientAddress, self.clientPort))
@@ -728,7 +889,7 @@ class ClientCommunication:
 							message = {"serverTime": int(time.time()),
 								"message": message["message"],
 								"error": "alert level does not exist"}
-							self.sslSocket.send(json.dumps(message))
+							self._sendMessage(message)
 						except Exception as e:
 							pass
 
@@ -745,7 +906,7 @@ class ClientCommunication:
 					message = {"serverTime": int(time.time()),
 						"message": message["message"],
 						"error": "unable to add sensors to database"}
-					self.sslSocket.send(json.dumps(message))
+					self._sendMessage(message)
 				except Exception as e:
 					pass
 
@@ -766,7 +927,7 @@ class ClientCommunication:
 						message = {"serverTime": int(time.time()),
 							"message": message["message"],
 							"error": "alerts not of type list"}
-						self.sslSocket.send(json.dumps(message))
+						self._sendMessage(message)
 					except Exception as e:
 						pass
 
@@ -783,7 +944,7 @@ class ClientCommunication:
 					message = {"serverTime": int(time.time()),
 						"message": message["message"],
 						"error": "no alerts in message"}
-					self.sslSocket.send(json.dumps(message))
+					self._sendMessage(message)
 				except Exception as e:
 					pass
 
@@ -810,7 +971,7 @@ class ClientCommunication:
 							message = {"serverTime": int(time.time()),
 								"message": message["message"],
 								"error": "alertLevels not of type list"}
-							self.sslSocket.send(json.dumps(message))
+							self._sendMessage(message)
 						except Exception as e:
 							pass
 
@@ -823,21 +984,15 @@ class ClientCommunication:
 							message = {"serverTime": int(time.time()),
 								"message": message["message"],
 								"error": "alertLevels items not of type int"}
-							self.sslSocket.send(json.dumps(message))
+							self._sendMessage(message)
 						except Exception as e:
 							pass
 
 						return False
 
 					# check if alert level is configured on server
-					found = False
 					for recvAlertLevel in alertLevels:
-						for confAlertLevel in self.alertLevels:
-							if recvAlertLevel == confAlertLevel.level:
-								found = True
-								break
-
-						if not found:
+						if not recvAlertLevel in self.alertLevelsByLevel:
 							logging.error("[%s]: Alert level %d does " 
 								% (self.fileName, recvAlertLevel)
 								+ "not exist in configuration (%s:%d)."
@@ -848,12 +1003,14 @@ class ClientCommunication:
 								message = {"serverTime": int(time.time()),
 									"message": message["message"],
 									"error": "alert level does not exist"}
-								self.sslSocket.send(json.dumps(message))
+								self._sendMessage(message)
 							except Exception as e:
 								pass
 
 							return False
 
+					self.clientAlertLevels.update(alertLevels)
+
 				except Exception as e:
 					logging.exception("[%s]: Alert data " % self.fileName
 						+ "invalid (%s:%d)." % (self.clientAddress,
@@ -864,7 +1021,7 @@ class ClientCommunication:
 						message = {"serverTime": int(time.time()),
 							"message": message["message"],
 							"error": "alert data invalid"}
-						self.sslSocket.send(json.dumps(message))
+						self._sendMessage(message)
 					except Exception as e:
 						pass
 
@@ -886,7 +1043,7 @@ class ClientCommunication:
 					message = {"serverTime": int(time.time()),
 						"message": message["message"],
 						"error": "unable to add alerts to database"}
-					self.sslSocket.send(json.dumps(message))
+					self._sendMessage(message)
 				except Exception as e:
 					pass
 
@@ -906,7 +1063,7 @@ class ClientCommunication:
 						message = {"serverTime": int(time.time()),
 							"message": message["message"],
 							"error": "manager not of type dict"}
-						self.sslSocket.send(json.dumps(message))
+						self._sendMessage(message)
 					except Exception as e:
 						pass
 
@@ -921,7 +1078,7 @@ class ClientCommunication:
 					message = {"serverTime": int(time.time()),
 						"message": message["message"],
 						"error": "no manager in message"}
-					self.sslSocket.send(json.dumps(message))
+					self._sendMessage(message)
 				except Exception as e:
 					pass
 
@@ -940,7 +1097,7 @@ class ClientCommunication:
 					message = {"serverTime": int(time.time()),
 						"message": message["message"],
 						"error": "manager data invalid"}
-					self.sslSocket.send(json.dumps(message))
+					self._sendMessage(message)
 				except Exception as e:
 					pass
 
@@ -960,7 +1117,7 @@ class ClientCommunication:
 					message = {"serverTime": int(time.time()),
 						"message": message["message"],
 						"error": "unable to add manager to database"}
-					self.sslSocket.send(json.dumps(message))
+					self._sendMessage(message)
 				except Exception as e:
 					pass
 
@@ -976,7 +1133,7 @@ class ClientCommunication:
 				message = {"serverTime": int(time.time()),
 					"message": message["message"],
 					"error": "node type not known"}
-				self.sslSocket.send(json.dumps(message))
+				self._sendMessage(message)
 			except Exception as e:
 				pass
 
@@ -988,7 +1145,7 @@ class ClientCommunication:
 			payload = {"type": "response", "result": "ok"}
 			message = {"serverTime": int(time.time()),
 				"message": "registration", "payload": payload}
-			self.sslSocket.send(json.dumps(message))
+			self._sendMessage(message)
 
 		except Exception as e:
 			logging.exception("[%s]: Sending registration response "
@@ -1018,7 +1175,7 @@ class ClientCommunication:
 				message = {"serverTime": int(time.time()),
 					"message": incomingMessage["message"],
 					"error": "received option invalid"}
-				self.sslSocket.send(json.dumps(message))
+				self._sendMessage(message)
 			except Exception as e:
 				pass
 
@@ -1047,7 +1204,7 @@ class ClientCommunication:
 			payload = {"type": "response", "result": "ok"}
 			message = {"serverTime": int(time.time()),
 				"message": "option", "payload": payload}
-			self.sslSocket.send(json.dumps(message))
+			self._sendMessage(message)
 		except Exception as e:
 			logging.exception("[%s]: Sending option " % self.fileName
 				+ "response failed (%s:%d)." 
@@ -1072,7 +1229,7 @@ class ClientCommunication:
 					message = {"serverTime": int(time.time()),
 						"message": message["message"],
 						"error": "sensors not of type list"}
-					self.sslSocket.send(json.dumps(message))
+					self._sendMessage(message)
 				except Exception as e:
 					pass
 
@@ -1088,7 +1245,7 @@ class ClientCommunication:
 				message = {"serverTime": int(time.time()),
 					"message": incomingMessage["message"],
 					"error": "received status invalid"}
-				self.sslSocket.send(json.dumps(message))
+				self._sendMessage(message)
 			except Exception as e:
 				pass
 
@@ -1105,7 +1262,7 @@ class ClientCommunication:
 				message = {"serverTime": int(time.time()),
 					"message": incomingMessage["message"],
 					"error": "count of sensors not correct"}
-				self.sslSocket.send(json.dumps(message))
+				self._sendMessage(message)
 			except Exception as e:
 				pass
 
@@ -1128,7 +1285,7 @@ class ClientCommunication:
 				message = {"serverTime": int(time.time()),
 					"message": incomingMessage["message"],
 					"error": "received sensor invalid"}
-				self.sslSocket.send(json.dumps(message))
+				self._sendMessage(message)
 			except Exception as e:
 				pass
 
@@ -1147,7 +1304,7 @@ class ClientCommunication:
 				message = {"serverTime": int(time.time()),
 					"message": incomingMessage["message"],
 					"error": "not able to update sensor state in database"}
-				self.sslSocket.send(json.dumps(message))
+				self._sendMessage(message)
 			except Exception as e:
 				pass
 
@@ -1158,7 +1315,7 @@ class ClientCommunication:
 			payload = {"type": "response", "result": "ok"}
 			message = {"serverTime": int(time.time()),
 				"message": "status", "payload": payload}
-			self.sslSocket.send(json.dumps(message))
+			self._sendMessage(message)
 		except Exception as e:
 			logging.exception("[%s]: Sending status " % self.fileName
 				+ "response failed (%s:%d)." 
@@ -1169,7 +1326,7 @@ class ClientCommunication:
 
 
 	# this internal function handles received sensor alerts
-	# (adds them to the database and wakes up the sensor alert executer)
+	# (hands them over to the sensor alert executer)
 	def _sensorAlertHandler(self, incomingMessage):
 
 		# extract sensor alert values
@@ -1190,7 +1347,7 @@ class ClientCommunication:
 						message = {"serverTime": int(time.time()),
 							"message": message["message"],
 							"error": "data not of type dict"}
-						self.sslSocket.send(json.dumps(message))
+						self._sendMessage(message)
 					except Exception as e:
 						pass
 
@@ -1212,15 +1369,16 @@ class ClientCommunication:
 				message = {"serverTime": int(time.time()),
 					"message": incomingMessage["message"],
 					"error": "received sensor alert invalid"}
-				self.sslSocket.send(json.dumps(message))
+				self._sendMessage(message)
 			except Exception as e:
 				pass
 
 			return False
 
-		# add sensor alert to database
-		if not self.storage.addSensorAlert(self.nodeId, remoteSensorId,
-			state, dataJson):
+		# add sensor alert (updates the state of the sensor in the database)
+		sensorAlert = self.storage.addSensorAlert(self.nodeId, remoteSensorId,
+			state, dataJson)
+		if sensorAlert is None:
 			logging.error("[%s]: Not able to add sensor alert (%s:%d)."
 				% (self.fileName, self.clientAddress, self.clientPort))
 
@@ -1229,21 +1387,22 @@ class ClientCommunication:
 				message = {"serverTime": int(time.time()),
 					"message": incomingMessage["message"],
 					"error": "not able to add sensor alert to database"}
-				self.sslSocket.send(json.dumps(message))
+				self._sendMessage(message)
 			except Exception as e:
 				pass
 
 			return False
 
-		# wake up sensor alert executer
-		self.sensorAlertExecuter.sensorAlertEvent.set()
+		# hand the sensor alert over to the sensor alert executer
+		# (wakes it up)
+		self.sensorAlertExecuter.addSensorAlert(sensorAlert)
 
 		# send sensor alert response
 		try:
 			payload = {"type": "response", "result": "ok"}
 			message = {"serverTime": int(time.time()),
 				"message": "sensoralert", "payload": payload}
-			self.sslSocket.send(json.dumps(message))
+			self._sendMessage(message)
 		except Exception as e:
 			logging.exception("[%s]: Sending sensor alert " % self.fileName
 				+ "response failed (%s:%d)." 
@@ -1271,7 +1430,7 @@ class ClientCommunication:
 				message = {"serverTime": int(time.time()),
 					"message": incomingMessage["message"],
 					"error": "received state change invalid"}
-				self.sslSocket.send(json.dumps(message))
+				self._sendMessage(message)
 			except Exception as e:
 				pass
 
@@ -1290,7 +1449,7 @@ class ClientCommunication:
 				message = {"serverTime": int(time.time()),
 					"message": incomingMessage["message"],
 					"error": "not able to change sensor state in database"}
-				self.sslSocket.send(json.dumps(message))
+				self._sendMessage(message)
 			except Exception as e:
 				pass
 
@@ -1308,7 +1467,7 @@ class ClientCommunication:
 				message = {"serverTime": int(time.time()),
 					"message": incomingMessage["message"],
 					"error": "not able to get sensor id from database"}
-				self.sslSocket.send(json.dumps(message))
+				self._sendMessage(message)
 			except Exception as e:
 				pass
 
@@ -1319,7 +1478,7 @@ class ClientCommunication:
 			payload = {"type": "response", "result": "ok"}
 			message = {"serverTime": int(time.time()),
 				"message": "statechange", "payload": payload}
-			self.sslSocket.send(json.dumps(message))
+			self._sendMessage(message)
 		except Exception as e:
 			logging.exception("[%s]: Sending state change " % self.fileName
 				+ "response failed (%s:%d)." 
@@ -1335,26 +1494,32 @@ class ClientCommunication:
 
 
 	# internal function to send the current state of the alert system
-	# to a manager
-	def _sendManagerAllInformation(self):
-
-		# get a list from database of 
-		# list[0] = optionCount
-		# list[1] = list(tuples of (type, value))
-		# list[2] = nodeCount
-		# list[3] = list(tuples of (nodeId, hostname, nodeType, instance,
-		# connected, version, rev))
-		# list[4] = sensorCount
-		# list[5] = list(tuples of (nodeId, sensorId, alertDelay,
-		# description, lastStateUpdated, state))
-		# list[6] = managerCount
-		# list[7] = list(tuples of (nodeId, managerId, description))
-		# list[8] = alertCount
-		# list[9] = list(tuples of (nodeId, alertId, description))	
-		alertSystemInformation = self.storage.getAlertSystemInformation()
-		if alertSystemInformation == None:
+	# to a manager (only the changes since the version the manager
+	# acknowledged last if possible)
+	def _sendManagerStatus(self):
+
+		# get the changes since the last acknowledged version
+		# (if the manager does not support versioned status updates
+		# or the changes can not be generated, a full status is sent)
+		deltaStatus = None
+		if self.managerStatusVersion is not None:
+			deltaStatus = self.managerStatus.getDeltaStatus(
+				self.managerStatusVersion)
+
+		if deltaStatus is not None:
+			version = deltaStatus[0]
+			status = deltaStatus[1]
+			removed = deltaStatus[2]
+			sensorsLastStateUpdated = deltaStatus[3]
+		else:
+			fullStatus = self.managerStatus.getFullStatus()
+			version = fullStatus[0]
+			status = fullStatus[1]
+			removed = None
+
+		if version == 0:
 			logging.error("[%s]: Getting alert system " % self.fileName
-				+ "information from database failed (%s:%d)." 
+				+ "information failed (%s:%d)." 
 				% (self.clientAddress, self.clientPort))
 
 			# send error message back
@@ -1362,118 +1527,41 @@ class ClientCommunication:
 				message = {"serverTime": int(time.time()),
 					"message": "status",
 					"error": "not able to get alert system data from database"}
-				self.sslSocket.send(json.dumps(message))
+				self._sendMessage(message)
 			except Exception as e:
 				pass
 
 			return False
-		optionCount = alertSystemInformation[0]
-		optionsInformation = alertSystemInformation[1]
-		nodeCount = alertSystemInformation[2]
-		nodesInformation = alertSystemInformation[3]
-		sensorCount = alertSystemInformation[4]
-		sensorsInformation = alertSystemInformation[5]
-		managerCount = alertSystemInformation[6]
-		managersInformation = alertSystemInformation[7]
-		alertCount = alertSystemInformation[8]
-		alertsInformation = alertSystemInformation[9]
-
-		# generating options list
-		options = list()
-		for i in range(optionCount):
-			tempDict = {"type": optionsInformation[i][0],
-				"value": optionsInformation[i][1]}
-			options.append(tempDict)
-
-		# generating nodes list
-		nodes = list()
-		for i in range(nodeCount):
-			tempDict = {"nodeId": nodesInformation[i][0],
-				"hostname": nodesInformation[i][1],
-				"nodeType": nodesInformation[i][2],
-				"instance": nodesInformation[i][3],
-				"connected": nodesInformation[i][4],
-				"version": nodesInformation[i][5],
-				"rev": nodesInformation[i][6]}
-			nodes.append(tempDict)
-
-		# generating sensors list
-		sensors = list()
-		for i in range(sensorCount):
-
-			sensorId = sensorsInformation[i][1]
-
-			# create list of alert levels of this sensor
-			dbAlertLevels = self.storage.getSensorAlertLevels(sensorId)
-			alertLevels = list()
-			for tempAlertLevel in dbAlertLevels:
-				alertLevels.append(tempAlertLevel[0])
-
-			tempDict = {"nodeId": sensorsInformation[i][0],
-				"sensorId": sensorId,
-				"alertDelay": sensorsInformation[i][2],
-				"alertLevels": alertLevels,
-				"description": sensorsInformation[i][3],
-				"lastStateUpdated": sensorsInformation[i][4],
-				"state": sensorsInformation[i][5]}
-			sensors.append(tempDict)
-
-		# generating managers list
-		managers = list()
-		for i in range(managerCount):
-			tempDict = {"nodeId": managersInformation[i][0],
-				"managerId": managersInformation[i][1],
-				"description": managersInformation[i][2]}
-			managers.append(tempDict)
-
-		# generating alerts list
-		alerts = list()
-		for i in range(alertCount):
-
-			alertId = alertsInformation[i][1]
-
-			# create list of alert levels of this alert
-			dbAlertLevels = self.storage.getAlertAlertLevels(alertId)
-			alertLevels = list()
-			for tempAlertLevel in dbAlertLevels:
-				alertLevels.append(tempAlertLevel[0])
-
-			tempDict = {"nodeId": alertsInformation[i][0],
-				"alertId": alertId,
-				"alertLevels": alertLevels,
-				"description": alertsInformation[i][2]}
-			alerts.append(tempDict)
-
-		# generating alertLevels list
-		alertLevels = list()
-		for i in range(len(self.alertLevels)):
-
-			tempDict = {"alertLevel": self.alertLevels[i].level,
-				"name": self.alertLevels[i].name,
-				"triggerAlways": (1 if self.alertLevels[i].triggerAlways
-				else 0),
-				"smtpActivated": (1 if self.alertLevels[i].smtpActivated
-				else 0),
-				"toAddr": self.alertLevels[i].toAddr,
-				"rulesActivated": self.alertLevels[i].rulesActivated}
-			alertLevels.append(tempDict)
-
-		logging.debug("[%s]: Sending status message (%s:%d)." 
-			% (self.fileName, self.clientAddress, self.clientPort))
+
+		logging.debug("[%s]: Sending %s status message " % (self.fileName,
+			("full" if removed is None else "delta"))
+			+ "with version %d (%s:%d)."
+			% (version, self.clientAddress, self.clientPort))
 
 		# sending status message to client
 		try:
 
 			payload = {"type": "request",
-				"options": options,
-				"nodes": nodes,
-				"sensors": sensors,
-				"managers": managers,
-				"alerts": alerts,
-				"alertLevels": alertLevels}
+				"version": version,
+				"options": status["options"],
+				"nodes": status["nodes"],
+				"sensors": status["sensors"],
+				"managers": status["managers"],
+				"alerts": status["alerts"],
+				"alertLevels": status["alertLevels"]}
+
+			# a delta only contains the changes since the acknowledged
+			# version, the removed entities and the time of the last
+			# status message of the sensors that were not changed
+			if removed is not None:
+				payload["statusType"] = "delta"
+				payload["baseVersion"] = self.managerStatusVersion
+				payload["removed"] = removed
+				payload["sensorsLastStateUpdated"] = sensorsLastStateUpdated
+
 			message = {"serverTime": int(time.time()),
 				"message": "status", "payload": payload}
-			self.sslSocket.send(json.dumps(message))
+			self._sendMessage(message)
 
 		except Exception as e:
 			logging.exception("[%s]: Sending status " % self.fileName
@@ -1485,7 +1573,7 @@ class ClientCommunication:
 		logging.debug("[%s]: Receiving status message response (%s:%d)."
 			% (self.fileName, self.clientAddress, self.clientPort))
 		try:
-			data = self.sslSocket.recv(BUFSIZE).strip()
+			data = self._recvMessageData()
 			message = json.loads(data)
 			# check if an error was received
 			if "error" in message.keys():
@@ -1504,7 +1592,7 @@ class ClientCommunication:
 					message = {"serverTime": int(time.time()),
 						"message": message["message"],
 						"error": "status message expected"}
-					self.sslSocket.send(json.dumps(message))
+					self._sendMessage(message)
 				except Exception as e:
 					pass
 
@@ -1520,12 +1608,25 @@ class ClientCommunication:
 					message = {"serverTime": int(time.time()),
 						"message": message["message"],
 						"error": "response expected"}
-					self.sslSocket.send(json.dumps(message))
+					self._sendMessage(message)
 				except Exception as e:
 					pass
 
 				return False
 
+			# check if the manager was not able to apply the changes
+			# because it does not have the version they are based on
+			# => a full status update has to be sent
+			if str(message["payload"]["result"]).upper() == "VERSIONGAP":
+				logging.warning("[%s]: Manager not able to " % self.fileName
+					+ "apply status changes to its version (%s:%d)."
+					% (self.clientAddress, self.clientPort))
+
+				self.managerStatusVersion = None
+				self.managerStatusVersionGap = True
+				self.lastRecv = time.time()
+				return False
+
 			# check if status message was correctly received
 			if str(message["payload"]["result"]).upper() != "OK":
 				logging.error("[%s]: Result not ok: '%s' (%s:%d)."
@@ -1533,6 +1634,13 @@ class ClientCommunication:
 					self.clientAddress, self.clientPort))
 				return False
 
+			# remember the version the manager acknowledged
+			# (older managers do not acknowledge a version and
+			# always get a full status update)
+			if "version" in message["payload"].keys():
+				self.managerStatusVersion = int(
+					message["payload"]["version"])
+
 		except Exception as e:
 			logging.exception("[%s]: Receiving status " % self.fileName
 				+ "message response failed (%s:%d)."
@@ -1544,19 +1652,33 @@ class ClientCommunication:
 		return True
 
 
-	# internal function to send a state change to a manager
-	def _sendManagerStateChange(self, sensorId, state):
+	# internal function to send state changes to a manager
+	# (list of tuples of (sensorId, state))
+	def _sendManagerStateChange(self, stateChanges):
 
 		# send state change message
-		logging.debug("[%s]: Sending state change message (%s:%d)."
-			% (self.fileName, self.clientAddress, self.clientPort))
+		logging.debug("[%s]: Sending state change message with " % self.fileName
+			+ "%d state changes (%s:%d)."
+			% (len(stateChanges), self.clientAddress, self.clientPort))
 		try:
-			payload = {"type": "request",
-				"sensorId": sensorId,
-				"state": state}
+
+			# a single state change is sent in the format that is
+			# also understood by older manager clients
+			if len(stateChanges) == 1:
+				payload = {"type": "request",
+					"sensorId": stateChanges[0][0],
+					"state": stateChanges[0][1]}
+			else:
+				stateChangesList = list()
+				for stateChangeTuple in stateChanges:
+					stateChangesList.append({"sensorId": stateChangeTuple[0],
+						"state": stateChangeTuple[1]})
+				payload = {"type": "request",
+					"stateChanges": stateChangesList}
+
 			message = {"serverTime": int(time.time()),
 				"message": "statechange", "payload": payload}
-			self.sslSocket.send(json.dumps(message))
+			self._sendMessage(message)
 		except Exception as e:
 			logging.exception("[%s]: Sending state change " % self.fileName
 				+ "failed (%s:%d)." 
@@ -1566,7 +1688,7 @@ class ClientCommunication:
 
 		# receive state change response message
 		try:
-			data = self.sslSocket.recv(BUFSIZE).strip()
+			data = self._recvMessageData()
 			message = json.loads(data)
 			# check if an error was received
 			if "error" in message.keys():
@@ -1585,7 +1707,7 @@ class ClientCommunication:
 					message = {"serverTime": int(time.time()),
 						"message": message["message"],
 						"error": "state change message expected"}
-					self.sslSocket.send(json.dumps(message))
+					self._sendMessage(message)
 				except Exception as e:
 					pass
 
@@ -1601,7 +1723,7 @@ class ClientCommunication:
 					message = {"serverTime": int(time.time()),
 						"message": message["message"],
 						"error": "response expected"}
-					self.sslSocket.send(json.dumps(message))
+					self._sendMessage(message)
 				except Exception as e:
 					pass
 
@@ -1636,7 +1758,7 @@ class ClientCommunication:
 			payload = {"type": "request"}
 			message = {"serverTime": int(time.time()),
 				"message": "sensoralertsoff", "payload": payload}
-			self.sslSocket.send(json.dumps(message))
+			self._sendMessage(message)
 		except Exception as e:
 			logging.exception("[%s]: Sending sensor alerts " % self.fileName
 				+ "off message failed (%s:%d)." 
@@ -1650,7 +1772,7 @@ class ClientCommunication:
 			% (self.clientAddress, self.clientPort))
 
 		try:
-			data = self.sslSocket.recv(BUFSIZE).strip()
+			data = self._recvMessageData()
 			message = json.loads(data)
 			# check if an error was received
 			if "error" in message.keys():
@@ -1670,7 +1792,7 @@ class ClientCommunication:
 					message = {"serverTime": int(time.time()),
 						"message": message["message"],
 						"error": "sensor alerts off message expected"}
-					self.sslSocket.send(json.dumps(message))
+					self._sendMessage(message)
 				except Exception as e:
 					pass
 
@@ -1686,7 +1808,7 @@ class ClientCommunication:
 					message = {"serverTime": int(time.time()),
 						"message": message["message"],
 						"error": "response expected"}
-					self.sslSocket.send(json.dumps(message))
+					self._sendMessage(message)
 				except Exception as e:
 					pass
 
@@ -1711,14 +1833,15 @@ class ClientCommunication:
 		return True
 
 
-	# function that sends a state change to a manager client
-	def sendManagerStateChange(self, sensorId, state):
+	# function that sends state changes to a manager client
+	# (list of tuples of (sensorId, state))
+	def sendManagerStateChange(self, stateChanges):
 
 		# initiate transaction with client and acquire lock
 		if not self._initiateTransaction("statechange", acquireLock=True):
 			return False
 
-		returnValue = self._sendManagerStateChange(sensorId, state)
+		returnValue = self._sendManagerStateChange(stateChanges)
 
 		self._releaseLock()
 		return returnValue
@@ -1744,9 +1867,23 @@ class ClientCommunication:
 		if not self._initiateTransaction("status", acquireLock=True):
 			return False
 
-		returnValue = self._sendManagerAllInformation()
+		self.managerStatusVersionGap = False
+		returnValue = self._sendManagerStatus()
 
 		self._releaseLock()
+
+		# manager was not able to apply the changes
+		# => send a full status update
+		if self.managerStatusVersionGap:
+			self.managerStatusVersionGap = False
+
+			if not self._initiateTransaction("status", acquireLock=True):
+				return False
+
+			returnValue = self._sendManagerStatus()
+
+			self._releaseLock()
+
 		return returnValue
 
 
@@ -1796,7 +1933,7 @@ class ClientCommunication:
 
 			message = {"serverTime": int(time.time()),
 				"message": "sensoralert", "payload": payload}
-			self.sslSocket.send(json.dumps(message))
+			self._sendMessage(message)
 		except Exception as e:
 			logging.exception("[%s]: Sending sensor alert " % self.fileName
 				+ "message failed (%s:%d)." 
@@ -1807,7 +1944,7 @@ class ClientCommunication:
 
 		# get sensor alert message response
 		try:
-			data = self.sslSocket.recv(BUFSIZE).strip()
+			data = self._recvMessageData()
 			message = json.loads(data)
 			# check if an error was received
 			if "error" in message.keys():
@@ -1828,7 +1965,7 @@ class ClientCommunication:
 					message = {"serverTime": int(time.time()),
 						"message": message["message"],
 						"error": "sensor alert message expected"}
-					self.sslSocket.send(json.dumps(message))
+					self._sendMessage(message)
 				except Exception as e:
 					pass
 
@@ -1845,7 +1982,7 @@ class ClientCommunication:
 					message = {"serverTime": int(time.time()),
 						"message": message["message"],
 						"error": "response expected"}
-					self.sslSocket.send(json.dumps(message))
+					self._sendMessage(message)
 				except Exception as e:
 					pass
 
@@ -1875,11 +2012,10 @@ class ClientCommunication:
 		return True
 
 
-	# this function handles the communication with the client
-	# and receives the commands
-	def handleCommunication(self):
-
-		self._acquireLock()
+	# internal function that initializes the communication with the client
+	# (verifies the version, authenticates and registers the client)
+	# (the lock has to be held by the caller)
+	def _initializeCommunication(self):
 
 		# set timeout of the socket to configured seconds
 		self.sslSocket.settimeout(self.serverReceiveTimeout)
@@ -1890,16 +2026,14 @@ class ClientCommunication:
 				+ "authentication failed (%s:%d)."
 				% (self.clientAddress, self.clientPort))
 
-			self._releaseLock()
-			return
+			return False
 
 		# second register client
 		if not self._registerClient():
 			logging.error("[%s]: Registration failed (%s:%d)."
 					% (self.fileName, self.clientAddress, self.clientPort))
 
-			self._releaseLock()
-			return
+			return False
 
 		# change the time of the last received message
 		# (for the watchdog so it can see that the connection is still alive)
@@ -1911,8 +2045,8 @@ class ClientCommunication:
 			logging.error("[%s]: Getting node id failed (%s:%d)."
 					% (self.fileName, self.clientAddress, self.clientPort))
 
-			self._releaseLock()
-			return
+			return False
+		self.sessionRegistry.registerNode(self)
 
 		# get the sensor count from the database for this connection
 		# if the nodeType is "sensor"
@@ -1922,31 +2056,32 @@ class ClientCommunication:
 				logging.error("[%s]: Getting sensor count failed (%s:%d)."
 						% (self.fileName, self.clientAddress, self.clientPort))
 
-				self._releaseLock()
-				return		
+				return False
 
 		# mark node as connected in the database
 		if not self.storage.markNodeAsConnected(self.nodeId):
 			logging.error("[%s]: Not able to mark node as connected (%s:%d)."
 				% (self.fileName, self.clientAddress, self.clientPort))
 
-			self._releaseLock()
-			return				
+			return False
 
 		# check if the type of the node is manager
 		# => send all current node information to the manager
 		if self.nodeType == "manager":
 
+			# update the snapshot of the alert system information
+			# to send the current state to the manager
+			self.managerStatus.update()
+
 			if (not self._initiateTransaction("status", acquireLock=False)
-				or not self._sendManagerAllInformation()):
+				or not self._sendManagerStatus()):
 				logging.error("[%s]: Not able send status " % self.fileName
 					+ "update to client (%s:%d)."
 					% (self.clientAddress, self.clientPort))
 
 				# clean up session before exiting
 				self._cleanUpSessionForClosing()
-				self._releaseLock()
-				return
+				return False
 
 		# if node is no manager 
 		# => send full status update to all manager clients
@@ -1955,284 +2090,478 @@ class ClientCommunication:
 			self.managerUpdateExecuter.forceStatusUpdate = True
 			self.managerUpdateExecuter.managerUpdateEvent.set()
 
+		# start the thread that sends all queued messages
+		# to manager and alert clients
+		if self.nodeType == "manager" or self.nodeType == "alert":
+			self.asyncSender = AsynchronousSender(self.globalData, self)
+			# set thread to daemon
+			# => threads terminates when main thread terminates	
+			self.asyncSender.daemon = True
+			self.asyncSender.start()
+
 		# set flag that the initialization process of the client is finished
 		self.clientInitialized = True
+		self.sessionRegistry.registerClient(self)
 
-		# handle commands
-		while 1:
+		return True
 
-			try:
-				# set timeout of the socket to 0.5 seconds
-				self.sslSocket.settimeout(0.5)
 
-				data = self.sslSocket.recv(BUFSIZE)
-				if not data:
+	# internal function that handles the data received from the client
+	# (acknowledges the RTS, receives the actual command and handles it)
+	# (the lock has to be held by the caller)
+	# returns False if the session was closed
+	def _handleReceivedData(self, data):
 
-					# clean up session before exiting
-					self._cleanUpSessionForClosing()
-					self._releaseLock()
-					return
+		try:
 
-				# change timeout of the socket back to configured seconds
-				self.sslSocket.settimeout(self.serverReceiveTimeout)
+			if not data:
 
-				data = data.strip()
-				message = json.loads(data)
-				# check if an error was received
-				if "error" in message.keys():
-					logging.error("[%s]: Error received: '%s' (%s:%d)."
-						% (self.fileName, message["error"],
-						self.clientAddress, self.clientPort))
+				# clean up session before exiting
+				self._cleanUpSessionForClosing()
+				return False
 
-					# clean up session before exiting
-					self._cleanUpSessionForClosing()
-					self._releaseLock()
-					return
+			data = data.strip()
+			message = json.loads(data)
+			# check if an error was received
+			if "error" in message.keys():
+				logging.error("[%s]: Error received: '%s' (%s:%d)."
+					% (self.fileName, message["error"],
+					self.clientAddress, self.clientPort))
 
-				# check if RTS was received
-				# => acknowledge it
-				if str(message["payload"]["type"]).upper() == "RTS":
-					receivedTransactionId = int(message["payload"]["id"])
+				# clean up session before exiting
+				self._cleanUpSessionForClosing()
+				return False
 
-					# received RTS (request to send) message
-					logging.debug("[%s]: Received RTS %d message (%s:%d)."
-						% (self.fileName, receivedTransactionId,
-						self.clientAddress, self.clientPort))
+			# check if RTS was received
+			# => acknowledge it
+			if str(message["payload"]["type"]).upper() == "RTS":
+				receivedTransactionId = int(message["payload"]["id"])
 
-					logging.debug("[%s]: Sending CTS %d message (%s:%d)."
-						% (self.fileName, receivedTransactionId,
-						self.clientAddress, self.clientPort))
+				# received RTS (request to send) message
+				logging.debug("[%s]: Received RTS %d message (%s:%d)."
+					% (self.fileName, receivedTransactionId,
+					self.clientAddress, self.clientPort))
 
-					# send CTS (clear to send) message
-					payload = {"type": "cts", "id": receivedTransactionId}
-					message = {"serverTime": int(time.time()),
-						"message": str(message["message"]),
-						"payload": payload}
-					self.sslSocket.send(json.dumps(message))
-
-					# after initiating transaction receive
-					# actual command 
-					data = self.sslSocket.recv(BUFSIZE)
-					data = data.strip()
-
-				# if no RTS was received
-				# => client does not stick to protocol 
-				# => terminate session
-				else:
+				logging.debug("[%s]: Sending CTS %d message (%s:%d)."
+					% (self.fileName, receivedTransactionId,
+					self.clientAddress, self.clientPort))
 
-					logging.error("[%s]: Did not receive " % self.fileName
-						+ "RTS. Client sent: '%s' (%s:%d)."
-						% (data, self.clientAddress, self.clientPort))
+				# send CTS (clear to send) message
+				payload = {"type": "cts", "id": receivedTransactionId}
+				message = {"serverTime": int(time.time()),
+					"message": str(message["message"]),
+					"payload": payload}
+				self._sendMessage(message)
 
-					# clean up session before exiting
-					self._cleanUpSessionForClosing()
-					self._releaseLock()
-					return
+				# after initiating transaction receive
+				# actual command 
+				data = self._recvMessageData()
 
-			except ssl.SSLError as e:
+			# if no RTS was received
+			# => client does not stick to protocol 
+			# => terminate session
+			else:
 
-				# catch receive timeouts 
-				err = e.args[0]
-				if err == "The read operation timed out":
+				logging.error("[%s]: Did not receive " % self.fileName
+					+ "RTS. Client sent: '%s' (%s:%d)."
+					% (data, self.clientAddress, self.clientPort))
 
-					# change timeout of the socket back to configured seconds
-					# before releasing the lock
-					self.sslSocket.settimeout(self.serverReceiveTimeout)
+				# clean up session before exiting
+				self._cleanUpSessionForClosing()
+				return False
 
-					# release lock and acquire to let other threads send
-					# data to the client
-					# (wait 0.5 seconds in between, because semaphore
-					# are released in random order => other threads could be
-					# unlucky and not be chosen => this has happened when
-					# loglevel was not debug => hdd I/O has slowed this process
-					# down)
-					self._releaseLock()
-					time.sleep(0.5)
-					self._acquireLock()
+		except Exception as e:
+			logging.exception("[%s]: Receiving failed " % self.fileName
+				+ "(%s:%d)." % (self.clientAddress, self.clientPort))
 
-					# continue receiving
-					continue
+			# clean up session before exiting
+			self._cleanUpSessionForClosing()
+			return False
 
-				logging.exception("[%s]: Receiving failed " % self.fileName
-					+ "(%s:%d)." % (self.clientAddress, self.clientPort))
+		# extract message type
+		try:
+			message = json.loads(data)
+			# check if an error was received
+			if "error" in message.keys():
+				logging.error("[%s]: Error received: '%s' (%s:%d)."
+					% (self.fileName, message["error"],
+					self.clientAddress, self.clientPort))
 
 				# clean up session before exiting
 				self._cleanUpSessionForClosing()
-				self._releaseLock()
-				return
+				return False
 
-			except Exception as e:
-				logging.exception("[%s]: Receiving failed " % self.fileName
-					+ "(%s:%d)." % (self.clientAddress, self.clientPort))
+			# check if the received type is the correct one
+			if str(message["payload"]["type"]).upper() != "REQUEST":
+				logging.error("[%s]: request expected (%s:%d)." 
+					% (self.fileName, self.clientAddress, self.clientPort))
+
+				# send error message back
+				try:
+					message = {"serverTime": int(time.time()),
+						"message": message["message"],
+						"error": "request expected"}
+					self._sendMessage(message)
+				except Exception as e:
+					pass
 
 				# clean up session before exiting
 				self._cleanUpSessionForClosing()
-				self._releaseLock()
-				return
+				return False
 
-			# extract message type
-			try:
-				message = json.loads(data)
-				# check if an error was received
-				if "error" in message.keys():
-					logging.error("[%s]: Error received: '%s' (%s:%d)."
-						% (self.fileName, message["error"],
-						self.clientAddress, self.clientPort))
+			# extract the command/message type of the message
+			command = str(message["message"]).upper()
 
-					# clean up session before exiting
-					self._cleanUpSessionForClosing()
-					self._releaseLock()
-					return
+		except Exception as e:
 
-				# check if the received type is the correct one
-				if str(message["payload"]["type"]).upper() != "REQUEST":
-					logging.error("[%s]: request expected (%s:%d)." 
-						% (self.fileName, self.clientAddress, self.clientPort))
+			logging.exception("[%s]: Received data " % self.fileName
+				+ "not valid: '%s' (%s:%d)." % (data, self.clientAddress,
+				self.clientPort))
 
-					# send error message back
-					try:
-						message = {"serverTime": int(time.time()),
-							"message": message["message"],
-							"error": "request expected"}
-						self.sslSocket.send(json.dumps(message))
-					except Exception as e:
-						pass
+			# clean up session before exiting
+			self._cleanUpSessionForClosing()
+			return False
 
-					# clean up session before exiting
-					self._cleanUpSessionForClosing()
-					self._releaseLock()
-					return
+		# the time the handling of the message started
+		# (only measured if metrics are activated)
+		if self.metrics is not None:
+			handlingStartTime = time.time()
 
-				# extract the command/message type of the message
-				command = str(message["message"]).upper()
+		# check if PING was received => send PONG back
+		if command == "PING":
 
-			except Exception as e:
+			logging.debug("[%s]: Received ping request (%s:%d)." 
+				% (self.fileName, self.clientAddress, self.clientPort))
+			logging.debug("[%s]: Sending ping response (%s:%d)." 
+				% (self.fileName, self.clientAddress, self.clientPort))
 
-				logging.exception("[%s]: Received data " % self.fileName
-					+ "not valid: '%s' (%s:%d)." % (data, self.clientAddress,
-					self.clientPort))
+			try:
+				payload = {"type": "response", "result": "ok"}
+				message = {"serverTime": int(time.time()),
+					"message": "ping", "payload": payload}
+				self._sendMessage(message)
+			except Exception as e:
+				logging.exception("[%s]: Sending ping " % self.fileName
+					+ "response to client failed (%s:%d)." 
+					% (self.clientAddress, self.clientPort))
 
 				# clean up session before exiting
 				self._cleanUpSessionForClosing()
-				self._releaseLock()
-				return
+				return False
 
-			# check if PING was received => send PONG back
-			if command == "PING":
+		# check if SENSORALERT was received
+		# => add to database and wake up alertExecuter
+		elif (command == "SENSORALERT"
+			and self.nodeType == "sensor"):
 
-				logging.debug("[%s]: Received ping request (%s:%d)." 
-					% (self.fileName, self.clientAddress, self.clientPort))
-				logging.debug("[%s]: Sending ping response (%s:%d)." 
-					% (self.fileName, self.clientAddress, self.clientPort))
+			logging.debug("[%s]: Received sensor alert message (%s:%d)." 
+				% (self.fileName, self.clientAddress, self.clientPort))
 
-				try:
-					payload = {"type": "response", "result": "ok"}
-					message = {"serverTime": int(time.time()),
-						"message": "ping", "payload": payload}
-					self.sslSocket.send(json.dumps(message))
-				except Exception as e:
-					logging.exception("[%s]: Sending ping " % self.fileName
-						+ "response to client failed (%s:%d)." 
-						% (self.clientAddress, self.clientPort))
+			if not self._callHandler(self._sensorAlertHandler, message):
 
-					# clean up session before exiting
-					self._cleanUpSessionForClosing()
-					self._releaseLock()
-					return
+				logging.error("[%s]: Handling sensor alert failed (%s:%d)."
+					% (self.fileName, self.clientAddress, self.clientPort))
 
-			# check if SENSORALERT was received
-			# => add to database and wake up alertExecuter
-			elif (command == "SENSORALERT"
-				and self.nodeType == "sensor"):
+				# clean up session before exiting
+				self._cleanUpSessionForClosing()
+				return False
 
-				logging.debug("[%s]: Received sensor alert message (%s:%d)." 
-					% (self.fileName, self.clientAddress, self.clientPort))
+		# check if STATECHANGE was received
+		# => change state of sensor in database
+		elif (command == "STATECHANGE"
+			and self.nodeType == "sensor"):
 
-				if not self._sensorAlertHandler(message):
+			logging.debug("[%s]: Received state change message (%s:%d)." 
+				% (self.fileName, self.clientAddress, self.clientPort))
 
-					logging.error("[%s]: Handling sensor alert failed (%s:%d)."
-						% (self.fileName, self.clientAddress, self.clientPort))
+			if not self._callHandler(self._stateChangeHandler, message):
 
-					# clean up session before exiting
-					self._cleanUpSessionForClosing()
-					self._releaseLock()
-					return
+				logging.error("[%s]: Handling sensor " % self.fileName
+					+ "state change failed (%s:%d)."
+					% (self.clientAddress, self.clientPort))
 
-			# check if STATECHANGE was received
-			# => change state of sensor in database
-			elif (command == "STATECHANGE"
-				and self.nodeType == "sensor"):
+				# clean up session before exiting
+				self._cleanUpSessionForClosing()
+				return False
+
+		# check if STATUS was received
+		# => add new state to the database
+		elif (command == "STATUS"
+			and self.nodeType == "sensor"):
 
-				logging.debug("[%s]: Received state change message (%s:%d)." 
+			logging.debug("[%s]: Received status message (%s:%d)." 
+				% (self.fileName, self.clientAddress, self.clientPort))
+
+			if not self._callHandler(self._statusHandler, message):
+
+				logging.error("[%s]: Handling status failed (%s:%d)." 
 					% (self.fileName, self.clientAddress, self.clientPort))
 
-				if not self._stateChangeHandler(message):
+				# clean up session before exiting
+				self._cleanUpSessionForClosing()
+				return False
 
-					logging.error("[%s]: Handling sensor " % self.fileName
-						+ "state change failed (%s:%d)."
-						% (self.clientAddress, self.clientPort))
+		# check if OPTION was received (for manager only)
+		# => change option in the database
+		elif (command == "OPTION"
+			and self.nodeType == "manager"):
 
-					# clean up session before exiting
-					self._cleanUpSessionForClosing()
-					self._releaseLock()
-					return
+			logging.debug("[%s]: Received option message (%s:%d)." 
+				% (self.fileName, self.clientAddress, self.clientPort))
 
-			# check if STATUS was received
-			# => add new state to the database
-			elif (command == "STATUS"
-				and self.nodeType == "sensor"):
+			if not self._callHandler(self._optionHandler, message):
 
-				logging.debug("[%s]: Received status message (%s:%d)." 
+				logging.error("[%s]: Handling option failed (%s:%d)." 
 					% (self.fileName, self.clientAddress, self.clientPort))
 
-				if not self._statusHandler(message):
+				# clean up session before exiting
+				self._cleanUpSessionForClosing()
+				return False
+
+		# command is unknown => close connection
+		else:
+			logging.error("[%s]: Received unknown " % self.fileName
+				+ "command. Client sent: '%s' (%s:%d)."
+				% (data, self.clientAddress, self.clientPort))
 
-					logging.error("[%s]: Handling status failed (%s:%d)." 
-						% (self.fileName, self.clientAddress, self.clientPort))
+			try:
+				message = {"serverTime": int(time.time()),
+					"message": message["message"],
+					"error": "unknown command/message type"}
+				self._sendMessage(message)
+			except Exception as e:
+				pass
 
-					# clean up session before exiting
-					self._cleanUpSessionForClosing()
-					self._releaseLock()
-					return
+			# clean up session before exiting
+			self._cleanUpSessionForClosing()
+			return False
+
+		self.lastRecv = time.time()
 
-			# check if OPTION was received (for manager only)
-			# => change option in the database
-			elif (command == "OPTION"
-				and self.nodeType == "manager"):
+		if self.metrics is not None:
+			self.metrics.observe("alertr_message_handling_seconds",
+				self.lastRecv - handlingStartTime,
+				(("type", command.lower()), ("nodetype", self.nodeType)))
 
-				logging.debug("[%s]: Received option message (%s:%d)." 
-					% (self.fileName, self.clientAddress, self.clientPort))
+		return True
 
-				if not self._optionHandler(message):
 
-					logging.error("[%s]: Handling option failed (%s:%d)." 
-						% (self.fileName, self.clientAddress, self.clientPort))
+	# function that checks if the communication with the client is
+	# currently used by another thread (does not block)
+	def isBusy(self):
+
+		if not self.connectionLock.acquire(False):
+			return True
+		self.connectionLock.release()
+		return False
+
+
+	# internal function that limits the time the server waits on
+	# the client while the lock is held (used by the worker threads of
+	# the event driven server, the lock has to be held by the caller)
+	def _limitReceiveTimeout(self, receiveTimeout):
+		self.serverReceiveTimeout = receiveTimeout
+		self.messageReceiveTimeout = receiveTimeout
+		self.sslSocket.settimeout(self.serverReceiveTimeout)
+
+
+	# internal function that removes the limit of the time the server
+	# waits on the client before the lock is released
+	# (the lock has to be held by the caller)
+	def _unlimitReceiveTimeout(self):
+		self.serverReceiveTimeout = self.globalData.serverReceiveTimeout
+		self.messageReceiveTimeout = None
+		self.sslSocket.settimeout(self.serverReceiveTimeout)
+
+
+	# function that initializes the communication with the client
+	# (used by the event driven server, the threaded server
+	# does this in handleCommunication())
+	# (the server waits at most receiveTimeout seconds on each message
+	# of the client)
+	def initializeCommunication(self, receiveTimeout):
+
+		self._acquireLock()
+
+		self._limitReceiveTimeout(receiveTimeout)
+		try:
+			returnValue = self._initializeCommunication()
+		finally:
+			self._unlimitReceiveTimeout()
+
+		self._releaseLock()
+		return returnValue
+
+
+	# function that handles the data that is waiting on the connection
+	# without blocking (used by the event driven server when the
+	# connection is readable)
+	# (the server waits at most receiveTimeout seconds on each message
+	# of the client)
+	# returns None if the connection is used by another thread
+	# and False if the session was closed
+	def handleIncomingMessage(self, receiveTimeout):
+
+		# do not wait for the lock, another thread is using the connection
+		# and will read its response itself
+		if not self.connectionLock.acquire(False):
+			return None
+
+		logging.debug("[%s]: Acquire lock (%s:%d)." % (self.fileName,
+			self.clientAddress, self.clientPort))
+
+		self._limitReceiveTimeout(receiveTimeout)
+		try:
+			returnValue = self._handleIncomingData()
+		finally:
+			self._unlimitReceiveTimeout()
+
+		self._releaseLock()
+		return returnValue
+
+
+	# internal function that handles the data that is waiting on the
+	# connection (the lock has to be held by the caller)
+	# returns False if the session was closed
+	def _handleIncomingData(self):
+
+		try:
+			# do not block if the waiting data was already
+			# read by another thread
+			self.sslSocket.settimeout(0.0)
+
+			data = self.sslSocket.recv(BUFSIZE)
+
+			# change timeout of the socket back to configured seconds
+			self.sslSocket.settimeout(self.serverReceiveTimeout)
+
+		except ssl.SSLError as e:
+
+			# change timeout of the socket back to configured seconds
+			# before releasing the lock
+			self.sslSocket.settimeout(self.serverReceiveTimeout)
+
+			# no complete record received yet
+			# => wait until the connection is readable again
+			if e.args[0] == ssl.SSL_ERROR_WANT_READ:
+				return True
+
+			logging.exception("[%s]: Receiving failed " % self.fileName
+				+ "(%s:%d)." % (self.clientAddress, self.clientPort))
+
+			# clean up session before exiting
+			self._cleanUpSessionForClosing()
+			return False
+
+		except Exception as e:
+			logging.exception("[%s]: Receiving failed " % self.fileName
+				+ "(%s:%d)." % (self.clientAddress, self.clientPort))
+
+			# clean up session before exiting
+			self._cleanUpSessionForClosing()
+			return False
+
+		# with the framed protocol the received data is buffered
+		# until a message is complete (and can contain more than
+		# one message)
+		if self.framedProtocol and data:
+
+			self.recvBuffer.extend(data)
+
+			returnValue = True
+			while returnValue:
+
+				try:
+					messageData = self._getBufferedMessage()
+				except Exception as e:
+					logging.exception("[%s]: Receiving failed "
+						% self.fileName
+						+ "(%s:%d)." % (self.clientAddress, self.clientPort))
 
 					# clean up session before exiting
 					self._cleanUpSessionForClosing()
+					returnValue = False
+					break
+
+				if messageData is None:
+					break
+
+				returnValue = self._handleReceivedData(messageData)
+
+		else:
+			returnValue = self._handleReceivedData(data)
+
+		return returnValue
+
+
+	# this function handles the communication with the client
+	# and receives the commands
+	def handleCommunication(self):
+
+		self._acquireLock()
+
+		# initialize the communication with the client
+		if not self._initializeCommunication():
+			self._releaseLock()
+			return
+
+		# handle commands
+		while 1:
+
+			try:
+				# set timeout of the socket to 0.5 seconds
+				self.sslSocket.settimeout(0.5)
+
+				data = self._recvMessageData()
+
+				# change timeout of the socket back to configured seconds
+				self.sslSocket.settimeout(self.serverReceiveTimeout)
+
+			except ssl.SSLError as e:
+
+				# catch receive timeouts 
+				err = e.args[0]
+				if err == "The read operation timed out":
+
+					# change timeout of the socket back to configured seconds
+					# before releasing the lock
+					self.sslSocket.settimeout(self.serverReceiveTimeout)
+
+					# release lock and acquire to let other threads send
+					# data to the client
+					# (wait 0.5 seconds in between, because semaphore
+					# are released in random order => other threads could be
+					# unlucky and not be chosen => this has happened when
+					# loglevel was not debug => hdd I/O has slowed this process
+					# down)
 					self._releaseLock()
-					return
+					time.sleep(0.5)
+					self._acquireLock()
 
-			# command is unknown => close connection
-			else:
-				logging.error("[%s]: Received unknown " % self.fileName
-					+ "command. Client sent: '%s' (%s:%d)."
-					% (data, self.clientAddress, self.clientPort))
+					# continue receiving
+					continue
 
-				try:
-					message = {"serverTime": int(time.time()),
-						"message": message["message"],
-						"error": "unknown command/message type"}
-					self.sslSocket.send(json.dumps(message))
-				except Exception as e:
-					pass
+				logging.exception("[%s]: Receiving failed " % self.fileName
+					+ "(%s:%d)." % (self.clientAddress, self.clientPort))
+
+				# clean up session before exiting
+				self._cleanUpSessionForClosing()
+				self._releaseLock()
+				return
+
+			except Exception as e:
+				logging.exception("[%s]: Receiving failed " % self.fileName
+					+ "(%s:%d)." % (self.clientAddress, self.clientPort))
 
 				# clean up session before exiting
 				self._cleanUpSessionForClosing()
 				self._releaseLock()
 				return
 
-			self.lastRecv = time.time()
+			# handle received data
+			if not self._handleReceivedData(data):
+				self._releaseLock()
+				return
 
 
 # this class is used for the threaded tcp server and extends the constructor
@@ -2269,16 +2598,14 @@ class ServerSession(SocketServer.BaseRequestHandler):
 		# get reference to global data object
 		self.globalData = server.globalData
 
-		# get server certificate/key file
-		self.serverCertFile = self.globalData.serverCertFile
-		self.serverKeyFile = self.globalData.serverKeyFile
-
-		# get client certificate settings
-		self.useClientCertificates = self.globalData.useClientCertificates
-		self.clientCAFile = self.globalData.clientCAFile
+		# get the ssl context that is shared by all connections
+		# (holds the certificate settings and the tls session cache)
+		self.sslContext = self.globalData.serverSSLContext
 
-		# add own server session to the global list of server sessions
-		self.globalData.serverSessions.append(self)
+		# add own server session to the registry of server sessions
+		# and let the watchdog check its connection for a timeout
+		self.globalData.sessionRegistry.addSession(self)
+		self.globalData.connectionWatchdog.watchSession(self)
 
 		SocketServer.BaseRequestHandler.__init__(self, request, 
 			clientAddress, server)
@@ -2292,17 +2619,8 @@ class ServerSession(SocketServer.BaseRequestHandler):
 		# try to initiate ssl with client
 		try:
 
-			# check if the clients should also be forced to authenticate
-			# themselves via a certificate
-			if self.useClientCertificates is True:
-				self.sslSocket = ssl.wrap_socket(self.request,
-					server_side=True, certfile=self.serverCertFile, 
-					keyfile=self.serverKeyFile, ssl_version=ssl.PROTOCOL_TLSv1,
-					cert_reqs=ssl.CERT_REQUIRED, ca_certs=self.clientCAFile)
-			else:
-				self.sslSocket = ssl.wrap_socket(self.request,
-					server_side=True, certfile=self.serverCertFile, 
-					keyfile=self.serverKeyFile, ssl_version=ssl.PROTOCOL_TLSv1)
+			self.sslSocket = self.sslContext.wrap_socket(self.request,
+				server_side=True)
 
 		except Exception as e:
 			logging.exception("[%s]: Unable to initialize SSL " % self.fileName
@@ -2312,7 +2630,7 @@ class ServerSession(SocketServer.BaseRequestHandler):
 			# remove own server session from the global list of server sessions
 			# before closing server session
 			try:
-				self.globalData.serverSessions.remove(self)
+				self.globalData.sessionRegistry.removeSession(self)
 			except:
 				pass
 
@@ -2335,7 +2653,7 @@ class ServerSession(SocketServer.BaseRequestHandler):
 		# remove own server session from the global list of server sessions
 		# before closing server session
 		try:
-			self.globalData.serverSessions.remove(self)
+			self.globalData.sessionRegistry.removeSession(self)
 		except:
 			pass
 
@@ -2355,317 +2673,1343 @@ class ServerSession(SocketServer.BaseRequestHandler):
 		except:
 			pass
 		try:	
-			self.globalData.serverSessions.remove(self)
+			self.globalData.sessionRegistry.removeSession(self)
 		except:
 			pass
 
 
-# this class checks if the connections to the clients timed out
-class ConnectionWatchdog(threading.Thread):
-
-	def __init__(self, globalData, connectionTimeout):
-		threading.Thread.__init__(self)
+# this class is used for incoming client connections when the
+# event driven server is used (all sessions are handled by one thread)
+class EventDrivenServerSession:
 
-		# get global configured data
-		self.globalData = globalData
-		self.serverSessions = self.globalData.serverSessions
-		self.storage = self.globalData.storage
-		self.smtpAlert = self.globalData.smtpAlert
-		self.managerUpdateExecuter = self.globalData.managerUpdateExecuter
+	def __init__(self, request, clientAddress, globalData):
 
 		# file nme of this file (used for logging)
 		self.fileName = os.path.basename(__file__)
 
-		# get value for the configured timeout of a session
-		self.connectionTimeout = connectionTimeout
+		# the accepted socket of the connection and its file descriptor
+		# (the descriptor is stored because it is still needed
+		# after the socket was closed)
+		self.request = request
+		self.fd = request.fileno()
 
-		# set exit flag as false
-		self.exitFlag = False
+		# ssl socket wrapper
+		self.sslSocket = None
 
-		# list of all timed out sensors
-		self.timedOutSensors = list()
+		# instance of the client communication object
+		self.clientComm = None
 
+		# get client ip address and port
+		self.clientAddress = clientAddress[0]
+		self.clientPort = clientAddress[1]
 
-	def run(self):
+		# get reference to global data object
+		self.globalData = globalData
 
-		while 1:
-			# wait 5 seconds before checking time of last received data
-			for i in range(5):
-				if self.exitFlag:
-					logging.info("[%s]: Exiting ConnectionWatchdog." 
-						% self.fileName)
-					return
-				time.sleep(1)
+		# get the ssl context that is shared by all connections
+		# (holds the certificate settings and the tls session cache)
+		self.sslContext = self.globalData.serverSSLContext
 
-			# check all server sessions if the connection timed out
-			for serverSession in self.serverSessions:
+		# flags that state in which phase the session is
+		self.handshakeDone = False
+		self.communicationInitialized = False
 
-				# check if client communication object exists
-				if serverSession.clientComm == None:
-					continue
+		# flag that states if the ssl handshake has to wait until
+		# the connection is writable
+		self.wantWrite = False
 
-				# check if the time of the data last received lies 
-				# too far in the past => kill connection
-				if ((time.time() - serverSession.clientComm.lastRecv) 
-					>= self.connectionTimeout):
-					
-					logging.error("[%s]: Connection to " % self.fileName
-						+ "client timed out. Closing connection (%s:%d)." 
-						% (serverSession.clientAddress,
-						serverSession.clientPort))
-					
-					serverSession.closeConnection()
-
-			# get all node ids from database
-			# return value is a list of tuples of (nodeId)
-			nodeIds = self.storage.getAllConnectedNodeIds()
-			if nodeIds == None:
-				logging.error("[%s]: Could not get node " % self.fileName
-					+ "ids from database.")
-			else:
+		# add own server session to the registry of server sessions
+		# and let the watchdog check its connection for a timeout
+		self.globalData.sessionRegistry.addSession(self)
+		self.globalData.connectionWatchdog.watchSession(self)
 
-				# check if node marked as connected got a connection
-				# to the server
-				for nodeIdTuple in nodeIds:
-					nodeId = nodeIdTuple[0]
-					found = False
-
-					for serverSession in self.serverSessions:
-
-						# check if client communication object exists
-						if serverSession.clientComm == None:
-							continue
-
-						if serverSession.clientComm.nodeId == nodeId:
-							found = True
-							break
-
-					# if no server session was found with the node id
-					# => node is not connected to the server
-					if not found:
-						logging.debug("[%s]: Marking node " % self.fileName
-							+ "'%d' as not connected." % nodeId)
-						if not self.storage.markNodeAsNotConnected(nodeId):
-							logging.error("[%s]: Could not " % self.fileName
-								+ "mark node as not connected in database.")
-						# wake up manager update executer
-						self.managerUpdateExecuter.forceStatusUpdate = True
-						self.managerUpdateExecuter.managerUpdateEvent.set()
-
-			# get all sensors that have timed out
-			# list of tuples of (sensorId, nodeId,
-			# lastStateUpdated, description)
-			sensorsTimeoutList = self.storage.getSensorsUpdatedOlderThan(
-				int(time.time()) - (2 * self.connectionTimeout))
-
-			# generate an alert for every timed out sensor
-			# (logging + email)
-			for sensorTimeoutTuple in sensorsTimeoutList:
-				sensorId = sensorTimeoutTuple[0]
-				nodeId = sensorTimeoutTuple[1]
-				hostname = self.storage.getNodeHostnameById(nodeId)
-				lastStateUpdated = sensorTimeoutTuple[2]
-				description = sensorTimeoutTuple[3]
-				if hostname == None:
-					logging.error("[%s]: Could not " % self.fileName
-						+ "get hostname for node from database.")
-					continue
 
-				logging.critical("[%s]: Sensor " % self.fileName
-						+ "with description '%s' from host '%s' timed out. "
-						% (description, hostname)
-						+ "Last state received at %s"
-						% time.strftime("%D %H:%M:%S",
-						time.localtime(lastStateUpdated)))
-
-				# send email alert for timed out sensor if activated
-				# and sensor is not in list of timed out sensors
-				if ((not self.smtpAlert is None)
-					and (not sensorId in self.timedOutSensors)):
-					if not self.smtpAlert.sendSensorTimeoutAlert(hostname,
-						description, lastStateUpdated):
-						logging.error("[%s]: Could not send " % self.fileName
-							+ "email alert for sensor timeout.")
-
-				# if sensor is not in list of timed out sensors
-				# => add it
-				if not sensorId in self.timedOutSensors:
-					self.timedOutSensors.append(sensorId)
-
-			# check if a timed out sensor has reconnected and
-			# updated its state and generate a notification
-			for oldTimedOutSensorId in self.timedOutSensors:
-				found = False
-				for sensorTimeoutTuple in sensorsTimeoutList:
-					currentTimedOutSensorId = sensorTimeoutTuple[0]
-					if oldTimedOutSensorId == currentTimedOutSensorId:
-						found = True
-						break
-				if not found:
-					self.timedOutSensors.remove(oldTimedOutSensorId)
-
-					# get a tuple of (sensorId, nodeId,
-					# remoteSensorId, description, state,
-					# lastStateUpdated, alertDelay)
-					timedOutSensor = self.storage.getSensorInformation(
-						oldTimedOutSensorId)
-
-					# check if the sensor could be found in the database
-					if timedOutSensor is None:
-						logging.error("[%s]: Could not get " % self.fileName
-							+ "sensor with id %d from database."
-							% oldTimedOutSensorId)
-						continue
-
-					nodeId = timedOutSensor[1]
-					hostname = self.storage.getNodeHostnameById(nodeId)
-					lastStateUpdated = timedOutSensor[5]
-					description = timedOutSensor[3]
-
-					logging.info("[%s]: Sensor " % self.fileName
-						+ "with description '%s' from host '%s' has "
-						% (description, hostname)
-						+ "reconnected. Last state received at %s"
-						% time.strftime("%D %H:%M:%S",
-						time.localtime(lastStateUpdated)))
-
-					# send email notification that sensor
-					# has reconnected if activated
-					if not self.smtpAlert is None:
-						if not self.smtpAlert.sendSensorTimeoutAlertClear(
-							hostname, description, lastStateUpdated):
-							logging.error("[%s]: Could not send " 
-								% self.fileName
-								+ "email notification for reconnected sensor.")
+	# this function wraps the socket of the connection without doing
+	# the ssl handshake (it is done by doHandshake() when the
+	# connection is readable)
+	def setup(self):
 
+		logging.info("[%s]: Client connected (%s:%d)." 
+			% (self.fileName, self.clientAddress, self.clientPort))
 
-	# sets the exit flag to shut down the thread
-	def exit(self):
-		self.exitFlag = True
-		return
+		try:
 
+			self.sslSocket = self.sslContext.wrap_socket(self.request,
+				server_side=True, do_handshake_on_connect=False)
 
-# this class is used to send messages to the client
-# in an asynchronous way to avoid blockings
-class AsynchronousSender(threading.Thread):
+			self.sslSocket.setblocking(0)
 
-	def __init__(self, globalData, clientComm):
-		threading.Thread.__init__(self)
+		except Exception as e:
+			logging.exception("[%s]: Unable to initialize SSL " % self.fileName
+				+ "connection (%s:%d)." 
+			% (self.clientAddress, self.clientPort))
 
-		# file nme of this file (used for logging)
-		self.fileName = os.path.basename(__file__)
+			return False
 
-		# get global configured data
-		self.globalData = globalData
+		return True
 
-		# the communication instance to the client
-		self.clientComm = clientComm
 
-		# this option is used when the thread should
-		# send a manager update
-		self.sendManagerUpdate = False
+	# this function is called by the server thread when the connection
+	# is ready during the ssl handshake and continues the handshake
+	# without blocking
+	# returns False if the session has to be closed
+	def doHandshake(self):
 
-		# this options are used when the thread should
-		# send a sensor alert to the client
-		self.sendSensorAlert = False
-		self.sensorAlertRulesActivated = None
-		self.sensorAlertSensorId = None
-		self.sensorAlertState = None
-		self.sensorAlertAlertLevels = None
-		self.sensorAlertSensorDescription = None
-		self.sensorAlertDataTransfer = False
-		self.sensorAlertData = None
+		self.wantWrite = False
 
-		# this options are used when the thread should
-		# send a state change to a manager client
-		self.sendManagerStateChange = False
-		self.sendManagerStateChangeSensorId = None
-		self.sendManagerStateChangeState = None
+		try:
+			self.sslSocket.do_handshake()
 
-		# this option is used when the thread should
-		# send a sensor alert off to the client
-		self.sendAlertSensorAlertsOff = False
+		except ssl.SSLError as e:
 
+			# handshake is not finished yet
+			# => wait until the connection is ready again
+			if e.args[0] == ssl.SSL_ERROR_WANT_READ:
+				return True
+			elif e.args[0] == ssl.SSL_ERROR_WANT_WRITE:
+				self.wantWrite = True
+				return True
 
-	def run(self):
+			logging.exception("[%s]: Unable to initialize SSL " 
+				% self.fileName
+				+ "connection (%s:%d)." 
+				% (self.clientAddress, self.clientPort))
 
-		# check if a status update to a manager should be send
-		if self.sendManagerUpdate:
-			if self.clientComm.nodeType != "manager":
-				logging.error("[%s]: Sending status " % self.fileName
-						+ "update to manager failed. Client is not a "
-						+ "'manager' node (%s:%d)."
-						% (self.clientComm.clientAddress,
-					self.clientComm.clientPort))
-				return
+			return False
 
-			# sending status update to manager
-			if not self.clientComm.sendManagerUpdate():
-				logging.error("[%s]: Sending status " % self.fileName
-					+ "update to manager failed (%s:%d)."
-					% (self.clientComm.clientAddress,
-					self.clientComm.clientPort))
-				return
+		except Exception as e:
+			logging.exception("[%s]: Unable to initialize SSL " 
+				% self.fileName
+				+ "connection (%s:%d)." 
+				% (self.clientAddress, self.clientPort))
 
-		# check if a sensor alert to a manager/alert should be send
-		elif self.sendSensorAlert:
-			if (self.clientComm.nodeType != "manager"
-				and self.clientComm.nodeType != "alert"):
-				logging.error("[%s]: Sending sensor " % self.fileName
-						+ "alert failed. Client is not a "
-						+ "'manager'/'alert' node (%s:%d)."
-						% (self.clientComm.clientAddress,
-					self.clientComm.clientPort))
-				return
+			return False
 
-			if not self.clientComm.sendSensorAlert(self.sensorAlertSensorId,
-				self.sensorAlertState, self.sensorAlertAlertLevels,
-				self.sensorAlertSensorDescription,
-				self.sensorAlertRulesActivated,
-				self.sensorAlertDataTransfer,
-				self.sensorAlertData):
-				logging.error("[%s]: Sending sensor " % self.fileName
-					+ "alert to manager/alert failed (%s:%d)."
-					% (self.clientComm.clientAddress,
-					self.clientComm.clientPort))
+		self.handshakeDone = True
 
-		# check if a state change to a manager should be send
-		elif self.sendManagerStateChange:
-			if self.clientComm.nodeType != "manager":
-				logging.error("[%s]: Sending state " % self.fileName
-						+ "change to manager failed. Client is not a "
-						+ "'manager' node (%s:%d)."
-						% (self.clientComm.clientAddress,
-					self.clientComm.clientPort))
+		# give connection to client communication handler
+		# (the protocol itself is handled with blocking receives)
+		self.sslSocket.settimeout(self.globalData.serverReceiveTimeout)
+		self.clientComm = ClientCommunication(self.sslSocket,
+			self.clientAddress, self.clientPort, self.globalData)
+
+		return True
+
+
+	# this function is called by a worker thread when the connection
+	# is readable after the ssl handshake and executes the next step
+	# of the session (it blocks until the client has sent the
+	# complete messages, at most the receive timeout of the event
+	# driven server for each message, therefore the server thread
+	# does not call it)
+	# returns False if the session has to be closed
+	def handle(self):
+
+		# verify version, authenticate and register client
+		# after it has sent its first message
+		if not self.communicationInitialized:
+
+			if not self.clientComm.initializeCommunication(
+				self.globalData.eventDrivenReceiveTimeout):
+				return False
+
+			self.communicationInitialized = True
+
+			# check if the client has already sent more data
+			if self.sslSocket.pending() == 0:
+				return True
+
+		# handle all messages that are waiting on the connection
+		while True:
+
+			returnValue = self.clientComm.handleIncomingMessage(
+				self.globalData.eventDrivenReceiveTimeout)
+
+			# another thread uses the connection at the moment
+			if returnValue is None:
+				return True
+
+			elif not returnValue:
+				return False
+
+			if self.sslSocket.pending() == 0:
+				break
+
+		return True
+
+
+	# this function closes the socket and removes the session
+	# (only called by the server thread)
+	def finish(self):
+
+		# stop the thread that sends the queued messages
+		# (if the session was not cleaned up by the client communication)
+		if (self.clientComm is not None
+			and self.clientComm.asyncSender is not None):
+			self.clientComm.asyncSender.exit()
+
+		# close ssl connection
+		try:
+			if self.sslSocket is not None:
+				self.sslSocket.close()
+			else:
+				self.request.close()
+		except Exception as e:
+			logging.exception("[%s]: Unable to close SSL " % self.fileName
+				+ "connection gracefully with %s:%d." 
+			% (self.clientAddress, self.clientPort))
+
+		# remove own server session from the global list of server sessions
+		# before closing server session
+		try:
+			self.globalData.sessionRegistry.removeSession(self)
+		except:
+			pass
+
+		logging.info("[%s]: Client disconnected (%s:%d)." 
+			% (self.fileName, self.clientAddress, self.clientPort))
+
+
+	# this function is used by other threads to close the connection
+	# (the socket is only shut down, the server thread notices it,
+	# cleans up the session and closes the socket afterwards to not free
+	# the file descriptor while it is still registered)
+	def closeConnection(self):
+		logging.info("[%s]: Closing connection to client (%s:%d)." 
+			% (self.fileName, self.clientAddress, self.clientPort))
+		try:	
+			self.request.shutdown(socket.SHUT_RDWR)
+		except:
+			pass
+		try:	
+			self.globalData.sessionRegistry.removeSession(self)
+		except:
+			pass
+
+
+# this class is used by the event driven server to handle the
+# communication with the clients after the ssl handshake
+# (authentication, registration and the received messages are handled
+# with blocking receives and are therefore not handled by the server
+# thread itself)
+class EventDrivenWorker(threading.Thread):
+
+	def __init__(self, globalData, server):
+		threading.Thread.__init__(self)
+
+		# file nme of this file (used for logging)
+		self.fileName = os.path.basename(__file__)
+
+		# get global configured data
+		self.globalData = globalData
+
+		# the event driven server the sessions are taken from
+		self.server = server
+
+
+	def run(self):
+
+		while 1:
+
+			serverSession = self.server.workQueue.get()
+
+			try:
+				returnValue = serverSession.handle()
+			except Exception as e:
+				logging.exception("[%s]: Handling connection " 
+					% self.fileName
+					+ "failed (%s:%d)." 
+					% (serverSession.clientAddress,
+					serverSession.clientPort))
+				returnValue = False
+
+			self.server.finishSession(serverSession, returnValue)
+
+
+# this class is an event driven server that handles all client
+# connections in one thread via epoll (or poll if epoll is not available)
+# instead of starting one thread for each connection (only the
+# communication after the ssl handshake is handed to a pool of
+# worker threads, so a slow client does not stall the other sessions)
+class EventDrivenTCPServer:
+
+	def __init__(self, globalData, serverAddress):
+
+		# file nme of this file (used for logging)
+		self.fileName = os.path.basename(__file__)
+
+		# get reference to global data object
+		self.globalData = globalData
+
+		# all sessions that are handled by this server
+		# (key: file descriptor, value: EventDrivenServerSession)
+		self.sessions = dict()
+
+		# list of sessions whose connection is used by another thread
+		# and that are therefore not polled at the moment
+		self.busySessions = list()
+
+		# interval in seconds in which the busy sessions are checked
+		self.busyCheckInterval = 0.1
+
+		# use epoll if available
+		if hasattr(select, "epoll"):
+			self.poller = select.epoll()
+			self.pollTimeoutFactor = 1.0
+			self.readMask = select.EPOLLIN | select.EPOLLPRI
+			self.writeMask = select.EPOLLOUT
+		else:
+			self.poller = select.poll()
+			self.pollTimeoutFactor = 1000.0
+			self.readMask = select.POLLIN | select.POLLPRI
+			self.writeMask = select.POLLOUT
+
+		# create listening socket
+		self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+		try:
+			self.socket.bind(serverAddress)
+			self.socket.listen(128)
+		except:
+			self.socket.close()
+			raise
+		self.socket.setblocking(0)
+		self.poller.register(self.socket.fileno(), self.readMask)
+
+		# queue of the sessions that are handled by a worker thread
+		# (their connections are not polled until the worker is finished)
+		self.workQueue = Queue.Queue()
+
+		# list and lock of/for the sessions the worker threads have
+		# finished as tuples (serverSession, returnValue)
+		self.finishedSessionsLock = threading.Lock()
+		self.finishedSessions = list()
+
+		# pipe that is used by the worker threads to wake up the
+		# server thread when they have finished a session
+		self.wakeupPipeRead, self.wakeupPipeWrite = os.pipe()
+		for fd in (self.wakeupPipeRead, self.wakeupPipeWrite):
+			flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+			fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+		self.poller.register(self.wakeupPipeRead, self.readMask)
+
+		# start the worker threads
+		for i in range(self.globalData.eventDrivenWorkers):
+			worker = EventDrivenWorker(self.globalData, self)
+			# set thread to daemon
+			# => threads terminates when main thread terminates	
+			worker.daemon = True
+			worker.start()
+
+
+	# internal function that accepts all waiting connections
+	def _acceptConnections(self):
+
+		while True:
+
+			try:
+				request, clientAddress = self.socket.accept()
+			except socket.error as e:
+				if e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK):
+					return
+
+				logging.exception("[%s]: Accepting connection " % self.fileName
+					+ "failed.")
 				return
 
-			# sending state change to manager
-			if not self.clientComm.sendManagerStateChange(
-				self.sendManagerStateChangeSensorId,
-				self.sendManagerStateChangeState):
-				logging.error("[%s]: Sending state " % self.fileName
-					+ "change to manager failed (%s:%d)."
-					% (self.clientComm.clientAddress,
-					self.clientComm.clientPort))
+			request.setblocking(0)
+
+			serverSession = EventDrivenServerSession(request, clientAddress,
+				self.globalData)
+			if not serverSession.setup():
+				serverSession.finish()
+				continue
+
+			self.sessions[serverSession.fd] = serverSession
+			self.poller.register(serverSession.fd, self.readMask)
+
+
+	# internal function that removes a session from the server
+	# and closes it
+	def _closeSession(self, serverSession):
+
+		try:
+			self.poller.unregister(serverSession.fd)
+		except:
+			pass
+
+		try:
+			del self.sessions[serverSession.fd]
+		except:
+			pass
+
+		try:
+			self.busySessions.remove(serverSession)
+		except:
+			pass
+
+		serverSession.finish()
+
+
+	# internal function that lets a session handle its ready connection
+	def _handleSession(self, serverSession):
+
+		# the ssl handshake is done by the server thread
+		# without blocking
+		if not serverSession.handshakeDone:
+
+			if not serverSession.doHandshake():
+				self._closeSession(serverSession)
 				return
 
-		# check if a sensor alert off to an alert client should be send
-		elif self.sendAlertSensorAlertsOff:
-			if self.clientComm.nodeType != "alert":
-				logging.error("[%s]: Sending sensor " % self.fileName
-						+ "alert off to alert failed. Client is not a "
-						+ "'alert' node (%s:%d)."
-						% (self.clientComm.clientAddress,
-					self.clientComm.clientPort))
+			# check if the client has already sent data
+			if (not serverSession.handshakeDone
+				or serverSession.sslSocket.pending() == 0):
+				self._pollSession(serverSession)
+				return
+
+		# hand the session to a worker thread and stop polling its
+		# connection until the worker is finished (the worker thread
+		# blocks until the client has sent the complete messages)
+		self.poller.unregister(serverSession.fd)
+		self.workQueue.put(serverSession)
+
+
+	# internal function that polls the connection of a session again
+	# after it has handled its ready connection
+	def _pollSession(self, serverSession):
+
+		# connection is used by another thread
+		# => stop polling it until the thread is finished
+		# (otherwise the response the thread waits for would
+		# wake up the server continuously, the file descriptor is
+		# unregistered because a hang up of the connection
+		# is reported even without any events to poll)
+		if (serverSession.clientComm is not None
+			and serverSession.clientComm.isBusy()):
+			if not serverSession in self.busySessions:
+				self.poller.unregister(serverSession.fd)
+				self.busySessions.append(serverSession)
+			return
+
+		if serverSession.wantWrite:
+			self.poller.modify(serverSession.fd,
+				self.readMask | self.writeMask)
+		else:
+			self.poller.modify(serverSession.fd, self.readMask)
+
+
+	# function that is called by a worker thread when it has finished
+	# a session (wakes up the server thread)
+	def finishSession(self, serverSession, returnValue):
+
+		self.finishedSessionsLock.acquire()
+		self.finishedSessions.append((serverSession, returnValue))
+		self.finishedSessionsLock.release()
+
+		try:
+			os.write(self.wakeupPipeWrite, "x")
+		except OSError as e:
+			# the server thread is already woken up
+			if e.errno != errno.EAGAIN:
+				raise
+
+
+	# internal function that polls the sessions again that
+	# were finished by the worker threads
+	def _checkFinishedSessions(self):
+
+		try:
+			os.read(self.wakeupPipeRead, 4096)
+		except OSError as e:
+			if e.errno not in (errno.EAGAIN, errno.EINTR):
+				raise
+
+		self.finishedSessionsLock.acquire()
+		finishedSessions = self.finishedSessions
+		self.finishedSessions = list()
+		self.finishedSessionsLock.release()
+
+		for serverSession, returnValue in finishedSessions:
+
+			if not returnValue:
+				self._closeSession(serverSession)
+				continue
+
+			try:
+				self.poller.register(serverSession.fd, self.readMask)
+				self._pollSession(serverSession)
+			except Exception as e:
+				logging.exception("[%s]: Handling connection " 
+					% self.fileName
+					+ "failed (%s:%d)." 
+					% (serverSession.clientAddress,
+					serverSession.clientPort))
+				self._closeSession(serverSession)
+
+
+	# internal function that polls the sessions again whose
+	# connections are not used by another thread anymore
+	def _checkBusySessions(self):
+
+		for serverSession in list(self.busySessions):
+
+			if serverSession.clientComm.isBusy():
+				continue
+
+			self.busySessions.remove(serverSession)
+			self.poller.register(serverSession.fd, self.readMask)
+
+			# data could already be decrypted and buffered
+			# by the ssl socket
+			if serverSession.sslSocket.pending() > 0:
+				self._handleSession(serverSession)
+
+
+	# this function handles all connections in an infinity loop
+	def serve_forever(self):
+
+		logging.info("[%s]: Event driven server started." % self.fileName)
+
+		while True:
+
+			if self.busySessions:
+				timeout = self.busyCheckInterval
+			else:
+				timeout = 0.5
+
+			try:
+				events = self.poller.poll(timeout * self.pollTimeoutFactor)
+			except (IOError, OSError, select.error) as e:
+				# ignore interrupted system calls
+				if e.args[0] == errno.EINTR:
+					continue
+				raise
+
+			for fd, event in events:
+
+				if fd == self.socket.fileno():
+					self._acceptConnections()
+					continue
+
+				if fd == self.wakeupPipeRead:
+					self._checkFinishedSessions()
+					continue
+
+				serverSession = self.sessions.get(fd)
+				if serverSession is None:
+					continue
+
+				try:
+					self._handleSession(serverSession)
+				except Exception as e:
+					logging.exception("[%s]: Handling connection " 
+						% self.fileName
+						+ "failed (%s:%d)." 
+						% (serverSession.clientAddress,
+						serverSession.clientPort))
+					self._closeSession(serverSession)
+
+			self._checkBusySessions()
+
+
+# this class checks if the connections to the clients timed out
+class ConnectionWatchdog(threading.Thread):
+
+	def __init__(self, globalData, connectionTimeout):
+		threading.Thread.__init__(self)
+
+		# get global configured data
+		self.globalData = globalData
+		self.sessionRegistry = self.globalData.sessionRegistry
+		self.storage = self.globalData.storage
+		self.smtpAlert = self.globalData.smtpAlert
+		self.managerUpdateExecuter = self.globalData.managerUpdateExecuter
+
+		# file nme of this file (used for logging)
+		self.fileName = os.path.basename(__file__)
+
+		# get value for the configured timeout of a session
+		self.connectionTimeout = connectionTimeout
+
+		# interval in seconds in which the sensors are checked again
+		# as long as timed out sensors exist (to notice their
+		# reconnection) or the database could not be read
+		self.sensorRecheckInterval = 5.0
+
+		# the metrics of the server (None if they are not activated)
+		self.metrics = self.globalData.metrics
+		if self.metrics is not None:
+			self.metrics.registerCallback("alertr_sessions", "gauge",
+				"Open server sessions (including not initialized ones).",
+				self._getSessionMetrics)
+			self.metrics.registerCallback("alertr_clients", "gauge",
+				"Initialized clients by node type.",
+				self._getClientMetrics)
+			self.metrics.registerCallback("alertr_sender_queue_length",
+				"gauge", "Messages queued for the clients by node type.",
+				self._getSenderMetrics)
+			self.metrics.registerHistogram(
+				"alertr_message_handling_seconds",
+				"Time of handling a message received from a client.")
+			self.metrics.registerHistogram("alertr_message_sending_seconds",
+				"Time of sending a queued message to a client.")
+			self.metrics.registerHistogram("alertr_sender_queue_seconds",
+				"Time a message waited in the queue of a client.")
+			self.metrics.registerCounter(
+				"alertr_messages_sending_failed_total",
+				"Queued messages that could not be sent to a client.")
+			self.metrics.registerCounter("alertr_sender_dropped_total",
+				"Messages dropped because the queue of a client was full.")
+			self.metrics.registerHistogram("alertr_authentication_seconds",
+				"Time of checking the credentials of a client.")
+
+		# set exit flag as false
+		self.exitFlag = False
+
+		# list of all timed out sensors
+		self.timedOutSensors = list()
+
+		# deadlines of the server sessions and of the checks of the
+		# nodes and sensors in the database (keys: server sessions,
+		# "nodes" and "sensors")
+		# (the deadline of a server session is not moved each time data is
+		# received, the time of the last received data is checked when the
+		# deadline is reached and a new deadline is scheduled if the
+		# connection has not timed out)
+		self.timers = TimerHeap()
+
+		# the time since when each server session is watched
+		# (key: server session; value: time)
+		self.sessionsWatchedSince = dict()
+
+		# lock that makes the timers thread safe
+		self.timersLock = threading.Lock()
+
+		# event that is set to wake up the watchdog
+		self.watchdogEvent = threading.Event()
+
+		# the nodes and sensors are checked directly after the start
+		currentTime = time.time()
+		self.timers.schedule("nodes", currentTime)
+		self.timers.schedule("sensors", currentTime)
+
+
+	# internal function that gets the number of sessions for the metrics
+	#
+	# return list of tuples (labels, value)
+	def _getSessionMetrics(self):
+
+		countSessions, _ = self.sessionRegistry.getSessionCounts()
+		return [((), countSessions)]
+
+
+	# internal function that gets the number of clients of each node type
+	# for the metrics
+	#
+	# return list of tuples (labels, value)
+	def _getClientMetrics(self):
+
+		_, clientCounts = self.sessionRegistry.getSessionCounts()
+		return [((("nodetype", nodeType),), count)
+			for nodeType, count in clientCounts.items()]
+
+
+	# internal function that gets the number of queued messages of the
+	# clients of each node type for the metrics
+	#
+	# return list of tuples (labels, value)
+	def _getSenderMetrics(self):
+
+		values = list()
+		for nodeType in ["alert", "manager"]:
+			queueLength = 0
+			for clientComm in self.sessionRegistry.getClientsByNodeType(
+				nodeType):
+				if clientComm.asyncSender is not None:
+					queueLength += len(clientComm.asyncSender.queue)
+			values.append(((("nodetype", nodeType),), queueLength))
+
+		return values
+
+
+	# internal function that checks if the connection of the server session
+	# timed out and closes it
+	def _checkSessionTimeout(self, serverSession):
+
+		self.timersLock.acquire()
+		watchedSince = self.sessionsWatchedSince[serverSession]
+		self.timersLock.release()
+
+		# server session was already closed => stop watching it
+		if not self.sessionRegistry.hasSession(serverSession):
+			self._unwatchSession(serverSession)
+			return
+
+		# check if client communication object exists
+		# (if not, check the session again after the timeout)
+		clientComm = serverSession.clientComm
+		if clientComm is None:
+			self.timersLock.acquire()
+			self.timers.schedule(serverSession,
+				time.time() + self.connectionTimeout)
+			self.timersLock.release()
+			return
+
+		# the deadline of the connection begins with the data last received
+		# (or with the start of the watching if no data was received yet)
+		lastRecv = max(clientComm.lastRecv, watchedSince)
+
+		# check if the time of the data last received lies 
+		# too far in the past => kill connection
+		if (time.time() - lastRecv) >= self.connectionTimeout:
+
+			logging.error("[%s]: Connection to " % self.fileName
+				+ "client timed out. Closing connection (%s:%d)." 
+				% (serverSession.clientAddress,
+				serverSession.clientPort))
+
+			serverSession.closeConnection()
+			self._unwatchSession(serverSession)
+			return
+
+		self.timersLock.acquire()
+		self.timers.schedule(serverSession,
+			lastRecv + self.connectionTimeout)
+		self.timersLock.release()
+
+
+	# internal function that marks all nodes as not connected in the
+	# database that have no server session
+	def _checkConnectedNodes(self):
+
+		# get all node ids from database
+		# return value is a list of tuples of (nodeId)
+		nodeIds = self.storage.getAllConnectedNodeIds()
+		if nodeIds == None:
+			logging.error("[%s]: Could not get node " % self.fileName
+				+ "ids from database.")
+		else:
+
+			# check if node marked as connected got a connection
+			# to the server
+			for nodeIdTuple in nodeIds:
+				nodeId = nodeIdTuple[0]
+
+				# if no server session was found with the node id
+				# => node is not connected to the server
+				if not self.sessionRegistry.isNodeConnected(nodeId):
+					logging.debug("[%s]: Marking node " % self.fileName
+						+ "'%d' as not connected." % nodeId)
+					if not self.storage.markNodeAsNotConnected(nodeId):
+						logging.error("[%s]: Could not " % self.fileName
+							+ "mark node as not connected in database.")
+					# wake up manager update executer
+					self.managerUpdateExecuter.forceStatusUpdate = True
+					self.managerUpdateExecuter.managerUpdateEvent.set()
+
+
+	# internal function that checks all sensors for a timeout
+	#
+	# return the time of the next check
+	def _checkSensorTimeouts(self):
+
+		# get all sensors that have timed out
+		# list of tuples of (sensorId, nodeId,
+		# lastStateUpdated, description)
+		oldestTimeUpdated = int(time.time()) - (2 * self.connectionTimeout)
+		sensorsTimeoutList = self.storage.getSensorsUpdatedOlderThan(
+			oldestTimeUpdated)
+		if sensorsTimeoutList is None:
+			logging.error("[%s]: Could not get timed " % self.fileName
+				+ "out sensors from database.")
+			return time.time() + self.sensorRecheckInterval
+
+		# generate an alert for every timed out sensor
+		# (logging + email)
+		for sensorTimeoutTuple in sensorsTimeoutList:
+			sensorId = sensorTimeoutTuple[0]
+			nodeId = sensorTimeoutTuple[1]
+			hostname = self.storage.getNodeHostnameById(nodeId)
+			lastStateUpdated = sensorTimeoutTuple[2]
+			description = sensorTimeoutTuple[3]
+			if hostname == None:
+				logging.error("[%s]: Could not " % self.fileName
+					+ "get hostname for node from database.")
+				continue
+
+			logging.critical("[%s]: Sensor " % self.fileName
+					+ "with description '%s' from host '%s' timed out. "
+					% (description, hostname)
+					+ "Last state received at %s"
+					% time.strftime("%D %H:%M:%S",
+					time.localtime(lastStateUpdated)))
+
+			# send email alert for timed out sensor if activated
+			# and sensor is not in list of timed out sensors
+			if ((not self.smtpAlert is None)
+				and (not sensorId in self.timedOutSensors)):
+				if not self.smtpAlert.sendSensorTimeoutAlert(hostname,
+					description, lastStateUpdated):
+					logging.error("[%s]: Could not send " % self.fileName
+						+ "email alert for sensor timeout.")
+
+			# if sensor is not in list of timed out sensors
+			# => add it
+			if not sensorId in self.timedOutSensors:
+				self.timedOutSensors.append(sensorId)
+
+		# check if a timed out sensor has reconnected and
+		# updated its state and generate a notification
+		for oldTimedOutSensorId in list(self.timedOutSensors):
+			found = False
+			for sensorTimeoutTuple in sensorsTimeoutList:
+				currentTimedOutSensorId = sensorTimeoutTuple[0]
+				if oldTimedOutSensorId == currentTimedOutSensorId:
+					found = True
+					break
+			if not found:
+				self.timedOutSensors.remove(oldTimedOutSensorId)
+
+				# get a tuple of (sensorId, nodeId,
+				# remoteSensorId, description, state,
+				# lastStateUpdated, alertDelay)
+				timedOutSensor = self.storage.getSensorInformation(
+					oldTimedOutSensorId)
+
+				# check if the sensor could be found in the database
+				if timedOutSensor is None:
+					logging.error("[%s]: Could not get " % self.fileName
+						+ "sensor with id %d from database."
+						% oldTimedOutSensorId)
+					continue
+
+				nodeId = timedOutSensor[1]
+				hostname = self.storage.getNodeHostnameById(nodeId)
+				lastStateUpdated = timedOutSensor[5]
+				description = timedOutSensor[3]
+
+				logging.info("[%s]: Sensor " % self.fileName
+					+ "with description '%s' from host '%s' has "
+					% (description, hostname)
+					+ "reconnected. Last state received at %s"
+					% time.strftime("%D %H:%M:%S",
+					time.localtime(lastStateUpdated)))
+
+				# send email notification that sensor
+				# has reconnected if activated
+				if not self.smtpAlert is None:
+					if not self.smtpAlert.sendSensorTimeoutAlertClear(
+						hostname, description, lastStateUpdated):
+						logging.error("[%s]: Could not send " 
+							% self.fileName
+							+ "email notification for reconnected sensor.")
+
+		# get the oldest state update of the sensors that have not
+		# timed out (no sensor can time out before it is too old)
+		oldestUpdate = self.storage.getOldestSensorUpdateNotOlderThan(
+			oldestTimeUpdated)
+		if oldestUpdate is None:
+			logging.error("[%s]: Could not get oldest " % self.fileName
+				+ "sensor state update from database.")
+			return time.time() + self.sensorRecheckInterval
+
+		# a sensor has timed out as soon as its last state update is
+		# older than the time checked against
+		# (if no such sensor exists, a sensor that is updated from now on
+		# can not time out before the timeout has passed, newly added
+		# sensors that were never updated are found by the next check)
+		if oldestUpdate == 0:
+			nextCheck = time.time() + (2 * self.connectionTimeout)
+		else:
+			nextCheck = oldestUpdate + (2 * self.connectionTimeout) + 1
+
+		# check timed out sensors again after a short time
+		# to notice their reconnection
+		if self.timedOutSensors:
+			nextCheck = min(nextCheck,
+				time.time() + self.sensorRecheckInterval)
+
+		return nextCheck
+
+
+	# internal function that stops watching the server session
+	def _unwatchSession(self, serverSession):
+
+		self.timersLock.acquire()
+		self.timers.cancel(serverSession)
+		if serverSession in self.sessionsWatchedSince:
+			del self.sessionsWatchedSince[serverSession]
+		self.timersLock.release()
+
+
+	# lets the watchdog check the connection of the server session
+	# for a timeout (the watchdog does not have to be woken up because the
+	# nodes are checked in a shorter interval than the timeout)
+	def watchSession(self, serverSession):
+
+		currentTime = time.time()
+
+		self.timersLock.acquire()
+		self.sessionsWatchedSince[serverSession] = currentTime
+		self.timers.schedule(serverSession,
+			currentTime + self.connectionTimeout)
+		self.timersLock.release()
+
+
+	def run(self):
+
+		while 1:
+
+			if self.exitFlag:
+				logging.info("[%s]: Exiting ConnectionWatchdog." 
+					% self.fileName)
 				return
 
-			# sending sensor alert off to alert client
-			if not self.clientComm.sendAlertSensorAlertsOff():
-				logging.error("[%s]: Sending sensor " % self.fileName
-					+ "alert off to alert client failed (%s:%d)."
+			# wait until the next deadline is reached
+			# (the node check is always scheduled)
+			self.timersLock.acquire()
+			nextDeadline = self.timers.getNextDeadline()
+			self.timersLock.release()
+			timeout = nextDeadline - time.time()
+			if timeout > 0:
+				self.watchdogEvent.wait(timeout)
+				self.watchdogEvent.clear()
+				continue
+
+			self.timersLock.acquire()
+			expiredKeys = self.timers.popExpired(time.time())
+			self.timersLock.release()
+
+			for expiredKey in expiredKeys:
+
+				if expiredKey == "nodes":
+					self._checkConnectedNodes()
+					nextCheck = time.time() + self.connectionTimeout
+
+				elif expiredKey == "sensors":
+					nextCheck = self._checkSensorTimeouts()
+
+				else:
+					self._checkSessionTimeout(expiredKey)
+					continue
+
+				self.timersLock.acquire()
+				self.timers.schedule(expiredKey, nextCheck)
+				self.timersLock.release()
+
+
+	# sets the exit flag to shut down the thread
+	def exit(self):
+		self.exitFlag = True
+		self.watchdogEvent.set()
+		return
+
+
+# this class is used to send messages to the client
+# in an asynchronous way to avoid blockings
+# (one long-lived thread per client session that sends the messages
+# of its queue one after another)
+class AsynchronousSender(threading.Thread):
+
+	def __init__(self, globalData, clientComm):
+		threading.Thread.__init__(self)
+
+		# file nme of this file (used for logging)
+		self.fileName = os.path.basename(__file__)
+
+		# get global configured data
+		self.globalData = globalData
+
+		# the communication instance to the client
+		self.clientComm = clientComm
+
+		# the metrics of the server (None if they are not activated)
+		self.metrics = self.globalData.metrics
+
+		# the tracer of the server (None if tracing is not activated)
+		self.tracer = self.globalData.tracer
+
+		# maximum number of messages that can wait in the queue
+		self.maxQueueSize = self.globalData.senderQueueSize
+
+		# queue of all messages that have to be sent to the client
+		# (a list of [messageType, timeQueued, arguments] elements)
+		self.queue = collections.deque()
+
+		# condition that is used to make the queue thread safe and
+		# to wake up the thread when a message was queued
+		self.queueCondition = threading.Condition()
+
+		# queued messages that can be coalesced with newer messages
+		# (the status update and the sensor alerts off message are only
+		# queued once, all state changes are sent in one message
+		# with the newest state of each sensor)
+		self.queuedManagerUpdate = None
+		self.queuedSensorAlertsOff = None
+		self.queuedStateChanges = None
+
+		# statistics of the queue (to see if the client can
+		# keep up with the messages)
+		self.countQueued = 0
+		self.countCoalesced = 0
+		self.countDropped = 0
+		self.countSent = 0
+		self.countFailed = 0
+		self.maxQueueLength = 0
+		self.maxTimeInQueue = 0.0
+		self.sumTimeInQueue = 0.0
+
+		# statistics of the sent sensor alerts (latency is the time
+		# from queueing the sensor alert until it was sent)
+		self.countSensorAlertsSent = 0
+		self.countSensorAlertsFailed = 0
+		self.maxSensorAlertLatency = 0.0
+		self.sumSensorAlertLatency = 0.0
+
+		# set exit flag as false
+		self.exitFlag = False
+
+
+	# internal function that appends a message to the queue
+	# (queue condition has to be acquired by the caller)
+	def _appendMessage(self, messageType, arguments):
+
+		message = [messageType, time.time(), arguments]
+		self.queue.append(message)
+
+		self.countQueued += 1
+		if len(self.queue) > self.maxQueueLength:
+			self.maxQueueLength = len(self.queue)
+
+		# wake up the thread
+		self.queueCondition.notify()
+
+		return message
+
+
+	# internal function that counts a message that was dropped
+	# because the queue is full
+	def _countDropped(self, messageType):
+
+		self.countDropped += 1
+
+		if self.metrics is not None:
+			self.metrics.incrementCounter("alertr_sender_dropped_total",
+				(("type", messageType),
+				("nodetype", self.clientComm.nodeType)))
+
+
+	# internal function that removes the queued state changes
+	# (queue condition has to be acquired by the caller)
+	def _removeStateChanges(self):
+
+		if self.queuedStateChanges is None:
+			return
+
+		self.countCoalesced += len(self.queuedStateChanges[2])
+		self.queue.remove(self.queuedStateChanges)
+		self.queuedStateChanges = None
+
+
+	# internal function that queues a status update
+	# (queue condition has to be acquired by the caller)
+	def _queueManagerUpdate(self):
+
+		# the queued state changes are covered by the status update
+		# (the snapshot of the alert system information is updated
+		# before a status update is queued)
+		self._removeStateChanges()
+
+		# a status update is already queued
+		# (it sends the newest snapshot when it is sent)
+		if self.queuedManagerUpdate is not None:
+			self.countCoalesced += 1
+			return True
+
+		if len(self.queue) >= self.maxQueueSize:
+			self._countDropped("status")
+			logging.warning("[%s]: Queue is full, dropping " % self.fileName
+				+ "status update (%s:%d)."
+				% (self.clientComm.clientAddress, self.clientComm.clientPort))
+			return False
+
+		self.queuedManagerUpdate = self._appendMessage("status", None)
+
+		return True
+
+
+	# internal function that checks if the message can be queued
+	# for the client
+	def _checkNodeType(self, messageType, nodeTypes):
+
+		if self.clientComm.nodeType in nodeTypes:
+			return True
+
+		logging.error("[%s]: Queueing %s message failed. " 
+			% (self.fileName, messageType)
+			+ "Client is not a '%s' node (%s:%d)."
+			% ("'/'".join(nodeTypes), self.clientComm.clientAddress,
+			self.clientComm.clientPort))
+
+		return False
+
+
+	# function that queues a full information update for a manager client
+	def queueManagerUpdate(self):
+
+		if not self._checkNodeType("status", ["manager"]):
+			return False
+
+		self.queueCondition.acquire()
+
+		if self.exitFlag:
+			self.queueCondition.release()
+			return False
+
+		returnValue = self._queueManagerUpdate()
+
+		self.queueCondition.release()
+		return returnValue
+
+
+	# function that queues state changes for a manager client
+	# (list of tuples of (sensorId, state))
+	def queueManagerStateChanges(self, stateChanges):
+
+		if not self._checkNodeType("statechange", ["manager"]):
+			return False
+
+		self.queueCondition.acquire()
+
+		if self.exitFlag:
+			self.queueCondition.release()
+			return False
+
+		# state changes are already queued
+		# => add them to the queued message (only the newest
+		# state of a sensor is sent)
+		# NOTE: state changes can not be covered by an already queued
+		# status update, because the snapshot it sends can be older
+		if self.queuedStateChanges is not None:
+			for stateChangeTuple in stateChanges:
+				self.queuedStateChanges[2][stateChangeTuple[0]] \
+					= stateChangeTuple[1]
+			self.countCoalesced += len(stateChanges)
+
+		# queue is full => replace state changes by one status update
+		elif len(self.queue) >= self.maxQueueSize:
+			logging.warning("[%s]: Queue is full, replacing " % self.fileName
+				+ "state changes by a status update (%s:%d)."
+				% (self.clientComm.clientAddress, self.clientComm.clientPort))
+			self.countCoalesced += len(stateChanges)
+
+			# update the snapshot to contain the state changes
+			self.clientComm.managerStatus.update()
+			self._queueManagerUpdate()
+
+		else:
+			self.queuedStateChanges = self._appendMessage("statechange",
+				dict(stateChanges))
+
+		self.queueCondition.release()
+		return True
+
+
+	# function that queues a sensor alert for an alert/manager client
+	# (the result is reported to the given sensor alert delivery
+	# after the sensor alert was sent)
+	def queueSensorAlert(self, sensorId, state, alertLevels, description,
+		rulesActivated, dataTransfer, data, delivery=None):
+
+		if not self._checkNodeType("sensoralert", ["manager", "alert"]):
+			return False
+
+		self.queueCondition.acquire()
+
+		if self.exitFlag:
+			self.queueCondition.release()
+			return False
+
+		# sensor alerts are never coalesced
+		# => drop sensor alert if queue is full
+		if len(self.queue) >= self.maxQueueSize:
+			self._countDropped("sensoralert")
+			self.queueCondition.release()
+			logging.error("[%s]: Queue is full, dropping " % self.fileName
+				+ "sensor alert (%s:%d)."
+				% (self.clientComm.clientAddress, self.clientComm.clientPort))
+			return False
+
+		self._appendMessage("sensoralert", (sensorId, state, alertLevels,
+			description, rulesActivated, dataTransfer, data, delivery))
+
+		self.queueCondition.release()
+		return True
+
+
+	# function that queues a sensor alerts off message for an alert client
+	def queueAlertSensorAlertsOff(self):
+
+		if not self._checkNodeType("sensoralertsoff", ["alert"]):
+			return False
+
+		self.queueCondition.acquire()
+
+		if self.exitFlag:
+			self.queueCondition.release()
+			return False
+
+		# a sensor alerts off message is already queued
+		if self.queuedSensorAlertsOff is not None:
+			self.countCoalesced += 1
+
+		elif len(self.queue) >= self.maxQueueSize:
+			self._countDropped("sensoralertsoff")
+			self.queueCondition.release()
+			logging.error("[%s]: Queue is full, dropping " % self.fileName
+				+ "sensor alerts off (%s:%d)."
+				% (self.clientComm.clientAddress, self.clientComm.clientPort))
+			return False
+
+		else:
+			self.queuedSensorAlertsOff = self._appendMessage(
+				"sensoralertsoff", None)
+
+		self.queueCondition.release()
+		return True
+
+
+	def run(self):
+
+		while 1:
+
+			# wait until a message is queued
+			self.queueCondition.acquire()
+			while len(self.queue) == 0 and not self.exitFlag:
+				self.queueCondition.wait()
+
+			# check if thread should terminate
+			if self.exitFlag:
+
+				# sensor alerts that are still queued are not delivered
+				undeliveredMessages = [message for message in self.queue
+					if message[0] == "sensoralert"]
+				self.queue.clear()
+				self.queueCondition.release()
+
+				for message in undeliveredMessages:
+					self.countSensorAlertsFailed += 1
+					if message[2][7] is not None:
+						message[2][7].reportResult(self.clientComm, False)
+
+				averageSensorAlertLatency = 0.0
+				if self.countSensorAlertsSent != 0:
+					averageSensorAlertLatency = (self.sumSensorAlertLatency
+						/ self.countSensorAlertsSent)
+
+				logging.debug("[%s]: Exiting sender. " % self.fileName
+					+ "Queued: %d; Coalesced: %d; Dropped: %d; Sent: %d; "
+					% (self.countQueued, self.countCoalesced,
+					self.countDropped, self.countSent)
+					+ "Failed: %d; Max queue length: %d; "
+					% (self.countFailed, self.maxQueueLength)
+					+ "Max time in queue: %.3fs; "
+					% self.maxTimeInQueue
+					+ "Sensor alerts sent: %d; Sensor alerts failed: %d; "
+					% (self.countSensorAlertsSent,
+					self.countSensorAlertsFailed)
+					+ "Sensor alert latency avg/max: %.3fs/%.3fs (%s:%d)."
+					% (averageSensorAlertLatency, self.maxSensorAlertLatency,
+					self.clientComm.clientAddress, self.clientComm.clientPort))
+				return
+
+			message = self.queue.popleft()
+			messageType = message[0]
+			arguments = message[2]
+
+			# message can not be coalesced anymore
+			if message is self.queuedManagerUpdate:
+				self.queuedManagerUpdate = None
+			elif message is self.queuedSensorAlertsOff:
+				self.queuedSensorAlertsOff = None
+			elif message is self.queuedStateChanges:
+				self.queuedStateChanges = None
+
+			self.queueCondition.release()
+
+			sendingStartTime = time.time()
+			timeInQueue = sendingStartTime - message[1]
+			self.sumTimeInQueue += timeInQueue
+			if timeInQueue > self.maxTimeInQueue:
+				self.maxTimeInQueue = timeInQueue
+
+			if self.tracer is not None:
+				self.tracer.startSpan("send %s" % messageType,
+					self.clientComm.nodeType)
+
+			# send status update to manager
+			if messageType == "status":
+				returnValue = self.clientComm.sendManagerUpdate()
+
+			# send state changes to manager
+			elif messageType == "statechange":
+				returnValue = self.clientComm.sendManagerStateChange(
+					arguments.items())
+
+			# send sensor alert to manager/alert
+			elif messageType == "sensoralert":
+				returnValue = self.clientComm.sendSensorAlert(arguments[0],
+					arguments[1], arguments[2], arguments[3], arguments[4],
+					arguments[5], arguments[6])
+
+				if returnValue:
+					latency = time.time() - message[1]
+					self.countSensorAlertsSent += 1
+					self.sumSensorAlertLatency += latency
+					if latency > self.maxSensorAlertLatency:
+						self.maxSensorAlertLatency = latency
+				else:
+					self.countSensorAlertsFailed += 1
+
+				# report the result to the delivery of the sensor alert
+				if arguments[7] is not None:
+					arguments[7].reportResult(self.clientComm, returnValue)
+
+			# send sensor alerts off to alert client
+			else:
+				returnValue = self.clientComm.sendAlertSensorAlertsOff()
+
+			if self.tracer is not None:
+				self.tracer.endSpan()
+
+			if self.metrics is not None:
+				labels = (("type", messageType),
+					("nodetype", self.clientComm.nodeType))
+				self.metrics.observe("alertr_sender_queue_seconds",
+					timeInQueue, labels)
+				self.metrics.observe("alertr_message_sending_seconds",
+					time.time() - sendingStartTime, labels)
+				if not returnValue:
+					self.metrics.incrementCounter(
+						"alertr_messages_sending_failed_total", labels)
+
+			if returnValue:
+				self.countSent += 1
+			else:
+				self.countFailed += 1
+				logging.error("[%s]: Sending %s " % (self.fileName, messageType)
+					+ "message to client failed (%s:%d)."
 					% (self.clientComm.clientAddress,
 					self.clientComm.clientPort))
-				return
+
+
+	# sets the exit flag to shut down the thread
+	def exit(self):
+		self.queueCondition.acquire()
+		self.exitFlag = True
+		self.queueCondition.notify()
+		self.queueCondition.release()
+		return
 
 
 # this class is used to change an option
@@ -2681,7 +4025,7 @@ class AsynchronousOptionExecuter(threading.Thread):
 		# get global configured data
 		self.globalData = globalData
 		self.storage = self.globalData.storage
-		self.serverSessions = self.globalData.serverSessions
+		self.sessionRegistry = self.globalData.sessionRegistry
 		self.asyncOptionExecuters = self.globalData.asyncOptionExecuters
 		self.asyncOptionExecutersLock \
 			= self.globalData.asyncOptionExecutersLock
@@ -2732,29 +4076,15 @@ class AsynchronousOptionExecuter(threading.Thread):
 		# => send sensor alerts off to alert clients
 		if (self.optionType == "alertSystemActive"
 			and self.optionValue == 0):
-			for serverSession in self.serverSessions:
-				# ignore sessions which do not exist yet
-				# and that are not managers
-				if serverSession.clientComm == None:
-					continue
-				if serverSession.clientComm.nodeType != "alert":
-					continue
-				if not serverSession.clientComm.clientInitialized:
-					continue
+			for clientComm in self.sessionRegistry.getClientsByNodeType(
+				"alert"):
 
-				# sending sensor alerts off to alert client
-				# via a thread to not block this one
-				sensorAlertsOffProcess = AsynchronousSender(
-					self.globalData, serverSession.clientComm)
-				# set thread to daemon
-				# => threads terminates when main thread terminates	
-				sensorAlertsOffProcess.daemon = True
-				sensorAlertsOffProcess.sendAlertSensorAlertsOff = True
+				# queue sensor alerts off for the alert client
+				# to not block this thread
 				logging.debug("[%s]: Sending sensor " % self.fileName
 					+ "alerts off to alert client (%s:%d)."
-					% (serverSession.clientComm.clientAddress,
-					serverSession.clientComm.clientPort))
-				sensorAlertsOffProcess.start()
+					% (clientComm.clientAddress, clientComm.clientPort))
+				clientComm.asyncSender.queueAlertSensorAlertsOff()
 
 		# wake up manager update executer
 		self.managerUpdateExecuter.forceStatusUpdate = True
@@ -0,0 +1,219 @@
+#!/usr/bin/python2
+
+# written by sqall
+# twitter: https://twitter.com/sqall01
+# blog: http://blog.h4des.org
+# github: https://github.com/sqall01
+#
+# Licensed under the GNU Public License, version 2.
+
+import threading
+
+
+# this class holds all server sessions and indexes the client communications
+# of the connected clients by their username, node id, node type and
+# the alert levels they handle (all functions are thread safe)
+class SessionRegistry:
+
+	def __init__(self):
+
+		# lock that makes the registry thread safe
+		self.lock = threading.Lock()
+
+		# all server sessions (also the ones that are not initialized yet)
+		self.serverSessions = set()
+
+		# client communications indexed by the username they use
+		# (key: username; value: client communication)
+		self.clientsByUsername = dict()
+
+		# client communications indexed by their node id
+		# (key: nodeId; value: client communication)
+		self.clientsByNodeId = dict()
+
+		# initialized client communications indexed by their node type
+		# (key: nodeType; value: set of client communications)
+		self.clientsByNodeType = dict()
+
+		# initialized client communications of alert clients indexed by the
+		# alert levels of their alerts
+		# (key: level; value: set of client communications)
+		self.clientsByAlertLevel = dict()
+
+
+	# internal function that removes a client communication from all indexes
+	# (lock has to be acquired by the caller)
+	def _removeClient(self, clientComm):
+
+		if (clientComm.username is not None
+			and clientComm.username in self.clientsByUsername
+			and self.clientsByUsername[clientComm.username] is clientComm):
+			del self.clientsByUsername[clientComm.username]
+
+		if (clientComm.nodeId in self.clientsByNodeId
+			and self.clientsByNodeId[clientComm.nodeId] is clientComm):
+			del self.clientsByNodeId[clientComm.nodeId]
+
+		if clientComm.nodeType in self.clientsByNodeType:
+			self.clientsByNodeType[clientComm.nodeType].discard(clientComm)
+
+		for level in clientComm.clientAlertLevels:
+			if level in self.clientsByAlertLevel:
+				self.clientsByAlertLevel[level].discard(clientComm)
+
+
+	# adds a server session
+	def addSession(self, serverSession):
+
+		self.lock.acquire()
+		self.serverSessions.add(serverSession)
+		self.lock.release()
+
+
+	# removes a server session and its client communication from all indexes
+	# (can be called more than once)
+	def removeSession(self, serverSession):
+
+		self.lock.acquire()
+		self.serverSessions.discard(serverSession)
+		if serverSession.clientComm is not None:
+			self._removeClient(serverSession.clientComm)
+		self.lock.release()
+
+
+	# gets all server sessions
+	#
+	# return list of server sessions
+	def getSessions(self):
+
+		self.lock.acquire()
+		serverSessions = list(self.serverSessions)
+		self.lock.release()
+
+		return serverSessions
+
+
+	# checks if the server session is handled by the server
+	def hasSession(self, serverSession):
+
+		self.lock.acquire()
+		hasSession = (serverSession in self.serverSessions)
+		self.lock.release()
+
+		return hasSession
+
+
+	# claims the username for the client communication
+	#
+	# return False if the username is already used by another client
+	def claimUsername(self, clientComm, username):
+
+		self.lock.acquire()
+		if (username in self.clientsByUsername
+			and self.clientsByUsername[username] is not clientComm):
+			self.lock.release()
+			return False
+
+		self.clientsByUsername[username] = clientComm
+		self.lock.release()
+
+		return True
+
+
+	# adds the client communication to the index of node ids
+	# (called as soon as the node id of the client is known)
+	def registerNode(self, clientComm):
+
+		self.lock.acquire()
+		self.clientsByNodeId[clientComm.nodeId] = clientComm
+		self.lock.release()
+
+
+	# adds the client communication to the indexes of node types and
+	# alert levels (called after the initialization of the client
+	# has finished)
+	def registerClient(self, clientComm):
+
+		self.lock.acquire()
+
+		if not clientComm.nodeType in self.clientsByNodeType:
+			self.clientsByNodeType[clientComm.nodeType] = set()
+		self.clientsByNodeType[clientComm.nodeType].add(clientComm)
+
+		for level in clientComm.clientAlertLevels:
+			if not level in self.clientsByAlertLevel:
+				self.clientsByAlertLevel[level] = set()
+			self.clientsByAlertLevel[level].add(clientComm)
+
+		self.lock.release()
+
+
+	# removes the client communication from all indexes
+	def unregisterClient(self, clientComm):
+
+		self.lock.acquire()
+		self._removeClient(clientComm)
+		self.lock.release()
+
+
+	# checks if a client with the given node id is connected
+	def isNodeConnected(self, nodeId):
+
+		self.lock.acquire()
+		isConnected = (nodeId in self.clientsByNodeId)
+		self.lock.release()
+
+		return isConnected
+
+
+	# gets the initialized client communications of the given node type
+	#
+	# return list of client communications
+	def getClientsByNodeType(self, nodeType):
+
+		self.lock.acquire()
+		if nodeType in self.clientsByNodeType:
+			clients = list(self.clientsByNodeType[nodeType])
+		else:
+			clients = list()
+		self.lock.release()
+
+		return clients
+
+
+	# gets the number of server sessions and of the initialized clients
+	# of each node type
+	#
+	# return tuple (number of sessions, dict (key: node type;
+	# value: number of clients))
+	def getSessionCounts(self):
+
+		self.lock.acquire()
+		countSessions = len(self.serverSessions)
+		clientCounts = dict()
+		for nodeType, clients in self.clientsByNodeType.items():
+			clientCounts[nodeType] = len(clients)
+		self.lock.release()
+
+		return (countSessions, clientCounts)
+
+
+	# gets the initialized client communications that have to receive a
+	# sensor alert for the given alert levels (all manager clients and the
+	# alert clients that handle one of the alert levels)
+	#
+	# return list of client communications
+	def getSensorAlertClients(self, alertLevels):
+
+		self.lock.acquire()
+
+		clients = set()
+		if "manager" in self.clientsByNodeType:
+			clients.update(self.clientsByNodeType["manager"])
+		for level in alertLevels:
+			if level in self.clientsByAlertLevel:
+				clients.update(self.clientsByAlertLevel[level])
+
+		self.lock.release()
+
+		return list(clients)
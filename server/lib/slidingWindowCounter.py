@@ -0,0 +1,96 @@
+#!/usr/bin/python2
+
+# written by sqall
+# twitter: https://twitter.com/sqall01
+# blog: http://blog.h4des.org
+# github: https://github.com/sqall01
+#
+# Licensed under the GNU Public License, version 2.
+
+import collections
+
+
+# this class counts the times of events that happened in a sliding window
+# (the times are kept sorted, so expired times are removed from the front
+# and new times are normally appended at the end)
+class SlidingWindowCounter:
+
+	def __init__(self, windowSize, maxSize):
+
+		# the time in seconds a counted time stays in the counter
+		self.windowSize = windowSize
+
+		# the maximum number of times that are stored in the counter
+		# (when it is reached the oldest time is removed)
+		self.maxSize = maxSize
+
+		# the counted times in ascending order
+		self.times = collections.deque()
+
+		# the counted times for a fast membership check
+		self.timesSet = set()
+
+		# number of times that were removed because the counter was full
+		self.countEvicted = 0
+
+
+	def __len__(self):
+		return len(self.times)
+
+
+	def __contains__(self, timeCounted):
+		return timeCounted in self.timesSet
+
+
+	def __iter__(self):
+		return iter(self.times)
+
+
+	# adds a time to the counter
+	#
+	# return False if the oldest time had to be removed for it, else True
+	def add(self, timeCounted):
+
+		notEvicted = True
+		if len(self.times) >= self.maxSize:
+			self.timesSet.discard(self.times.popleft())
+			self.countEvicted += 1
+			notEvicted = False
+
+		# times are normally added in ascending order
+		# => only re-sort the counter if they are not
+		if len(self.times) == 0 or timeCounted >= self.times[-1]:
+			self.times.append(timeCounted)
+		else:
+			self.times = collections.deque(sorted(
+				list(self.times) + [timeCounted]))
+		self.timesSet.add(timeCounted)
+
+		return notEvicted
+
+
+	# removes all times from the counter whose window has passed
+	# before the given time
+	#
+	# return number of removed times
+	def expire(self, currentTime):
+
+		countExpired = 0
+		while (len(self.times) != 0
+			and (self.times[0] + self.windowSize) < currentTime):
+			self.timesSet.discard(self.times.popleft())
+			countExpired += 1
+
+		return countExpired
+
+
+	# gets the earliest time a counted time expires after the given time
+	#
+	# return time or None
+	def getNextExpiration(self, afterTime):
+
+		for timeCounted in self.times:
+			if (timeCounted + self.windowSize) > afterTime:
+				return timeCounted + self.windowSize
+
+		return None
@@ -12,14 +12,490 @@ import logging
 import os
 import socket
 import time
+import threading
+import collections
+
+
+# this class sends the queued eMails in the background over one
+# persistent connection to the smtp server (sensor alert eMails for the
+# same address are collected to one digest eMail during alert storms and
+# eMails that could not be sent are retried with an increasing interval)
+class SMTPSender(threading.Thread):
+
+	def __init__(self, host, port, fromAddr, globalData):
+		threading.Thread.__init__(self)
+
+		# file nme of this file (used for logging)
+		self.fileName = os.path.basename(__file__)
+
+		self.host = host
+		self.port = port
+		self.fromAddr = fromAddr
+
+		# get global configured data
+		self.globalData = globalData
+		self.maxQueueSize = self.globalData.smtpQueueSize
+		self.digestInterval = self.globalData.smtpDigestInterval
+		self.retryInterval = self.globalData.smtpRetryInterval
+		self.maxRetryInterval = self.globalData.smtpMaxRetryInterval
+		self.maxAttempts = self.globalData.smtpMaxAttempts
+		self.idleTimeout = self.globalData.smtpIdleTimeout
+		self.timeout = self.globalData.smtpTimeout
+		self.exitAttempts = self.globalData.smtpExitAttempts
+		self.exitTimeout = self.globalData.smtpExitTimeout
+
+		# queue of all eMails that have to be sent (a list of
+		# [toAddr, subject, message, timeQueued, isSensorAlert,
+		# failedAttempts] elements)
+		self.queue = collections.deque()
+
+		# condition that is used to make the queue thread safe and
+		# to wake up the thread when an eMail was queued
+		self.queueCondition = threading.Condition()
+
+		# time until which sensor alert eMails are collected for a digest
+		# (key: toAddr; value: time)
+		self.digestUntil = dict()
+
+		# time of the next attempt to send an eMail after a failure
+		# and the interval to wait after the next failure
+		self.nextAttemptTime = 0.0
+		self.currentRetryInterval = self.retryInterval
+
+		# the connection to the smtp server (kept open until it
+		# was not used for the idle timeout) and the time it was last used
+		self.smtpServer = None
+		self.lastUsed = 0.0
+
+		# statistics of the queue
+		self.countQueued = 0
+		self.countDropped = 0
+		self.countSent = 0
+		self.countDigests = 0
+		self.countFailed = 0
+		self.countRetries = 0
+		self.countConnections = 0
+		self.maxQueueLength = 0
+		self.maxTimeInQueue = 0.0
+
+		# the metrics of the server (None if they are not activated)
+		self.metrics = self.globalData.metrics
+		if self.metrics is not None:
+			self.metrics.registerCallback("alertr_smtp_queue_length",
+				"gauge", "eMails that are not sent yet.",
+				self._getQueueMetrics)
+			self.metrics.registerCallback("alertr_smtp_emails_total",
+				"counter", "eMails handled by the smtp sender by event.",
+				self._getMailMetrics)
+			self.metrics.registerCallback("alertr_smtp_connections_total",
+				"counter", "Connections opened to the smtp server.",
+				self._getConnectionMetrics)
+
+		# set exit flag as false
+		self.exitFlag = False
+
+
+	# internal function that gets the length of the queue for the metrics
+	#
+	# return list of tuples (labels, value)
+	def _getQueueMetrics(self):
+		return [((), len(self.queue))]
+
+
+	# internal function that gets the statistics of the eMails
+	# for the metrics
+	#
+	# return list of tuples (labels, value)
+	def _getMailMetrics(self):
+		return [((("event", "queued"),), self.countQueued),
+			((("event", "dropped"),), self.countDropped),
+			((("event", "sent"),), self.countSent),
+			((("event", "digest"),), self.countDigests),
+			((("event", "failed"),), self.countFailed),
+			((("event", "retried"),), self.countRetries)]
+
+
+	# internal function that gets the number of connections
+	# for the metrics
+	#
+	# return list of tuples (labels, value)
+	def _getConnectionMetrics(self):
+		return [((), self.countConnections)]
+
+
+	# internal function that removes the next eMails that have to be sent
+	# from the queue (all sensor alert eMails for the same address
+	# are returned together)
+	# (queue condition has to be acquired by the caller)
+	#
+	# return list of eMails or None
+	def _getNextMails(self, currentTime):
+
+		if currentTime < self.nextAttemptTime:
+			return None
+
+		# remove digest intervals that are over
+		for toAddr in list(self.digestUntil.keys()):
+			if self.digestUntil[toAddr] <= currentTime:
+				del self.digestUntil[toAddr]
+
+		for mail in self.queue:
+			if not mail[4] or mail[0] not in self.digestUntil:
+				break
+		else:
+			return None
+
+		if not mail[4]:
+			self.queue.remove(mail)
+			return [mail]
+
+		mails = [queuedMail for queuedMail in self.queue
+			if queuedMail[4] and queuedMail[0] == mail[0]]
+		self.queue = collections.deque([queuedMail
+			for queuedMail in self.queue
+			if not queuedMail[4] or queuedMail[0] != mail[0]])
+		return mails
+
+
+	# internal function that gets the time the thread has to wait
+	# until it has something to do
+	# (queue condition has to be acquired by the caller)
+	#
+	# return time in seconds or None
+	def _getWaitTimeout(self, currentTime):
+
+		wakeupTime = None
+
+		# either the next attempt after a failure or the end of
+		# a digest interval is awaited
+		if len(self.queue) != 0:
+			if self.nextAttemptTime > currentTime:
+				wakeupTime = self.nextAttemptTime
+			elif len(self.digestUntil) != 0:
+				wakeupTime = min(self.digestUntil.values())
+
+		# close the connection when it is idle
+		if self.smtpServer is not None:
+			idleTime = self.lastUsed + self.idleTimeout
+			if wakeupTime is None or idleTime < wakeupTime:
+				wakeupTime = idleTime
+
+		if wakeupTime is None:
+			return None
+		return max(wakeupTime - currentTime, 0.01)
+
+
+	# internal function that closes the connection to the smtp server
+	def _closeConnection(self):
+
+		if self.smtpServer is None:
+			return
+
+		try:
+			self.smtpServer.quit()
+		except Exception as e:
+			try:
+				self.smtpServer.close()
+			except Exception as e:
+				pass
+
+		self.smtpServer = None
+
+
+	# internal function that sends an eMail to the configured smtp server
+	# (a connection that was closed by the smtp server is reopened once)
+	#
+	# return True, False if sending should be retried or None
+	# if the smtp server rejected the eMail permanently
+	def _sendMail(self, toAddr, subject, message):
+
+		emailHeader = "From: %s\r\nTo: %s\r\nSubject: %s\r\n" \
+			% (self.fromAddr, toAddr, subject)
+
+		# sending eMail alert to configured smtp server
+		logging.info("[%s]: Sending eMail alert to %s."
+			% (self.fileName, toAddr))
+
+		for attempt in range(2):
+
+			reusedConnection = self.smtpServer is not None
+
+			try:
+				if self.smtpServer is None:
+					self.smtpServer = smtplib.SMTP(self.host, self.port,
+						timeout=self.timeout)
+					self.countConnections += 1
+
+				self.smtpServer.sendmail(self.fromAddr, toAddr,
+					emailHeader + message)
+				self.lastUsed = time.time()
+
+				return True
+
+			except smtplib.SMTPRecipientsRefused as e:
+				logging.exception("[%s]: Unable to send eMail alert. "
+					% self.fileName)
+
+				for code, _ in e.recipients.values():
+					if code < 500:
+						return False
+				return None
+
+			except smtplib.SMTPResponseException as e:
+				logging.exception("[%s]: Unable to send eMail alert. "
+					% self.fileName)
+
+				if (e.smtp_code >= 500
+					and not isinstance(e, smtplib.SMTPConnectError)):
+					return None
+
+				# the smtp server closes the connection
+				if e.smtp_code == 421:
+					self._closeConnection()
+				return False
+
+			except Exception as e:
+				self._closeConnection()
+
+				# the smtp server could have closed the connection
+				# while it was idle => try it with a new connection
+				if reusedConnection and attempt == 0:
+					logging.debug("[%s]: Connection to smtp server "
+						% self.fileName
+						+ "was closed. Reconnecting.")
+					continue
+
+				logging.exception("[%s]: Unable to send eMail alert. "
+					% self.fileName)
+				return False
+
+		return False
+
+
+	# internal function that creates the subject and message of the
+	# eMail that is sent for the given eMails (all sensor alert eMails
+	# for the same address are sent as one digest eMail)
+	#
+	# return tuple of (subject, message)
+	def _composeMail(self, mails):
+
+		if len(mails) == 1:
+			return (mails[0][1], mails[0][2])
+
+		subject = "[alertR] %d sensor alerts triggered" % len(mails)
+		message = "The following %d sensor alerts " % len(mails) \
+			+ "were triggered since the last eMail alert.\n\n" \
+			+ "\n\n".join(["%s\n%s" % (mail[1], mail[2])
+			for mail in mails])
+		return (subject, message)
+
+
+	# internal function that sends the eMails that are still queued
+	# when the thread exits (digest intervals and retry times are not
+	# awaited anymore, the attempts and the time are bounded and
+	# every eMail that could not be sent is logged)
+	#
+	# return number of undelivered eMails
+	def _drainQueue(self):
+
+		deadline = time.time() + self.exitTimeout
+		countUndelivered = 0
+
+		while 1:
+
+			self.queueCondition.acquire()
+			self.digestUntil.clear()
+			self.nextAttemptTime = 0.0
+			mails = self._getNextMails(time.time())
+			self.queueCondition.release()
+
+			# all queued eMails were handled
+			if mails is None:
+				return countUndelivered
+
+			toAddr = mails[0][0]
+			subject, message = self._composeMail(mails)
+
+			result = False
+			for attempt in range(self.exitAttempts):
+				if time.time() >= deadline:
+					break
+				result = self._sendMail(toAddr, subject, message)
+				if result is not False:
+					break
+
+			if result:
+				self.countSent += 1
+				if len(mails) > 1:
+					self.countDigests += 1
+				continue
+
+			for mail in mails:
+				self.countFailed += 1
+				countUndelivered += 1
+				logging.error("[%s]: Dropping eMail alert '%s' to %s "
+					% (self.fileName, mail[1], toAddr)
+					+ "queued at %s on exit."
+					% time.strftime("%D %H:%M:%S", time.localtime(mail[3])))
+
+
+	# this function queues an eMail that is sent in the background
+	#
+	# return True or False
+	def queueMail(self, toAddr, subject, message, isSensorAlert):
+
+		self.queueCondition.acquire()
+
+		if self.exitFlag:
+			self.queueCondition.release()
+			return False
+
+		if len(self.queue) >= self.maxQueueSize:
+			self.countDropped += 1
+			self.queueCondition.release()
+
+			logging.error("[%s]: eMail queue is full. " % self.fileName
+				+ "Dropping eMail alert to %s." % toAddr)
+
+			return False
+
+		self.queue.append([toAddr, subject, message, time.time(),
+			isSensorAlert, 0])
+
+		self.countQueued += 1
+		if len(self.queue) > self.maxQueueLength:
+			self.maxQueueLength = len(self.queue)
+
+		# wake up the thread
+		self.queueCondition.notify()
+		self.queueCondition.release()
+
+		return True
+
+
+	def run(self):
+
+		while 1:
+
+			# wait until an eMail has to be sent
+			self.queueCondition.acquire()
+			mails = None
+			if not self.exitFlag:
+				currentTime = time.time()
+				mails = self._getNextMails(currentTime)
+				if mails is None:
+					self.queueCondition.wait(
+						self._getWaitTimeout(currentTime))
+
+			# check if thread should terminate
+			# (the still queued eMails are sent before)
+			if self.exitFlag:
+				self.queueCondition.release()
+
+				countUndelivered = self._drainQueue()
+				self._closeConnection()
+
+				logging.debug("[%s]: Exiting smtp sender. " % self.fileName
+					+ "Queued: %d; Dropped: %d; Sent: %d; Digests: %d; "
+					% (self.countQueued, self.countDropped, self.countSent,
+					self.countDigests)
+					+ "Failed: %d; Retries: %d; Connections: %d; "
+					% (self.countFailed, self.countRetries,
+					self.countConnections)
+					+ "Undelivered: %d; Max queue length: %d; "
+					% (countUndelivered, self.maxQueueLength)
+					+ "Max time in queue: %.3fs."
+					% self.maxTimeInQueue)
+				return
+
+			self.queueCondition.release()
+
+			# close the connection if it was not used for the idle timeout
+			if mails is None:
+				if (self.smtpServer is not None
+					and (time.time() - self.lastUsed) >= self.idleTimeout):
+					self._closeConnection()
+				continue
+
+			# send all sensor alert eMails for the same address
+			# as one digest eMail
+			toAddr = mails[0][0]
+			subject, message = self._composeMail(mails)
+
+			result = self._sendMail(toAddr, subject, message)
+
+			currentTime = time.time()
+
+			if result:
+				self.countSent += 1
+				if len(mails) > 1:
+					self.countDigests += 1
+				for mail in mails:
+					timeInQueue = currentTime - mail[3]
+					if timeInQueue > self.maxTimeInQueue:
+						self.maxTimeInQueue = timeInQueue
+
+				self.nextAttemptTime = 0.0
+				self.currentRetryInterval = self.retryInterval
+
+				# collect the following sensor alert eMails for this
+				# address to a digest eMail
+				if mails[0][4] and self.digestInterval > 0:
+					self.queueCondition.acquire()
+					self.digestUntil[toAddr] = (currentTime
+						+ self.digestInterval)
+					self.queueCondition.release()
+
+				continue
+
+			# drop eMails that were rejected permanently or that
+			# failed too often and retry the others
+			retryMails = list()
+			for mail in mails:
+				mail[5] += 1
+				if result is None or mail[5] >= self.maxAttempts:
+					self.countFailed += 1
+					logging.error("[%s]: Giving up sending eMail alert "
+						% self.fileName
+						+ "'%s' to %s after %d attempts."
+						% (mail[1], toAddr, mail[5]))
+				else:
+					retryMails.append(mail)
+
+			if len(retryMails) == 0:
+				continue
+
+			self.countRetries += 1
+			logging.warning("[%s]: Retrying to send %d eMail alert(s) "
+				% (self.fileName, len(retryMails))
+				+ "in %.1f seconds." % self.currentRetryInterval)
+
+			self.queueCondition.acquire()
+			self.queue.extendleft(reversed(retryMails))
+			self.nextAttemptTime = currentTime + self.currentRetryInterval
+			self.queueCondition.release()
+
+			self.currentRetryInterval = min(self.currentRetryInterval * 2,
+				self.maxRetryInterval)
+
+
+	# sets the exit flag to shut down the thread
+	# (the thread sends the still queued eMails before it terminates)
+	def exit(self):
+		self.queueCondition.acquire()
+		self.exitFlag = True
+		self.queueCondition.notify()
+		self.queueCondition.release()
+		return
 
 
 # this class handles the eMail alerts that are sent via smtp
+# (the eMails are queued and sent by a background thread)
 class SMTPAlert:
 
-	def __init__(self, host, port, fromAddr, toAddr):
+	def __init__(self, host, port, fromAddr, toAddr, globalData):
 
-		if (host != "127.0.0.1" 
+		if (host != "127.0.0.1"
 			or port != 25):
 			raise NotImplementedError('Only host "127.0.0.1" and '
 				+ 'port "25" is implemented')
@@ -39,6 +515,13 @@ class SMTPAlert:
 		self.newestVersion = None
 		self.newestRev = None
 
+		# this flag keeps track if an update check problem alert was sent
+		self.updateFailureAlertSent = False
+
+		# the thread that sends the queued eMails
+		# (has to be started by the caller)
+		self.smtpSender = SMTPSender(host, port, fromAddr, globalData)
+
 
 	# this function sends an email alert in case of
 	# a sensor alert
@@ -53,24 +536,7 @@ class SMTPAlert:
 			+ "The description of the sensor is '%s'." \
 			% description
 
-		emailHeader = "From: %s\r\nTo: %s\r\nSubject: %s\r\n" \
-			% (self.fromAddr, toAddr, subject)
-
-		# sending eMail alert to configured smtp server
-		logging.info("[%s]: Sending eMail alert to %s." 
-			% (self.fileName, toAddr))
-		try:
-
-			smtpServer = smtplib.SMTP(self.host, self.port)
-			smtpServer.sendmail(self.fromAddr, toAddr, 
-				emailHeader + message)
-			smtpServer.quit()
-		except Exception as e:
-			logging.exception("[%s]: Unable to send eMail alert. " 
-				% self.fileName)
-			return False
-
-		return True
+		return self.smtpSender.queueMail(toAddr, subject, message, True)
 
 
 	# this function sends an email alert in case of
@@ -84,24 +550,7 @@ class SMTPAlert:
 			+ "triggered on %s." \
 			% time.strftime("%D %H:%M:%S", time.localtime(timeTriggered))
 
-		emailHeader = "From: %s\r\nTo: %s\r\nSubject: %s\r\n" \
-			% (self.fromAddr, toAddr, subject)
-
-		# sending eMail alert to configured smtp server
-		logging.info("[%s]: Sending eMail alert to %s." 
-			% (self.fileName, toAddr))
-		try:
-
-			smtpServer = smtplib.SMTP(self.host, self.port)
-			smtpServer.sendmail(self.fromAddr, toAddr, 
-				emailHeader + message)
-			smtpServer.quit()
-		except Exception as e:
-			logging.exception("[%s]: Unable to send eMail alert. " 
-				% self.fileName)
-			return False
-
-		return True
+		return self.smtpSender.queueMail(toAddr, subject, message, True)
 
 
 	# this function sends an email alert in case of
@@ -118,24 +567,8 @@ class SMTPAlert:
 			+ "The last state was received at: %s" \
 			% time.strftime("%D %H:%M:%S", time.localtime(lastStateUpdated))
 
-		emailHeader = "From: %s\r\nTo: %s\r\nSubject: %s\r\n" \
-			% (self.fromAddr, self.toAddr, subject)
-
-		# sending eMail alert to configured smtp server
-		logging.info("[%s]: Sending eMail alert to %s." 
-			% (self.fileName, self.toAddr))
-		try:
-
-			smtpServer = smtplib.SMTP(self.host, self.port)
-			smtpServer.sendmail(self.fromAddr, self.toAddr, 
-				emailHeader + message)
-			smtpServer.quit()
-		except Exception as e:
-			logging.exception("[%s]: Unable to send eMail alert. " 
-				% self.fileName)
-			return False
-
-		return True
+		return self.smtpSender.queueMail(self.toAddr, subject, message,
+			False)
 
 
 	# this function sends an email in case of
@@ -153,22 +586,32 @@ class SMTPAlert:
 			+ "has been received at: %s" \
 			% time.strftime("%D %H:%M:%S", time.localtime(lastStateUpdated))
 
-		emailHeader = "From: %s\r\nTo: %s\r\nSubject: %s\r\n" \
-			% (self.fromAddr, self.toAddr, subject)
+		return self.smtpSender.queueMail(self.toAddr, subject, message,
+			False)
 
-		# sending eMail alert to configured smtp server
-		logging.info("[%s]: Sending eMail alert to %s." 
-			% (self.fileName, self.toAddr))
-		try:
-			smtpServer = smtplib.SMTP(self.host, self.port)
-			smtpServer.sendmail(self.fromAddr, self.toAddr, 
-				emailHeader + message)
-			smtpServer.quit()
-		except Exception as e:
-			logging.exception("[%s]: Unable to send eMail alert. " 
-				% self.fileName)
+
+	# this function sends an email in case of
+	# a problem with the update check
+	def sendUpdateCheckFailureAlert(self, updateFailCount, clientName):
+
+		if self.updateFailureAlertSent:
+			return True
+
+		subject = "[alertR] Update check problems detected"
+
+		message = "Problems detected on the client '%s' on host '%s'. " \
+			% (clientName, socket.gethostname()) \
+			+ "The client was not able to check for an update for %d times " \
+			% updateFailCount \
+			+ "in a row."
+
+		if not self.smtpSender.queueMail(self.toAddr, subject, message,
+			False):
 			return False
 
+		# set flag that an update check problem alert was sent before exiting
+		self.updateFailureAlertSent = True
+
 		return True
 
 
@@ -185,20 +628,8 @@ class SMTPAlert:
 			+ "'%s' on host '%s' were solved after %d attempts." \
 			% (clientName, socket.gethostname(), updateFailCount)
 
-		emailHeader = "From: %s\r\nTo: %s\r\nSubject: %s\r\n" \
-			% (self.fromAddr, self.toAddr, subject)
-
-		# sending eMail alert to configured smtp server
-		logging.info("[%s]: Sending eMail alert to %s." 
-			% (self.fileName, self.toAddr))
-		try:
-			smtpServer = smtplib.SMTP(self.host, self.port)
-			smtpServer.sendmail(self.fromAddr, self.toAddr, 
-				emailHeader + message)
-			smtpServer.quit()
-		except Exception as e:
-			logging.exception("[%s]: Unable to send eMail alert. " 
-				% self.fileName)
+		if not self.smtpSender.queueMail(self.toAddr, subject, message,
+			False):
 			return False
 
 		# clear flag that an update check problem alert was sent before exiting
@@ -255,24 +686,12 @@ class SMTPAlert:
 				+ "instance again." \
 				+ "\n"
 
-		emailHeader = "From: %s\r\nTo: %s\r\nSubject: %s\r\n" \
-			% (self.fromAddr, self.toAddr, subject)
-
-		# sending eMail alert to configured smtp server
-		logging.info("[%s]: Sending eMail alert to %s." 
-			% (self.fileName, self.toAddr))
-		try:
-			smtpServer = smtplib.SMTP(self.host, self.port)
-			smtpServer.sendmail(self.fromAddr, self.toAddr, 
-				emailHeader + message)
-			smtpServer.quit()
-		except Exception as e:
-			logging.exception("[%s]: Unable to send eMail alert. " 
-				% self.fileName)
+		if not self.smtpSender.queueMail(self.toAddr, subject, message,
+			False):
 			return False
 
 		# store the new version and revision
 		self.newestVersion = version
 		self.newestRev = rev
 
-		return True
\ No newline at end of file
+		return True
@@ -17,7 +17,141 @@ import hashlib
 
 
 # internal abstract class for new storage backends
-class _Storage():
+class _Storage(object):
+
+	# internal function that initializes the locking of the database
+	# (all writes are serialized by the lock; if reads are processed
+	# concurrently they do not acquire the lock)
+	def _initLocking(self, concurrentReads, tracer):
+
+		# lock that serializes the access to the database
+		self.dbLock = threading.Semaphore(1)
+
+		# sets if reads are processed concurrently to each other and
+		# to writes (every thread uses its own connection to the database)
+		self.concurrentReads = concurrentReads
+
+		# data of the current thread (i.e., connection to the database)
+		self.threadData = threading.local()
+
+		# the tracer that records the waiting for the lock
+		# (None if tracing is not activated)
+		self.tracer = tracer
+
+		# statistics about the contention on the database
+		self.statisticsLock = threading.Lock()
+		self.lockCount = 0
+		self.lockContendedCount = 0
+		self.lockWaitTime = 0.0
+		self.lockMaxWaitTime = 0.0
+		self.readCount = 0
+		self.readActiveCount = 0
+		self.readMaxActiveCount = 0
+
+
+	# internal function that removes the cached sensors of all nodes
+	# (is used when sensors are added, changed or deleted)
+	def _clearNodeSensors(self):
+
+		# cached sensors of the nodes (key: nodeId; value: dict with
+		# key: remoteSensorId; value: list of
+		# [sensorId, state, alertDelay, description])
+		# (only accessed while the lock is held)
+		self.nodeSensors = dict()
+
+
+	# internal function that acquires the lock
+	def _acquireLock(self):
+		logging.debug("[%s]: Acquire lock." % self.fileName)
+
+		# only measure the waiting time if the lock is not free
+		waitTime = 0.0
+		if not self.dbLock.acquire(False):
+			startTime = time.time()
+			self.dbLock.acquire()
+			waitTime = time.time() - startTime
+			if self.tracer is not None:
+				self.tracer.addSpan("dbLock wait", startTime, waitTime)
+
+		self.statisticsLock.acquire()
+		self.lockCount += 1
+		if waitTime > 0.0:
+			self.lockContendedCount += 1
+			self.lockWaitTime += waitTime
+			if waitTime > self.lockMaxWaitTime:
+				self.lockMaxWaitTime = waitTime
+		self.statisticsLock.release()
+
+
+	# internal function that releases the lock
+	def _releaseLock(self):
+		logging.debug("[%s]: Release lock." % self.fileName)
+		self.dbLock.release()
+
+
+	# internal function that is used before reading from the database
+	# (acquires the lock if reads are not processed concurrently)
+	def _acquireReadLock(self):
+
+		if not self.concurrentReads:
+			self._acquireLock()
+			return
+
+		self.statisticsLock.acquire()
+		self.readCount += 1
+		self.readActiveCount += 1
+		if self.readActiveCount > self.readMaxActiveCount:
+			self.readMaxActiveCount = self.readActiveCount
+		self.statisticsLock.release()
+
+
+	# internal function that is used after reading from the database
+	# (releases the lock if reads are not processed concurrently)
+	def _releaseReadLock(self):
+
+		if not self.concurrentReads:
+			self._releaseLock()
+			return
+
+		self.statisticsLock.acquire()
+		self.readActiveCount -= 1
+		self.statisticsLock.release()
+
+
+	# gets the statistics about the contention on the database
+	#
+	# return dict with the statistics
+	def getLockStatistics(self):
+
+		self.statisticsLock.acquire()
+		lockStatistics = {"lockCount": self.lockCount,
+			"lockContendedCount": self.lockContendedCount,
+			"lockWaitTime": self.lockWaitTime,
+			"lockMaxWaitTime": self.lockMaxWaitTime,
+			"readCount": self.readCount,
+			"readActiveCount": self.readActiveCount,
+			"readMaxActiveCount": self.readMaxActiveCount}
+		self.statisticsLock.release()
+
+		return lockStatistics
+
+
+	# internal function that logs the statistics about the contention
+	# on the database
+	def _logLockStatistics(self):
+
+		lockStatistics = self.getLockStatistics()
+		logging.debug("[%s]: Database lock statistics. " % self.fileName
+			+ "Locked: %d; Contended: %d; Wait time: %.3fs; "
+			% (lockStatistics["lockCount"],
+			lockStatistics["lockContendedCount"],
+			lockStatistics["lockWaitTime"])
+			+ "Max wait time: %.3fs; Concurrent reads: %d; "
+			% (lockStatistics["lockMaxWaitTime"],
+			lockStatistics["readCount"])
+			+ "Max active reads: %d."
+			% lockStatistics["readMaxActiveCount"])
+
 
 	# creates the database (should only be called if the database
 	# does not exist)
@@ -67,14 +201,27 @@ class _Storage():
 		raise NotImplemented("Function not implemented yet.")
 
 
-	# adds a sensor alert to the database when the id of a node is given,
-	# the id of the sensor that is used internally by the node and the state
+	# adds a sensor alert when the id of a node is given, the id of the
+	# sensor that is used internally by the node and the state
+	# (updates the state of the sensor in the database, the sensor alert
+	# itself is only stored in the database if it is added to the journal)
 	#
-	# return True or False
+	# return a tuple (sensorAlertId, sensorId, nodeId, timeReceived,
+	# alertDelay, state, description, dataJson) with sensorAlertId None
+	# or None
 	def addSensorAlert(self, nodeId, remoteSensorId, state, dataJson):
 		raise NotImplemented("Function not implemented yet.")
 
 
+	# adds the given sensor alerts to the journal of sensor alerts
+	# in the database (in one transaction)
+	#
+	# return list of the sensorAlertIds in the same order
+	# or None
+	def addSensorAlertsToJournal(self, sensorAlerts):
+		raise NotImplemented("Function not implemented yet.")
+
+
 	# gets the id of the node by a given username
 	# (usernames are unique to each node)
 	#
@@ -138,7 +285,7 @@ class _Storage():
 		raise NotImplemented("Function not implemented yet.")
 
 
-	# gets all sensor alerts in the database
+	# gets all sensor alerts in the journal of sensor alerts
 	#
 	# return a list of tuples (sensorAlertId, sensorId, nodeId, timeReceived,
 	# alertDelay, state, description, dataJson)
@@ -181,6 +328,15 @@ class _Storage():
 		raise NotImplemented("Function not implemented yet.")
 
 
+	# gets the time of the oldest last state update of all sensors
+	# which last state updates are not older than the given time
+	#
+	# return time of the oldest last state update,
+	# 0 if no such sensor exists or None
+	def getOldestSensorUpdateNotOlderThan(self, oldestTimeUpdated):
+		raise NotImplemented("Function not implemented yet.")
+
+
 	# gets all information of a sensor by its given id
 	#
 	# return a tuple of (sensorId, nodeId,
@@ -212,6 +368,8 @@ class _Storage():
 	# list[7] = list(tuples of (nodeId, managerId, description))
 	# list[8] = alertCount
 	# list[9] = list(tuples of (nodeId, alertId, description))
+	# list[10] = list(tuples of (sensorId, alertLevel))
+	# list[11] = list(tuples of (alertId, alertLevel))
 	# or None	
 	def getAlertSystemInformation(self):
 		raise NotImplemented("Function not implemented yet.")
@@ -245,10 +403,11 @@ class _Storage():
 		raise NotImplemented("Function not implemented yet.")
 
 
-	# deletes a sensor alert given by its sensor alert id
+	# deletes the sensor alerts given by their sensor alert ids
+	# from the journal of sensor alerts (in one transaction)
 	#
 	# return True or False
-	def deleteSensorAlert(self, sensorAlertId):
+	def deleteSensorAlerts(self, sensorAlertIds):
 		raise NotImplemented("Function not implemented yet.")
 
 
@@ -277,10 +436,11 @@ class _Storage():
 # class for using sqlite as storage backend
 class Sqlite(_Storage):
 
-	def __init__(self, storagePath, version):
+	def __init__(self, storagePath, version, concurrentReads, tracer):
 
 		# import the needed package
 		import sqlite3
+		self.sqlite3 = sqlite3
 
 		# version of server
 		self.version = version
@@ -292,24 +452,37 @@ class Sqlite(_Storage):
 		self.storagePath = storagePath
 
 		# sqlite is not thread safe => use lock
-		self.dbLock = threading.Semaphore(1)
+		# (or one connection per thread if reads are processed concurrently)
+		self._initLocking(concurrentReads, tracer)
+
+		# sensors of the nodes that are cached for the update of the states
+		self._clearNodeSensors()
 
 		# check if database exists
-		# if not create one
-		if os.path.exists(self.storagePath) == False:
+		databaseExists = os.path.exists(self.storagePath)
+
+		# connection that is shared by all threads
+		# (only used if reads are not processed concurrently)
+		self.sharedConn = None
+		self.sharedCursor = None
+		if not self.concurrentReads:
+			self.sharedConn = sqlite3.connect(self.storagePath,
+				check_same_thread=False)
+			self.sharedCursor = self.sharedConn.cursor()
+
+		# use write-ahead logging to allow reads concurrently to a write
+		# (the journal mode is stored persistently in the database)
+		else:
+			self.cursor.execute("PRAGMA journal_mode=WAL")
+
+		# if database does not exist create one
+		if not databaseExists:
 			
 			logging.info("[%s]: No database found. Creating '%s'."
 			% (self.fileName, self.storagePath))
 
-			self.conn = sqlite3.connect(self.storagePath,
-				check_same_thread=False)
-			self.cursor = self.conn.cursor()
 			self.createStorage()
 		else:
-			self.conn = sqlite3.connect(self.storagePath,
-				check_same_thread=False)
-			self.cursor = self.conn.cursor()
-
 			# check if the versions are compatible
 			self.checkVersionAndClearConflict()
 
@@ -365,6 +538,33 @@ class Sqlite(_Storage):
 		return sensorId
 
 
+	# internal function that gets the cached sensors of a node
+	# (reads all sensors of the node from the database if they
+	# are not cached yet)
+	#
+	# return dict with key: remoteSensorId; value: list of
+	# [sensorId, state, alertDelay, description]
+	# or raised Exception
+	def _getNodeSensors(self, nodeId):
+
+		if nodeId in self.nodeSensors:
+			return self.nodeSensors[nodeId]
+
+		self.cursor.execute("SELECT id, remoteSensorId, state, "
+			+ "alertDelay, description "
+			+ "FROM sensors "
+			+ "WHERE nodeId = ?", (nodeId, ))
+		result = self.cursor.fetchall()
+
+		nodeSensors = dict()
+		for sensorTuple in result:
+			nodeSensors[sensorTuple[1]] = [sensorTuple[0], sensorTuple[2],
+				sensorTuple[3], sensorTuple[4]]
+		self.nodeSensors[nodeId] = nodeSensors
+
+		return nodeSensors
+
+
 	# internal function that gets the alert id of an alert when the id 
 	# of a node is given and the remote alert id that is used 
 	# by the node internally
@@ -405,16 +605,48 @@ class Sqlite(_Storage):
 		return managerId
 
 
-	# internal function that acquires the lock
-	def _acquireLock(self):
-		logging.debug("[%s]: Acquire lock." % self.fileName)
-		self.dbLock.acquire()
-
-
 	# internal function that releases the lock
 	def _releaseLock(self):
-		logging.debug("[%s]: Release lock." % self.fileName)
-		self.dbLock.release()
+
+		# discard all changes that were not committed
+		# (an open transaction of the connection of one thread would
+		# block the writes of all other threads)
+		if self.concurrentReads:
+			self.conn.rollback()
+
+		_Storage._releaseLock(self)
+
+
+	# internal function that returns the connection to the database
+	# (if reads are processed concurrently every thread opens its own
+	# connection, otherwise all threads share one connection)
+	def _getConnection(self):
+
+		if not self.concurrentReads:
+			return self.sharedConn
+
+		conn = getattr(self.threadData, "conn", None)
+		if conn is None:
+			conn = self.sqlite3.connect(self.storagePath)
+			self.threadData.conn = conn
+			self.threadData.cursor = conn.cursor()
+
+		return conn
+
+
+	# internal function that returns the cursor of the connection
+	# to the database
+	def _getCursor(self):
+
+		if not self.concurrentReads:
+			return self.sharedCursor
+
+		self._getConnection()
+		return self.threadData.cursor
+
+
+	conn = property(_getConnection)
+	cursor = property(_getCursor)
 
 
 	# internal function that creates the database
@@ -592,6 +824,9 @@ class Sqlite(_Storage):
 
 		self._acquireLock()
 
+		# the sensors of the node may change
+		self._clearNodeSensors()
+
 		# check if a node with the same username already exists
 		# => if not add node
 		if not self._usernameInDb(username):
@@ -868,7 +1103,10 @@ class Sqlite(_Storage):
 	# return True or False
 	def addSensors(self, username, sensors):
 
-		self._acquireLock()	
+		self._acquireLock()
+
+		# the sensors of the node may change
+		self._clearNodeSensors()
 
 		# get the id of the node
 		try:
@@ -1530,7 +1768,7 @@ class Sqlite(_Storage):
 	# return nodeId or None
 	def getNodeId(self, username):
 
-		self._acquireLock()
+		self._acquireReadLock()
 
 		nodeId = None
 		try:
@@ -1539,7 +1777,7 @@ class Sqlite(_Storage):
 			logging.exception("[%s]: Not able to get node id." 
 				% self.fileName)			
 	
-		self._releaseLock()
+		self._releaseReadLock()
 
 		return nodeId
 
@@ -1549,7 +1787,7 @@ class Sqlite(_Storage):
 	# return count of sensors or None
 	def getSensorCount(self, nodeId):
 
-		self._acquireLock()
+		self._acquireReadLock()
 
 		# get all sensors on this nodes
 		sensorCount = None
@@ -1562,7 +1800,7 @@ class Sqlite(_Storage):
 			logging.exception("[%s]: Not able to get sensor count." 
 				% self.fileName)	
 
-		self._releaseLock()
+		self._releaseReadLock()
 
 		return sensorCount
 
@@ -1573,7 +1811,7 @@ class Sqlite(_Storage):
 	# or None
 	def getSurveyData(self):
 
-		self._acquireLock()
+		self._acquireReadLock()
 
 		surveyData = None
 		try:
@@ -1587,7 +1825,7 @@ class Sqlite(_Storage):
 			logging.exception("[%s]: Not able to get survey data." 
 				% self.fileName)
 
-		self._releaseLock()
+		self._releaseReadLock()
 
 		return surveyData
 
@@ -1597,7 +1835,7 @@ class Sqlite(_Storage):
 	# or None
 	def getUniqueID(self):
 
-		self._acquireLock()
+		self._acquireReadLock()
 
 		uniqueID = None
 		try:
@@ -1608,7 +1846,7 @@ class Sqlite(_Storage):
 			logging.exception("[%s]: Not able to get the unique id." 
 				% self.fileName)
 
-		self._releaseLock()
+		self._releaseReadLock()
 
 		return uniqueID
 
@@ -1618,20 +1856,21 @@ class Sqlite(_Storage):
 	#
 	# return True or False
 	def updateSensorState(self, nodeId, stateList):
-		
+
 		self._acquireLock()
 
-		# stateList is a list of tuples of (remoteSensorId, state)
-		for stateTuple in stateList:
+		try:
+			nodeSensors = self._getNodeSensors(nodeId)
 
-			try:
+			# resolve the ids of the sensors and get the sensors
+			# which state has changed
+			# (stateList is a list of tuples of (remoteSensorId, state))
+			sensorIds = set()
+			changedStates = list()
+			for stateTuple in stateList:
 
 				# check if the sensor does exist in the database
-				self.cursor.execute("SELECT id FROM sensors "
-					+ "WHERE nodeId = ? "
-					+ "AND remoteSensorId = ?", (nodeId, stateTuple[0]))
-				result = self.cursor.fetchall()
-				if len(result) != 1:
+				if not stateTuple[0] in nodeSensors:
 					logging.error("[%s]: Sensor does not exist in database."
 						% self.fileName)
 
@@ -1639,23 +1878,58 @@ class Sqlite(_Storage):
 
 					return False
 
+				sensorData = nodeSensors[stateTuple[0]]
+				sensorIds.add(sensorData[0])
+				if sensorData[1] != stateTuple[1]:
+					changedStates.append(stateTuple)
+
+			utcTimestamp = int(time.time())
+
+			# update the time of the last state update of the sensors
+			# (with one statement if all sensors of the node are updated
+			# which is the case for the periodic full state of a node)
+			if len(sensorIds) == len(nodeSensors):
 				self.cursor.execute("UPDATE sensors SET "
-					+ "state = ?, "
 					+ "lastStateUpdated = ? "
-					+ "WHERE nodeId = ? "
-					+ "AND remoteSensorId = ?",
-					(stateTuple[1], int(time.time()), nodeId, stateTuple[0]))
+					+ "WHERE nodeId = ?", (utcTimestamp, nodeId))
+			else:
+				self.cursor.executemany("UPDATE sensors SET "
+					+ "lastStateUpdated = ? "
+					+ "WHERE id = ?",
+					[(utcTimestamp, sensorId) for sensorId in sensorIds])
+
+			# only update the sensors which state has changed
+			if len(changedStates) != 0:
+				self.cursor.executemany("UPDATE sensors SET "
+					+ "state = ? "
+					+ "WHERE id = ?",
+					[(stateTuple[1], nodeSensors[stateTuple[0]][0])
+					for stateTuple in changedStates])
+
+		except Exception as e:
+			logging.exception("[%s]: Not able to update sensor state."
+				% self.fileName)
+
+			# the cached sensors may differ from the database
+			self._clearNodeSensors()
+
+			# discard all changes of the failed update
+			try:
+				self.conn.rollback()
 			except Exception as e:
-				logging.exception("[%s]: Not able to update sensor state."
-					% self.fileName)
+				pass
 
-				self._releaseLock()
+			self._releaseLock()
 
-				return False
+			return False
 
 		# commit all changes
 		self.conn.commit()
 
+		# update the cached states of the sensors
+		for stateTuple in changedStates:
+			nodeSensors[stateTuple[0]][1] = stateTuple[1]
+
 		self._releaseLock()
 
 		return True
@@ -1667,7 +1941,7 @@ class Sqlite(_Storage):
 	# return sensorId or None
 	def getSensorId(self, nodeId, remoteSensorId):
 
-		self._acquireLock()
+		self._acquireReadLock()
 
 		try:
 			sensorId = self._getSensorId(nodeId, remoteSensorId)
@@ -1675,11 +1949,11 @@ class Sqlite(_Storage):
 			logging.exception("[%s]: Not able to get sensorId from database."
 				% self.fileName)
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return None
 
-		self._releaseLock()
+		self._releaseReadLock()
 
 		return sensorId
 
@@ -1690,7 +1964,7 @@ class Sqlite(_Storage):
 	# return alertId or None
 	def getAlertId(self, nodeId, remoteAlertId):
 
-		self._acquireLock()
+		self._acquireReadLock()
 
 		try:
 			alertId = self._getAlertId(nodeId, remoteAlertId)
@@ -1698,11 +1972,11 @@ class Sqlite(_Storage):
 			logging.exception("[%s]: Not able to get alertId from database."
 				% self.fileName)
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return None
 
-		self._releaseLock()
+		self._releaseReadLock()
 
 		return alertId		
 
@@ -1713,7 +1987,7 @@ class Sqlite(_Storage):
 	# or None
 	def getSensorAlertLevels(self, sensorId):
 
-		self._acquireLock()
+		self._acquireReadLock()
 
 		try:
 			self.cursor.execute("SELECT alertLevel "
@@ -1726,12 +2000,12 @@ class Sqlite(_Storage):
 			logging.exception("[%s]: Not able to get " % self.fileName
 				+ "alert levels for sensor with id %d." % sensorId)
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			# return None if action failed
 			return None
 
-		self._releaseLock()
+		self._releaseReadLock()
 
 		# return list of tuples of (alertLevel)
 		return result
@@ -1743,7 +2017,7 @@ class Sqlite(_Storage):
 	# or None
 	def getAlertAlertLevels(self, alertId):
 
-		self._acquireLock()
+		self._acquireReadLock()
 
 		try:
 			self.cursor.execute("SELECT alertLevel "
@@ -1756,83 +2030,133 @@ class Sqlite(_Storage):
 			logging.exception("[%s]: Not able to get " % self.fileName
 				+ "alert levels for alert with id %d." % alertId)
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			# return None if action failed
 			return None
 
-		self._releaseLock()
+		self._releaseReadLock()
 
 		# return list of tuples of (alertLevel)
 		return result
 
 
-	# adds a sensor alert to the database when the id of a node is given,
-	# the id of the sensor that is used internally by the node and the state
+	# adds a sensor alert when the id of a node is given, the id of the
+	# sensor that is used internally by the node and the state
+	# (updates the state of the sensor in the database, the sensor alert
+	# itself is only stored in the database if it is added to the journal)
 	#
-	# return True or False
+	# return a tuple (sensorAlertId, sensorId, nodeId, timeReceived,
+	# alertDelay, state, description, dataJson) with sensorAlertId None
+	# or None
 	def addSensorAlert(self, nodeId, remoteSensorId, state, dataJson):
 
 		self._acquireLock()
 
 		try:
+			nodeSensors = self._getNodeSensors(nodeId)
 
 			# check if the sensor does exist in the database
-			# and get its sensorId
-			self.cursor.execute("SELECT id FROM sensors "
-				+ "WHERE nodeId = ? "
-				+ "AND remoteSensorId = ?", (nodeId, remoteSensorId))
-			result = self.cursor.fetchall()
-			if len(result) != 1:
+			if not remoteSensorId in nodeSensors:
 				logging.error("[%s]: Sensor does not exist in database."
 					% self.fileName)
 
 				self._releaseLock()
 
-				return False
-			sensorId = result[0][0]
+				return None
+			sensorData = nodeSensors[remoteSensorId]
+
+			timeReceived = int(time.time())
 
 			# update state of sensor in the database
 			self.cursor.execute("UPDATE sensors SET "
 				+ "state = ?, "
 				+ "lastStateUpdated = ? "
-				+ "WHERE nodeId = ? "
-				+ "AND remoteSensorId = ?",
-				(state, int(time.time()), nodeId, remoteSensorId))
-
-			# add sensor alert to database
-			self.cursor.execute("INSERT INTO sensorAlerts ("
-				+ "nodeId, "
-				+ "sensorId, "
-				+ "state, "
-				+ "timeReceived, "
-				+ "dataJson) VALUES (?, ?, ?, ?, ?)",
-				(nodeId, sensorId, state, int(time.time()), dataJson))
+				+ "WHERE id = ?",
+				(state, timeReceived, sensorData[0]))
 
 		except Exception as e:
 			logging.exception("[%s]: Not able to add sensor alert."
 				% self.fileName)
 
+			# the cached sensors may differ from the database
+			self._clearNodeSensors()
+
+			# discard all changes of the failed transaction
+			try:
+				self.conn.rollback()
+			except Exception as e:
+				pass
+
 			self._releaseLock()
 
-			return False
+			return None
 
 		# commit all changes
 		self.conn.commit()
 
+		# update the cached state of the sensor
+		sensorData[1] = state
+
 		self._releaseLock()
 
-		return True
+		return (None, sensorData[0], nodeId, timeReceived, sensorData[2],
+			state, sensorData[3], dataJson)
+
+
+	# adds the given sensor alerts to the journal of sensor alerts
+	# in the database (in one transaction)
+	#
+	# return list of the sensorAlertIds in the same order
+	# or None
+	def addSensorAlertsToJournal(self, sensorAlerts):
+
+		self._acquireLock()
+
+		sensorAlertIds = list()
+		try:
+			for sensorAlert in sensorAlerts:
+				self.cursor.execute("INSERT INTO sensorAlerts ("
+					+ "nodeId, "
+					+ "sensorId, "
+					+ "state, "
+					+ "timeReceived, "
+					+ "dataJson) VALUES (?, ?, ?, ?, ?)",
+					(sensorAlert[2], sensorAlert[1], sensorAlert[5],
+					sensorAlert[3], sensorAlert[7]))
+				sensorAlertIds.append(self.cursor.lastrowid)
+
+		except Exception as e:
+			logging.exception("[%s]: Not able to add sensor alerts "
+				% self.fileName
+				+ "to the journal.")
+
+			# discard all changes of the failed transaction
+			try:
+				self.conn.rollback()
+			except Exception as e:
+				pass
+
+			self._releaseLock()
+
+			return None
+
+		# commit all changes
+		self.conn.commit()
+
+		self._releaseLock()
 
+		return sensorAlertIds
 
-	# gets all sensor alerts in the database
+
+	# gets all sensor alerts in the journal of sensor alerts
 	#
 	# return a list of tuples (sensorAlertId, sensorId, nodeId, timeReceived,
 	# alertDelay, state, description, dataJson)
 	# or None
 	def getSensorAlerts(self):
 
-		self._acquireLock()
+		self._acquireReadLock()
 
 		try:
 			
@@ -1854,30 +2178,38 @@ class Sqlite(_Storage):
 			logging.exception("[%s]: Not able to get sensor alerts."
 				% self.fileName)			
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return None
 
-		self._releaseLock()
+		self._releaseReadLock()
 
 		# return a list of tuples (sensorAlertId, sensorId, nodeId,
 		# timeReceived, alertDelay, state, description, dataJson)
 		return result
 
 
-	# deletes a sensor alert given by its sensor alert id
+	# deletes the sensor alerts given by their sensor alert ids
+	# from the journal of sensor alerts (in one transaction)
 	#
 	# return True or False
-	def deleteSensorAlert(self, sensorAlertId):
+	def deleteSensorAlerts(self, sensorAlertIds):
 
 		self._acquireLock()
 
 		try:
-			self.cursor.execute("DELETE FROM sensorAlerts WHERE id = ?",
-					(sensorAlertId, ))
+			self.cursor.executemany("DELETE FROM sensorAlerts WHERE id = ?",
+				[(sensorAlertId, ) for sensorAlertId in sensorAlertIds])
 		except Exception as e:
-			logging.exception("[%s]: Not able to delete sensor alert." 
-				% self.fileName)
+			logging.exception("[%s]: Not able to delete sensor alerts "
+				% self.fileName
+				+ "from the journal.")
+
+			# discard all changes of the failed transaction
+			try:
+				self.conn.rollback()
+			except Exception as e:
+				pass
 
 			self._releaseLock()
 
@@ -1896,7 +2228,7 @@ class Sqlite(_Storage):
 	# return True or False
 	def isAlertSystemActive(self):
 
-		self._acquireLock()
+		self._acquireReadLock()
 
 		try:
 			self.cursor.execute("SELECT value FROM options WHERE type = ?",
@@ -1908,11 +2240,11 @@ class Sqlite(_Storage):
 			logging.exception("[%s]: Not able to check " % self.fileName
 				+ "if alert system is active.")
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return False
 
-		self._releaseLock()
+		self._releaseReadLock()
 
 		if alertSystemActive == 1:
 			return True
@@ -1926,7 +2258,7 @@ class Sqlite(_Storage):
 	# or None
 	def getAllAlertsAlertLevels(self):
 
-		self._acquireLock()
+		self._acquireReadLock()
 
 		try:
 			self.cursor.execute("SELECT alertLevel "
@@ -1938,12 +2270,12 @@ class Sqlite(_Storage):
 			logging.exception("[%s]: Not able to get " % self.fileName
 				+ "all alert levels for alert clients.")
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			# return None if action failed
 			return None
 
-		self._releaseLock()
+		self._releaseReadLock()
 
 		# return list of tuples of (alertLevel)
 		return result
@@ -1955,7 +2287,7 @@ class Sqlite(_Storage):
 	# or None
 	def getAllSensorsAlertLevels(self):
 
-		self._acquireLock()
+		self._acquireReadLock()
 
 		try:
 			self.cursor.execute("SELECT alertLevel "
@@ -1967,12 +2299,12 @@ class Sqlite(_Storage):
 			logging.exception("[%s]: Not able to get " % self.fileName
 				+ "all alert levels for sensors.")
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			# return None if action failed
 			return None
 
-		self._releaseLock()
+		self._releaseReadLock()
 
 		# return list of tuples of (alertLevel)
 		return result
@@ -1984,7 +2316,7 @@ class Sqlite(_Storage):
 	# or None
 	def getAllConnectedNodeIds(self):
 
-		self._acquireLock()
+		self._acquireReadLock()
 
 		# get all connected node ids from database
 		try:
@@ -1998,12 +2330,12 @@ class Sqlite(_Storage):
 			logging.exception("[%s]: Not able to get " % self.fileName
 				+ "all node ids.")
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			# return None if action failed
 			return None
 
-		self._releaseLock()
+		self._releaseReadLock()
 
 		# return list of tuples of (nodeId)
 		return result
@@ -2071,7 +2403,7 @@ class Sqlite(_Storage):
 	# or None
 	def getSensorsUpdatedOlderThan(self, oldestTimeUpdated):
 
-		self._acquireLock()
+		self._acquireReadLock()
 
 		try:
 			self.cursor.execute("SELECT id, "
@@ -2087,17 +2419,49 @@ class Sqlite(_Storage):
 			logging.exception("[%s]: Not able to get " % self.fileName
 				+ "nodes from database which sensors were not updated.")
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return None
 
-		self._releaseLock()
+		self._releaseReadLock()
 
 		# return list of tuples of (sensorId, nodeId,
 		# lastStateUpdated, description)
 		return result
 
 
+	# gets the time of the oldest last state update of all sensors
+	# which last state updates are not older than the given time
+	#
+	# return time of the oldest last state update,
+	# 0 if no such sensor exists or None
+	def getOldestSensorUpdateNotOlderThan(self, oldestTimeUpdated):
+
+		self._acquireReadLock()
+
+		try:
+			self.cursor.execute("SELECT MIN(lastStateUpdated) "
+				+ "FROM sensors "
+				+ "WHERE lastStateUpdated >= ?", (oldestTimeUpdated, ))
+
+			result = self.cursor.fetchall()
+		except Exception as e:
+
+			logging.exception("[%s]: Not able to get " % self.fileName
+				+ "oldest sensor state update from database.")
+
+			self._releaseReadLock()
+
+			return None
+
+		self._releaseReadLock()
+
+		# MIN() returns NULL if no sensor was found
+		if result[0][0] is None:
+			return 0
+		return result[0][0]
+
+
 	# gets all information of a sensor by its given id
 	#
 	# return a tuple of (sensorId, nodeId,
@@ -2105,7 +2469,7 @@ class Sqlite(_Storage):
 	# or None
 	def getSensorInformation(self, sensorId):
 
-		self._acquireLock()
+		self._acquireReadLock()
 
 		try:
 			self.cursor.execute("SELECT id, "
@@ -2124,7 +2488,7 @@ class Sqlite(_Storage):
 			logging.exception("[%s]: Not able to get " % self.fileName
 				+ "sensor information from sensor id.")
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return None
 
@@ -2134,11 +2498,11 @@ class Sqlite(_Storage):
 			logging.error("[%s]: Sensor id is not unique in " % self.fileName
 				+ "database.")
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return None
 
-		self._releaseLock()
+		self._releaseReadLock()
 
 		# return a tuple of (sensorId, nodeId,
 		# remoteSensorId, description, state, lastStateUpdated, alertDelay)
@@ -2150,7 +2514,7 @@ class Sqlite(_Storage):
 	# return hostname or None
 	def getNodeHostnameById(self, nodeId):
 
-		self._acquireLock()
+		self._acquireReadLock()
 
 		try:
 			self.cursor.execute("SELECT hostname FROM nodes "
@@ -2163,11 +2527,11 @@ class Sqlite(_Storage):
 			logging.exception("[%s]: Not able to get " % self.fileName
 				+ "hostname for node from database.")
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return None
 
-		self._releaseLock()
+		self._releaseReadLock()
 
 		return hostname
 
@@ -2187,10 +2551,12 @@ class Sqlite(_Storage):
 	# list[7] = list(tuples of (nodeId, managerId, description))
 	# list[8] = alertCount
 	# list[9] = list(tuples of (nodeId, alertId, description))
+	# list[10] = list(tuples of (sensorId, alertLevel))
+	# list[11] = list(tuples of (alertId, alertLevel))
 	# or None	
 	def getAlertSystemInformation(self):
 
-		self._acquireLock()
+		self._acquireReadLock()
 
 		try:
 
@@ -2245,6 +2611,20 @@ class Sqlite(_Storage):
 			alertsInformation = result
 			alertCount = len(alertsInformation)
 
+			# get the alert levels of all sensors
+			self.cursor.execute("SELECT sensorId, "
+				+ "alertLevel "
+				+ "FROM sensorsAlertLevels")
+			result = self.cursor.fetchall()
+			sensorsAlertLevels = result
+
+			# get the alert levels of all alerts
+			self.cursor.execute("SELECT alertId, "
+				+ "alertLevel "
+				+ "FROM alertsAlertLevels")
+			result = self.cursor.fetchall()
+			alertsAlertLevels = result
+
 			# generate a list with all nodes information
 			alertSystemInformation = list()
 			alertSystemInformation.append(optionCount)
@@ -2257,17 +2637,19 @@ class Sqlite(_Storage):
 			alertSystemInformation.append(managersInformation)
 			alertSystemInformation.append(alertCount)
 			alertSystemInformation.append(alertsInformation)
+			alertSystemInformation.append(sensorsAlertLevels)
+			alertSystemInformation.append(alertsAlertLevels)
 
 		except Exception as e:
 
 			logging.exception("[%s]: Not able to get " % self.fileName
 				+ "all nodes information from database.")
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return None
 
-		self._releaseLock()
+		self._releaseReadLock()
 
 		# return a list of
 		# list[0] = optionCount
@@ -2281,7 +2663,9 @@ class Sqlite(_Storage):
 		# list[6] = managerCount
 		# list[7] = list(tuples of (nodeId, managerId, description))
 		# list[8] = alertCount
-		# list[9] = list(tuples of (nodeId, alertId, description))		
+		# list[9] = list(tuples of (nodeId, alertId, description))
+		# list[10] = list(tuples of (sensorId, alertLevel))
+		# list[11] = list(tuples of (alertId, alertLevel))
 		return alertSystemInformation
 
 
@@ -2331,7 +2715,7 @@ class Sqlite(_Storage):
 	# return sensor state or None
 	def getSensorState(self, sensorId):
 
-		self._acquireLock()
+		self._acquireReadLock()
 
 		try:
 			# get sensor state from database
@@ -2342,7 +2726,7 @@ class Sqlite(_Storage):
 			if len(result) != 1:
 				logging.error("[%s]: Sensor was not found." % self.fileName)
 
-				self._releaseLock()
+				self._releaseReadLock()
 
 				return None
 
@@ -2353,11 +2737,11 @@ class Sqlite(_Storage):
 			logging.exception("[%s]: Not able to get " % self.fileName
 				+ "sensor state from database.")
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return None
 
-		self._releaseLock()
+		self._releaseReadLock()
 
 		return state
 
@@ -2369,23 +2753,26 @@ class Sqlite(_Storage):
 
 		self._acquireLock()
 
+		self._logLockStatistics()
+
 		self.cursor.close()
 		self.conn.close()
 
-		self._releaseLock()
+		_Storage._releaseLock(self)
 
 
-# class for using mysql as storage backend
-class Mysql(_Storage):
+# this class holds a bounded pool of connections to the mysql server
+# (a thread checks out one connection and gets the same connection
+# for nested checkouts; idle connections are checked before they are
+# used again and broken connections are replaced by new ones)
+class MysqlConnectionPool:
 
-	def __init__(self, host, port, database, username, password, version):
+	def __init__(self, host, port, database, username, password,
+		maxConnections):
 
 		# file nme of this file (used for logging)
 		self.fileName = os.path.basename(__file__)
 
-		# version of server
-		self.version = version
-
 		# needed mysql parameters
 		self.host = host
 		self.port = port
@@ -2393,21 +2780,225 @@ class Mysql(_Storage):
 		self.username = username
 		self.password = password
 
-		# mysql lock
-		self.dbLock = threading.Semaphore(1)
+		# maximum number of connections to the mysql server
+		self.maxConnections = maxConnections
 
-		self.conn = None
-		self.cursor = None
+		# time in seconds a connection can be idle before it is checked
+		# if it is still alive before it is used again
+		self.healthCheckInterval = 30.0
 
-		# connect to the database
-		self._openConnection()
+		# list of idle connections as lists of [connection, time released]
+		self.idleConnections = list()
 
-		# check if alert system tables exist already
-		# if not => create them
-		self.cursor.execute("SHOW TABLES LIKE 'internals'")
-		internalsResult = self.cursor.fetchall()		
-		self.cursor.execute("SHOW TABLES LIKE 'options'")
-		optionsResult = self.cursor.fetchall()
+		# number of existing connections (idle and checked out)
+		self.connectionCount = 0
+
+		# condition that is used to wait for a free connection
+		self.poolCondition = threading.Condition()
+
+		# connection that is checked out by the current thread
+		# (as list of [connection, number of checkouts])
+		self.threadData = threading.local()
+
+		# statistics of the pool
+		self.countCreated = 0
+		self.countReused = 0
+		self.countDiscarded = 0
+		self.countWaited = 0
+
+
+	# internal function that creates a new connection to the mysql server
+	def _createConnection(self):
+		# import the needed package
+		import MySQLdb
+
+		return MySQLdb.connect(host=self.host, port=self.port,
+			user=self.username,	passwd=self.password, db=self.database)
+
+
+	# internal function that checks if a connection is still alive
+	def _isHealthy(self, connection):
+
+		try:
+			connection.ping()
+		except Exception as e:
+			return False
+
+		return True
+
+
+	# internal function that closes a connection and frees its
+	# place in the pool
+	def _discardConnection(self, connection):
+
+		try:
+			connection.close()
+		except Exception as e:
+			pass
+
+		self.poolCondition.acquire()
+		self.connectionCount -= 1
+		self.countDiscarded += 1
+		self.poolCondition.notify()
+		self.poolCondition.release()
+
+
+	# function that checks out a connection for the current thread
+	# (blocks if all connections are in use)
+	#
+	# return connection or raised Exception
+	def checkout(self):
+
+		# the thread already holds a connection => use it again
+		checkedOut = getattr(self.threadData, "checkedOut", None)
+		if checkedOut is not None:
+			checkedOut[1] += 1
+			return checkedOut[0]
+
+		connection = None
+		timeReleased = 0.0
+
+		# get an idle connection or the permission to create a new one
+		self.poolCondition.acquire()
+		while True:
+			if len(self.idleConnections) != 0:
+				connection, timeReleased = self.idleConnections.pop()
+				self.countReused += 1
+				break
+
+			if self.connectionCount < self.maxConnections:
+				self.connectionCount += 1
+				break
+
+			self.countWaited += 1
+			self.poolCondition.wait()
+		self.poolCondition.release()
+
+		# check if a connection that was idle for a while is still alive
+		# => if not, replace it by a new one
+		if (connection is not None
+			and (time.time() - timeReleased) > self.healthCheckInterval
+			and not self._isHealthy(connection)):
+
+			logging.warning("[%s]: Connection to database " % self.fileName
+				+ "is not alive anymore. Reconnecting.")
+
+			try:
+				connection.close()
+			except Exception as e:
+				pass
+			connection = None
+
+		if connection is None:
+			try:
+				connection = self._createConnection()
+			except Exception as e:
+				self.poolCondition.acquire()
+				self.connectionCount -= 1
+				self.poolCondition.notify()
+				self.poolCondition.release()
+				raise
+
+			self.poolCondition.acquire()
+			self.countCreated += 1
+			self.poolCondition.release()
+
+		self.threadData.checkedOut = [connection, 1]
+		return connection
+
+
+	# function that gives a checked out connection back to the pool
+	#
+	# no return value
+	def release(self, connection):
+
+		# only give connection back after the last nested checkout
+		checkedOut = self.threadData.checkedOut
+		checkedOut[1] -= 1
+		if checkedOut[1] > 0:
+			return
+		self.threadData.checkedOut = None
+
+		# end the current transaction (otherwise changes made to the
+		# database by another program are not seen when the connection is
+		# used again); if this fails the connection is broken
+		# => replace it by a new one with the next checkout
+		try:
+			connection.rollback()
+		except Exception as e:
+			logging.warning("[%s]: Connection to database " % self.fileName
+				+ "failed. Discarding it.")
+			self._discardConnection(connection)
+			return
+
+		self.poolCondition.acquire()
+		self.idleConnections.append([connection, time.time()])
+		self.poolCondition.notify()
+		self.poolCondition.release()
+
+
+	# function that closes all idle connections
+	#
+	# no return value
+	def close(self):
+
+		self.poolCondition.acquire()
+
+		logging.debug("[%s]: Closing database connections. " % self.fileName
+			+ "Created: %d; Reused: %d; Discarded: %d; Waited: %d."
+			% (self.countCreated, self.countReused, self.countDiscarded,
+			self.countWaited))
+
+		for idleConnection in self.idleConnections:
+			try:
+				idleConnection[0].close()
+			except Exception as e:
+				pass
+			self.connectionCount -= 1
+		self.idleConnections = list()
+
+		self.poolCondition.release()
+
+
+# class for using mysql as storage backend
+class Mysql(_Storage):
+
+	def __init__(self, host, port, database, username, password, version,
+		poolSize, concurrentReads, tracer):
+
+		# file nme of this file (used for logging)
+		self.fileName = os.path.basename(__file__)
+
+		# version of server
+		self.version = version
+
+		# needed mysql parameters
+		self.host = host
+		self.port = port
+		self.database = database
+		self.username = username
+		self.password = password
+
+		# mysql lock
+		# (reads do not use the lock if they are processed concurrently)
+		self._initLocking(concurrentReads, tracer)
+
+		# sensors of the nodes that are cached for the update of the states
+		self._clearNodeSensors()
+
+		# pool of connections to the mysql server
+		self.connectionPool = MysqlConnectionPool(self.host, self.port,
+			self.database, self.username, self.password, poolSize)
+
+		# connect to the database
+		self._openConnection()
+
+		# check if alert system tables exist already
+		# if not => create them
+		self.cursor.execute("SHOW TABLES LIKE 'internals'")
+		internalsResult = self.cursor.fetchall()		
+		self.cursor.execute("SHOW TABLES LIKE 'options'")
+		optionsResult = self.cursor.fetchall()
 		self.cursor.execute("SHOW TABLES LIKE 'nodes'")
 		nodesResult = self.cursor.fetchall()
 		self.cursor.execute("SHOW TABLES LIKE 'sensors'")
@@ -2444,23 +3035,49 @@ class Mysql(_Storage):
 			self.checkVersionAndClearConflict()
 
 
-	# internal function that connects to the mysql server
-	# (needed because direct changes to the database by another program
-	# are not seen if the connection to the mysql server is kept alive)
-	def _openConnection(self):
-		# import the needed package
-		import MySQLdb
+	# internal function that returns the connection to the mysql server
+	# of the current thread
+	def _getConnection(self):
+		return getattr(self.threadData, "conn", None)
+
+
+	# internal function that sets the connection to the mysql server
+	# of the current thread
+	def _setConnection(self, conn):
+		self.threadData.conn = conn
+
+
+	# internal function that returns the cursor of the connection
+	# to the mysql server of the current thread
+	def _getCursor(self):
+		return getattr(self.threadData, "cursor", None)
+
+
+	# internal function that sets the cursor of the connection
+	# to the mysql server of the current thread
+	def _setCursor(self, cursor):
+		self.threadData.cursor = cursor
+
+
+	conn = property(_getConnection, _setConnection)
+	cursor = property(_getCursor, _setCursor)
 
-		self.conn = MySQLdb.connect(host=self.host, port=self.port,
-			user=self.username,	passwd=self.password, db=self.database)
 
+	# internal function that checks out a connection to the mysql server
+	# from the connection pool
+	def _openConnection(self):
+
+		self.conn = self.connectionPool.checkout()
 		self.cursor = self.conn.cursor()
 
 
-	# internal function that closes the connection to the mysql server
+	# internal function that gives the connection to the mysql server
+	# back to the connection pool
+	# (the current transaction is ended, because direct changes to the
+	# database by another program are not seen otherwise)
 	def _closeConnection(self):
 		self.cursor.close()
-		self.conn.close()
+		self.connectionPool.release(self.conn)
 		self.cursor = None
 		self.conn = None
 
@@ -2516,6 +3133,33 @@ class Mysql(_Storage):
 		return sensorId
 
 
+	# internal function that gets the cached sensors of a node
+	# (reads all sensors of the node from the database if they
+	# are not cached yet)
+	#
+	# return dict with key: remoteSensorId; value: list of
+	# [sensorId, state, alertDelay, description]
+	# or raised Exception
+	def _getNodeSensors(self, nodeId):
+
+		if nodeId in self.nodeSensors:
+			return self.nodeSensors[nodeId]
+
+		self.cursor.execute("SELECT id, remoteSensorId, state, "
+			+ "alertDelay, description "
+			+ "FROM sensors "
+			+ "WHERE nodeId = %s", (nodeId, ))
+		result = self.cursor.fetchall()
+
+		nodeSensors = dict()
+		for sensorTuple in result:
+			nodeSensors[sensorTuple[1]] = [sensorTuple[0], sensorTuple[2],
+				sensorTuple[3], sensorTuple[4]]
+		self.nodeSensors[nodeId] = nodeSensors
+
+		return nodeSensors
+
+
 	# internal function that gets the alert id of an alert when the id 
 	# of a node is given and the remote alert id that is used 
 	# by the node internally
@@ -2556,18 +3200,6 @@ class Mysql(_Storage):
 		return managerId
 
 
-	# internal function that acquires the lock
-	def _acquireLock(self):
-		logging.debug("[%s]: Acquire lock." % self.fileName)
-		self.dbLock.acquire()
-
-
-	# internal function that releases the lock
-	def _releaseLock(self):
-		logging.debug("[%s]: Release lock." % self.fileName)
-		self.dbLock.release()
-
-
 	# internal function that creates the database
 	# (should only be called if the database does not exist)
 	#
@@ -2755,6 +3387,9 @@ class Mysql(_Storage):
 
 		self._acquireLock()
 
+		# the sensors of the node may change
+		self._clearNodeSensors()
+
 		# connect to the database
 		try:
 			self._openConnection()
@@ -3069,7 +3704,10 @@ class Mysql(_Storage):
 	# return True or False
 	def addSensors(self, username, sensors):
 
-		self._acquireLock()	
+		self._acquireLock()
+
+		# the sensors of the node may change
+		self._clearNodeSensors()
 
 		# connect to the database
 		try:
@@ -3848,7 +4486,7 @@ class Mysql(_Storage):
 	# return nodeId or None
 	def getNodeId(self, username):
 
-		self._acquireLock()
+		self._acquireReadLock()
 
 		# connect to the database
 		try:
@@ -3857,7 +4495,7 @@ class Mysql(_Storage):
 			logging.exception("[%s]: Not able to connect to database."
 				% self.fileName)
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return None
 
@@ -3871,7 +4509,7 @@ class Mysql(_Storage):
 		# close connection to the database
 		self._closeConnection()
 
-		self._releaseLock()
+		self._releaseReadLock()
 
 		return nodeId
 
@@ -3880,7 +4518,7 @@ class Mysql(_Storage):
 	# return count of sensors in database
 	def getSensorCount(self, nodeId):
 
-		self._acquireLock()
+		self._acquireReadLock()
 
 		# connect to the database
 		try:
@@ -3889,7 +4527,7 @@ class Mysql(_Storage):
 			logging.exception("[%s]: Not able to connect to database."
 				% self.fileName)
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return False
 
@@ -3908,7 +4546,7 @@ class Mysql(_Storage):
 		# close connection to the database
 		self._closeConnection()
 
-		self._releaseLock()
+		self._releaseReadLock()
 
 		return sensorCount
 
@@ -3919,7 +4557,7 @@ class Mysql(_Storage):
 	# or None
 	def getSurveyData(self):
 
-		self._acquireLock()
+		self._acquireReadLock()
 
 		# connect to the database
 		try:
@@ -3928,7 +4566,7 @@ class Mysql(_Storage):
 			logging.exception("[%s]: Not able to connect to database."
 				% self.fileName)
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return None
 
@@ -3947,7 +4585,7 @@ class Mysql(_Storage):
 		# close connection to the database
 		self._closeConnection()
 
-		self._releaseLock()
+		self._releaseReadLock()
 
 		return list(surveyData)
 
@@ -3958,7 +4596,7 @@ class Mysql(_Storage):
 	# or None
 	def getUniqueID(self):
 
-		self._acquireLock()
+		self._acquireReadLock()
 
 		# connect to the database
 		try:
@@ -3967,7 +4605,7 @@ class Mysql(_Storage):
 			logging.exception("[%s]: Not able to connect to database."
 				% self.fileName)
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return None
 
@@ -3983,7 +4621,7 @@ class Mysql(_Storage):
 		# close connection to the database
 		self._closeConnection()
 
-		self._releaseLock()
+		self._releaseReadLock()
 
 		return uniqueID
 
@@ -3993,7 +4631,7 @@ class Mysql(_Storage):
 	#
 	# return True or False
 	def updateSensorState(self, nodeId, stateList):
-		
+
 		self._acquireLock()
 
 		# connect to the database
@@ -4007,17 +4645,18 @@ class Mysql(_Storage):
 
 			return False
 
-		# stateList is a list of tuples of (remoteSensorId, state)
-		for stateTuple in stateList:
+		try:
+			nodeSensors = self._getNodeSensors(nodeId)
 
-			try:
+			# resolve the ids of the sensors and get the sensors
+			# which state has changed
+			# (stateList is a list of tuples of (remoteSensorId, state))
+			sensorIds = set()
+			changedStates = list()
+			for stateTuple in stateList:
 
 				# check if the sensor does exist in the database
-				self.cursor.execute("SELECT id FROM sensors "
-					+ "WHERE nodeId = %s "
-					+ "AND remoteSensorId = %s", (nodeId, stateTuple[0]))
-				result = self.cursor.fetchall()
-				if len(result) != 1:
+				if not stateTuple[0] in nodeSensors:
 					logging.error("[%s]: Sensor does not exist in database."
 						% self.fileName)
 
@@ -4028,22 +4667,47 @@ class Mysql(_Storage):
 
 					return False
 
+				sensorData = nodeSensors[stateTuple[0]]
+				sensorIds.add(sensorData[0])
+				if sensorData[1] != stateTuple[1]:
+					changedStates.append(stateTuple)
+
+			utcTimestamp = int(time.time())
+
+			# update the time of the last state update of the sensors
+			# (with one statement if all sensors of the node are updated
+			# which is the case for the periodic full state of a node)
+			if len(sensorIds) == len(nodeSensors):
 				self.cursor.execute("UPDATE sensors SET "
-					+ "state = %s, "
 					+ "lastStateUpdated = %s "
-					+ "WHERE nodeId = %s "
-					+ "AND remoteSensorId = %s",
-					(stateTuple[1], int(time.time()), nodeId, stateTuple[0]))
-			except Exception as e:
-				logging.exception("[%s]: Not able to update sensor state."
-					% self.fileName)
+					+ "WHERE nodeId = %s", (utcTimestamp, nodeId))
+			else:
+				self.cursor.executemany("UPDATE sensors SET "
+					+ "lastStateUpdated = %s "
+					+ "WHERE id = %s",
+					[(utcTimestamp, sensorId) for sensorId in sensorIds])
 
-				# close connection to the database
-				self._closeConnection()
+			# only update the sensors which state has changed
+			if len(changedStates) != 0:
+				self.cursor.executemany("UPDATE sensors SET "
+					+ "state = %s "
+					+ "WHERE id = %s",
+					[(stateTuple[1], nodeSensors[stateTuple[0]][0])
+					for stateTuple in changedStates])
 
-				self._releaseLock()
+		except Exception as e:
+			logging.exception("[%s]: Not able to update sensor state."
+				% self.fileName)
 
-				return False
+			# the cached sensors may differ from the database
+			self._clearNodeSensors()
+
+			# close connection to the database
+			self._closeConnection()
+
+			self._releaseLock()
+
+			return False
 
 		# commit all changes
 		self.conn.commit()
@@ -4051,6 +4715,10 @@ class Mysql(_Storage):
 		# close connection to the database
 		self._closeConnection()
 
+		# update the cached states of the sensors
+		for stateTuple in changedStates:
+			nodeSensors[stateTuple[0]][1] = stateTuple[1]
+
 		self._releaseLock()
 
 		return True
@@ -4062,7 +4730,7 @@ class Mysql(_Storage):
 	# return sensorId or None
 	def getSensorId(self, nodeId, remoteSensorId):
 
-		self._acquireLock()
+		self._acquireReadLock()
 
 		# connect to the database
 		try:
@@ -4071,7 +4739,7 @@ class Mysql(_Storage):
 			logging.exception("[%s]: Not able to connect to database."
 				% self.fileName)
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return None
 
@@ -4084,14 +4752,14 @@ class Mysql(_Storage):
 			# close connection to the database
 			self._closeConnection()
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return None
 
 		# close connection to the database
 		self._closeConnection()
 
-		self._releaseLock()
+		self._releaseReadLock()
 
 		return sensorId
 
@@ -4102,7 +4770,7 @@ class Mysql(_Storage):
 	# return alertId or None
 	def getAlertId(self, nodeId, remoteAlertId):
 
-		self._acquireLock()
+		self._acquireReadLock()
 
 		# connect to the database
 		try:
@@ -4111,7 +4779,7 @@ class Mysql(_Storage):
 			logging.exception("[%s]: Not able to connect to database."
 				% self.fileName)
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return None
 
@@ -4124,14 +4792,14 @@ class Mysql(_Storage):
 			# close connection to the database
 			self._closeConnection()
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return None
 
 		# close connection to the database
 		self._closeConnection()
 
-		self._releaseLock()
+		self._releaseReadLock()
 
 		return alertId
 
@@ -4142,7 +4810,7 @@ class Mysql(_Storage):
 	# or None
 	def getSensorAlertLevels(self, sensorId):
 
-		self._acquireLock()
+		self._acquireReadLock()
 
 		# connect to the database
 		try:
@@ -4151,7 +4819,7 @@ class Mysql(_Storage):
 			logging.exception("[%s]: Not able to connect to database."
 				% self.fileName)
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return False
 
@@ -4169,7 +4837,7 @@ class Mysql(_Storage):
 			# close connection to the database
 			self._closeConnection()
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			# return None if action failed
 			return None
@@ -4177,7 +4845,7 @@ class Mysql(_Storage):
 		# close connection to the database
 		self._closeConnection()
 
-		self._releaseLock()
+		self._releaseReadLock()
 
 		# return list of tuples of (alertLevel)
 		return list(result)
@@ -4189,7 +4857,7 @@ class Mysql(_Storage):
 	# or None
 	def getAlertAlertLevels(self, alertId):
 
-		self._acquireLock()
+		self._acquireReadLock()
 
 		# connect to the database
 		try:
@@ -4198,7 +4866,7 @@ class Mysql(_Storage):
 			logging.exception("[%s]: Not able to connect to database."
 				% self.fileName)
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return False
 
@@ -4216,7 +4884,7 @@ class Mysql(_Storage):
 			# close connection to the database
 			self._closeConnection()
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			# return None if action failed
 			return None
@@ -4224,16 +4892,20 @@ class Mysql(_Storage):
 		# close connection to the database
 		self._closeConnection()
 
-		self._releaseLock()
+		self._releaseReadLock()
 
 		# return list of tuples of (alertLevel)
 		return list(result)
 
 
-	# adds a sensor alert to the database when the id of a node is given,
-	# the id of the sensor that is used internally by the node and the state
+	# adds a sensor alert when the id of a node is given, the id of the
+	# sensor that is used internally by the node and the state
+	# (updates the state of the sensor in the database, the sensor alert
+	# itself is only stored in the database if it is added to the journal)
 	#
-	# return True or False
+	# return a tuple (sensorAlertId, sensorId, nodeId, timeReceived,
+	# alertDelay, state, description, dataJson) with sensorAlertId None
+	# or None
 	def addSensorAlert(self, nodeId, remoteSensorId, state, dataJson):
 
 		self._acquireLock()
@@ -4247,17 +4919,13 @@ class Mysql(_Storage):
 
 			self._releaseLock()
 
-			return False
+			return None
 
 		try:
+			nodeSensors = self._getNodeSensors(nodeId)
 
 			# check if the sensor does exist in the database
-			# and get its sensorId
-			self.cursor.execute("SELECT id FROM sensors "
-				+ "WHERE nodeId = %s "
-				+ "AND remoteSensorId = %s", (nodeId, remoteSensorId))
-			result = self.cursor.fetchall()
-			if len(result) != 1:
+			if not remoteSensorId in nodeSensors:
 				logging.error("[%s]: Sensor does not exist in database."
 					% self.fileName)
 
@@ -4266,36 +4934,91 @@ class Mysql(_Storage):
 
 				self._releaseLock()
 
-				return False
-			sensorId = result[0][0]
+				return None
+			sensorData = nodeSensors[remoteSensorId]
+
+			timeReceived = int(time.time())
 
 			# update state of sensor in the database
 			self.cursor.execute("UPDATE sensors SET "
 				+ "state = %s, "
 				+ "lastStateUpdated = %s "
-				+ "WHERE nodeId = %s "
-				+ "AND remoteSensorId = %s",
-				(state, int(time.time()), nodeId, remoteSensorId))
-
-			# add sensor alert to database
-			self.cursor.execute("INSERT INTO sensorAlerts ("
-				+ "nodeId, "
-				+ "sensorId, "
-				+ "state, "
-				+ "timeReceived, "
-				+ "dataJson) VALUES (%s, %s, %s, %s, %s)",
-				(nodeId, sensorId, state, int(time.time()), dataJson))
+				+ "WHERE id = %s",
+				(state, timeReceived, sensorData[0]))
 
 		except Exception as e:
 			logging.exception("[%s]: Not able to add sensor alert."
 				% self.fileName)
 
+			# the cached sensors may differ from the database
+			self._clearNodeSensors()
+
+			# close connection to the database
+			self._closeConnection()
+
+			self._releaseLock()
+
+			return None
+
+		# commit all changes
+		self.conn.commit()
+
+		# close connection to the database
+		self._closeConnection()
+
+		# update the cached state of the sensor
+		sensorData[1] = state
+
+		self._releaseLock()
+
+		return (None, sensorData[0], nodeId, timeReceived, sensorData[2],
+			state, sensorData[3], dataJson)
+
+
+	# adds the given sensor alerts to the journal of sensor alerts
+	# in the database (in one transaction)
+	#
+	# return list of the sensorAlertIds in the same order
+	# or None
+	def addSensorAlertsToJournal(self, sensorAlerts):
+
+		self._acquireLock()
+
+		# connect to the database
+		try:
+			self._openConnection()
+		except Exception as e:
+			logging.exception("[%s]: Not able to connect to database."
+				% self.fileName)
+
+			self._releaseLock()
+
+			return None
+
+		sensorAlertIds = list()
+		try:
+			for sensorAlert in sensorAlerts:
+				self.cursor.execute("INSERT INTO sensorAlerts ("
+					+ "nodeId, "
+					+ "sensorId, "
+					+ "state, "
+					+ "timeReceived, "
+					+ "dataJson) VALUES (%s, %s, %s, %s, %s)",
+					(sensorAlert[2], sensorAlert[1], sensorAlert[5],
+					sensorAlert[3], sensorAlert[7]))
+				sensorAlertIds.append(self.cursor.lastrowid)
+
+		except Exception as e:
+			logging.exception("[%s]: Not able to add sensor alerts "
+				% self.fileName
+				+ "to the journal.")
+
 			# close connection to the database
 			self._closeConnection()
 
 			self._releaseLock()
 
-			return False
+			return None
 
 		# commit all changes
 		self.conn.commit()
@@ -4305,17 +5028,17 @@ class Mysql(_Storage):
 
 		self._releaseLock()
 
-		return True
+		return sensorAlertIds
 
 
-	# gets all sensor alerts in the database
+	# gets all sensor alerts in the journal of sensor alerts
 	#
 	# return a list of tuples (sensorAlertId, sensorId, nodeId, timeReceived,
 	# alertDelay, state, description, dataJson)
 	# or None
 	def getSensorAlerts(self):
 
-		self._acquireLock()
+		self._acquireReadLock()
 
 		# connect to the database
 		try:
@@ -4324,7 +5047,7 @@ class Mysql(_Storage):
 			logging.exception("[%s]: Not able to connect to database."
 				% self.fileName)
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return None
 
@@ -4351,24 +5074,25 @@ class Mysql(_Storage):
 			# close connection to the database
 			self._closeConnection()
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return None
 
 		# close connection to the database
 		self._closeConnection()
 
-		self._releaseLock()
+		self._releaseReadLock()
 
 		# return a list of tuples (sensorAlertId, sensorId, nodeId,
 		# timeReceived, alertDelay, state, description, dataJson)
 		return result
 
 
-	# deletes a sensor alert given by its sensor alert id
+	# deletes the sensor alerts given by their sensor alert ids
+	# from the journal of sensor alerts (in one transaction)
 	#
 	# return True or False
-	def deleteSensorAlert(self, sensorAlertId):
+	def deleteSensorAlerts(self, sensorAlertIds):
 
 		self._acquireLock()
 
@@ -4384,11 +5108,12 @@ class Mysql(_Storage):
 			return False
 
 		try:
-			self.cursor.execute("DELETE FROM sensorAlerts WHERE id = %s",
-					(sensorAlertId, ))
+			self.cursor.executemany("DELETE FROM sensorAlerts WHERE id = %s",
+				[(sensorAlertId, ) for sensorAlertId in sensorAlertIds])
 		except Exception as e:
-			logging.exception("[%s]: Not able to delete sensor alert." 
-				% self.fileName)
+			logging.exception("[%s]: Not able to delete sensor alerts "
+				% self.fileName
+				+ "from the journal.")
 
 			# close connection to the database
 			self._closeConnection()
@@ -4413,7 +5138,7 @@ class Mysql(_Storage):
 	# return True or False
 	def isAlertSystemActive(self):
 
-		self._acquireLock()
+		self._acquireReadLock()
 
 		# connect to the database
 		try:
@@ -4422,7 +5147,7 @@ class Mysql(_Storage):
 			logging.exception("[%s]: Not able to connect to database."
 				% self.fileName)
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return False
 
@@ -4439,14 +5164,14 @@ class Mysql(_Storage):
 			# close connection to the database
 			self._closeConnection()
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return False
 
 		# close connection to the database
 		self._closeConnection()
 
-		self._releaseLock()
+		self._releaseReadLock()
 
 		if alertSystemActive == 1:
 			return True
@@ -4460,7 +5185,7 @@ class Mysql(_Storage):
 	# or None
 	def getAllAlertsAlertLevels(self):
 
-		self._acquireLock()
+		self._acquireReadLock()
 
 		# connect to the database
 		try:
@@ -4469,7 +5194,7 @@ class Mysql(_Storage):
 			logging.exception("[%s]: Not able to connect to database."
 				% self.fileName)
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return None
 
@@ -4486,7 +5211,7 @@ class Mysql(_Storage):
 			# close connection to the database
 			self._closeConnection()
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			# return None if action failed
 			return None
@@ -4494,7 +5219,7 @@ class Mysql(_Storage):
 		# close connection to the database
 		self._closeConnection()
 
-		self._releaseLock()
+		self._releaseReadLock()
 
 		# return list of tuples of (alertLevel)
 		return list(result)
@@ -4506,7 +5231,7 @@ class Mysql(_Storage):
 	# or None
 	def getAllSensorsAlertLevels(self):
 
-		self._acquireLock()
+		self._acquireReadLock()
 
 		# connect to the database
 		try:
@@ -4515,7 +5240,7 @@ class Mysql(_Storage):
 			logging.exception("[%s]: Not able to connect to database."
 				% self.fileName)
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return None
 
@@ -4532,7 +5257,7 @@ class Mysql(_Storage):
 			# close connection to the database
 			self._closeConnection()
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			# return None if action failed
 			return None
@@ -4540,7 +5265,7 @@ class Mysql(_Storage):
 		# close connection to the database
 		self._closeConnection()
 
-		self._releaseLock()
+		self._releaseReadLock()
 
 		# return list of tuples of (alertLevel)
 		return list(result)
@@ -4552,7 +5277,7 @@ class Mysql(_Storage):
 	# or None
 	def getAllConnectedNodeIds(self):
 
-		self._acquireLock()
+		self._acquireReadLock()
 
 		# connect to the database
 		try:
@@ -4561,7 +5286,7 @@ class Mysql(_Storage):
 			logging.exception("[%s]: Not able to connect to database."
 				% self.fileName)
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return None
 
@@ -4580,7 +5305,7 @@ class Mysql(_Storage):
 			# close connection to the database
 			self._closeConnection()
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			# return None if action failed
 			return None
@@ -4588,7 +5313,7 @@ class Mysql(_Storage):
 		# close connection to the database
 		self._closeConnection()
 
-		self._releaseLock()
+		self._releaseReadLock()
 
 		# return list of tuples of (nodeId)
 		return list(result)
@@ -4690,7 +5415,7 @@ class Mysql(_Storage):
 	# or None
 	def getSensorsUpdatedOlderThan(self, oldestTimeUpdated):
 
-		self._acquireLock()
+		self._acquireReadLock()
 
 		# connect to the database
 		try:
@@ -4699,7 +5424,7 @@ class Mysql(_Storage):
 			logging.exception("[%s]: Not able to connect to database."
 				% self.fileName)
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return None
 
@@ -4720,20 +5445,69 @@ class Mysql(_Storage):
 			# close connection to the database
 			self._closeConnection()
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return None
 
 		# close connection to the database
 		self._closeConnection()
 
-		self._releaseLock()
+		self._releaseReadLock()
 
 		# return list of tuples of (sensorId, nodeId,
 		# lastStateUpdated, description)
 		return list(result)
 
 
+	# gets the time of the oldest last state update of all sensors
+	# which last state updates are not older than the given time
+	#
+	# return time of the oldest last state update,
+	# 0 if no such sensor exists or None
+	def getOldestSensorUpdateNotOlderThan(self, oldestTimeUpdated):
+
+		self._acquireReadLock()
+
+		# connect to the database
+		try:
+			self._openConnection()
+		except Exception as e:
+			logging.exception("[%s]: Not able to connect to database."
+				% self.fileName)
+
+			self._releaseReadLock()
+
+			return None
+
+		try:
+			self.cursor.execute("SELECT MIN(lastStateUpdated) "
+				+ "FROM sensors "
+				+ "WHERE lastStateUpdated >= %s", (oldestTimeUpdated, ))
+
+			result = self.cursor.fetchall()
+		except Exception as e:
+
+			logging.exception("[%s]: Not able to get " % self.fileName
+				+ "oldest sensor state update from database.")
+
+			# close connection to the database
+			self._closeConnection()
+
+			self._releaseReadLock()
+
+			return None
+
+		# close connection to the database
+		self._closeConnection()
+
+		self._releaseReadLock()
+
+		# MIN() returns NULL if no sensor was found
+		if result[0][0] is None:
+			return 0
+		return int(result[0][0])
+
+
 	# gets all information of a sensor by its given id
 	#
 	# return a tuple of (sensorId, nodeId,
@@ -4741,7 +5515,7 @@ class Mysql(_Storage):
 	# or None
 	def getSensorInformation(self, sensorId):
 
-		self._acquireLock()
+		self._acquireReadLock()
 
 		# connect to the database
 		try:
@@ -4750,7 +5524,7 @@ class Mysql(_Storage):
 			logging.exception("[%s]: Not able to connect to database."
 				% self.fileName)
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return None
 
@@ -4774,7 +5548,7 @@ class Mysql(_Storage):
 			# close connection to the database
 			self._closeConnection()
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return None
 
@@ -4787,14 +5561,14 @@ class Mysql(_Storage):
 			# close connection to the database
 			self._closeConnection()
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return None
 
 		# close connection to the database
 		self._closeConnection()
 
-		self._releaseLock()
+		self._releaseReadLock()
 
 		# return a tuple of (sensorId, nodeId,
 		# remoteSensorId, description, state, lastStateUpdated, alertDelay)
@@ -4806,7 +5580,7 @@ class Mysql(_Storage):
 	# return hostname or None
 	def getNodeHostnameById(self, nodeId):
 
-		self._acquireLock()
+		self._acquireReadLock()
 
 		# connect to the database
 		try:
@@ -4815,7 +5589,7 @@ class Mysql(_Storage):
 			logging.exception("[%s]: Not able to connect to database."
 				% self.fileName)
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return None
 
@@ -4833,14 +5607,14 @@ class Mysql(_Storage):
 			# close connection to the database
 			self._closeConnection()
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return None
 
 		# close connection to the database
 		self._closeConnection()
 
-		self._releaseLock()
+		self._releaseReadLock()
 
 		return hostname
 
@@ -4860,10 +5634,12 @@ class Mysql(_Storage):
 	# list[7] = list(tuples of (nodeId, managerId, description))
 	# list[8] = alertCount
 	# list[9] = list(tuples of (nodeId, alertId, description))
+	# list[10] = list(tuples of (sensorId, alertLevel))
+	# list[11] = list(tuples of (alertId, alertLevel))
 	# or None	
 	def getAlertSystemInformation(self):
 
-		self._acquireLock()
+		self._acquireReadLock()
 
 		# connect to the database
 		try:
@@ -4872,7 +5648,7 @@ class Mysql(_Storage):
 			logging.exception("[%s]: Not able to connect to database."
 				% self.fileName)
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return None
 
@@ -4929,6 +5705,20 @@ class Mysql(_Storage):
 			alertsInformation = result
 			alertCount = len(alertsInformation)
 
+			# get the alert levels of all sensors
+			self.cursor.execute("SELECT sensorId, "
+				+ "alertLevel "
+				+ "FROM sensorsAlertLevels")
+			result = self.cursor.fetchall()
+			sensorsAlertLevels = result
+
+			# get the alert levels of all alerts
+			self.cursor.execute("SELECT alertId, "
+				+ "alertLevel "
+				+ "FROM alertsAlertLevels")
+			result = self.cursor.fetchall()
+			alertsAlertLevels = result
+
 			# generate a list with all nodes information
 			alertSystemInformation = list()
 			alertSystemInformation.append(optionCount)
@@ -4941,6 +5731,8 @@ class Mysql(_Storage):
 			alertSystemInformation.append(managersInformation)
 			alertSystemInformation.append(alertCount)
 			alertSystemInformation.append(alertsInformation)
+			alertSystemInformation.append(sensorsAlertLevels)
+			alertSystemInformation.append(alertsAlertLevels)
 
 		except Exception as e:
 
@@ -4950,14 +5742,14 @@ class Mysql(_Storage):
 			# close connection to the database
 			self._closeConnection()
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return None
 
 		# close connection to the database
 		self._closeConnection()
 
-		self._releaseLock()
+		self._releaseReadLock()
 
 		# return a list of
 		# list[0] = optionCount
@@ -4971,7 +5763,9 @@ class Mysql(_Storage):
 		# list[6] = managerCount
 		# list[7] = list(tuples of (nodeId, managerId, description))
 		# list[8] = alertCount
-		# list[9] = list(tuples of (nodeId, alertId, description))		
+		# list[9] = list(tuples of (nodeId, alertId, description))
+		# list[10] = list(tuples of (sensorId, alertLevel))
+		# list[11] = list(tuples of (alertId, alertLevel))
 		return alertSystemInformation
 
 
@@ -5042,7 +5836,7 @@ class Mysql(_Storage):
 	# return sensor state or None
 	def getSensorState(self, sensorId):
 
-		self._acquireLock()
+		self._acquireReadLock()
 
 		# connect to the database
 		try:
@@ -5051,7 +5845,7 @@ class Mysql(_Storage):
 			logging.exception("[%s]: Not able to connect to database."
 				% self.fileName)
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return None
 
@@ -5067,7 +5861,7 @@ class Mysql(_Storage):
 				# close connection to the database
 				self._closeConnection()
 
-				self._releaseLock()
+				self._releaseReadLock()
 
 				return None
 
@@ -5081,14 +5875,14 @@ class Mysql(_Storage):
 			# close connection to the database
 			self._closeConnection()
 
-			self._releaseLock()
+			self._releaseReadLock()
 
 			return None
 
 		# close connection to the database
 		self._closeConnection()
 
-		self._releaseLock()
+		self._releaseReadLock()
 
 		return state
 
@@ -5097,4 +5891,571 @@ class Mysql(_Storage):
 	#
 	# no return value
 	def close(self):
-		pass
\ No newline at end of file
+
+		self._acquireLock()
+
+		self._logLockStatistics()
+
+		self.connectionPool.close()
+
+		self._releaseLock()
+
+# this class caches the metadata of the nodes, sensors, alerts and
+# alert levels as well as the options and the states of the sensors
+# in memory; all writes go through to the wrapped storage backend and
+# update or invalidate the cached data
+# (changes made to the database by other programs are not seen)
+class CachedStorage(_Storage):
+
+	def __init__(self, storage, metrics):
+
+		# file nme of this file (used for logging)
+		self.fileName = os.path.basename(__file__)
+
+		# the storage backend that is wrapped by the cache
+		self.storage = storage
+
+		# lock that serializes all writes so the cache is updated
+		# in the same order as the database
+		self.writeLock = threading.Lock()
+
+		# lock that protects the cached data
+		self.cacheLock = threading.Lock()
+
+		# counters that are increased each time the cached data is
+		# invalidated (a value that was read from the database is only
+		# cached if it was not invalidated while it was read)
+		self.metadataGeneration = 0
+		self.stateGeneration = 0
+
+		# the cached data
+		self.nodeIds = dict()
+		self.sensorCounts = dict()
+		self.sensorIds = dict()
+		self.alertIds = dict()
+		self.sensorAlertLevels = dict()
+		self.alertAlertLevels = dict()
+		self.nodeHostnames = dict()
+		self.sensorStates = dict()
+		self.options = dict()
+
+		# statistics about the usage of the cache
+		self.hitCount = 0
+		self.missCount = 0
+
+		# the metrics of the server (None if they are not activated)
+		if metrics is not None:
+			metrics.registerCallback("alertr_storage_cache_total",
+				"counter", "Reads of the cached data by result.",
+				self._getCacheMetrics)
+
+
+	# internal function that gets the statistics of the cache
+	# for the metrics
+	#
+	# return list of tuples (labels, value)
+	def _getCacheMetrics(self):
+
+		self.cacheLock.acquire()
+		values = [((("result", "hit"),), self.hitCount),
+			((("result", "miss"),), self.missCount)]
+		self.cacheLock.release()
+
+		return values
+
+
+	# internal function that returns the cached value of the given key
+	# or reads it from the storage backend and caches it
+	# (the result of a failed read is returned and not cached, the
+	# backends return None or False if a read failed)
+	def _getCachedValue(self, cache, key, isState, readFunction, *args):
+
+		self.cacheLock.acquire()
+		if key in cache:
+			self.hitCount += 1
+			value = cache[key]
+			self.cacheLock.release()
+			return value
+		self.missCount += 1
+		if isState:
+			generation = self.stateGeneration
+		else:
+			generation = self.metadataGeneration
+		self.cacheLock.release()
+
+		value = readFunction(*args)
+
+		if value is None or value is False:
+			return value
+
+		self.cacheLock.acquire()
+		if isState:
+			currentGeneration = self.stateGeneration
+		else:
+			currentGeneration = self.metadataGeneration
+		if generation == currentGeneration:
+			cache[key] = value
+		self.cacheLock.release()
+
+		return value
+
+
+	# internal function that removes all cached data
+	# (is used after nodes, sensors, alerts or managers were changed)
+	def _invalidateCache(self):
+
+		logging.debug("[%s]: Invalidating cache." % self.fileName)
+
+		self.cacheLock.acquire()
+		self.metadataGeneration += 1
+		self.stateGeneration += 1
+		self.nodeIds = dict()
+		self.sensorCounts = dict()
+		self.sensorIds = dict()
+		self.alertIds = dict()
+		self.sensorAlertLevels = dict()
+		self.alertAlertLevels = dict()
+		self.nodeHostnames = dict()
+		self.sensorStates = dict()
+		self.options = dict()
+		self.cacheLock.release()
+
+
+	# internal function that calls a write function of the storage
+	# backend and invalidates the cache afterwards
+	def _writeAndInvalidate(self, writeFunction, *args):
+
+		self.writeLock.acquire()
+
+		try:
+			result = writeFunction(*args)
+		finally:
+			self._invalidateCache()
+			self.writeLock.release()
+
+		return result
+
+
+	# internal function that writes the new states of the sensors
+	# of a node through to the cache (given in a tuple of
+	# (remoteSensorId, state); the states are removed from the cache
+	# if the write to the storage backend failed)
+	def _writeSensorStates(self, nodeId, stateList, result):
+
+		self.cacheLock.acquire()
+		self.stateGeneration += 1
+		for stateTuple in stateList:
+			key = (nodeId, stateTuple[0])
+			if not key in self.sensorIds:
+				self.sensorStates = dict()
+				continue
+			sensorId = self.sensorIds[key]
+			if result:
+				self.sensorStates[sensorId] = stateTuple[1]
+			elif sensorId in self.sensorStates:
+				del self.sensorStates[sensorId]
+		self.cacheLock.release()
+
+
+	# creates the database (should only be called if the database
+	# does not exist)
+	#
+	# no return value but raise exception if it fails
+	def createStorage(self):
+		self._writeAndInvalidate(self.storage.createStorage)
+
+
+	# checks the version of the server and the version in the database
+	# and clears every compatibility issue
+	#
+	# no return value but raise exception if it fails
+	def checkVersionAndClearConflict(self):
+		self._writeAndInvalidate(self.storage.checkVersionAndClearConflict)
+
+
+	# adds a node if it does not exist or changes the registered
+	# values if it does exist
+	#
+	# return True or False
+	def addNode(self, username, hostname, nodeType, instance, version, rev):
+		return self._writeAndInvalidate(self.storage.addNode, username,
+			hostname, nodeType, instance, version, rev)
+
+
+	# adds/updates the data that is given by the node for the sensors
+	# to the database
+	#
+	# return True or False
+	def addSensors(self, username, sensors):
+		return self._writeAndInvalidate(self.storage.addSensors, username,
+			sensors)
+
+
+	# adds/updates the data that is given by the node for the alerts
+	# to the database
+	#
+	# return True or False
+	def addAlerts(self, username, alerts):
+		return self._writeAndInvalidate(self.storage.addAlerts, username,
+			alerts)
+
+
+	# adds/updates the data that is given by the node for
+	# the manager to the database
+	#
+	# return True or False
+	def addManager(self, username, manager):
+		return self._writeAndInvalidate(self.storage.addManager, username,
+			manager)
+
+
+	# adds a sensor alert when the id of a node is given, the id of the
+	# sensor that is used internally by the node and the state
+	# (updates the state of the sensor in the database, the sensor alert
+	# itself is only stored in the database if it is added to the journal)
+	#
+	# return a tuple (sensorAlertId, sensorId, nodeId, timeReceived,
+	# alertDelay, state, description, dataJson) with sensorAlertId None
+	# or None
+	def addSensorAlert(self, nodeId, remoteSensorId, state, dataJson):
+
+		self.writeLock.acquire()
+
+		sensorAlert = self.storage.addSensorAlert(nodeId, remoteSensorId,
+			state, dataJson)
+
+		# the sensor alert also updates the state of the sensor
+		self._writeSensorStates(nodeId, [(remoteSensorId, state)],
+			sensorAlert is not None)
+
+		self.writeLock.release()
+
+		return sensorAlert
+
+
+	# adds the given sensor alerts to the journal of sensor alerts
+	# in the database (in one transaction)
+	#
+	# return list of the sensorAlertIds in the same order
+	# or None
+	def addSensorAlertsToJournal(self, sensorAlerts):
+		return self.storage.addSensorAlertsToJournal(sensorAlerts)
+
+
+	# gets the id of the node by a given username
+	# (usernames are unique to each node)
+	#
+	# return nodeId or None
+	def getNodeId(self, username):
+		return self._getCachedValue(self.nodeIds, username, False,
+			self.storage.getNodeId, username)
+
+
+	# gets the count of the sensors of a node in the database
+	#
+	# return count of sensors or None
+	def getSensorCount(self, nodeId):
+		return self._getCachedValue(self.sensorCounts, nodeId, False,
+			self.storage.getSensorCount, nodeId)
+
+
+	# gets the sensor id of a sensor when the id of a node is given
+	# and the remote sensor id that is used by the node internally
+	#
+	# return sensorId or None
+	def getSensorId(self, nodeId, remoteSensorId):
+		return self._getCachedValue(self.sensorIds,
+			(nodeId, remoteSensorId), False,
+			self.storage.getSensorId, nodeId, remoteSensorId)
+
+
+	# gets all data needed for the survey
+	#
+	# return list of tuples of (instance, version, rev)
+	# or None
+	def getSurveyData(self):
+		return self.storage.getSurveyData()
+
+
+	# gets the unique id from the database
+	#
+	# return unique id
+	# or None
+	def getUniqueID(self):
+		return self.storage.getUniqueID()
+
+
+	# gets the alert id of a alert when the id of a node is given
+	# and the remote alert id that is used by the node internally
+	#
+	# return alertId or None
+	def getAlertId(self, nodeId, remoteAlertId):
+		return self._getCachedValue(self.alertIds,
+			(nodeId, remoteAlertId), False,
+			self.storage.getAlertId, nodeId, remoteAlertId)
+
+
+	# gets all alert levels for a specific sensor given by sensorId
+	#
+	# return list of tuples of (alertLevel)
+	# or None
+	def getSensorAlertLevels(self, sensorId):
+		return self._getCachedValue(self.sensorAlertLevels, sensorId, False,
+			self.storage.getSensorAlertLevels, sensorId)
+
+
+	# gets all alert levels for a specific alert given by alertId
+	#
+	# return list of tuples of (alertLevel)
+	# or None
+	def getAlertAlertLevels(self, alertId):
+		return self._getCachedValue(self.alertAlertLevels, alertId, False,
+			self.storage.getAlertAlertLevels, alertId)
+
+
+	# gets all sensor alerts in the journal of sensor alerts
+	#
+	# return a list of tuples (sensorAlertId, sensorId, nodeId, timeReceived,
+	# alertDelay, state, description, dataJson)
+	# or None
+	def getSensorAlerts(self):
+		return self.storage.getSensorAlerts()
+
+
+	# gets all alert levels for the alert clients from the database
+	#
+	# return list of tuples of (alertLevel)
+	# or None
+	def getAllAlertsAlertLevels(self):
+		return self.storage.getAllAlertsAlertLevels()
+
+
+	# gets all alert levels for the sensors from the database
+	#
+	# return list of tuples of (alertLevel)
+	# or None
+	def getAllSensorsAlertLevels(self):
+		return self.storage.getAllSensorsAlertLevels()
+
+
+	# gets all nodes from the database that are connected to the server
+	#
+	# return list of tuples of (nodeId)
+	# or None
+	def getAllConnectedNodeIds(self):
+		return self.storage.getAllConnectedNodeIds()
+
+
+	# gets the information of all sensors which last state updates
+	# are older than the given time
+	#
+	# return list of tuples of (sensorId, nodeId,
+	# lastStateUpdated, description)
+	# or None
+	def getSensorsUpdatedOlderThan(self, oldestTimeUpdated):
+		return self.storage.getSensorsUpdatedOlderThan(oldestTimeUpdated)
+
+
+	# gets the time of the oldest last state update of all sensors
+	# which last state updates are not older than the given time
+	#
+	# return time of the oldest last state update,
+	# 0 if no such sensor exists or None
+	def getOldestSensorUpdateNotOlderThan(self, oldestTimeUpdated):
+		return self.storage.getOldestSensorUpdateNotOlderThan(
+			oldestTimeUpdated)
+
+
+	# gets all information of a sensor by its given id
+	#
+	# return a tuple of (sensorId, nodeId,
+	# remoteSensorId, description, state, lastStateUpdated, alertDelay)
+	# or None
+	def getSensorInformation(self, sensorId):
+		return self.storage.getSensorInformation(sensorId)
+
+
+	# gets the hostname of a node from the database when its id is given
+	#
+	# return hostname or None
+	def getNodeHostnameById(self, nodeId):
+		return self._getCachedValue(self.nodeHostnames, nodeId, False,
+			self.storage.getNodeHostnameById, nodeId)
+
+
+	# gets all information that the server has at the current moment
+	# (see the abstract storage class for the returned lists)
+	#
+	# return a list of lists or None
+	def getAlertSystemInformation(self):
+		return self.storage.getAlertSystemInformation()
+
+
+	# gets the state of a sensor given by id
+	#
+	# return sensor state or None
+	def getSensorState(self, sensorId):
+		return self._getCachedValue(self.sensorStates, sensorId, True,
+			self.storage.getSensorState, sensorId)
+
+
+	# change a option in the database
+	#
+	# return True or False
+	def changeOption(self, optionType, optionValue):
+
+		self.writeLock.acquire()
+
+		result = self.storage.changeOption(optionType, optionValue)
+
+		# write the new value through to the cache
+		self.cacheLock.acquire()
+		self.metadataGeneration += 1
+		if result:
+			self.options[optionType] = optionValue
+		elif optionType in self.options:
+			del self.options[optionType]
+		self.cacheLock.release()
+
+		self.writeLock.release()
+
+		return result
+
+
+	# marks a node given by its id as NOT connected
+	#
+	# return True or False
+	def markNodeAsNotConnected(self, nodeId):
+		return self.storage.markNodeAsNotConnected(nodeId)
+
+
+	# marks a node given by its id as connected
+	#
+	# return True or False
+	def markNodeAsConnected(self, nodeId):
+		return self.storage.markNodeAsConnected(nodeId)
+
+
+	# deletes the sensor alerts given by their sensor alert ids
+	# from the journal of sensor alerts (in one transaction)
+	#
+	# return True or False
+	def deleteSensorAlerts(self, sensorAlertIds):
+		return self.storage.deleteSensorAlerts(sensorAlertIds)
+
+
+	# checks if the alert system is active or not
+	#
+	# return True or False
+	def isAlertSystemActive(self):
+
+		self.cacheLock.acquire()
+		if "alertSystemActive" in self.options:
+			self.hitCount += 1
+			alertSystemActive = (self.options["alertSystemActive"] == 1)
+			self.cacheLock.release()
+			return alertSystemActive
+		self.missCount += 1
+		generation = self.metadataGeneration
+		self.cacheLock.release()
+
+		alertSystemActive = self.storage.isAlertSystemActive()
+
+		# only cache an active alert system because the storage backend
+		# also returns False if the read failed
+		# (an inactive alert system is cached when the option is changed)
+		if alertSystemActive:
+			self.cacheLock.acquire()
+			if generation == self.metadataGeneration:
+				self.options["alertSystemActive"] = 1
+			self.cacheLock.release()
+
+		return alertSystemActive
+
+
+	# updates the states of the sensors of a node in the database
+	# (given in a tuple of (remoteSensorId, state))
+	#
+	# return True or False
+	def updateSensorState(self, nodeId, stateList):
+
+		self.writeLock.acquire()
+
+		result = self.storage.updateSensorState(nodeId, stateList)
+
+		self._writeSensorStates(nodeId, stateList, result)
+
+		self.writeLock.release()
+
+		return result
+
+
+	# gets the statistics about the contention on the database
+	# (extended by the statistics of the cache)
+	#
+	# return dict with the statistics
+	def getLockStatistics(self):
+
+		lockStatistics = self.storage.getLockStatistics()
+
+		self.cacheLock.acquire()
+		lockStatistics["cacheHitCount"] = self.hitCount
+		lockStatistics["cacheMissCount"] = self.missCount
+		self.cacheLock.release()
+
+		return lockStatistics
+
+
+	# closes db for usage
+	#
+	# no return value
+	def close(self):
+
+		self.cacheLock.acquire()
+		logging.debug("[%s]: Cache statistics. " % self.fileName
+			+ "Hits: %d; Misses: %d." % (self.hitCount, self.missCount))
+		self.cacheLock.release()
+
+		self.storage.close()
+
+
+# this class measures the time of all calls to the wrapped storage
+# backend and adds it to the metrics of the server
+# (functions of the storage backend are looked up on the first call
+# and wrapped, all other attributes are passed through)
+class MeteredStorage(object):
+
+	def __init__(self, storage, metrics):
+
+		# file nme of this file (used for logging)
+		self.fileName = os.path.basename(__file__)
+
+		# the storage backend that is measured
+		self.storage = storage
+
+		self.metrics = metrics
+		self.metrics.registerHistogram("alertr_storage_call_seconds",
+			"Time of the calls to the storage backend.")
+
+
+	def __getattr__(self, name):
+
+		attribute = getattr(self.storage, name)
+		if name.startswith("_") or not callable(attribute):
+			return attribute
+
+		labels = (("method", name),)
+		metrics = self.metrics
+
+		def meteredFunction(*args, **kwargs):
+			startTime = time.time()
+			try:
+				return attribute(*args, **kwargs)
+			finally:
+				metrics.observe("alertr_storage_call_seconds",
+					time.time() - startTime, labels)
+
+		# store the wrapped function so it is not looked up again
+		self.__dict__[name] = meteredFunction
+
+		return meteredFunction
@@ -0,0 +1,108 @@
+#!/usr/bin/python2
+
+# written by sqall
+# twitter: https://twitter.com/sqall01
+# blog: http://blog.h4des.org
+# github: https://github.com/sqall01
+#
+# Licensed under the GNU Public License, version 2.
+
+import heapq
+
+
+# this class is a heap of timers that are identified by a key
+# (scheduling a key again replaces its timer, replaced and canceled timers
+# stay in the heap until they are reached or the heap is compacted)
+class TimerHeap:
+
+	def __init__(self):
+
+		# heap of tuples (deadline, sequenceNumber, key)
+		self.heap = list()
+
+		# the current timer of each scheduled key
+		# (key: key; value: tuple (deadline, sequenceNumber))
+		self.timers = dict()
+
+		# increasing number that keeps the order of timers with the same
+		# deadline and avoids comparing keys
+		self.sequenceNumber = 0
+
+
+	# internal function that removes the replaced and canceled timers
+	# from the top of the heap
+	def _removeStaleTimers(self):
+
+		while self.heap:
+			if self._isCurrent(self.heap[0]):
+				break
+			heapq.heappop(self.heap)
+
+
+	# internal function that checks if the given element of the heap
+	# is the current timer of its key
+	# (the sequence number identifies the timer, a key can be scheduled
+	# several times with the same deadline)
+	def _isCurrent(self, element):
+
+		key = element[2]
+		return (key in self.timers
+			and self.timers[key] == (element[0], element[1]))
+
+
+	# schedules a timer for the given key
+	# (replaces the timer of the key if one exists)
+	def schedule(self, key, deadline):
+
+		# the key is already scheduled with this deadline
+		if key in self.timers and self.timers[key][0] == deadline:
+			return
+
+		self.timers[key] = (deadline, self.sequenceNumber)
+		heapq.heappush(self.heap, (deadline, self.sequenceNumber, key))
+		self.sequenceNumber += 1
+
+		# rebuild the heap if it consists mostly of replaced timers
+		if len(self.heap) > (2 * len(self.timers) + 64):
+			self.heap = [x for x in self.heap if self._isCurrent(x)]
+			heapq.heapify(self.heap)
+
+
+	# cancels the timer of the given key (if one exists)
+	def cancel(self, key):
+
+		if key in self.timers:
+			del self.timers[key]
+
+
+	# gets the earliest deadline of all timers
+	#
+	# return deadline or None
+	def getNextDeadline(self):
+
+		self._removeStaleTimers()
+
+		if self.heap:
+			return self.heap[0][0]
+
+		return None
+
+
+	# removes all timers with a deadline before the given time
+	#
+	# return list of the keys of the removed timers
+	def popExpired(self, currentTime):
+
+		expiredKeys = list()
+
+		while True:
+			self._removeStaleTimers()
+			if not self.heap or self.heap[0][0] >= currentTime:
+				break
+
+			key = heapq.heappop(self.heap)[2]
+			del self.timers[key]
+			expiredKeys.append(key)
+
+		return expiredKeys
+
@@ -0,0 +1,270 @@
+#!/usr/bin/python2
+
+# written by sqall
+# twitter: https://twitter.com/sqall01
+# blog: http://blog.h4des.org
+# github: https://github.com/sqall01
+#
+# Licensed under the GNU Public License, version 2.
+
+import threading
+import thread
+import logging
+import os
+import time
+import json
+import errno
+import fcntl
+import collections
+
+
+# this class records the timing spans of the hot paths of the server
+# in a ring buffer and writes them to a trace file
+# (spans are nested per thread and nested spans get the node type
+# of the span they are nested in)
+class Tracer:
+
+	def __init__(self, bufferSize, traceFile, traceFormat):
+
+		# file nme of this file (used for logging)
+		self.fileName = os.path.basename(__file__)
+
+		# file the spans are written to
+		self.traceFile = traceFile
+
+		# format of the trace file ("JSON" for the chrome trace event
+		# format or "FOLDED" for the folded stacks of flame graph tools)
+		self.traceFormat = traceFormat
+
+		# ring buffer of the finished spans (tuples (name, nodeType,
+		# parentNames, startTime, duration, threadId))
+		self.spans = collections.deque(maxlen=bufferSize)
+		self.spansLock = threading.Lock()
+
+		# number of spans that were recorded since the start
+		self.countSpans = 0
+
+		# data of the current thread (i.e., stack of the open spans as
+		# lists [name, nodeType, startTime])
+		self.threadData = threading.local()
+
+
+	# internal function that gets the stack of the open spans
+	# of the current thread
+	def _getStack(self):
+
+		try:
+			return self.threadData.stack
+		except AttributeError:
+			self.threadData.stack = list()
+			return self.threadData.stack
+
+
+	# internal function that adds a finished span to the ring buffer
+	def _addSpan(self, name, nodeType, stack, startTime, duration):
+
+		span = (name, nodeType, tuple([openSpan[0] for openSpan in stack]),
+			startTime, duration, thread.get_ident())
+
+		self.spansLock.acquire()
+		self.spans.append(span)
+		self.countSpans += 1
+		self.spansLock.release()
+
+
+	# opens a span in the current thread
+	# (node type None uses the node type of the span it is nested in)
+	def startSpan(self, name, nodeType=None):
+
+		stack = self._getStack()
+		if nodeType is None and stack:
+			nodeType = stack[-1][1]
+		stack.append([name, nodeType, time.time()])
+
+
+	# closes the last opened span of the current thread
+	def endSpan(self):
+
+		stack = self._getStack()
+		name, nodeType, startTime = stack.pop()
+		self._addSpan(name, nodeType, stack, startTime,
+			time.time() - startTime)
+
+
+	# adds a span that was already measured by the caller
+	# (i.e., waiting for a lock) nested in the open spans
+	# of the current thread
+	def addSpan(self, name, startTime, duration, nodeType=None):
+
+		stack = self._getStack()
+		if nodeType is None and stack:
+			nodeType = stack[-1][1]
+		self._addSpan(name, nodeType, stack, startTime, duration)
+
+
+	# internal function that converts the spans into the chrome trace
+	# event format (can be loaded by chrome://tracing or perfetto)
+	#
+	# return string
+	def _getJsonTrace(self, spans):
+
+		processId = os.getpid()
+
+		traceEvents = list()
+		for name, nodeType, parentNames, startTime, duration, threadId \
+			in spans:
+
+			if nodeType is None:
+				nodeType = "server"
+
+			traceEvents.append({"name": name,
+				"cat": nodeType,
+				"ph": "X",
+				"ts": int(startTime * 1000000),
+				"dur": int(duration * 1000000),
+				"pid": processId,
+				"tid": threadId,
+				"args": {"nodeType": nodeType}})
+
+		return json.dumps({"traceEvents": traceEvents,
+			"displayTimeUnit": "ms"})
+
+
+	# internal function that converts the spans into folded stacks
+	# with the own time of the spans in microseconds (can be used by
+	# flamegraph.pl or speedscope, the node type is the root frame)
+	#
+	# return string
+	def _getFoldedStacks(self, spans):
+
+		# time of the stacks (key: frames; value: time in microseconds)
+		stackTimes = dict()
+		for name, nodeType, parentNames, startTime, duration, threadId \
+			in spans:
+
+			if nodeType is None:
+				nodeType = "server"
+
+			frames = (nodeType, ) + parentNames
+			durationMicro = int(duration * 1000000)
+			stackTimes[frames + (name, )] = (stackTimes.get(
+				frames + (name, ), 0) + durationMicro)
+
+			# the time of a nested span is not the own time of the span
+			# it is nested in
+			if parentNames:
+				stackTimes[frames] = (stackTimes.get(frames, 0)
+					- durationMicro)
+
+		lines = list()
+		for frames in sorted(stackTimes.keys()):
+
+			# spans that are still open have no own time
+			if stackTimes[frames] <= 0:
+				continue
+
+			lines.append("%s %d" % (";".join([frame.replace(";", ":")
+				.replace(" ", "_") for frame in frames]),
+				stackTimes[frames]))
+
+		return "\n".join(lines) + "\n"
+
+
+	# writes the spans in the ring buffer to the trace file
+	#
+	# return True or False
+	def dump(self):
+
+		self.spansLock.acquire()
+		spans = list(self.spans)
+		countSpans = self.countSpans
+		self.spansLock.release()
+
+		try:
+			if self.traceFormat == "JSON":
+				traceData = self._getJsonTrace(spans)
+			else:
+				traceData = self._getFoldedStacks(spans)
+
+			# write to a temporary file first so the trace file
+			# is never read incomplete
+			tempFile = self.traceFile + ".tmp"
+			fileHandle = open(tempFile, "w")
+			fileHandle.write(traceData)
+			fileHandle.close()
+			os.rename(tempFile, self.traceFile)
+
+		except Exception as e:
+			logging.exception("[%s]: Not able to write trace file '%s'."
+				% (self.fileName, self.traceFile))
+			return False
+
+		logging.info("[%s]: Wrote %d of %d recorded spans to "
+			% (self.fileName, len(spans), countSpans)
+			+ "trace file '%s'." % self.traceFile)
+
+		return True
+
+
+# this class writes the trace file when it is requested
+# (requests are made by the signal handler and only write to a pipe
+# because the main thread could hold the lock of the tracer)
+class TraceDumper(threading.Thread):
+
+	def __init__(self, globalData):
+		threading.Thread.__init__(self)
+
+		# file nme of this file (used for logging)
+		self.fileName = os.path.basename(__file__)
+
+		# get global configured data
+		self.globalData = globalData
+		self.tracer = self.globalData.tracer
+
+		# pipe that is used to request the writing of the trace file
+		# (writing end is non-blocking so a request never blocks)
+		self.requestPipeRead, self.requestPipeWrite = os.pipe()
+		flags = fcntl.fcntl(self.requestPipeWrite, fcntl.F_GETFL)
+		fcntl.fcntl(self.requestPipeWrite, fcntl.F_SETFL,
+			flags | os.O_NONBLOCK)
+
+		# set exit flag as false
+		self.exitFlag = False
+
+
+	# requests the writing of the trace file
+	# (can be called by a signal handler)
+	def requestDump(self):
+
+		try:
+			os.write(self.requestPipeWrite, "x")
+		except OSError as e:
+			# a request is already pending
+			if e.errno != errno.EAGAIN:
+				raise
+
+
+	def run(self):
+
+		while 1:
+
+			try:
+				os.read(self.requestPipeRead, 4096)
+			except OSError as e:
+				# a signal interrupted the read => read again
+				if e.errno == errno.EINTR:
+					continue
+				raise
+
+			# check if thread should terminate
+			if self.exitFlag:
+				return
+
+			self.tracer.dump()
+
+
+	# sets the exit flag to shut down the thread
+	def exit(self):
+		self.exitFlag = True
+		self.requestDump()
+		return
@@ -10,11 +10,16 @@
 import csv
 import logging
 import os
+import time
+import threading
+import hashlib
+import hmac
+import binascii
 
 
 # internal abstract class for new user backends
 class _userBackend():
-	
+
 	# this function checks if the user credentials are valid
 	#
 	# return True or False
@@ -31,19 +36,128 @@ class _userBackend():
 
 
 # user backend that uses a simple csv file
-# in the form of "username, password" per line
+# in the form of "username, password, type of node, instance of node"
+# per line (the password can also be stored as salted hash in the form of
+# "pbkdf2_sha256$iterations$salt$hash" with salt and hash in hex)
 class CSVBackend(_userBackend):
 
-	def __init__(self, csvLocation):
+	def __init__(self, csvLocation, reloadInterval, metrics):
 
 		# file nme of this file (used for logging)
 		self.fileName = os.path.basename(__file__)
 
-		# stores all user credentials as a tuple of values (username, password)
-		self.userCredentials = list()
+		# location of the csv file
+		self.csvLocation = csvLocation
+
+		# interval in seconds in which the csv file is checked for changes
+		# (0 disables the reloading of the csv file)
+		self.reloadInterval = reloadInterval
+
+		# time the csv file was last checked for changes and its
+		# modification time and size when it was read
+		self.lastReloadCheck = 0.0
+		self.csvFileState = None
+
+		# lock that makes sure only one thread reloads the csv file
+		self.reloadLock = threading.Lock()
+
+		# number of times the csv file was loaded
+		self.countLoads = 0
+
+		# stores all user credentials indexed by the username
+		# (key: username; value: tuple of (password, passwordHash,
+		# nodeType, instance) with password None if a hash is stored,
+		# passwordHash a tuple of (iterations, salt, hash) or None and
+		# the node type and instance in upper case)
+		# (the dict is only replaced when the csv file is reloaded
+		# and never changed)
+		self.userCredentials = dict()
+
+		# password hash that the password of an unknown username is
+		# checked against (tuple of (iterations, salt, hash) with the
+		# highest iterations of the stored hashes or None if no
+		# hashes are stored)
+		self.dummyPasswordHash = None
 
 		# parse csv file and store all user credentials
-		with open(csvLocation, 'rb') as csvFile:
+		# (an error aborts the start of the server)
+		self._loadCsvFile()
+
+		# the metrics of the server (None if they are not activated)
+		if metrics is not None:
+			metrics.registerCallback("alertr_user_backend_loads_total",
+				"counter", "Number of times the csv file was loaded.",
+				self._getLoadMetrics)
+			metrics.registerCallback("alertr_user_backend_users",
+				"gauge", "Users that are stored in the csv file.",
+				self._getUserMetrics)
+
+
+	# internal function that gets the number of loads of the csv file
+	# for the metrics
+	#
+	# return list of tuples (labels, value)
+	def _getLoadMetrics(self):
+		return [((), self.countLoads)]
+
+
+	# internal function that gets the number of users for the metrics
+	#
+	# return list of tuples (labels, value)
+	def _getUserMetrics(self):
+		return [((), len(self.userCredentials))]
+
+
+	# internal function that compares two strings in a time
+	# that does not depend on their content
+	def _compareDigest(self, a, b):
+
+		if hasattr(hmac, "compare_digest"):
+			return hmac.compare_digest(a, b)
+
+		if len(a) != len(b):
+			return False
+		result = 0
+		for x, y in zip(a, b):
+			result |= ord(x) ^ ord(y)
+		return result == 0
+
+
+	# internal function that parses a stored password hash
+	#
+	# return tuple of (iterations, salt, hash)
+	def _parsePasswordHash(self, passwordField):
+
+		hashParts = passwordField.split("$")
+		if len(hashParts) != 4:
+			raise ValueError("Password hash has not the form "
+				+ "'pbkdf2_sha256$iterations$salt$hash'.")
+
+		if not hasattr(hashlib, "pbkdf2_hmac"):
+			raise ValueError("Password hashes need at least Python 2.7.8.")
+
+		iterations = int(hashParts[1])
+		if iterations <= 0:
+			raise ValueError("Iterations of password hash are not positive.")
+
+		salt = binascii.unhexlify(hashParts[2])
+		passwordHash = binascii.unhexlify(hashParts[3])
+
+		return (iterations, salt, passwordHash)
+
+
+	# internal function that parses the csv file and replaces
+	# the stored user credentials
+	# (raises an exception if the csv file could not be read)
+	def _loadCsvFile(self):
+
+		userCredentials = dict()
+		maxIterations = 0
+
+		csvFileStat = os.stat(self.csvLocation)
+		csvFileState = (csvFileStat.st_mtime, csvFileStat.st_size)
+
+		with open(self.csvLocation, 'rb') as csvFile:
 			csvReader = csv.reader(csvFile, quoting=csv.QUOTE_ALL)
 			for row in csvReader:
 				if len(row) != 4:
@@ -57,19 +171,81 @@ class CSVBackend(_userBackend):
 				instance = row[3].replace(' ', '')
 
 				# check if username has a duplicate
-				if any(map(lambda x : x[0] == username,
-					self.userCredentials)):
+				if username in userCredentials:
 
 					logging.error("[%s]: Username '%s' already exists "
-						% (self.fileName, logString)
+						% (self.fileName, username)
 						+ "in CSV file.")
 
 					continue
 
-				self.userCredentials.append( (username,
-					password,
-					nodeType,
-					instance) )
+				# check if the password is stored as hash
+				passwordHash = None
+				if password.startswith("pbkdf2_sha256$"):
+					try:
+						passwordHash = self._parsePasswordHash(password)
+					except Exception as e:
+						logging.exception("[%s]: Password hash of "
+							% self.fileName
+							+ "username '%s' is not valid." % username)
+
+						continue
+					password = None
+					maxIterations = max(maxIterations, passwordHash[0])
+
+				userCredentials[username] = (password,
+					passwordHash,
+					nodeType.upper(),
+					instance.upper())
+
+		self.userCredentials = userCredentials
+		if maxIterations > 0:
+			self.dummyPasswordHash = (maxIterations, os.urandom(16),
+				os.urandom(32))
+		else:
+			self.dummyPasswordHash = None
+		self.csvFileState = csvFileState
+		self.countLoads += 1
+
+		logging.debug("[%s]: Loaded %d user credentials from CSV file."
+			% (self.fileName, len(userCredentials)))
+
+
+	# internal function that reloads the csv file if it has changed
+	# (checked at most once in the reload interval)
+	def _reloadIfChanged(self):
+
+		if self.reloadInterval <= 0:
+			return
+
+		currentTime = time.time()
+		if (currentTime - self.lastReloadCheck) < self.reloadInterval:
+			return
+
+		# only one thread checks the csv file, the others use
+		# the stored user credentials
+		if not self.reloadLock.acquire(False):
+			return
+
+		try:
+			self.lastReloadCheck = currentTime
+
+			csvFileStat = os.stat(self.csvLocation)
+			if ((csvFileStat.st_mtime, csvFileStat.st_size)
+				!= self.csvFileState):
+
+				logging.info("[%s]: CSV file has changed. Reloading it."
+					% self.fileName)
+
+				self._loadCsvFile()
+
+		except Exception as e:
+			logging.exception("[%s]: Not able to reload CSV file. "
+				% self.fileName
+				+ "Keeping the user credentials loaded before.")
+
+		finally:
+			self.reloadLock.release()
 
 
 	# this function checks if the user credentials are valid
@@ -77,20 +253,35 @@ class CSVBackend(_userBackend):
 	# return True or False
 	def areUserCredentialsValid(self, username, password):
 
-		# check all usernames if the given username exist
-		# and then if the password is the correct one
-		for storedTuple in self.userCredentials:
+		self._reloadIfChanged()
 
-			if storedTuple[0] != username:
-				continue
+		# compare the password as byte string
+		if isinstance(password, unicode):
+			password = password.encode("utf-8")
 
+		try:
+			storedTuple = self.userCredentials[username]
+		except KeyError:
+			# check the password anyway (against a dummy hash with the
+			# same iterations as the stored hashes) to not reveal
+			# the existence of the username by the response time
+			dummyPasswordHash = self.dummyPasswordHash
+			if dummyPasswordHash is None:
+				self._compareDigest(password, password)
 			else:
-				if storedTuple[1] == password:
-					return True
-				else:
-					return False
+				iterations, salt, passwordHash = dummyPasswordHash
+				self._compareDigest(passwordHash,
+					hashlib.pbkdf2_hmac("sha256", password, salt,
+					iterations))
+			return False
 
-		return False
+		# password is stored as plain text
+		if storedTuple[1] is None:
+			return self._compareDigest(storedTuple[0], password)
+
+		iterations, salt, passwordHash = storedTuple[1]
+		return self._compareDigest(passwordHash,
+			hashlib.pbkdf2_hmac("sha256", password, salt, iterations))
 
 
 	# this function checks if the node type and instance of the client
@@ -99,18 +290,12 @@ class CSVBackend(_userBackend):
 	# return True or False
 	def checkNodeTypeAndInstance(self, username, nodeType, instance):
 
-		# check all usernames if the given username exist
-		# and then check the given node type and instance
-		for storedTuple in self.userCredentials:
-
-			if storedTuple[0] != username:
-				continue
+		self._reloadIfChanged()
 
-			else:
-				if (storedTuple[2].upper() == nodeType.upper()
-					and storedTuple[3].upper() == instance.upper()):
-					return True
-				else:
-					return False
+		try:
+			storedTuple = self.userCredentials[username]
+		except KeyError:
+			return False
 
-		return False
\ No newline at end of file
+		return (storedTuple[2] == nodeType.upper()
+			and storedTuple[3] == instance.upper())
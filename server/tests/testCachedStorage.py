@@ -0,0 +1,110 @@
+#!/usr/bin/python2
+
+# written by sqall
+# twitter: https://twitter.com/sqall01
+# blog: http://blog.h4des.org
+# github: https://github.com/sqall01
+#
+# Licensed under the GNU Public License, version 2.
+
+# run from the server directory with:
+# python2 -m unittest discover -s tests -p "test*.py"
+
+import os
+import sys
+import time
+import logging
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+	".."))
+from lib import CachedStorage, SensorAlertExecuter, AlertLevel, GlobalData
+
+
+# storage backend that fails the first reads like the mysql backend
+# (returns False) and returns the alert levels afterwards
+class FailingStorage:
+
+	def __init__(self, countFailures):
+		self.countFailures = countFailures
+		self.countReads = 0
+
+
+	def _read(self, value):
+		self.countReads += 1
+		if self.countReads <= self.countFailures:
+			return False
+		return value
+
+
+	def getSensorAlertLevels(self, sensorId):
+		return self._read([(1, )])
+
+
+	def getAlertAlertLevels(self, alertId):
+		return self._read([(1, )])
+
+
+	def getSensorCount(self, nodeId):
+		return self._read(3)
+
+
+# tests the cache of the metadata of the storage backends
+class TestCachedStorage(unittest.TestCase):
+
+	def setUp(self):
+
+		logging.disable(logging.CRITICAL)
+
+
+	def tearDown(self):
+
+		logging.disable(logging.NOTSET)
+
+
+	def test_failedReadIsNotCached(self):
+
+		for getterName, value in [("getSensorAlertLevels", [(1, )]),
+			("getAlertAlertLevels", [(1, )]), ("getSensorCount", 3)]:
+
+			backend = FailingStorage(1)
+			storage = CachedStorage(backend, None)
+			getter = getattr(storage, getterName)
+
+			self.assertEqual(getter(1), False)
+			self.assertEqual(getter(1), value)
+			self.assertEqual(getter(1), value)
+			self.assertEqual(backend.countReads, 2)
+
+
+	def test_failedReadDoesNotStopSensorAlertExecuter(self):
+
+		globalData = GlobalData()
+		globalData.serverSessions = list()
+		alertLevel = AlertLevel()
+		alertLevel.level = 1
+		alertLevel.triggerAlways = True
+		alertLevel.triggerAlertTriggered = True
+		alertLevel.triggerAlertNormal = True
+		alertLevel.rulesActivated = False
+		globalData.alertLevels.append(alertLevel)
+		globalData.alertLevelsByLevel[1] = alertLevel
+		globalData.storage = CachedStorage(FailingStorage(1), None)
+		executer = SensorAlertExecuter(globalData)
+
+		sensorAlert = (1, 1, 1, 0, 0, 1, "", "")
+
+		# the sensor alert can not be handled while the read fails
+		sensorAlertsToHandle = list()
+		executer._preFilterSensorAlert(sensorAlert, time.time(), True,
+			sensorAlertsToHandle, dict())
+		self.assertEqual(sensorAlertsToHandle, [])
+
+		# the next sensor alert of the sensor is handled
+		executer._preFilterSensorAlert(sensorAlert, time.time(), True,
+			sensorAlertsToHandle, dict())
+		self.assertEqual(len(sensorAlertsToHandle), 1)
+		self.assertEqual(sensorAlertsToHandle[0][1], [alertLevel])
+
+
+if __name__ == '__main__':
+	unittest.main()
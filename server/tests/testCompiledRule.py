@@ -0,0 +1,91 @@
+#!/usr/bin/python2
+
+# written by sqall
+# twitter: https://twitter.com/sqall01
+# blog: http://blog.h4des.org
+# github: https://github.com/sqall01
+#
+# Licensed under the GNU Public License, version 2.
+
+# run from the server directory with:
+# python2 -m unittest discover -s tests -p "test*.py"
+
+import os
+import sys
+import time
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+	".."))
+from lib import RuleStart, RuleElement, RuleBoolean, RuleHour, CompiledRule
+
+
+# tests the rule elements of compiled rules that depend on the time
+class TestCompiledRuleTimeElements(unittest.TestCase):
+
+	# creates a rule element of type "hour" that covers the current hour
+	def _createHourElement(self, ruleElement):
+
+		hourElement = RuleHour()
+		hourElement.time = "utc"
+		hourElement.start = time.gmtime().tm_hour
+		hourElement.end = time.gmtime().tm_hour
+
+		ruleElement.type = "hour"
+		ruleElement.element = hourElement
+		return ruleElement
+
+
+	def test_resetRuleStartTriggersAgain(self):
+
+		ruleStart = self._createHourElement(RuleStart())
+		compiledRule = CompiledRule(ruleStart)
+
+		self.assertEqual(compiledRule.updateTimeElements(), [ruleStart])
+		self.assertTrue(ruleStart.triggered)
+
+		# the rule is reset (for example because the rule chain triggered)
+		# => it triggers again with the next update and not only
+		# when the hour changes
+		ruleStart.triggered = False
+		ruleStart.timeWhenTriggered = 0.0
+		self.assertEqual(compiledRule.updateTimeElements(), [ruleStart])
+		self.assertTrue(ruleStart.triggered)
+		self.assertNotEqual(ruleStart.timeWhenTriggered, 0.0)
+
+
+	def test_triggeredRuleStartWaitsForNextChange(self):
+
+		ruleStart = self._createHourElement(RuleStart())
+		compiledRule = CompiledRule(ruleStart)
+		compiledRule.updateTimeElements()
+
+		# nothing changes until the hour changes
+		self.assertEqual(compiledRule.updateTimeElements(), [])
+		self.assertTrue(compiledRule.getNextDeadline() > time.time())
+
+
+	def test_resetBooleanRuleStartTriggersAgain(self):
+
+		hourElement = self._createHourElement(RuleElement())
+
+		booleanElement = RuleBoolean()
+		booleanElement.type = "and"
+		booleanElement.elements = [hourElement]
+
+		ruleStart = RuleStart()
+		ruleStart.type = "boolean"
+		ruleStart.element = booleanElement
+		compiledRule = CompiledRule(ruleStart)
+
+		compiledRule.evaluateBooleanElements(
+			compiledRule.updateTimeElements())
+		self.assertTrue(ruleStart.triggered)
+
+		ruleStart.triggered = False
+		compiledRule.evaluateBooleanElements(
+			compiledRule.updateTimeElements())
+		self.assertTrue(ruleStart.triggered)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,142 @@
+#!/usr/bin/python2
+
+# written by sqall
+# twitter: https://twitter.com/sqall01
+# blog: http://blog.h4des.org
+# github: https://github.com/sqall01
+#
+# Licensed under the GNU Public License, version 2.
+
+# run from the server directory with:
+# python2 -m unittest discover -s tests -p "test*.py"
+
+import os
+import sys
+import time
+import threading
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+	".."))
+from lib import ManagerStatus, GlobalData
+
+
+# storage that returns the alert system information with one sensor
+# whose state is the number of the read (the first read is delayed,
+# so it finishes after a later read when they are not serialized)
+class SensorStateStorage:
+
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.countReads = 0
+		self.state = 0
+		self.lastStateUpdated = 0
+
+
+	def getAlertSystemInformation(self):
+
+		self.lock.acquire()
+		self.countReads += 1
+		countReads = self.countReads
+		state = self.state
+		lastStateUpdated = self.lastStateUpdated
+		self.lock.release()
+
+		if countReads == 1:
+			time.sleep(0.2)
+
+		return [0, [], 1, [(1, "host", "sensor", "instance", 1, 0.1, 0)],
+			1, [(1, 1, 0, "sensor", lastStateUpdated, state)],
+			0, [], 0, [], [], []]
+
+
+# tests the snapshot of the manager status
+class TestManagerStatus(unittest.TestCase):
+
+	def setUp(self):
+
+		self.storage = SensorStateStorage()
+		globalData = GlobalData()
+		globalData.storage = self.storage
+		self.managerStatus = ManagerStatus(globalData)
+
+
+	# gets the state of the sensor in the snapshot
+	def _getSensorState(self):
+		return self.managerStatus.getFullStatus()[1]["sensors"][0]["state"]
+
+
+	def test_concurrentUpdatesApplyNewestInformation(self):
+
+		# the first update reads the old state and is delayed, the
+		# second update is started after the state changed
+		firstUpdate = threading.Thread(target=self.managerStatus.update)
+		firstUpdate.start()
+		time.sleep(0.05)
+		self.storage.state = 1
+		secondUpdate = threading.Thread(target=self.managerStatus.update)
+		secondUpdate.start()
+		firstUpdate.join()
+		secondUpdate.join()
+
+		self.assertEqual(self._getSensorState(), 1)
+
+
+	def test_lastStateUpdatedIsNoChange(self):
+
+		baseVersion = self.managerStatus.update()
+
+		# only the time of the last status message changed
+		# => no new version, but the full status is up to date
+		self.storage.lastStateUpdated = 100
+		self.assertEqual(self.managerStatus.update(), baseVersion)
+		self.assertEqual(self.managerStatus.getFullStatus()[1]["sensors"][0][
+			"lastStateUpdated"], 100)
+		version, status, removed, sensorsLastStateUpdated \
+			= self.managerStatus.getDeltaStatus(baseVersion)
+		self.assertEqual(status["sensors"], [])
+		self.assertEqual(sensorsLastStateUpdated, [[1, 100]])
+
+		# the state changed => the sensor is in the delta
+		self.storage.state = 1
+		self.storage.lastStateUpdated = 200
+		newVersion = self.managerStatus.update()
+		self.assertTrue(newVersion > baseVersion)
+		version, status, removed, sensorsLastStateUpdated \
+			= self.managerStatus.getDeltaStatus(baseVersion)
+		self.assertEqual(len(status["sensors"]), 1)
+		self.assertEqual(status["sensors"][0]["lastStateUpdated"], 200)
+		self.assertEqual(sensorsLastStateUpdated, [])
+
+
+	def test_lastStateUpdatedReachesMergingClient(self):
+
+		# the client gets a full status once and merges
+		# the deltas afterwards (like the manager clients)
+		self.managerStatus.update()
+		clientVersion, clientStatus = self.managerStatus.getFullStatus()
+		clientSensors = dict([(sensor["sensorId"], sensor)
+			for sensor in clientStatus["sensors"]])
+
+		for lastStateUpdated in [100, 200]:
+
+			# the sensor sent a status message, its state is the same
+			self.storage.lastStateUpdated = lastStateUpdated
+			self.managerStatus.update()
+
+			version, status, removed, sensorsLastStateUpdated \
+				= self.managerStatus.getDeltaStatus(clientVersion)
+			for sensor in status["sensors"]:
+				clientSensors[sensor["sensorId"]] = sensor
+			for sensorId, sensorLastStateUpdated in sensorsLastStateUpdated:
+				clientSensors[sensorId] = dict(clientSensors[sensorId])
+				clientSensors[sensorId]["lastStateUpdated"] \
+					= sensorLastStateUpdated
+			clientVersion = version
+
+			self.assertEqual(clientSensors[1]["lastStateUpdated"],
+				lastStateUpdated)
+			self.assertEqual(clientSensors[1]["state"], 0)
+
+
+if __name__ == '__main__':
+	unittest.main()
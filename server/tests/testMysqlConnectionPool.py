@@ -0,0 +1,213 @@
+#!/usr/bin/python2
+
+# written by sqall
+# twitter: https://twitter.com/sqall01
+# blog: http://blog.h4des.org
+# github: https://github.com/sqall01
+#
+# Licensed under the GNU Public License, version 2.
+
+# run from the server directory with:
+# python2 -m unittest discover -s tests -p "test*.py"
+
+import os
+import sys
+import time
+import logging
+import threading
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+	".."))
+from lib import Mysql
+from lib.storage import MysqlConnectionPool
+
+
+# connection to the mysql server that fails all calls when it is broken
+class FakeConnection:
+
+	def __init__(self):
+		self.broken = False
+		self.closed = False
+		self.countRollbacks = 0
+
+
+	def ping(self):
+		if self.broken:
+			raise Exception("Connection is broken.")
+
+
+	def rollback(self):
+		if self.broken:
+			raise Exception("Connection is broken.")
+		self.countRollbacks += 1
+
+
+	def close(self):
+		self.closed = True
+
+
+# replaces the MySQLdb package (connect() creates fake connections
+# or fails if the mysql server is not reachable)
+class FakeMySQLdb:
+
+	def __init__(self):
+		self.failConnect = False
+		self.connections = list()
+
+
+	def connect(self, host, port, user, passwd, db):
+		if self.failConnect:
+			raise Exception("Can not connect to mysql server.")
+		connection = FakeConnection()
+		self.connections.append(connection)
+		return connection
+
+
+# tests the pool of connections to the mysql server
+class TestMysqlConnectionPool(unittest.TestCase):
+
+	def setUp(self):
+
+		logging.disable(logging.CRITICAL)
+
+		self.previousMySQLdb = sys.modules.get("MySQLdb")
+		self.mysqldb = FakeMySQLdb()
+		sys.modules["MySQLdb"] = self.mysqldb
+
+
+	def tearDown(self):
+
+		logging.disable(logging.NOTSET)
+
+		if self.previousMySQLdb is None:
+			del sys.modules["MySQLdb"]
+		else:
+			sys.modules["MySQLdb"] = self.previousMySQLdb
+
+
+	def _createPool(self, maxConnections):
+		return MysqlConnectionPool("127.0.0.1", 3306, "alertr", "username",
+			"password", maxConnections)
+
+
+	def test_releasedConnectionIsReused(self):
+
+		pool = self._createPool(2)
+
+		connection = pool.checkout()
+		pool.release(connection)
+		self.assertEqual(connection.countRollbacks, 1)
+
+		self.assertTrue(pool.checkout() is connection)
+		self.assertEqual(len(self.mysqldb.connections), 1)
+		self.assertEqual(pool.countCreated, 1)
+		self.assertEqual(pool.countReused, 1)
+
+
+	def test_nestedCheckoutUsesSameConnection(self):
+
+		pool = self._createPool(2)
+
+		connection = pool.checkout()
+		self.assertTrue(pool.checkout() is connection)
+
+		# the connection is only given back after the last release
+		pool.release(connection)
+		self.assertEqual(len(pool.idleConnections), 0)
+		pool.release(connection)
+		self.assertEqual(len(pool.idleConnections), 1)
+		self.assertEqual(pool.connectionCount, 1)
+
+
+	def test_checkoutBlocksWhenPoolIsExhausted(self):
+
+		pool = self._createPool(1)
+		connection = pool.checkout()
+
+		# a second thread has to wait until the connection is released
+		checkedOut = list()
+		def checkout():
+			checkedOut.append(pool.checkout())
+		thread = threading.Thread(target=checkout)
+		thread.daemon = True
+		thread.start()
+
+		time.sleep(0.2)
+		self.assertEqual(checkedOut, [])
+		self.assertEqual(pool.countWaited, 1)
+
+		pool.release(connection)
+		thread.join(2.0)
+		self.assertEqual(checkedOut, [connection])
+		self.assertEqual(pool.connectionCount, 1)
+		self.assertEqual(len(self.mysqldb.connections), 1)
+
+
+	def test_brokenIdleConnectionIsReplaced(self):
+
+		pool = self._createPool(1)
+		pool.healthCheckInterval = -1.0
+
+		connection = pool.checkout()
+		pool.release(connection)
+		connection.broken = True
+
+		newConnection = pool.checkout()
+		self.assertTrue(newConnection is not connection)
+		self.assertTrue(connection.closed)
+		self.assertEqual(pool.connectionCount, 1)
+		self.assertEqual(pool.countCreated, 2)
+
+
+	def test_connectionIsDiscardedWhenRollbackFails(self):
+
+		pool = self._createPool(1)
+
+		connection = pool.checkout()
+		connection.broken = True
+		pool.release(connection)
+		self.assertTrue(connection.closed)
+		self.assertEqual(pool.connectionCount, 0)
+		self.assertEqual(pool.countDiscarded, 1)
+		self.assertEqual(len(pool.idleConnections), 0)
+
+		# the place of the discarded connection is free again
+		newConnection = pool.checkout()
+		self.assertTrue(newConnection is not connection)
+		self.assertEqual(pool.connectionCount, 1)
+
+
+	def test_failedConnectFreesPlaceInPool(self):
+
+		pool = self._createPool(1)
+
+		self.mysqldb.failConnect = True
+		self.assertRaises(Exception, pool.checkout)
+		self.assertEqual(pool.connectionCount, 0)
+
+		# the pool does not block after the failed connect
+		self.mysqldb.failConnect = False
+		connection = pool.checkout()
+		self.assertEqual(pool.connectionCount, 1)
+		pool.release(connection)
+
+
+	def test_storageReturnsFalseWhenConnectFails(self):
+
+		# the mysql storage backend without the creation of the tables
+		storage = Mysql.__new__(Mysql)
+		storage.fileName = "storage.py"
+		storage._initLocking(False, None)
+		storage.connectionPool = self._createPool(1)
+
+		self.mysqldb.failConnect = True
+		self.assertEqual(storage.getSensorCount(1), False)
+
+		# the lock and the place in the pool are released
+		self.assertTrue(storage.dbLock.acquire(False))
+		storage.dbLock.release()
+		self.assertEqual(storage.connectionPool.connectionCount, 0)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,152 @@
+#!/usr/bin/python2
+
+# written by sqall
+# twitter: https://twitter.com/sqall01
+# blog: http://blog.h4des.org
+# github: https://github.com/sqall01
+#
+# Licensed under the GNU Public License, version 2.
+
+# run from the server directory with:
+# python2 -m unittest discover -s tests -p "test*.py"
+
+import os
+import sys
+import time
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+	".."))
+from lib import SlidingWindowCounter, SensorAlertExecuter, AlertLevel, \
+	RuleStart, GlobalData
+
+
+# tests the counting of the times in a sliding window
+class TestSlidingWindowCounter(unittest.TestCase):
+
+	def test_expireRemovesOnlyFront(self):
+
+		counter = SlidingWindowCounter(10, 100)
+		for timeCounted in [100, 105, 110, 115]:
+			self.assertTrue(counter.add(timeCounted))
+
+		# window of 100 and 105 has passed, 110 expires exactly at 120
+		self.assertEqual(counter.expire(120), 2)
+		self.assertEqual(list(counter), [110, 115])
+		self.assertFalse(100 in counter)
+		self.assertFalse(105 in counter)
+		self.assertTrue(110 in counter)
+
+		self.assertEqual(counter.expire(120), 0)
+		self.assertEqual(counter.expire(1000), 2)
+		self.assertEqual(len(counter), 0)
+
+
+	def test_addOutOfOrderKeepsTimesSorted(self):
+
+		counter = SlidingWindowCounter(10, 100)
+		for timeCounted in [100, 110, 105]:
+			counter.add(timeCounted)
+
+		self.assertEqual(list(counter), [100, 105, 110])
+		self.assertEqual(counter.expire(116), 2)
+		self.assertEqual(list(counter), [110])
+
+
+	def test_capEvictsOldest(self):
+
+		counter = SlidingWindowCounter(10, 3)
+		for timeCounted in [100, 101, 102]:
+			self.assertTrue(counter.add(timeCounted))
+
+		self.assertFalse(counter.add(103))
+		self.assertEqual(len(counter), 3)
+		self.assertEqual(list(counter), [101, 102, 103])
+		self.assertFalse(100 in counter)
+		self.assertEqual(counter.countEvicted, 1)
+
+
+	def test_getNextExpiration(self):
+
+		counter = SlidingWindowCounter(10, 100)
+		self.assertEqual(counter.getNextExpiration(0), None)
+
+		counter.add(100)
+		counter.add(105)
+		self.assertEqual(counter.getNextExpiration(0), 110)
+		self.assertEqual(counter.getNextExpiration(110), 115)
+		self.assertEqual(counter.getNextExpiration(115), None)
+
+
+# tests the handling of the counter limit of the rules
+class TestRuleCounterLimit(unittest.TestCase):
+
+	def setUp(self):
+
+		self.executer = SensorAlertExecuter(GlobalData())
+
+		self.ruleStart = RuleStart()
+		self.ruleStart.order = 0
+		self.ruleStart.counterActivated = True
+		self.ruleStart.counterLimit = 2
+		self.ruleStart.counterWaitTime = 60
+		self.ruleStart.counter = SlidingWindowCounter(
+			self.ruleStart.counterWaitTime, self.ruleStart.counterLimit)
+
+		self.alertLevel = AlertLevel()
+		self.alertLevel.level = 1
+		self.alertLevel.rules = [self.ruleStart]
+
+
+	# lets the rule trigger at the given time and updates its counter
+	def _trigger(self, timeWhenTriggered):
+
+		self.ruleStart.triggered = True
+		self.ruleStart.timeWhenTriggered = timeWhenTriggered
+		self.executer._updateRuleCounters(self.alertLevel)
+
+
+	def test_limitResetsRule(self):
+
+		currentTime = time.time()
+
+		self._trigger(currentTime - 2)
+		self.assertTrue(self.ruleStart.triggered)
+		self._trigger(currentTime - 1)
+		self.assertTrue(self.ruleStart.triggered)
+		self.assertEqual(len(self.ruleStart.counter), 2)
+
+		# limit is reached => the rule is reset
+		self._trigger(currentTime)
+		self.assertFalse(self.ruleStart.triggered)
+		self.assertEqual(self.ruleStart.timeWhenTriggered, 0.0)
+		self.assertEqual(len(self.ruleStart.counter), 2)
+		self.assertEqual(self.ruleStart.counter.countEvicted, 0)
+
+
+	def test_sameTriggerCountedOnce(self):
+
+		currentTime = time.time()
+
+		self._trigger(currentTime)
+		self._trigger(currentTime)
+		self.assertTrue(self.ruleStart.triggered)
+		self.assertEqual(len(self.ruleStart.counter), 1)
+
+
+	def test_expiredTriggersFreeTheLimit(self):
+
+		currentTime = time.time()
+
+		# triggers outside of the window are removed before
+		# the limit is checked
+		self._trigger(currentTime - 200)
+		self._trigger(currentTime - 100)
+		self.assertEqual(len(self.ruleStart.counter), 1)
+
+		self._trigger(currentTime)
+		self.assertTrue(self.ruleStart.triggered)
+		self.assertEqual(list(self.ruleStart.counter), [currentTime])
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,298 @@
+#!/usr/bin/python2
+
+# written by sqall
+# twitter: https://twitter.com/sqall01
+# blog: http://blog.h4des.org
+# github: https://github.com/sqall01
+#
+# Licensed under the GNU Public License, version 2.
+
+# run from the server directory with:
+# python2 -m unittest discover -s tests -p "test*.py"
+
+import os
+import sys
+import time
+import smtplib
+import logging
+import threading
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+	".."))
+from lib import GlobalData
+from lib.smtp import SMTPSender
+
+
+# smtp server that records the sent eMails and fails the sending
+# with the given exceptions (one exception per attempt)
+class SmtpServerStub:
+
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.sentMails = list()
+		self.failures = list()
+		self.countConnections = 0
+		self.countAttempts = 0
+
+		# the smtp sender and the retry interval it had
+		# at each attempt
+		self.sender = None
+		self.retryIntervals = list()
+		self.attemptTimes = list()
+
+
+# replaces smtplib.SMTP and uses the smtp server stub
+class SMTPStub:
+
+	server = None
+
+	def __init__(self, host, port, timeout):
+		self.server.lock.acquire()
+		self.server.countConnections += 1
+		self.server.lock.release()
+
+
+	def sendmail(self, fromAddr, toAddr, message):
+		server = self.server
+		server.lock.acquire()
+		try:
+			server.countAttempts += 1
+			server.attemptTimes.append(time.time())
+			if server.sender is not None:
+				server.retryIntervals.append(
+					server.sender.currentRetryInterval)
+			if len(server.failures) != 0:
+				raise server.failures.pop(0)
+			server.sentMails.append((fromAddr, toAddr, message))
+		finally:
+			server.lock.release()
+
+
+	def quit(self):
+		pass
+
+
+	def close(self):
+		pass
+
+
+# tests the sending of the queued eMails
+class TestSmtpSender(unittest.TestCase):
+
+	def setUp(self):
+
+		logging.disable(logging.CRITICAL)
+
+		self.server = SmtpServerStub()
+		SMTPStub.server = self.server
+		self.previousSMTP = smtplib.SMTP
+		smtplib.SMTP = SMTPStub
+
+		globalData = GlobalData()
+		globalData.smtpDigestInterval = 0.3
+		globalData.smtpRetryInterval = 0.05
+		globalData.smtpMaxRetryInterval = 0.2
+		globalData.smtpMaxAttempts = 10
+		globalData.smtpExitTimeout = 2.0
+		self.sender = SMTPSender("127.0.0.1", 25, "alertr@example.org",
+			globalData)
+		self.sender.daemon = True
+
+
+	def tearDown(self):
+
+		if self.sender.isAlive():
+			self.sender.exit()
+			self.sender.join(5.0)
+
+		smtplib.SMTP = self.previousSMTP
+
+		logging.disable(logging.NOTSET)
+
+
+	# waits until the given number of eMails was sent
+	def _waitForSentMails(self, count):
+
+		timeout = time.time() + 5.0
+		while (len(self.server.sentMails) < count
+			and time.time() < timeout):
+			time.sleep(0.01)
+
+		self.assertEqual(len(self.server.sentMails), count)
+
+
+	def test_sensorAlertsAreCollectedToDigest(self):
+
+		sender = self.sender
+		sender.queueMail("a@example.org", "alert 1", "message 1", True)
+		sender.queueMail("a@example.org", "alert 2", "message 2", True)
+		sender.queueMail("a@example.org", "timeout", "message 3", False)
+		sender.queueMail("b@example.org", "alert 4", "message 4", True)
+		sender.queueMail("a@example.org", "alert 5", "message 5", True)
+
+		# sensor alert eMails to "a" are collected while its digest
+		# interval is running, the others are sent
+		currentTime = time.time()
+		sender.digestUntil["a@example.org"] = currentTime + 10.0
+		self.assertEqual([mail[1] for mail in sender._getNextMails(
+			currentTime)], ["timeout"])
+		self.assertEqual([mail[1] for mail in sender._getNextMails(
+			currentTime)], ["alert 4"])
+		self.assertEqual(sender._getNextMails(currentTime), None)
+
+		# all collected sensor alert eMails are returned together
+		# after the digest interval
+		mails = sender._getNextMails(currentTime + 11.0)
+		self.assertEqual([mail[1] for mail in mails],
+			["alert 1", "alert 2", "alert 5"])
+		self.assertEqual(len(sender.queue), 0)
+
+		subject, message = sender._composeMail(mails)
+		self.assertEqual(subject, "[alertR] 3 sensor alerts triggered")
+		self.assertTrue("alert 1\nmessage 1" in message)
+		self.assertTrue("alert 5\nmessage 5" in message)
+
+
+	def test_digestIsSent(self):
+
+		self.sender.start()
+
+		# the first sensor alert eMail is sent directly, the following
+		# ones are sent as digest after the digest interval
+		self.sender.queueMail("a@example.org", "alert 1", "message 1", True)
+		self._waitForSentMails(1)
+		self.sender.queueMail("a@example.org", "alert 2", "message 2", True)
+		self.sender.queueMail("a@example.org", "alert 3", "message 3", True)
+		time.sleep(0.1)
+		self.assertEqual(len(self.server.sentMails), 1)
+		self._waitForSentMails(2)
+
+		fromAddr, toAddr, message = self.server.sentMails[0]
+		self.assertEqual(fromAddr, "alertr@example.org")
+		self.assertEqual(toAddr, "a@example.org")
+		self.assertEqual(message, "From: alertr@example.org\r\n"
+			+ "To: a@example.org\r\nSubject: alert 1\r\nmessage 1")
+
+		fromAddr, toAddr, message = self.server.sentMails[1]
+		self.assertEqual(toAddr, "a@example.org")
+		self.assertTrue("Subject: [alertR] 2 sensor alerts triggered\r\n"
+			in message)
+		self.assertTrue("alert 2\nmessage 2" in message)
+		self.assertTrue("alert 3\nmessage 3" in message)
+
+		# one persistent connection is used for all eMails
+		self.assertEqual(self.server.countConnections, 1)
+		self.assertEqual(self.sender.countDigests, 1)
+
+
+	def test_retryIntervalIsDoubled(self):
+
+		self.server.sender = self.sender
+		self.server.failures = [smtplib.SMTPResponseException(451,
+			"Try again later.") for i in range(4)]
+		self.sender.start()
+
+		self.sender.queueMail("a@example.org", "timeout", "message", False)
+		self._waitForSentMails(1)
+
+		# the retry interval is doubled up to the maximum and reset
+		# after the eMail was sent
+		self.assertEqual(self.server.retryIntervals,
+			[0.05, 0.1, 0.2, 0.2, 0.2])
+		for i in range(4):
+			self.assertTrue(self.server.attemptTimes[i + 1]
+				- self.server.attemptTimes[i]
+				>= self.server.retryIntervals[i] * 0.9)
+		self.assertEqual(self.sender.currentRetryInterval, 0.05)
+		self.assertEqual(self.sender.countRetries, 4)
+		self.assertEqual(self.sender.countFailed, 0)
+
+
+	def test_eMailIsDroppedAfterMaxAttempts(self):
+
+		self.sender.maxAttempts = 2
+		self.server.failures = [smtplib.SMTPResponseException(451,
+			"Try again later.") for i in range(2)]
+		self.sender.start()
+
+		self.sender.queueMail("a@example.org", "timeout 1", "message", False)
+		self.sender.queueMail("a@example.org", "timeout 2", "message", False)
+		self._waitForSentMails(1)
+
+		self.assertEqual(self.server.countAttempts, 3)
+		self.assertTrue("Subject: timeout 2\r\n"
+			in self.server.sentMails[0][2])
+		self.assertEqual(self.sender.countFailed, 1)
+
+
+	def test_permanentRejectionIsDropped(self):
+
+		self.server.failures = [
+			smtplib.SMTPResponseException(554, "Transaction failed."),
+			smtplib.SMTPRecipientsRefused({"b@example.org": (550,
+			"No such user.")})]
+		self.sender.start()
+
+		self.sender.queueMail("a@example.org", "timeout 1", "message", False)
+		self.sender.queueMail("b@example.org", "timeout 2", "message", False)
+		self.sender.queueMail("a@example.org", "timeout 3", "message", False)
+		self._waitForSentMails(1)
+
+		# the rejected eMails are not retried
+		self.assertEqual(self.server.countAttempts, 3)
+		self.assertTrue("Subject: timeout 3\r\n"
+			in self.server.sentMails[0][2])
+		self.assertEqual(self.sender.countFailed, 2)
+		self.assertEqual(self.sender.countRetries, 0)
+
+
+	def test_queuedMailsAreSentOnExit(self):
+
+		self.sender.digestInterval = 60.0
+		self.sender.retryInterval = 60.0
+		self.sender.currentRetryInterval = 60.0
+		self.sender.start()
+
+		# the sensor alert eMails that are collected for a digest and
+		# the eMails that wait for a retry are sent on exit
+		self.sender.queueMail("a@example.org", "alert 1", "message 1", True)
+		self._waitForSentMails(1)
+		self.sender.queueMail("a@example.org", "alert 2", "message 2", True)
+		self.sender.queueMail("a@example.org", "alert 3", "message 3", True)
+		self.server.failures = [smtplib.SMTPResponseException(451,
+			"Try again later.")]
+		self.sender.queueMail("b@example.org", "timeout", "message 4", False)
+		time.sleep(0.1)
+		self.assertEqual(len(self.server.sentMails), 1)
+
+		self.sender.exit()
+		self.sender.join(5.0)
+		self.assertFalse(self.sender.isAlive())
+
+		self.assertEqual(sorted([mail[1] for mail in
+			self.server.sentMails[1:]]), ["a@example.org", "b@example.org"])
+		self.assertFalse(self.sender.queueMail("a@example.org", "alert 5",
+			"message 5", True))
+
+
+	def test_drainQueueIsBounded(self):
+
+		# the smtp server is not reachable
+		self.server.failures = [smtplib.SMTPResponseException(451,
+			"Try again later.") for i in range(10)]
+
+		self.sender.queueMail("a@example.org", "alert 1", "message 1", True)
+		self.sender.queueMail("a@example.org", "alert 2", "message 2", True)
+		self.sender.queueMail("b@example.org", "timeout", "message 3", False)
+
+		# every eMail is tried the number of exit attempts and is
+		# dropped afterwards
+		self.assertEqual(self.sender._drainQueue(), 3)
+		self.assertEqual(self.server.countAttempts,
+			2 * self.sender.exitAttempts)
+		self.assertEqual(self.sender.countFailed, 3)
+		self.assertEqual(len(self.sender.queue), 0)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,74 @@
+#!/usr/bin/python2
+
+# written by sqall
+# twitter: https://twitter.com/sqall01
+# blog: http://blog.h4des.org
+# github: https://github.com/sqall01
+#
+# Licensed under the GNU Public License, version 2.
+
+# run from the server directory with:
+# python2 -m unittest discover -s tests -p "test*.py"
+
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+	".."))
+from lib import TimerHeap
+
+
+# tests the heap of timers
+class TestTimerHeap(unittest.TestCase):
+
+	def test_popExpiredInOrder(self):
+
+		timerHeap = TimerHeap()
+		timerHeap.schedule("b", 20.0)
+		timerHeap.schedule("a", 10.0)
+		timerHeap.schedule("c", 30.0)
+
+		self.assertEqual(timerHeap.getNextDeadline(), 10.0)
+		self.assertEqual(timerHeap.popExpired(25.0), ["a", "b"])
+		self.assertEqual(timerHeap.popExpired(25.0), [])
+		self.assertEqual(timerHeap.getNextDeadline(), 30.0)
+
+
+	def test_replaceAndCancel(self):
+
+		timerHeap = TimerHeap()
+		timerHeap.schedule("a", 10.0)
+		timerHeap.schedule("a", 40.0)
+		timerHeap.schedule("b", 20.0)
+		timerHeap.cancel("b")
+
+		self.assertEqual(timerHeap.getNextDeadline(), 40.0)
+		self.assertEqual(timerHeap.popExpired(30.0), [])
+		self.assertEqual(timerHeap.popExpired(50.0), ["a"])
+		self.assertEqual(timerHeap.getNextDeadline(), None)
+
+
+	def test_sameDeadlineDoesNotGrowHeap(self):
+
+		timerHeap = TimerHeap()
+		for i in range(10000):
+			timerHeap.schedule("a", 10.0)
+			timerHeap.schedule("b", float(i))
+
+		self.assertTrue(len(timerHeap.heap) <= 2 * 2 + 64 + 1)
+		self.assertEqual(timerHeap.popExpired(100000.0), ["a", "b"])
+
+
+	def test_rescheduleSameDeadlineAfterCancel(self):
+
+		timerHeap = TimerHeap()
+		timerHeap.schedule("a", 10.0)
+		timerHeap.cancel("a")
+		timerHeap.schedule("a", 10.0)
+
+		self.assertEqual(timerHeap.popExpired(20.0), ["a"])
+		self.assertEqual(timerHeap.popExpired(20.0), [])
+
+
+if __name__ == '__main__':
+	unittest.main()